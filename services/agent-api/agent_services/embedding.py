@@ -4,16 +4,19 @@ Embedding 生成服务
 Phase 6: Sprint 6.2
 """
 
+import asyncio
 import logging
 import os
+import threading
+import weakref
 import requests
-from typing import List, Optional, Union
+from typing import Coroutine, Dict, List, Optional, Union
 
 try:
-    from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-    HAS_TENACITY = True
+    import aiohttp
+    HAS_AIOHTTP = True
 except ImportError:
-    HAS_TENACITY = False
+    HAS_AIOHTTP = False
 
 logger = logging.getLogger(__name__)
 
@@ -24,41 +27,156 @@ EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
 # 是否启用模拟 embedding（仅用于开发测试）
 EMBEDDING_MOCK_ENABLED = os.getenv("EMBEDDING_MOCK_ENABLED", "false").lower() in ("true", "1", "yes")
 
+# 批量请求配置：单个子批次的估算 token 上限与条数上限
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "8000"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+# 同时在途的子批次请求数
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# 子批次失败后的最大尝试次数（含首次）
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_REQUEST_TIMEOUT = float(os.getenv("EMBEDDING_REQUEST_TIMEOUT", "30"))
+
+
+class EmbeddingRequestError(Exception):
+    """Embedding API 请求失败"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本 token 数（不依赖 tokenizer）
+
+    ASCII 字符按约 4 字符/token 计，非 ASCII（中文等）按 1 字符/token 计。
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars) + 1
 
-def _make_embedding_request(api_url: str, text: str, model: str) -> requests.Response:
-    """Make embedding request with optional retry"""
-    return requests.post(
-        f"{api_url}/v1/embeddings",
-        json={"input": text, "model": model},
-        timeout=30
-    )
-
-
-# Apply retry decorator if tenacity is available
-if HAS_TENACITY:
-    _make_embedding_request = retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((requests.exceptions.ConnectionError,
-                                       requests.exceptions.Timeout)),
-        before_sleep=lambda retry_state: logger.warning(
-            f"Embedding request failed, retrying ({retry_state.attempt_number}/3)..."
-        )
-    )(_make_embedding_request)
+
+def build_token_batches(
+    texts: List[str],
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+    max_size: int = EMBEDDING_BATCH_MAX_SIZE,
+) -> List[List[int]]:
+    """
+    按 token 预算把文本切分为微批次
+
+    Args:
+        texts: 输入文本列表
+        max_tokens: 单批估算 token 上限（超长单条文本独占一批）
+        max_size: 单批条数上限
+
+    Returns:
+        每个批次对应的原始下标列表（空白文本不参与分批）
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _get_shared_embedding_cache():
+    """获取共享 Embedding 缓存（shared 模块不可用或缓存关闭时返回 None）"""
+    try:
+        from shared.embedding_cache import get_embedding_cache
+    except ImportError:
+        return None
+    try:
+        return get_embedding_cache()
+    except Exception as e:
+        logger.warning(f"Embedding cache unavailable: {e}")
+        return None
+
+
+class _LoopRunner:
+    """
+    后台常驻事件循环
+
+    同步接口通过 run_coroutine_threadsafe 把协程提交到同一个循环，
+    避免每次调用 asyncio.run 新建/销毁循环，也让连接池可以跨调用复用。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="embedding-loop", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro: Coroutine):
+        """在后台循环上执行协程并阻塞等待结果"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Cannot call sync embedding API from the embedding loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+_loop_runner = _LoopRunner()
 
 
 class EmbeddingService:
     """Embedding 生成服务"""
 
-    def __init__(self, api_url: str = None):
+    def __init__(
+        self,
+        api_url: str = None,
+        max_batch_tokens: int = None,
+        max_batch_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        embedding_cache=None,
+    ):
         """
         初始化 Embedding 服务
 
         Args:
             api_url: Embedding API 地址
+            max_batch_tokens: 单个子批次估算 token 上限
+            max_batch_size: 单个子批次条数上限
+            max_concurrency: 并发子批次请求数上限
+            max_retries: 子批次最大尝试次数
+            embedding_cache: Embedding 缓存，None 时使用共享缓存
         """
         self.api_url = api_url or MODEL_API_URL
         self.model = EMBEDDING_MODEL
+        self.max_batch_tokens = max_batch_tokens or EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_size = max_batch_size or EMBEDDING_BATCH_MAX_SIZE
+        self.max_concurrency = max(1, max_concurrency or EMBEDDING_MAX_CONCURRENCY)
+        self.max_retries = max(1, max_retries or EMBEDDING_MAX_RETRIES)
+        # aiohttp 会话绑定创建时的事件循环，按循环分别缓存
+        self._sessions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._http: Optional[requests.Session] = None
+        self._embedding_cache = embedding_cache
+
+    @property
+    def embedding_cache(self):
+        """按 (模型, 文本哈希) 寻址的共享缓存"""
+        if self._embedding_cache is None:
+            self._embedding_cache = _get_shared_embedding_cache()
+        return self._embedding_cache
 
     async def embed_text(self, text: str) -> List[float]:
         """
@@ -75,47 +193,156 @@ class EmbeddingService:
         """
         if not text or not text.strip():
             return [0.0] * EMBEDDING_DIM
-
-        try:
-            response = _make_embedding_request(self.api_url, text, self.model)
-
-            if response.status_code == 200:
-                result = response.json()
-                embedding = result.get("data", [{}])[0].get("embedding", [])
-                return embedding
-            else:
-                error_msg = f"Embedding API error: {response.status_code}"
-                if EMBEDDING_MOCK_ENABLED:
-                    logger.warning(f"{error_msg}, falling back to mock embedding (EMBEDDING_MOCK_ENABLED=true)")
-                    return self._mock_embedding(text)
-                else:
-                    logger.error(f"{error_msg}. Set EMBEDDING_MOCK_ENABLED=true for development or configure a valid embedding service.")
-                    raise RuntimeError(f"{error_msg}. Embedding service unavailable.")
-
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Embedding API connection failed: {e}"
-            if EMBEDDING_MOCK_ENABLED:
-                logger.warning(f"{error_msg}, falling back to mock embedding (EMBEDDING_MOCK_ENABLED=true)")
-                return self._mock_embedding(text)
-            else:
-                logger.error(f"{error_msg}. Set EMBEDDING_MOCK_ENABLED=true for development or configure a valid embedding service.")
-                raise RuntimeError(f"Embedding service unavailable: {e}")
+        return (await self.embed_texts([text]))[0]
 
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
         批量生成向量
 
+        先批量查询共享缓存，只把未命中的文本按 token 预算切分微批次，
+        每个子批次一次 /v1/embeddings 请求，并发数受 max_concurrency 限制，
+        失败的子批次单独重试。
+
         Args:
             texts: 输入文本列表
 
         Returns:
-            向量列表的列表
+            向量列表的列表（与输入顺序一致，空白文本为零向量）
+
+        Raises:
+            RuntimeError: 当 API 调用失败且未启用模拟模式时
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        cache = self.embedding_cache
+        if cache is not None:
+            lookup = [i for i, text in enumerate(texts) if text and text.strip()]
+            # 缓存查询包含 Redis 往返，放到线程中执行，避免阻塞事件循环
+            cached = await asyncio.to_thread(cache.get_many, self.model, [texts[i] for i in lookup])
+            for i, vector in zip(lookup, cached):
+                results[i] = vector
+            pending = [text if results[i] is None else "" for i, text in enumerate(texts)]
+        else:
+            pending = texts
+        batches = build_token_batches(pending, self.max_batch_tokens, self.max_batch_size)
+
+        if batches:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            batch_vectors = await asyncio.gather(
+                *(self._embed_batch([texts[i] for i in batch], semaphore) for batch in batches)
+            )
+            for batch, vectors in zip(batches, batch_vectors):
+                for idx, vector in zip(batch, vectors):
+                    results[idx] = vector
+
+        return [vec if vec is not None else [0.0] * EMBEDDING_DIM for vec in results]
+
+    async def _embed_batch(self, batch: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+        """执行单个子批次请求（带并发限制与指数退避重试）"""
+        async with semaphore:
+            last_error: Optional[Exception] = None
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    vectors = await self._post_embeddings(batch)
+                    if self.embedding_cache is not None:
+                        await asyncio.to_thread(self.embedding_cache.set_many, self.model, batch, vectors)
+                    return vectors
+                except EmbeddingRequestError as e:
+                    last_error = e
+                    if not e.retryable:
+                        break
+                except (asyncio.TimeoutError, requests.exceptions.RequestException, OSError) as e:
+                    last_error = e
+                except Exception as e:
+                    if HAS_AIOHTTP and isinstance(e, aiohttp.ClientError):
+                        last_error = e
+                    else:
+                        raise
+                if attempt < self.max_retries:
+                    logger.warning(
+                        f"Embedding batch of {len(batch)} failed, retrying "
+                        f"({attempt}/{self.max_retries}): {last_error}"
+                    )
+                    await asyncio.sleep(min(2 ** (attempt - 1), 10))
+
+        error_msg = f"Embedding API request failed: {last_error}"
+        if EMBEDDING_MOCK_ENABLED:
+            logger.warning(f"{error_msg}, falling back to mock embedding (EMBEDDING_MOCK_ENABLED=true)")
+            return [self._mock_embedding(text) for text in batch]
+        logger.error(f"{error_msg}. Set EMBEDDING_MOCK_ENABLED=true for development or configure a valid embedding service.")
+        raise RuntimeError(f"Embedding service unavailable: {last_error}")
+
+    async def _post_embeddings(self, batch: List[str]) -> List[List[float]]:
+        """
+        调用 /v1/embeddings（input 为数组）
+
+        Raises:
+            EmbeddingRequestError: 非 200 响应或返回条数不匹配
         """
-        embeddings = []
-        for text in texts:
-            embedding = await self.embed_text(text)
-            embeddings.append(embedding)
-        return embeddings
+        payload = {"input": batch, "model": self.model}
+        if HAS_AIOHTTP:
+            session = self._get_session()
+            async with session.post(f"{self.api_url}/v1/embeddings", json=payload) as resp:
+                status = resp.status
+                body = await resp.json(content_type=None) if status == 200 else None
+        else:
+            # aiohttp 不可用时回退到线程池中的同步连接池
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, self._post_embeddings_sync, payload)
+            status = response.status_code
+            body = response.json() if status == 200 else None
+
+        if status != 200:
+            raise EmbeddingRequestError(
+                f"Embedding API error: {status}",
+                retryable=status == 429 or status >= 500,
+            )
+        return self._parse_embeddings(body, len(batch))
+
+    def _post_embeddings_sync(self, payload: Dict) -> requests.Response:
+        """同步 HTTP 请求（复用 requests.Session 连接池）"""
+        if self._http is None:
+            self._http = requests.Session()
+        return self._http.post(
+            f"{self.api_url}/v1/embeddings", json=payload, timeout=EMBEDDING_REQUEST_TIMEOUT
+        )
+
+    @staticmethod
+    def _parse_embeddings(body: Optional[Dict], expected: int) -> List[List[float]]:
+        """按 index 字段还原返回顺序"""
+        data = (body or {}).get("data") or []
+        if len(data) != expected:
+            raise EmbeddingRequestError(
+                f"Embedding API returned {len(data)} vectors for {expected} inputs",
+                retryable=False,
+            )
+        ordered = sorted(enumerate(data), key=lambda item: item[1].get("index", item[0]))
+        return [item.get("embedding", []) for _, item in ordered]
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """获取当前事件循环对应的 aiohttp 会话（连接池）"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency * 2),
+                timeout=aiohttp.ClientTimeout(total=EMBEDDING_REQUEST_TIMEOUT),
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环上的连接池"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def close(self) -> None:
+        """关闭同步接口使用的连接池"""
+        if self._sessions:
+            _loop_runner.run(self.aclose())
+        if self._http is not None:
+            self._http.close()
+            self._http = None
 
     def _mock_embedding(self, text: str) -> List[float]:
         """
@@ -145,14 +372,12 @@ class EmbeddingService:
         return embedding
 
     def sync_embed_text(self, text: str) -> List[float]:
-        """同步版本的 embed_text"""
-        import asyncio
-        return asyncio.run(self.embed_text(text))
+        """同步版本的 embed_text（在共享后台事件循环上执行）"""
+        return _loop_runner.run(self.embed_text(text))
 
     def sync_embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """同步版本的 embed_texts"""
-        import asyncio
-        return asyncio.run(self.embed_texts(texts))
+        """同步版本的 embed_texts（在共享后台事件循环上执行）"""
+        return _loop_runner.run(self.embed_texts(texts))
 
     def embed_query(self, query: str) -> List[float]:
         """
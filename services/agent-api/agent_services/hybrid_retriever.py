@@ -12,21 +12,30 @@ Production: 结合向量检索和关键词检索的高性能搜索
 """
 
 import logging
+import os
 import re
 import math
+import threading
 import time
 from typing import Any, Dict, List, Optional, Tuple, Set
 from dataclasses import dataclass, field
 from enum import Enum
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
 import hashlib
 import json
+import shutil
+import tempfile
+
+import numpy as np
 
 from .vector_store import VectorStore
 from .embedding import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
+# MMR 使用的分块向量缓存容量（按 chunk id）
+CHUNK_EMBEDDING_CACHE_SIZE = int(os.getenv("CHUNK_EMBEDDING_CACHE_SIZE", "10000"))
+
 
 class RetrievalMethod(Enum):
     """检索方法"""
@@ -85,6 +94,9 @@ class RetrievalConfig:
     enable_cache: bool = True
     cache_ttl: int = 300            # 秒
 
+    # BM25 索引持久化目录（按集合名分子目录），为空则不落盘
+    bm25_index_dir: Optional[str] = field(default_factory=lambda: os.getenv("BM25_INDEX_DIR"))
+
     # 过滤
     filters: Optional[Dict[str, Any]] = None
 
@@ -93,9 +105,25 @@ class BM25Index:
     """
     BM25 索引器
 
-    用于关键词检索的 BM25 算法实现
+    基于倒排索引的 BM25 实现：
+    - 倒排表以 CSR 形式存放在紧凑的 NumPy 数组中（term -> [doc, tf]）
+    - 预计算每个文档的长度归一化项，查询时只遍历命中词的倒排表
+    - 分数向量化累加，argpartition 取 top-k
+    - 增量添加/删除文档：新文档写入增量倒排表，删除使用墓碑标记，
+      增量或墓碑过多时自动合并
+    - 可落盘，加载时通过 mmap 映射倒排数组
     """
 
+    # 增量倒排表超过主索引该比例时触发合并
+    COMPACT_RATIO = 0.25
+    # 增量倒排表至少达到该条数才考虑合并
+    COMPACT_MIN_POSTINGS = 50000
+
+    _STOPWORDS = frozenset({
+        '的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个',
+        '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这',
+    })
+
     def __init__(
         self,
         k1: float = 1.2,     # 词频饱和参数
@@ -111,65 +139,238 @@ class BM25Index:
         self.k1 = k1
         self.b = b
 
-        # 索引数据
+        # 中文分词（简单实现）
+        self.word_pattern = re.compile(r'[\w\u4e00-\u9fff]+')
+        self.cjk_pattern = re.compile(r'[\u4e00-\u9fff]+|[^\u4e00-\u9fff]+')
+
+        self._reset()
+
+    def _reset(self) -> None:
+        """清空索引数据"""
+        # 文档槽位：槽位号即倒排表中的文档编号，删除后留下墓碑直到合并
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_texts: List[Optional[str]] = []
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._id_to_idx: Dict[str, int] = {}
         self.doc_count = 0
-        self.doc_lengths: List[int] = []
         self.avg_doc_length = 0.0
-        self.doc_vectors: List[Dict[str, int]] = []  # 每个文档的词频向量
-        self.idf: Dict[str, float] = {}              # 逆文档频率
+        self._total_length = 0
 
-        # 文档映射
-        self.doc_ids: List[str] = []
-        self.doc_texts: List[str] = []
+        # 词表与文档频率
+        self._vocab: Dict[str, int] = {}
+        self._df: List[int] = []
 
-        # 中文分词（简单实现）
-        self.word_pattern = re.compile(r'[\w\u4e00-\u9fff]+')
+        # 主倒排表 (CSR)：term_id 的倒排位于 [offsets[t], offsets[t+1])
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.int32)
+
+        # 增量倒排表：term_id -> ([doc, ...], [tf, ...])
+        self._delta: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._delta_size = 0
+        self._deleted = 0
+
+        # 长度归一化缓存 k1 * (1 - b + b * dl / avgdl)
+        self._norms: Optional[np.ndarray] = None
+
+    @property
+    def idf(self) -> Dict[str, float]:
+        """逆文档频率（按词）"""
+        return {term: self._idf(self._df[tid]) for term, tid in self._vocab.items() if self._df[tid] > 0}
+
+    def _idf(self, df: int) -> float:
+        # IDF = log((N - df + 0.5) / (df + 0.5) + 1)
+        return math.log((self.doc_count - df + 0.5) / (df + 0.5) + 1)
 
     def index_documents(self, documents: List[Dict[str, Any]]) -> None:
         """
-        索引文档集合
+        索引文档集合（全量重建）
 
         Args:
             documents: 文档列表，每项包含 id 和 text
         """
-        self.doc_count = len(documents)
-        self.doc_ids = [d.get("id", f"doc_{i}") for i, d in enumerate(documents)]
-        self.doc_texts = [d.get("text", "") for d in documents]
+        self._reset()
+        self._append_documents(documents)
+        self._compact()
 
-        # 分词并计算词频
-        for doc in documents:
-            text = doc.get("text", "")
-            tokens = self._tokenize(text)
-            self.doc_vectors.append(Counter(tokens))
-            self.doc_lengths.append(len(tokens))
+        logger.info(f"BM25 索引完成: {self.doc_count} 个文档, 平均长度 {self.avg_doc_length:.1f}")
 
-        # 计算平均文档长度
-        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        增量添加文档，已存在的 id 会被替换
 
-        # 计算 IDF
-        self._compute_idf()
+        Args:
+            documents: 文档列表，每项包含 id 和 text
+        """
+        existing = [d.get("id") for d in documents if d.get("id") in self._id_to_idx]
+        if existing:
+            self.delete_documents(existing)
+        self._append_documents(documents)
+        self._maybe_compact()
 
-        logger.info(f"BM25 索引完成: {self.doc_count} 个文档, 平均长度 {self.avg_doc_length:.1f}")
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        删除文档（墓碑标记，合并时回收）
+
+        Returns:
+            实际删除的文档数
+        """
+        deleted = 0
+        for doc_id in doc_ids:
+            idx = self._id_to_idx.pop(doc_id, None)
+            if idx is None:
+                continue
+            for term in set(self._tokenize(self.doc_texts[idx] or "")):
+                tid = self._vocab.get(term)
+                if tid is not None:
+                    self._df[tid] -= 1
+            self._alive[idx] = False
+            self._total_length -= int(self.doc_lengths[idx])
+            self.doc_ids[idx] = None
+            self.doc_texts[idx] = None
+            deleted += 1
+
+        if deleted:
+            self.doc_count -= deleted
+            self._deleted += deleted
+            self._update_stats()
+            self._maybe_compact()
+        return deleted
+
+    @staticmethod
+    def _dedupe_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """同一批次中重复的 id 只保留最后一个"""
+        last = {doc.get("id"): i for i, doc in enumerate(documents) if doc.get("id") is not None}
+        return [
+            doc for i, doc in enumerate(documents)
+            if doc.get("id") is None or last[doc.get("id")] == i
+        ]
+
+    def _append_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """分词并写入增量倒排表"""
+        documents = self._dedupe_documents(documents)
+        if not documents:
+            return
+
+        start = len(self.doc_ids)
+        lengths = []
+        for offset, doc in enumerate(documents):
+            idx = start + offset
+            doc_id = doc.get("id", f"doc_{idx}")
+            text = doc.get("text", "")
+            tokens = self._tokenize(text)
+
+            self.doc_ids.append(doc_id)
+            self.doc_texts.append(text)
+            self._id_to_idx[doc_id] = idx
+            lengths.append(len(tokens))
+
+            for term, tf in Counter(tokens).items():
+                tid = self._vocab.get(term)
+                if tid is None:
+                    tid = len(self._df)
+                    self._vocab[term] = tid
+                    self._df.append(0)
+                self._df[tid] += 1
+                docs, tfs = self._delta.setdefault(tid, ([], []))
+                docs.append(idx)
+                tfs.append(tf)
+                self._delta_size += 1
+
+        self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.int32)])
+        self._alive = np.concatenate([self._alive, np.ones(len(documents), dtype=bool)])
+        self.doc_count += len(documents)
+        self._total_length += sum(lengths)
+        self._update_stats()
+
+    def _update_stats(self) -> None:
+        self.avg_doc_length = self._total_length / self.doc_count if self.doc_count else 0.0
+        self._norms = None
+
+    def _get_norms(self) -> np.ndarray:
+        """获取（必要时重算）每个文档的长度归一化项"""
+        if self._norms is None or len(self._norms) != len(self.doc_lengths):
+            avgdl = self.avg_doc_length or 1.0
+            self._norms = (
+                self.k1 * (1 - self.b + self.b * self.doc_lengths.astype(np.float32) / avgdl)
+            ).astype(np.float32)
+        return self._norms
+
+    def _maybe_compact(self) -> None:
+        base = max(len(self._post_docs), 1)
+        if (
+            self._delta_size >= self.COMPACT_MIN_POSTINGS and self._delta_size > base * self.COMPACT_RATIO
+        ) or self._deleted > max(self.doc_count, 1) * self.COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self) -> None:
+        """合并主索引与增量倒排表，回收已删除文档并重新编号"""
+        alive_idx = np.flatnonzero(self._alive)
+        remap = np.full(len(self._alive), -1, dtype=np.int32)
+        remap[alive_idx] = np.arange(len(alive_idx), dtype=np.int32)
+
+        vocab_size = len(self._df)
+        base_counts = np.diff(self._offsets)
+        term_of_base = np.repeat(np.arange(len(base_counts), dtype=np.int32), base_counts)
+
+        delta_terms, delta_docs, delta_tfs = [], [], []
+        for tid, (docs, tfs) in self._delta.items():
+            delta_terms.append(np.full(len(docs), tid, dtype=np.int32))
+            delta_docs.append(np.asarray(docs, dtype=np.int32))
+            delta_tfs.append(np.asarray(tfs, dtype=np.int32))
+
+        terms = np.concatenate([term_of_base] + delta_terms)
+        docs = np.concatenate([np.asarray(self._post_docs, dtype=np.int32)] + delta_docs)
+        tfs = np.concatenate([np.asarray(self._post_tfs, dtype=np.int32)] + delta_tfs)
+
+        new_docs = remap[docs] if len(docs) else docs
+        keep = new_docs >= 0
+        terms, new_docs, tfs = terms[keep], new_docs[keep], tfs[keep]
+
+        order = np.lexsort((new_docs, terms))
+        self._post_docs = new_docs[order]
+        self._post_tfs = tfs[order]
+        counts = np.bincount(terms, minlength=vocab_size)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        self.doc_ids = [self.doc_ids[i] for i in alive_idx]
+        self.doc_texts = [self.doc_texts[i] for i in alive_idx]
+        self.doc_lengths = np.asarray(self.doc_lengths[alive_idx], dtype=np.int32)
+        self._alive = np.ones(len(alive_idx), dtype=bool)
+        self._id_to_idx = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self._delta = {}
+        self._delta_size = 0
+        self._deleted = 0
+        self._norms = None
 
     def _tokenize(self, text: str) -> List[str]:
         """分词"""
         # 简单实现：支持中英文
-        tokens = self.word_pattern.findall(text.lower())
+        tokens = []
+        for word in self.word_pattern.findall(text.lower()):
+            for part in self.cjk_pattern.findall(word):
+                if len(part) > 2 and '\u4e00' <= part[0] <= '\u9fff':
+                    # 中文连续片段按字符二元组切分（无需分词词典）
+                    tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+                else:
+                    tokens.append(part)
         # 过滤单字符和停用词
-        stopwords = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
-        return [t for t in tokens if len(t) > 1 and t not in stopwords]
-
-    def _compute_idf(self) -> None:
-        """计算逆文档频率"""
-        df = defaultdict(int)  # 词频统计
-
-        for doc_vector in self.doc_vectors:
-            for term in doc_vector:
-                df[term] += 1
-
-        # IDF = log((N - df + 0.5) / (df + 0.5))
-        for term, freq in df.items():
-            self.idf[term] = math.log((self.doc_count - freq + 0.5) / (freq + 0.5) + 1)
+        return [t for t in tokens if len(t) > 1 and t not in self._STOPWORDS]
+
+    def _postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """获取某个词的倒排表（主索引 + 增量）"""
+        if tid + 1 < len(self._offsets):
+            lo, hi = self._offsets[tid], self._offsets[tid + 1]
+            docs, tfs = self._post_docs[lo:hi], self._post_tfs[lo:hi]
+        else:
+            docs = tfs = np.zeros(0, dtype=np.int32)
+
+        delta = self._delta.get(tid)
+        if delta:
+            docs = np.concatenate([docs, np.asarray(delta[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(delta[1], dtype=np.int32)])
+        return docs, tfs
 
     def search(
         self,
@@ -180,6 +381,8 @@ class BM25Index:
         """
         BM25 搜索
 
+        只对至少命中一个查询词的文档计算分数。
+
         Args:
             query: 查询文本
             top_k: 返回结果数量
@@ -190,43 +393,162 @@ class BM25Index:
         """
         query_tokens = self._tokenize(query)
 
-        if not query_tokens:
+        if not query_tokens or self.doc_count == 0 or top_k <= 0:
             return []
 
-        scores = []
+        norms = self._get_norms()
+        all_docs, all_scores = [], []
+
+        for term, qtf in Counter(query_tokens).items():
+            tid = self._vocab.get(term)
+            if tid is None or self._df[tid] <= 0:
+                continue
+
+            docs, tfs = self._postings(tid)
+            if not len(docs):
+                continue
+
+            tf = tfs.astype(np.float32)
+            # BM25 公式：idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+            contrib = (qtf * self._idf(self._df[tid])) * tf * (self.k1 + 1) / (tf + norms[docs])
+            all_docs.append(docs)
+            all_scores.append(contrib)
+
+        results: List[Tuple[str, float]] = []
+        matched = np.zeros(0, dtype=np.int64)
+        if all_docs:
+            docs = np.concatenate(all_docs)
+            contribs = np.concatenate(all_scores)
+            uniq, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=contribs)
+
+            alive = self._alive[uniq]
+            matched = uniq[alive]
+            mask = alive & (scores >= min_score)
+            uniq, scores = uniq[mask], scores[mask]
+
+            if len(scores) > top_k:
+                part = np.argpartition(-scores, top_k - 1)[:top_k]
+                uniq, scores = uniq[part], scores[part]
+            order = np.lexsort((uniq, -scores))
+            results = [(self.doc_ids[uniq[i]], float(scores[i])) for i in order]
+
+        # 阈值不大于 0 时，未命中的文档以 0 分按索引顺序补齐
+        if min_score <= 0 and len(results) < top_k:
+            matched_set = set(matched.tolist())
+            for idx in np.flatnonzero(self._alive):
+                if len(results) >= top_k:
+                    break
+                if idx not in matched_set:
+                    results.append((self.doc_ids[idx], 0.0))
 
-        for doc_idx, doc_vector in enumerate(self.doc_vectors):
-            score = 0.0
-            doc_length = self.doc_lengths[doc_idx]
+        return results
 
-            for term in query_tokens:
-                if term not in doc_vector:
-                    continue
+    def get_document_text(self, doc_id: str) -> Optional[str]:
+        """获取文档文本"""
+        idx = self._id_to_idx.get(doc_id)
+        if idx is None:
+            return None
+        return self.doc_texts[idx]
 
-                # BM25 公式
-                tf = doc_vector[term]
-                idf = self.idf.get(term, 0)
+    # ==================== 持久化 ====================
 
-                # 标准化词频
-                numerator = tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length / self.avg_doc_length))
+    def save(self, path: str) -> None:
+        """
+        保存索引到目录（先合并增量）
 
-                score += idf * (numerator / denominator)
+        倒排数组保存为 .npy，加载时可直接 mmap；词表与文档信息保存为 JSON。
+        每次保存写入同级的新版本目录，再用 os.replace 原子切换 path 符号链接，
+        不会覆盖正在被 mmap 读取的文件，保存中途退出也不会留下半写的索引。
+        """
+        self._compact()
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
 
-            if score >= min_score:
-                scores.append((self.doc_ids[doc_idx], score))
+        version_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", dir=parent)
+        try:
+            os.chmod(version_dir, 0o755)
+            self._write_files(version_dir)
+            self._swap_in(path, version_dir)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"BM25 索引已保存: {path} ({self.doc_count} 个文档)")
+
+    @staticmethod
+    def _swap_in(path: str, version_dir: str) -> None:
+        """将 path 原子切换到新版本目录，并删除旧版本"""
+        previous = None
+        if os.path.islink(path):
+            previous = os.path.realpath(path)
+        elif os.path.isdir(path):
+            # 旧格式直接保存在目录中：先移走再切换（仅首次迁移时发生）
+            previous = f"{version_dir}.legacy"
+            os.rename(path, previous)
+
+        link_tmp = f"{version_dir}.link"
+        os.symlink(os.path.basename(version_dir), link_tmp)
+        os.replace(link_tmp, path)
+
+        # 已 mmap 的读者持有 inode，删除旧文件不影响其读取
+        if previous and previous != version_dir:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def _write_files(self, path: str) -> None:
+        np.save(os.path.join(path, "offsets.npy"), self._offsets)
+        np.save(os.path.join(path, "post_docs.npy"), self._post_docs)
+        np.save(os.path.join(path, "post_tfs.npy"), self._post_tfs)
+        np.save(os.path.join(path, "doc_lengths.npy"), self.doc_lengths)
+
+        terms = [None] * len(self._vocab)
+        for term, tid in self._vocab.items():
+            terms[tid] = term
+        meta = {
+            "k1": self.k1,
+            "b": self.b,
+            "terms": terms,
+            "df": self._df,
+            "doc_ids": self.doc_ids,
+            "doc_texts": self.doc_texts,
+        }
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
 
-        # 按分数降序排序
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        """
+        从目录加载索引
 
-    def get_document_text(self, doc_id: str) -> Optional[str]:
-        """获取文档文本"""
-        try:
-            idx = self.doc_ids.index(doc_id)
-            return self.doc_texts[idx]
-        except ValueError:
-            return None
+        Args:
+            path: save() 写入的目录
+            mmap: 是否以只读 mmap 方式映射倒排数组
+        """
+        # 只解析一次链接，避免加载过程中遇到并发保存而混用两个版本的文件
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        index = cls(k1=meta["k1"], b=meta["b"])
+        mmap_mode = "r" if mmap else None
+        index._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode)
+        index._post_docs = np.load(os.path.join(path, "post_docs.npy"), mmap_mode=mmap_mode)
+        index._post_tfs = np.load(os.path.join(path, "post_tfs.npy"), mmap_mode=mmap_mode)
+        index.doc_lengths = np.array(np.load(os.path.join(path, "doc_lengths.npy")), dtype=np.int32)
+
+        index._vocab = {term: tid for tid, term in enumerate(meta["terms"])}
+        index._df = list(meta["df"])
+        index.doc_ids = list(meta["doc_ids"])
+        index.doc_texts = list(meta["doc_texts"])
+        index._id_to_idx = {doc_id: i for i, doc_id in enumerate(index.doc_ids)}
+        index._alive = np.ones(len(index.doc_ids), dtype=bool)
+        index.doc_count = len(index.doc_ids)
+        index._total_length = int(index.doc_lengths.sum())
+        index._update_stats()
+
+        logger.info(f"BM25 索引已加载: {path} ({index.doc_count} 个文档)")
+        return index
 
 
 class HybridRetriever:
@@ -255,41 +577,88 @@ class HybridRetriever:
         # 检索缓存
         self._cache: Dict[str, Tuple[List[RetrievalResult], float]] = {}
 
+        # 分块向量缓存（chunk id -> 单位化向量），供 MMR 计算相似度
+        self._chunk_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._chunk_embeddings_lock = threading.Lock()
+
         # 嵌入服务
         self.embedding_service = get_embedding_service()
 
+    def _bm25_index_path(self) -> Optional[str]:
+        """当前集合的 BM25 索引目录"""
+        if not self.config.bm25_index_dir:
+            return None
+        return os.path.join(self.config.bm25_index_dir, self.config.collection_name)
+
     def _load_bm25_index(self) -> None:
-        """加载或构建 BM25 索引"""
+        """从磁盘加载 BM25 索引（mmap 映射倒排数组）"""
         if self._index_loaded:
             return
 
-        try:
-            # 从向量存储获取所有文档构建 BM25 索引
-            if not self.vector_store.utility.has_collection(self.config.collection_name):
-                logger.warning(f"Collection {self.config.collection_name} does not exist")
-                return
-
-            collection = self.vector_store.Collection(self.config.collection_name)
-            collection.load()
+        path = self._bm25_index_path()
+        if not path or not os.path.exists(os.path.join(path, "meta.json")):
+            logger.warning(f"BM25 index for collection {self.config.collection_name} not found")
+            return
 
-            # 获取所有文档
-            # 注意：这里简化处理，生产环境应使用专门的索引服务
+        try:
+            self.bm25_index = BM25Index.load(path, mmap=True)
             self._index_loaded = True
-            logger.info("BM25 index loaded")
-
         except Exception as e:
             logger.error(f"Failed to load BM25 index: {e}")
 
-    def build_bm25_index(self, documents: List[Dict[str, Any]]) -> None:
+    def build_bm25_index(self, documents: List[Dict[str, Any]], persist: bool = False) -> None:
         """
         构建 BM25 索引
 
         Args:
             documents: 文档列表，每项包含 id 和 text
+            persist: 是否保存到 bm25_index_dir
         """
         self.bm25_index = BM25Index()
         self.bm25_index.index_documents(documents)
         self._index_loaded = True
+        if persist:
+            self.save_bm25_index()
+
+    def update_bm25_index(
+        self,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        delete_ids: Optional[List[str]] = None,
+        persist: bool = False,
+    ) -> None:
+        """
+        增量更新 BM25 索引，无需全量重建
+
+        Args:
+            documents: 新增或替换的文档
+            delete_ids: 需要删除的文档 id
+            persist: 是否保存到 bm25_index_dir
+        """
+        if not self.bm25_index:
+            self._load_bm25_index()
+        if not self.bm25_index:
+            self.bm25_index = BM25Index()
+            self._index_loaded = True
+
+        if delete_ids:
+            self.bm25_index.delete_documents(delete_ids)
+        if documents:
+            self.bm25_index.add_documents(documents)
+        self.clear_cache()
+        if persist:
+            self.save_bm25_index()
+
+    def save_bm25_index(self) -> bool:
+        """保存 BM25 索引到磁盘"""
+        path = self._bm25_index_path()
+        if not self.bm25_index or not path:
+            return False
+        try:
+            self.bm25_index.save(path)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save BM25 index: {e}")
+            return False
 
     def retrieve(
         self,
@@ -342,22 +711,36 @@ class HybridRetriever:
         self,
         query: str,
         top_k: int,
+        query_embedding: Optional[List[float]] = None,
+        include_embeddings: bool = False,
     ) -> List[RetrievalResult]:
-        """向量语义检索"""
+        """
+        向量语义检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            query_embedding: 已计算的查询向量（避免重复调用嵌入服务）
+            include_embeddings: 是否同时取回命中向量写入分块向量缓存
+        """
         try:
             # 获取查询向量
-            embedding = self.embedding_service.embed_query(query)
+            embedding = query_embedding or self.embedding_service.embed_query(query)
 
             # 向量搜索
+            search_kwargs = {"include_embeddings": True} if include_embeddings else {}
             search_result = self.vector_store.search(
                 collection_name=self.config.collection_name,
                 query_embedding=embedding,
                 top_k=top_k,
                 use_cache=self.config.enable_cache,
+                **search_kwargs,
             )
 
             results = []
             for item in search_result.get("results", []):
+                if item.get("embedding"):
+                    self._cache_chunk_embedding(item["id"], item["embedding"])
                 results.append(RetrievalResult(
                     id=item["id"],
                     text=item.get("text", ""),
@@ -377,6 +760,7 @@ class HybridRetriever:
         self,
         query: str,
         top_k: int,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[RetrievalResult]:
         """关键词 BM25 检索"""
         if not self.bm25_index:
@@ -384,7 +768,7 @@ class HybridRetriever:
 
         if not self.bm25_index:
             logger.warning("BM25 index not available, falling back to vector search")
-            return self._vector_search(query, top_k)
+            return self._vector_search(query, top_k, query_embedding=query_embedding)
 
         try:
             scores = self.bm25_index.search(
@@ -414,6 +798,8 @@ class HybridRetriever:
         self,
         query: str,
         top_k: int,
+        query_embedding: Optional[List[float]] = None,
+        include_embeddings: bool = False,
     ) -> List[RetrievalResult]:
         """
         混合检索 + RRF 合并
@@ -422,8 +808,14 @@ class HybridRetriever:
         score(d) = sum(rank_weight / (k + rank(d)))
         """
         # 获取两种检索结果
-        vector_results = self._vector_search(query, self.config.mmr_top_k)
-        keyword_results = self._keyword_search(query, self.config.mmr_top_k)
+        vector_results = self._vector_search(
+            query, self.config.mmr_top_k,
+            query_embedding=query_embedding,
+            include_embeddings=include_embeddings,
+        )
+        keyword_results = self._keyword_search(
+            query, self.config.mmr_top_k, query_embedding=query_embedding
+        )
 
         # 使用权重进行 RRF 合并
         rrf_scores = defaultdict(float)
@@ -489,71 +881,120 @@ class HybridRetriever:
 
         平衡相关性和多样性:
         MMR = argmax [λ * relevance(d, q) - (1-λ) * max(similarity(d, d_i))]
-        """
-        # 先获取候选结果
-        candidates = self._hybrid_search_rrf(query, self.config.mmr_top_k)
-
-        if not candidates:
-            return []
 
-        # 获取查询向量
+        相关性使用归一化后的 RRF 分数，文档间相似度使用候选向量的余弦相似度。
+        候选向量随向量检索一并取回，或来自分块向量缓存。
+        """
+        # 查询向量只计算一次，供候选检索复用
         try:
             query_embedding = self.embedding_service.embed_query(query)
         except Exception as e:
             logger.error(f"Failed to embed query for MMR: {e}")
+            query_embedding = None
+
+        candidates = self._hybrid_search_rrf(
+            query, self.config.mmr_top_k,
+            query_embedding=query_embedding,
+            include_embeddings=True,
+        )
+
+        if len(candidates) <= 1:
             return candidates[:top_k]
 
-        selected = []
-        remaining = candidates.copy()
-
-        # 贪心选择
-        while selected and len(selected) < top_k and remaining:
-            best_score = -float('inf')
-            best_idx = 0
-
-            for i, candidate in enumerate(remaining):
-                # 相关性分数
-                relevance = candidate.score
-
-                # 与已选结果的最大相似度
-                max_similarity = 0.0
-                if selected:
-                    for s in selected:
-                        sim = self._compute_similarity(
-                            candidate.id,
-                            s.id,
-                            query_embedding,
-                        )
-                        max_similarity = max(max_similarity, sim)
-
-                # MMR 分数
-                mmr_score = (
-                    self.config.mmr_lambda * relevance -
-                    (1 - self.config.mmr_lambda) * max_similarity
-                )
-
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_idx = i
-
-            selected.append(remaining.pop(best_idx))
-
-        # 如果第一个，选择最相关的
-        if not selected and remaining:
-            selected.append(remaining.pop(0))
+        vectors = self._get_candidate_embeddings(candidates)
+        relevance = np.array([c.score for c in candidates], dtype=np.float32)
+        max_relevance = relevance.max()
+        if max_relevance > 0:
+            relevance = relevance / max_relevance
+
+        order = self._mmr_select(relevance, vectors, top_k, self.config.mmr_lambda)
+        return [candidates[i] for i in order]
+
+    @staticmethod
+    def _mmr_select(
+        relevance: np.ndarray,
+        vectors: np.ndarray,
+        top_k: int,
+        mmr_lambda: float,
+    ) -> List[int]:
+        """
+        矩阵化的 MMR 贪心选择
+
+        一次计算候选间的余弦相似度矩阵，每选中一个候选只做一次
+        max_sim 的逐元素更新，复杂度 O(n²·d + k·n)。
+
+        Args:
+            relevance: 候选相关性 (n,)
+            vectors: 单位化候选向量 (n, d)，缺失向量的行为全零
+            top_k: 选择数量
+            mmr_lambda: 相关性权重
+
+        Returns:
+            选中候选的下标（按选择顺序）
+        """
+        n = len(relevance)
+        top_k = min(top_k, n)
+        if top_k <= 0:
+            return []
+
+        similarity = vectors @ vectors.T
+        max_similarity = np.full(n, -np.inf, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+
+        selected = [int(np.argmax(relevance))]
+        available[selected[0]] = False
+        max_similarity = np.maximum(max_similarity, similarity[selected[0]])
+
+        while len(selected) < top_k:
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            max_similarity = np.maximum(max_similarity, similarity[best])
 
         return selected
 
-    def _compute_similarity(
-        self,
-        doc1_id: str,
-        doc2_id: str,
-        query_embedding: List[float],
-    ) -> float:
-        """计算两个文档的相似度（简化版）"""
-        # 生产环境应预计算文档向量并缓存
-        # 这里返回简化计算
-        return 0.0
+    def _cache_chunk_embedding(self, chunk_id: str, embedding: List[float]) -> np.ndarray:
+        """写入分块向量缓存（单位化后存储）"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._chunk_embeddings_lock:
+            self._chunk_embeddings[chunk_id] = vector
+            self._chunk_embeddings.move_to_end(chunk_id)
+            while len(self._chunk_embeddings) > CHUNK_EMBEDDING_CACHE_SIZE:
+                self._chunk_embeddings.popitem(last=False)
+        return vector
+
+    def _get_candidate_embeddings(self, candidates: List[RetrievalResult]) -> np.ndarray:
+        """
+        获取候选的单位化向量矩阵
+
+        优先读分块向量缓存，缺失的按 id 从向量库批量取回；仍缺失的
+        （例如只存在于 BM25 索引的文档）置零，视为与其他候选不相似。
+        """
+        with self._chunk_embeddings_lock:
+            found = {c.id: self._chunk_embeddings.get(c.id) for c in candidates}
+        missing = [chunk_id for chunk_id, vector in found.items() if vector is None]
+
+        if missing:
+            try:
+                fetched = self.vector_store.get_embeddings(self.config.collection_name, missing)
+                for chunk_id, embedding in fetched.items():
+                    found[chunk_id] = self._cache_chunk_embedding(chunk_id, embedding)
+            except Exception as e:
+                logger.warning(f"Failed to fetch candidate embeddings for MMR: {e}")
+
+        dim = next((len(v) for v in found.values() if v is not None), 0)
+        matrix = np.zeros((len(candidates), dim), dtype=np.float32)
+        for i, candidate in enumerate(candidates):
+            vector = found.get(candidate.id)
+            if vector is not None and len(vector) == dim:
+                matrix[i] = vector
+        return matrix
 
     def _apply_filters(
         self,
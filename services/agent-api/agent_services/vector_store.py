@@ -11,16 +11,43 @@ Production: 高可用支持
 - 多主机故障转移
 - 连接池管理
 - 自动重连
+
+批量写入:
+- VectorWriter 跨多次调用缓冲行，按列大批量 insert，按行数/时间阈值或显式 commit 落盘
+- 集合句柄与加载状态缓存，避免每次操作都调用 has_collection / load
+
+搜索缓存:
+- 精确命中：完整查询向量哈希 + 集合 + 过滤条件 + 集合版本（写入/删除时递增）
+- 集合版本存放在 Redis（INCR / GET），其他进程（如 Celery 导入）的写入同样使缓存失效；
+  Redis 不可用时退化为进程内版本号，跨进程写入只能依赖 TTL 过期
+- 语义命中（可选）：最近查询向量的小型内存索引，相似度超过阈值时复用结果
+- OrderedDict 实现 O(1) LRU 淘汰
 """
 
 import logging
 import os
 import json
 import hashlib
+import threading
 import time
 import uuid
-from typing import List, Dict, Any, Optional, Tuple
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set, Tuple
 from functools import lru_cache
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
 from pymilvus import (
     connections,
     Collection,
@@ -62,12 +89,102 @@ NPROBE = int(os.getenv("MILVUS_NPROBE", "16"))  # 搜索时探测的聚类中心
 # Sprint 8: 搜索结果缓存
 SEARCH_CACHE_SIZE = int(os.getenv("VECTOR_SEARCH_CACHE_SIZE", "1000"))
 SEARCH_CACHE_TTL = int(os.getenv("VECTOR_SEARCH_CACHE_TTL", "60"))  # 秒
+# 语义缓存：查询向量余弦相似度不低于该阈值时复用结果（0 表示只做精确命中）
+SEARCH_CACHE_SIMILARITY = float(os.getenv("VECTOR_SEARCH_CACHE_SIMILARITY", "0"))
+SEARCH_CACHE_SEMANTIC_SIZE = int(os.getenv("VECTOR_SEARCH_CACHE_SEMANTIC_SIZE", "256"))  # 每个范围保留的查询向量数
+# 集合版本号存放在 Redis 中，跨进程共享
+SEARCH_CACHE_SHARED_VERSIONS = os.getenv(
+    "VECTOR_SEARCH_CACHE_SHARED_VERSIONS", os.getenv("REDIS_ENABLED", "true")
+).lower() == "true"
+COLLECTION_VERSION_KEY_PREFIX = "vector_store:collection_version:"
+VERSION_REDIS_RETRY_INTERVAL = 30  # Redis 不可用后重新连接的间隔（秒）
 
 # Production: 故障转移配置
 FAILOVER_ENABLED = os.getenv("MILVUS_FAILOVER_ENABLED", "true").lower() == "true"
 FAILOVER_TIMEOUT = int(os.getenv("MILVUS_FAILOVER_TIMEOUT", "5"))  # 秒
 HEALTH_CHECK_INTERVAL = int(os.getenv("MILVUS_HEALTH_CHECK_INTERVAL", "30"))  # 秒
 
+# 批量写入缓冲
+INSERT_BUFFER_ROWS = int(os.getenv("MILVUS_INSERT_BUFFER_ROWS", "5000"))  # 缓冲行数达到后批量 insert
+INSERT_FLUSH_INTERVAL = float(os.getenv("MILVUS_INSERT_FLUSH_INTERVAL", "5"))  # 缓冲最长保留时间（秒）
+
+
+def _prepare_rows(texts: List[str], metadata: Optional[List[Dict]]) -> Tuple[List[str], List[str], List[str]]:
+    """生成主键、doc_id 与元数据 JSON 列"""
+    metadata = metadata or [{}] * len(texts)
+    ids = [uuid.uuid4().hex for _ in range(len(texts))]
+    # 从 metadata 中提取 doc_id（如果存在）
+    doc_ids = [(m or {}).get("doc_id", "") for m in metadata]
+    metadata_json = [json.dumps(m or {}, ensure_ascii=False) for m in metadata]
+    return ids, doc_ids, metadata_json
+
+
+class SemanticQueryIndex:
+    """
+    最近查询向量的内存索引（语义缓存）
+
+    按缓存范围（集合 + 版本 + top_k + 过滤条件）分组，每组保留最近 capacity 个
+    归一化查询向量（环形缓冲矩阵），查找时一次矩阵乘法求最相似的已缓存查询。
+    """
+
+    def __init__(self, threshold: float, capacity: int = SEARCH_CACHE_SEMANTIC_SIZE,
+                 max_scopes: int = 256):
+        self.threshold = threshold
+        self.capacity = max(1, capacity)
+        self.max_scopes = max_scopes
+        # scope -> [向量矩阵, 缓存键列表, 已写入数量]
+        self._scopes: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]):
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    def add(self, scope: str, vector: List[float], cache_key: str):
+        vec = self._normalize(vector)
+        if vec is None:
+            return
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or entry[0].shape[1] != vec.shape[0]:
+                entry = [np.zeros((self.capacity, vec.shape[0]), dtype=np.float32), [None] * self.capacity, 0]
+                self._scopes[scope] = entry
+            self._scopes.move_to_end(scope)
+            slot = entry[2] % self.capacity
+            entry[0][slot] = vec
+            entry[1][slot] = cache_key
+            entry[2] += 1
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def lookup(self, scope: str, vector: List[float]) -> Optional[str]:
+        """返回相似度不低于阈值的最相似查询的缓存键"""
+        vec = self._normalize(vector)
+        if vec is None:
+            return None
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or entry[0].shape[1] != vec.shape[0]:
+                return None
+            count = min(entry[2], self.capacity)
+            similarities = entry[0][:count] @ vec
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return entry[1][best]
+
+    def drop_collection(self, collection_name: str):
+        prefix = f"{collection_name}:"
+        with self._lock:
+            for scope in [s for s in self._scopes if s.startswith(prefix)]:
+                del self._scopes[scope]
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
 
 class VectorStore:
     """
@@ -81,7 +198,15 @@ class VectorStore:
     """
 
     _connected = False
-    _search_cache: Dict[str, Tuple[Any, float]] = {}
+    _search_cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+    _search_cache_lock = threading.Lock()
+    _collection_versions: Dict[str, int] = {}
+    _version_redis = None
+    _version_redis_retry_at = 0.0
+    _semantic_index: Optional[SemanticQueryIndex] = (
+        SemanticQueryIndex(SEARCH_CACHE_SIMILARITY)
+        if SEARCH_CACHE_SIMILARITY > 0 and NUMPY_AVAILABLE else None
+    )
     _connection_alias = "default"
     _max_retries = 3
     _retry_delay = 1.0  # 秒
@@ -92,6 +217,11 @@ class VectorStore:
     _endpoint_health: Dict[str, float] = {}  # endpoint -> last healthy timestamp
     _last_health_check = 0
 
+    # 集合句柄与加载状态缓存
+    _collections: Dict[str, Collection] = {}
+    _loaded_collections: Set[str] = set()
+    _collections_lock = threading.Lock()
+
     def __init__(self):
         """初始化向量存储"""
         if not self._connected:
@@ -144,6 +274,8 @@ class VectorStore:
             if self._check_connection():
                 logger.info(f"Successfully connected to Milvus at {host}:{port}")
                 VectorStore._connected = True
+                # 新连接（可能是另一个端点）上的加载状态未知
+                self._clear_collection_cache()
                 # 标记端点健康
                 self._endpoint_health[f"{host}:{port}"] = time.time()
             else:
@@ -247,6 +379,57 @@ class VectorStore:
                 "port": current_port
             }
 
+    def _clear_collection_cache(self, name: Optional[str] = None):
+        """丢弃缓存的集合句柄与加载状态（name 为 None 时全部丢弃）"""
+        with VectorStore._collections_lock:
+            if name is None:
+                VectorStore._collections.clear()
+                VectorStore._loaded_collections.clear()
+            else:
+                VectorStore._collections.pop(name, None)
+                VectorStore._loaded_collections.discard(name)
+
+    def _get_collection(self, name: str, create: bool = False) -> Optional[Collection]:
+        """
+        获取集合句柄（缓存）
+
+        Args:
+            name: 集合名称
+            create: 集合不存在时是否创建
+
+        Returns:
+            Collection 对象，不存在且不创建时返回 None
+        """
+        collection = VectorStore._collections.get(name)
+        if collection is not None:
+            return collection
+
+        if utility.has_collection(name):
+            collection = Collection(name)
+        elif create:
+            collection = self.create_collection(name)
+        else:
+            return None
+
+        with VectorStore._collections_lock:
+            VectorStore._collections.setdefault(name, collection)
+        return collection
+
+    def _ensure_loaded(self, name: str, collection: Collection):
+        """确保集合已加载到内存（每个集合只调用一次 load）"""
+        if name in VectorStore._loaded_collections:
+            return
+        collection.load()
+        with VectorStore._collections_lock:
+            VectorStore._loaded_collections.add(name)
+
+    def _get_loaded_collection(self, name: str) -> Optional[Collection]:
+        """获取已加载的集合句柄，集合不存在时返回 None"""
+        collection = self._get_collection(name)
+        if collection is not None:
+            self._ensure_loaded(name, collection)
+        return collection
+
     def create_collection(self, name: str, dimension: int = EMBEDDING_DIM, drop_existing: bool = False):
         """
         创建向量集合
@@ -263,6 +446,8 @@ class VectorStore:
         if utility.has_collection(name):
             if drop_existing:
                 utility.drop_collection(name)
+                self._clear_collection_cache(name)
+                self._bump_collection_version(name)
             else:
                 return Collection(name)
 
@@ -295,42 +480,118 @@ class VectorStore:
 
         return collection
 
-    def _get_cache_key(self, collection_name: str, query_embedding: List[float],
-                       top_k: int, filters: Optional[Dict] = None) -> str:
-        """生成缓存键 - Sprint 8"""
-        # 对向量进行哈希以减少键的大小
-        embedding_str = ",".join(f"{x:.4f}" for x in query_embedding[:10])  # 只用前10维
+    @classmethod
+    def _get_version_redis(cls):
+        """共享集合版本号的 Redis 客户端；未启用或不可用时返回 None"""
+        if not (SEARCH_CACHE_SHARED_VERSIONS and REDIS_AVAILABLE):
+            return None
+        if cls._version_redis is None and time.time() >= cls._version_redis_retry_at:
+            try:
+                client = redis.Redis(
+                    host=os.getenv("REDIS_HOST", "localhost"),
+                    port=int(os.getenv("REDIS_PORT", "6379")),
+                    db=int(os.getenv("REDIS_DB", "0")),
+                    password=os.getenv("REDIS_PASSWORD") or None,
+                    socket_timeout=1,
+                    socket_connect_timeout=1,
+                )
+                client.ping()
+                cls._version_redis = client
+            except Exception as e:
+                cls._version_redis_unavailable(e)
+        return cls._version_redis
+
+    @classmethod
+    def _version_redis_unavailable(cls, error: Exception):
+        cls._version_redis = None
+        cls._version_redis_retry_at = time.time() + VERSION_REDIS_RETRY_INTERVAL
+        logger.warning(f"Collection version Redis unavailable, using process-local versions: {error}")
+
+    def _bump_collection_version(self, collection_name: str):
+        """集合数据变更：递增版本，使该集合已缓存的搜索结果失效"""
+        with VectorStore._search_cache_lock:
+            VectorStore._collection_versions[collection_name] = \
+                VectorStore._collection_versions.get(collection_name, 0) + 1
+        client = VectorStore._get_version_redis()
+        if client is not None:
+            try:
+                client.incr(COLLECTION_VERSION_KEY_PREFIX + collection_name)
+            except Exception as e:
+                VectorStore._version_redis_unavailable(e)
+        if VectorStore._semantic_index is not None:
+            VectorStore._semantic_index.drop_collection(collection_name)
+
+    def _get_collection_version(self, collection_name: str) -> str:
+        """集合当前版本：优先读 Redis 中的共享版本，不可用时使用进程内版本"""
+        client = VectorStore._get_version_redis()
+        if client is not None:
+            try:
+                return str(int(client.get(COLLECTION_VERSION_KEY_PREFIX + collection_name) or 0))
+            except Exception as e:
+                VectorStore._version_redis_unavailable(e)
+        # 与共享版本区分，避免 Redis 恢复后误命中
+        return f"local{VectorStore._collection_versions.get(collection_name, 0)}"
+
+    def _get_cache_scope(self, collection_name: str, top_k: int,
+                         filters: Optional[Dict] = None) -> str:
+        """缓存范围：集合 + 集合版本 + top_k + 过滤条件"""
+        version = self._get_collection_version(collection_name)
         filter_str = json.dumps(filters, sort_keys=True) if filters else ""
-        cache_key = f"{collection_name}:{top_k}:{hashlib.md5((embedding_str + filter_str).encode()).hexdigest()}"
-        return cache_key
+        filter_hash = hashlib.md5(filter_str.encode()).hexdigest()
+        return f"{collection_name}:v{version}:{top_k}:{filter_hash}"
+
+    def _get_cache_key(self, collection_name: str, query_embedding: List[float],
+                       top_k: int, filters: Optional[Dict] = None,
+                       cache_scope: Optional[str] = None) -> str:
+        """生成缓存键：缓存范围 + 完整查询向量（float32）的哈希
+
+        已算出的 cache_scope 可直接传入，避免再读一次集合版本。
+        """
+        if cache_scope is None:
+            cache_scope = self._get_cache_scope(collection_name, top_k, filters)
+        vector_hash = hashlib.sha1(array("f", query_embedding).tobytes()).hexdigest()
+        return f"{cache_scope}:{vector_hash}"
 
     def _get_from_cache(self, cache_key: str) -> Optional[List[Dict]]:
         """从缓存获取结果 - Sprint 8"""
-        import time
-        if cache_key in VectorStore._search_cache:
-            result, timestamp = VectorStore._search_cache[cache_key]
-            if time.time() - timestamp < SEARCH_CACHE_TTL:
-                logger.debug(f"Cache hit: {cache_key}")
-                return result
-            else:
+        with VectorStore._search_cache_lock:
+            entry = VectorStore._search_cache.get(cache_key)
+            if entry is None:
+                return None
+            result, timestamp = entry
+            if time.time() - timestamp >= SEARCH_CACHE_TTL:
                 # 过期，删除
                 del VectorStore._search_cache[cache_key]
-        return None
-
-    def _set_cache(self, cache_key: str, result: List[Dict]):
-        """设置缓存 - Sprint 8"""
-        import time
-        # LRU: 如果缓存满了，删除最旧的
-        if len(VectorStore._search_cache) >= SEARCH_CACHE_SIZE:
-            oldest_key = min(VectorStore._search_cache.keys(),
-                           key=lambda k: VectorStore._search_cache[k][1])
-            del VectorStore._search_cache[oldest_key]
+                return None
+            VectorStore._search_cache.move_to_end(cache_key)
+        logger.debug(f"Cache hit: {cache_key}")
+        return result
 
-        VectorStore._search_cache[cache_key] = (result, time.time())
+    def _get_similar_from_cache(self, scope: str, query_embedding: List[float]) -> Optional[List[Dict]]:
+        """语义缓存：查找同一范围内足够相似的已缓存查询"""
+        if VectorStore._semantic_index is None:
+            return None
+        cache_key = VectorStore._semantic_index.lookup(scope, query_embedding)
+        return self._get_from_cache(cache_key) if cache_key else None
+
+    def _set_cache(self, cache_key: str, result: List[Dict], scope: Optional[str] = None,
+                   query_embedding: Optional[List[float]] = None):
+        """设置缓存（LRU 淘汰最久未使用的条目） - Sprint 8"""
+        with VectorStore._search_cache_lock:
+            VectorStore._search_cache[cache_key] = (result, time.time())
+            VectorStore._search_cache.move_to_end(cache_key)
+            while len(VectorStore._search_cache) > SEARCH_CACHE_SIZE:
+                VectorStore._search_cache.popitem(last=False)
+
+        if scope and query_embedding is not None and VectorStore._semantic_index is not None:
+            VectorStore._semantic_index.add(scope, query_embedding, cache_key)
 
     def clear_search_cache(self):
         """清空搜索缓存 - Sprint 8"""
-        VectorStore._search_cache.clear()
+        with VectorStore._search_cache_lock:
+            VectorStore._search_cache.clear()
+        if VectorStore._semantic_index is not None:
+            VectorStore._semantic_index.clear()
         logger.info("Vector search cache cleared")
 
     def insert(self, collection_name: str, texts: List[str],
@@ -351,32 +612,34 @@ class VectorStore:
         self._ensure_connection()
 
         # 如果集合不存在，创建它
-        if not utility.has_collection(collection_name):
-            self.create_collection(collection_name)
-
-        collection = Collection(collection_name)
-
-        # 准备数据
-        ids = [uuid.uuid4().hex for _ in range(len(texts))]
-        metadata_json = [json.dumps(m or {}, ensure_ascii=False) for m in (metadata or [{}] * len(texts))]
-        # 从 metadata 中提取 doc_id（如果存在）
-        doc_ids = [m.get("doc_id", "") for m in (metadata or [{}] * len(texts))]
+        collection = self._get_collection(collection_name, create=True)
 
         # 插入数据（新 schema: id, doc_id, embedding, text, metadata）
-        data = [ids, doc_ids, embeddings, texts, metadata_json]
-        collection.insert(data)
-
-        # 刷新以确保数据可搜索
-        collection.flush()
+        ids, doc_ids, metadata_json = _prepare_rows(texts, metadata)
+        collection.insert([ids, doc_ids, embeddings, texts, metadata_json])
+        self._bump_collection_version(collection_name)
 
-        # 加载集合到内存
-        collection.load()
+        # 已加载集合的新数据无需 flush 即可被搜索；段的封存交给 Milvus 或 VectorWriter.commit
+        self._ensure_loaded(collection_name, collection)
 
         return len(texts)
 
+    def writer(self, max_rows: int = INSERT_BUFFER_ROWS,
+               flush_interval: float = INSERT_FLUSH_INTERVAL) -> "VectorWriter":
+        """
+        创建批量写入器（用于大批量导入）
+
+        用法:
+            with vector_store.writer() as writer:
+                for doc in documents:
+                    writer.add(collection_name, doc_texts, doc_embeddings, doc_metadata)
+        """
+        return VectorWriter(self, max_rows=max_rows, flush_interval=flush_interval)
+
     def search(self, collection_name: str, query_embedding: List[float],
                top_k: int = 5, output_fields: List[str] = None,
-               use_cache: bool = True, offset: int = 0) -> Dict[str, Any]:
+               use_cache: bool = True, offset: int = 0,
+               include_embeddings: bool = False) -> Dict[str, Any]:
         """
         向量相似度搜索 - Sprint 8: 优化版本
 
@@ -387,6 +650,7 @@ class VectorStore:
             output_fields: 返回的字段列表
             use_cache: 是否使用缓存
             offset: 分页偏移量
+            include_embeddings: 是否在结果中返回命中向量（用于 MMR 等重排）
 
         Returns:
             包含结果和元数据的字典
@@ -394,55 +658,75 @@ class VectorStore:
         # 确保连接有效
         self._ensure_connection()
 
-        if not utility.has_collection(collection_name):
+        collection = self._get_collection(collection_name)
+        if collection is None:
             return {"results": [], "total": 0, "offset": offset, "limit": top_k}
 
         # Sprint 8: 检查缓存
-        cache_key = None
+        cache_key = cache_scope = None
         if use_cache and offset == 0:  # 只缓存第一页
-            cache_key = self._get_cache_key(collection_name, query_embedding, top_k)
+            cache_filters = {}
+            if output_fields:
+                cache_filters["__fields__"] = sorted(output_fields)
+            if include_embeddings:
+                cache_filters["__embeddings__"] = True
+            cache_scope = self._get_cache_scope(collection_name, top_k, cache_filters or None)
+            cache_key = self._get_cache_key(
+                collection_name, query_embedding, top_k, cache_scope=cache_scope
+            )
+            cache_match = "exact"
             cached_result = self._get_from_cache(cache_key)
+            if cached_result is None:
+                cache_match = "semantic"
+                cached_result = self._get_similar_from_cache(cache_scope, query_embedding)
             if cached_result is not None:
                 return {
                     "results": cached_result[:top_k],
                     "total": len(cached_result),
                     "offset": offset,
                     "limit": top_k,
-                    "cached": True
+                    "cached": True,
+                    "cache_match": cache_match,
                 }
 
-        collection = Collection(collection_name)
-        collection.load()
+        self._ensure_loaded(collection_name, collection)
 
         # Sprint 8: 优化的搜索参数
         # 对于分页，我们需要获取更多结果
         search_limit = top_k + offset
 
+        fields = list(output_fields or ["text", "metadata"])
+        if include_embeddings and "embedding" not in fields:
+            fields.append("embedding")
+
         # 执行搜索
         results = collection.search(
             data=[query_embedding],
             anns_field="embedding",
             param={"metric_type": METRIC_TYPE, "params": {"nprobe": NPROBE}},
             limit=search_limit,
-            output_fields=output_fields or ["text", "metadata"]
+            output_fields=fields
         )
 
         # 格式化结果
         formatted_results = []
         for hit in results[0]:
-            formatted_results.append({
+            item = {
                 "id": hit.id,
                 "score": float(hit.score),
                 "text": hit.entity.get("text", ""),
                 "metadata": json.loads(hit.entity.get("metadata", "{}"))
-            })
+            }
+            if include_embeddings:
+                item["embedding"] = list(hit.entity.get("embedding") or [])
+            formatted_results.append(item)
 
         # 应用分页
         paginated_results = formatted_results[offset:offset + top_k]
 
         # Sprint 8: 缓存完整结果（仅第一页）
         if use_cache and offset == 0 and cache_key:
-            self._set_cache(cache_key, formatted_results)
+            self._set_cache(cache_key, formatted_results, cache_scope, query_embedding)
 
         return {
             "results": paginated_results,
@@ -452,6 +736,28 @@ class VectorStore:
             "cached": False
         }
 
+    def get_embeddings(self, collection_name: str, ids: List[str]) -> Dict[str, List[float]]:
+        """
+        按主键批量获取已存储的向量
+
+        Args:
+            collection_name: 集合名称
+            ids: 向量主键列表
+
+        Returns:
+            {id: embedding}，不存在的 id 不返回
+        """
+        if not ids:
+            return {}
+
+        collection = self._get_loaded_collection(collection_name)
+        if collection is None:
+            return {}
+
+        id_list = ", ".join(json.dumps(str(i)) for i in ids)
+        rows = collection.query(expr=f"id in [{id_list}]", output_fields=["id", "embedding"])
+        return {row["id"]: list(row["embedding"]) for row in rows}
+
     def search_batch(self, collection_name: str, query_embeddings: List[List[float]],
                      top_k: int = 5, output_fields: List[str] = None) -> List[List[Dict[str, Any]]]:
         """
@@ -466,12 +772,10 @@ class VectorStore:
         Returns:
             二维结果列表，每个查询对应一个结果列表
         """
-        if not utility.has_collection(collection_name):
+        collection = self._get_loaded_collection(collection_name)
+        if collection is None:
             return [[] for _ in query_embeddings]
 
-        collection = Collection(collection_name)
-        collection.load()
-
         # 执行批量搜索
         results = collection.search(
             data=query_embeddings,
@@ -507,13 +811,13 @@ class VectorStore:
         Returns:
             删除的文档数量
         """
-        if not utility.has_collection(collection_name):
+        collection = self._get_collection(collection_name)
+        if collection is None:
             return 0
 
-        collection = Collection(collection_name)
-
         if ids:
             collection.delete(f"id in {ids}")
+            self._bump_collection_version(collection_name)
 
         return len(ids) if ids else 0
 
@@ -541,29 +845,27 @@ class VectorStore:
             # 转义 doc_id 中的特殊字符，防止 Milvus 表达式注入
             escaped_doc_id = doc_id.replace('"', '\\"')
 
-            # 检查集合是否存在
-            if not utility.has_collection(collection_name):
-                logger.warning(f"Collection {collection_name} does not exist, nothing to delete")
-                return False
-
             # 确保连接有效
             self._ensure_connection()
 
-            collection = Collection(collection_name)
+            # 检查集合是否存在
+            collection = self._get_collection(collection_name)
+            if collection is None:
+                logger.warning(f"Collection {collection_name} does not exist, nothing to delete")
+                return False
 
             # 先加载集合，确保删除操作能正确执行
             try:
-                collection.load()
+                self._ensure_loaded(collection_name, collection)
             except Exception as e:
                 logger.debug(f"Collection load warning (may already be loaded): {e}")
 
             # 使用 doc_id 字段过滤删除所有属于该文档的向量
             # Milvus 的表达式语法：doc_id == "xxx"
+            # 删除对已加载集合的搜索立即可见，无需逐次 flush
             delete_expr = f'doc_id == "{escaped_doc_id}"'
             collection.delete(expr=delete_expr)
-
-            # 刷新以确保删除立即生效
-            collection.flush()
+            self._bump_collection_version(collection_name)
 
             # 记录删除操作
             logger.info(f"Deleted vectors by doc_id: collection={collection_name}, doc_id={doc_id}")
@@ -600,21 +902,20 @@ class VectorStore:
         unique_doc_ids = list(set(doc_ids))
 
         try:
+            # 确保连接有效
+            self._ensure_connection()
+
             # 检查集合是否存在
-            if not utility.has_collection(collection_name):
+            collection = self._get_collection(collection_name)
+            if collection is None:
                 logger.warning(f"Collection {collection_name} does not exist")
                 result["failed"] = len(unique_doc_ids)
                 result["failed_ids"] = unique_doc_ids
                 return result
 
-            # 确保连接有效
-            self._ensure_connection()
-
-            collection = Collection(collection_name)
-
             # 先加载集合
             try:
-                collection.load()
+                self._ensure_loaded(collection_name, collection)
             except Exception as e:
                 logger.debug(f"Collection load warning: {e}")
 
@@ -624,7 +925,7 @@ class VectorStore:
             delete_expr = f'doc_id in [{", ".join(escaped_ids)}]'
 
             collection.delete(expr=delete_expr)
-            collection.flush()
+            self._bump_collection_version(collection_name)
 
             result["success"] = len(unique_doc_ids)
             logger.info(f"Batch deleted vectors: collection={collection_name}, count={result['success']}")
@@ -661,31 +962,14 @@ class VectorStore:
         if total == 0:
             return 0
 
-        if metadata is None:
-            metadata = [{}] * total
-
-        inserted = 0
-        num_batches = (total + batch_size - 1) // batch_size
-
         logger.info(f"Batch insert started: {total} vectors into '{collection_name}' "
-                     f"in {num_batches} batches (batch_size={batch_size})")
-
-        for batch_idx in range(num_batches):
-            start = batch_idx * batch_size
-            end = min(start + batch_size, total)
-
-            batch_texts = texts[start:end]
-            batch_embeddings = embeddings[start:end]
-            batch_metadata = metadata[start:end]
-
-            count = self.insert(collection_name, batch_texts, batch_embeddings, batch_metadata)
-            inserted += count
+                     f"(batch_size={batch_size})")
 
-            logger.info(f"Batch {batch_idx + 1}/{num_batches} inserted: "
-                         f"{count} vectors ({inserted}/{total} total)")
+        with self.writer(max_rows=batch_size, flush_interval=float("inf")) as writer:
+            writer.add(collection_name, texts, embeddings, metadata)
 
-        logger.info(f"Batch insert completed: {inserted}/{total} vectors into '{collection_name}'")
-        return inserted
+        logger.info(f"Batch insert completed: {writer.rows_written}/{total} vectors into '{collection_name}'")
+        return writer.rows_written
 
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """
@@ -699,12 +983,10 @@ class VectorStore:
         """
         self._ensure_connection()
 
-        if not utility.has_collection(collection_name):
+        collection = self._get_loaded_collection(collection_name)
+        if collection is None:
             return {"exists": False, "collection_name": collection_name}
 
-        collection = Collection(collection_name)
-        collection.load()
-
         # 基本信息
         num_entities = collection.num_entities
 
@@ -764,6 +1046,8 @@ class VectorStore:
         """删除集合"""
         if utility.has_collection(collection_name):
             utility.drop_collection(collection_name)
+        self._clear_collection_cache(collection_name)
+        self._bump_collection_version(collection_name)
 
     def list_collections(self) -> List[str]:
         """列出所有集合"""
@@ -771,12 +1055,10 @@ class VectorStore:
 
     def collection_info(self, collection_name: str) -> Dict[str, Any]:
         """获取集合信息"""
-        if not utility.has_collection(collection_name):
+        collection = self._get_loaded_collection(collection_name)
+        if collection is None:
             return {"exists": False}
 
-        collection = Collection(collection_name)
-        collection.load()
-
         return {
             "exists": True,
             "name": collection_name,
@@ -792,3 +1074,259 @@ class VectorStore:
                 ]
             }
         }
+
+
+class VectorWriter:
+    """
+    Milvus 批量写入器
+
+    跨多次 add 调用缓冲行，按集合以列式大批量 insert：
+    - 缓冲行数达到 max_rows，或最早的缓冲行已超过 flush_interval 秒时写入
+    - commit 写入剩余行，并对本次写入过的集合各 flush（封存段）一次
+    - 作为上下文管理器使用时，正常退出自动 commit；异常退出丢弃未写入的缓冲
+    - add 传入 key 时按 key 隔离写入失败：同一 key 的行不拆到不同块，批量 insert
+      失败后逐个 key 重试，仍失败的 key 记入 failed 而不抛出；单个集合失败不影响其他集合
+    - 无 key 的行写入失败时放回缓冲并抛出
+    """
+
+    def __init__(self, store: VectorStore, max_rows: int = INSERT_BUFFER_ROWS,
+                 flush_interval: float = INSERT_FLUSH_INTERVAL):
+        self.store = store
+        self.max_rows = max(1, max_rows)
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._buffers: Dict[str, List[list]] = {}
+        self._buffered_rows = 0
+        self._first_buffered_at: Optional[float] = None
+        self._written_collections: Set[str] = set()
+        # 集合 -> [(key, 行数)]，与缓冲行一一对应
+        self._segments: Dict[str, List[Tuple[Any, int]]] = {}
+        self.failed: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, collection_name: str, texts: List[str],
+            embeddings: List[List[float]], metadata: List[Dict] = None,
+            key: Any = None) -> int:
+        """
+        缓冲一批文档向量
+
+        Args:
+            key: 文档标识；写入失败时记入 failed[key]
+
+        Returns:
+            缓冲的行数
+
+        Raises:
+            ValueError: texts / embeddings / metadata 行数不一致（不会写入缓冲）
+        """
+        if not texts:
+            return 0
+        if len(embeddings) != len(texts) or (metadata is not None and len(metadata) != len(texts)):
+            raise ValueError(
+                f"Row count mismatch: {len(texts)} texts, {len(embeddings)} embeddings, "
+                f"{len(metadata) if metadata is not None else '-'} metadata"
+            )
+
+        ids, doc_ids, metadata_json = _prepare_rows(texts, metadata)
+        with self._lock:
+            columns = self._buffers.setdefault(collection_name, [[], [], [], [], []])
+            for column, values in zip(columns, (ids, doc_ids, embeddings, texts, metadata_json)):
+                column.extend(values)
+            self._segments.setdefault(collection_name, []).append((key, len(texts)))
+            self._buffered_rows += len(texts)
+            if self._first_buffered_at is None:
+                self._first_buffered_at = time.time()
+
+            if self._buffered_rows >= self.max_rows or \
+                    time.time() - self._first_buffered_at >= self.flush_interval:
+                self._write_buffers()
+        return len(texts)
+
+    def flush(self) -> int:
+        """写入所有缓冲行（不封存段），返回写入行数"""
+        with self._lock:
+            return self._write_buffers()
+
+    def commit(self) -> int:
+        """
+        写入剩余缓冲行，并对本次写入过的集合执行一次 flush
+
+        Returns:
+            本写入器累计写入的行数
+        """
+        with self._lock:
+            self._write_buffers()
+            for name in self._written_collections:
+                collection = self.store._get_collection(name)
+                if collection is not None:
+                    collection.flush()
+            self._written_collections.clear()
+            return self.rows_written
+
+    def discard(self):
+        """丢弃未写入的缓冲"""
+        with self._lock:
+            self._buffers.clear()
+            self._segments.clear()
+            self._buffered_rows = 0
+            self._first_buffered_at = None
+
+    def _write_buffers(self) -> int:
+        """按集合写入缓冲行（调用方持有锁）；单个集合失败不影响其他集合"""
+        if not self._buffered_rows:
+            return 0
+
+        self.store._ensure_connection()
+        written = 0
+        buffers, self._buffers = self._buffers, {}
+        segments, self._segments = self._segments, {}
+        self._buffered_rows = 0
+        self._first_buffered_at = None
+
+        error = None
+        for name, columns in buffers.items():
+            try:
+                written += self._write_collection(name, columns, segments.get(name, []))
+            except Exception as e:
+                error = error or e
+
+        self.rows_written += written
+        if error is not None:
+            raise error
+        return written
+
+    def _plan_chunks(self, segments: List[Tuple[Any, int]]) -> List[List[Tuple[Any, int, int, bool]]]:
+        """
+        按 max_rows 把缓冲行划分为 insert 块，块内元素为 (key, 起始行, 结束行, 是否整段)
+
+        带 key 的段放不进当前块时另起一块，不会被拆到两次 insert 中；
+        只有超过 max_rows 的段才会连续切分（无 key 的段按行数填满每一块）。
+        """
+        chunks, current, rows, offset = [], [], 0, 0
+        for key, count in segments:
+            seg_start, seg_end = offset, offset + count
+            offset = seg_end
+            if key is not None and current and rows + count > self.max_rows:
+                chunks.append(current)
+                current, rows = [], 0
+            pos = seg_start
+            while pos < seg_end:
+                take = min(self.max_rows - rows, seg_end - pos)
+                current.append((key, pos, pos + take, take == count))
+                rows += take
+                pos += take
+                if rows >= self.max_rows:
+                    chunks.append(current)
+                    current, rows = [], 0
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _write_collection(self, name: str, columns: List[list],
+                          segments: List[Tuple[Any, int]]) -> int:
+        """
+        把一个集合的缓冲行按块 insert，返回写入行数
+
+        - 块失败时逐个 key 重试，仍失败的 key 记入 failed，已写入的该 key 的行会被删除
+        - 含无 key 行的块失败时，把该块及之后的行放回缓冲后抛出，由下次写入重试
+        """
+        written = 0
+        collection = None
+        # 被切分的 key 已写入的主键，失败时删除，避免调用方重试后重复
+        partial: Dict[Any, List[str]] = {}
+        try:
+            for chunk in self._plan_chunks(segments):
+                units = [unit for unit in chunk if unit[0] is None or unit[0] not in self.failed]
+                if not units:
+                    continue
+                if len(units) != len(chunk):
+                    # 块中含已失败 key 的剩余行（不再写入），其余 key 单独写入
+                    written += self._retry_units(name, columns, units, partial)
+                    continue
+                start, end = chunk[0][1], chunk[-1][2]
+                try:
+                    if collection is None:
+                        collection = self.store._get_collection(name, create=True)
+                    collection.insert([column[start:end] for column in columns])
+                except Exception as e:
+                    # 句柄可能已失效（集合被删除等），下次重新获取
+                    self.store._clear_collection_cache(name)
+                    collection = None
+                    if any(key is None for key, _, _, _ in units):
+                        self._restore_buffer(name, columns, segments, start)
+                        raise
+                    logger.warning(f"VectorWriter batch insert into '{name}' failed, retrying per key: {e}")
+                    written += self._retry_units(name, columns, units, partial)
+                    continue
+                written += end - start
+                for key, unit_start, unit_end, whole in chunk:
+                    if key is not None and not whole:
+                        partial.setdefault(key, []).extend(columns[0][unit_start:unit_end])
+        finally:
+            self.store._bump_collection_version(name)
+
+        if written:
+            self.store._ensure_loaded(name, self.store._get_collection(name, create=True))
+            self._written_collections.add(name)
+            logger.debug(f"VectorWriter inserted {written} rows into '{name}'")
+        return written
+
+    def _retry_units(self, name: str, columns: List[list], units: List[Tuple[Any, int, int, bool]],
+                     partial: Dict[Any, List[str]]) -> int:
+        """逐个 key 单独 insert（批量 insert 失败后的重试）"""
+        written = 0
+        for key, start, end, whole in units:
+            if key in self.failed:
+                continue
+            try:
+                collection = self.store._get_collection(name, create=True)
+                collection.insert([column[start:end] for column in columns])
+            except Exception as e:
+                self.store._clear_collection_cache(name)
+                # 已删除的部分行不计入写入行数
+                written -= self._fail_key(name, key, partial.pop(key, []), e)
+                continue
+            written += end - start
+            if not whole:
+                partial.setdefault(key, []).extend(columns[0][start:end])
+        return written
+
+    def _fail_key(self, name: str, key: Any, written_ids: List[str], error: Exception) -> int:
+        """记录 key 写入失败，并删除该 key 已写入的部分行，返回删除的行数"""
+        self.failed[key] = str(error)
+        logger.error(f"VectorWriter insert into '{name}' failed for {key!r}: {error}")
+        if not written_ids:
+            return 0
+        try:
+            id_list = ", ".join(json.dumps(i) for i in written_ids)
+            self.store._get_collection(name, create=True).delete(expr=f"id in [{id_list}]")
+        except Exception as e:
+            self.failed[key] = f"{error}; partial rows not removed: {e}"
+            logger.error(f"VectorWriter failed to remove partial rows for {key!r} in '{name}': {e}")
+            return 0
+        return len(written_ids)
+
+    def _restore_buffer(self, name: str, columns: List[list],
+                        segments: List[Tuple[Any, int]], start: int):
+        """把第 start 行起尚未写入的行放回缓冲（调用方持有锁）"""
+        restored, offset = [], 0
+        for key, count in segments:
+            seg_start, seg_end = offset, offset + count
+            offset = seg_end
+            if seg_end > start:
+                restored.append((key, seg_end - max(seg_start, start)))
+        self._buffers[name] = [column[start:] for column in columns]
+        self._segments[name] = restored
+        self._buffered_rows += len(columns[0]) - start
+        if self._first_buffered_at is None:
+            self._first_buffered_at = time.time()
+
+    def __enter__(self) -> "VectorWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
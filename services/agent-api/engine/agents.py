@@ -10,11 +10,11 @@ import json
 import logging
 import os
 import re
-import requests
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from .base_tools import get_tool_registry, ToolRegistry
+from .llm_client import get_llm_client
 
 logger = logging.getLogger(__name__)
 
@@ -162,62 +162,26 @@ class ReActAgent:
         return None
 
     async def _call_llm(self, prompt: str, retries: int = 2) -> str:
-        """调用 LLM API（异步 + 重试）"""
-        last_error = None
-
-        for attempt in range(retries + 1):
-            try:
-                try:
-                    import aiohttp
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(
-                            f"{self.llm_api_url}/v1/chat/completions",
-                            json={
-                                "model": self.model,
-                                "messages": [
-                                    {"role": "system", "content": "你是一个有帮助的 AI 助手，可以思考和使用工具来解决问题。"},
-                                    {"role": "user", "content": prompt}
-                                ],
-                                "temperature": 0.1,
-                                "max_tokens": 1000
-                            },
-                            timeout=aiohttp.ClientTimeout(total=30)
-                        ) as resp:
-                            if resp.status == 200:
-                                result = await resp.json()
-                                return result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                            else:
-                                last_error = f"LLM API returned {resp.status}"
-                except ImportError:
-                    # aiohttp 不可用时回退到同步 requests
-                    import asyncio
-                    loop = asyncio.get_event_loop()
-                    response = await loop.run_in_executor(None, lambda: requests.post(
-                        f"{self.llm_api_url}/v1/chat/completions",
-                        json={
-                            "model": self.model,
-                            "messages": [
-                                {"role": "system", "content": "你是一个有帮助的 AI 助手，可以思考和使用工具来解决问题。"},
-                                {"role": "user", "content": prompt}
-                            ],
-                            "temperature": 0.1,
-                            "max_tokens": 1000
-                        },
-                        timeout=30
-                    ))
-
-                    if response.status_code == 200:
-                        result = response.json()
-                        return result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                    else:
-                        last_error = f"LLM API returned {response.status_code}"
-
-            except Exception as e:
-                last_error = str(e)
-                if attempt < retries:
-                    import asyncio
-                    await asyncio.sleep(1 * (attempt + 1))  # 递增延迟
-                    logger.warning(f"LLM 调用失败 (attempt {attempt + 1}/{retries + 1}): {e}")
+        """调用 LLM API（共享连接池 + 重试）"""
+        try:
+            response = await get_llm_client(self.llm_api_url).chat_completion(
+                {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": "你是一个有帮助的 AI 助手，可以思考和使用工具来解决问题。"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": 0.1,
+                    "max_tokens": 1000
+                },
+                retries=retries
+            )
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+            last_error = f"LLM API returned {response.status_code}"
+        except Exception as e:
+            last_error = str(e)
 
         return f"Error: {last_error}"
 
@@ -497,18 +461,14 @@ class FunctionCallingAgent:
         for iteration in range(self.max_iterations):
             # 调用 LLM
             try:
-                response = requests.post(
-                    f"{self.llm_api_url}/v1/chat/completions",
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "tools": self.tool_registry.get_function_schemas(),
-                        "tool_choice": "auto",
-                        "temperature": 0.1,
-                        "max_tokens": 1000
-                    },
-                    timeout=30
-                )
+                response = await get_llm_client(self.llm_api_url).chat_completion({
+                    "model": self.model,
+                    "messages": messages,
+                    "tools": self.tool_registry.get_function_schemas(),
+                    "tool_choice": "auto",
+                    "temperature": 0.1,
+                    "max_tokens": 1000
+                })
 
                 if response.status_code != 200:
                     return {
@@ -607,18 +567,14 @@ class FunctionCallingAgent:
 
             # 调用 LLM
             try:
-                response = requests.post(
-                    f"{self.llm_api_url}/v1/chat/completions",
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "tools": self.tool_registry.get_function_schemas(),
-                        "tool_choice": "auto",
-                        "temperature": 0.1,
-                        "max_tokens": 1000
-                    },
-                    timeout=30
-                )
+                response = await get_llm_client(self.llm_api_url).chat_completion({
+                    "model": self.model,
+                    "messages": messages,
+                    "tools": self.tool_registry.get_function_schemas(),
+                    "tool_choice": "auto",
+                    "temperature": 0.1,
+                    "max_tokens": 1000
+                })
 
                 if response.status_code != 200:
                     yield {"type": "error", "message": f"LLM API error: {response.status_code}"}
@@ -723,16 +679,12 @@ class PlanExecuteAgent:
 计划："""
 
         try:
-            response = requests.post(
-                f"{self.llm_api_url}/v1/chat/completions",
-                json={
-                    "model": self.model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.3,
-                    "max_tokens": 500
-                },
-                timeout=30
-            )
+            response = await get_llm_client(self.llm_api_url).chat_completion({
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.3,
+                "max_tokens": 500
+            })
 
             if response.status_code == 200:
                 result = response.json()
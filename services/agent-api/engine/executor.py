@@ -3,9 +3,16 @@
 Phase 6: Sprint 6.1
 
 支持解析和执行简单的工作流定义
+
+执行采用波前调度：跟踪每个节点的入度，前驱全部完成的节点立即启动，
+同一工作流内并发数受 max_concurrency 限制。节点输出按拓扑顺序合并到上下文，
+并发节点写入同名键时结果与完成先后无关。
 """
 
+import heapq
 import json
+import logging
+import os
 import uuid
 import asyncio
 from datetime import datetime
@@ -14,20 +21,30 @@ from collections import defaultdict, deque
 
 from .nodes import get_node_executor, BaseNode
 
+logger = logging.getLogger(__name__)
+
+# 单个工作流内同时执行的节点数上限
+WORKFLOW_MAX_CONCURRENCY = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "8"))
+
 
 class WorkflowExecutor:
     """工作流执行器"""
 
-    def __init__(self, workflow_id: str, definition: Dict[str, Any]):
+    def __init__(self, workflow_id: str, definition: Dict[str, Any], max_concurrency: Optional[int] = None):
         """
         初始化执行器
 
         Args:
             workflow_id: 工作流ID
             definition: 工作流定义（JSON解析后的字典）
+            max_concurrency: 同时执行的节点数上限，默认取定义中的 max_concurrency
+                或 WORKFLOW_MAX_CONCURRENCY
         """
         self.workflow_id = workflow_id
         self.definition = definition
+        self.max_concurrency = max(
+            1, int(max_concurrency or definition.get("max_concurrency") or WORKFLOW_MAX_CONCURRENCY)
+        )
 
         # 解析节点和边
         self.nodes = {n["id"]: n for n in definition.get("nodes", [])}
@@ -159,47 +176,26 @@ class WorkflowExecutor:
                     "errors": errors
                 }
 
-            # 获取执行顺序
+            # 获取执行顺序（同时完成环检测）
             execution_order = self._topological_sort()
 
-            # 按顺序执行节点
-            for node_id in execution_order:
-                node_def = self.nodes[node_id]
-
-                try:
-                    # 创建节点执行器
-                    executor = get_node_executor(node_def)
-
-                    # 执行节点
-                    result = await executor.execute(self.context)
-
-                    # 更新上下文
-                    self.context.update(result)
-                    self.node_results[node_id] = {
-                        "status": "success",
-                        "result": result
-                    }
-
-                except Exception as e:
-                    # 节点执行失败
-                    self.node_results[node_id] = {
-                        "status": "error",
-                        "error": str(e)
-                    }
-                    self.errors.append(f"节点 {node_id} 执行失败: {str(e)}")
-
-                    # 是否继续执行？默认遇到错误停止
-                    if node_def.get("config", {}).get("continue_on_error", False):
-                        continue
-                    else:
-                        self.status = "failed"
-                        self.completed_at = datetime.now()
-                        return {
-                            "execution_id": self.execution_id,
-                            "status": "failed",
-                            "errors": self.errors,
-                            "node_results": self.node_results
-                        }
+            # 按依赖关系并行执行节点
+            failed = await self._run_wavefront(execution_order)
+            if failed:
+                self.status = "failed"
+                self.completed_at = datetime.now()
+                return {
+                    "execution_id": self.execution_id,
+                    "status": "failed",
+                    "errors": self.errors,
+                    "node_results": self.node_results
+                }
+            if self.status == "stopped":
+                return {
+                    "execution_id": self.execution_id,
+                    "status": "stopped",
+                    "node_results": self.node_results
+                }
 
             # 执行成功
             self.status = "completed"
@@ -229,6 +225,98 @@ class WorkflowExecutor:
                 "errors": self.errors
             }
 
+    async def _run_wavefront(self, execution_order: List[str]) -> bool:
+        """
+        波前调度执行节点
+
+        入度归零的节点进入就绪队列（按拓扑序号出队，保证启动顺序确定），
+        运行中节点数不超过 max_concurrency。节点失败时若配置了
+        continue_on_error 则视为完成并继续调度后继节点，否则取消其余运行中的节点。
+
+        Args:
+            execution_order: 拓扑排序结果
+
+        Returns:
+            是否因节点失败而终止
+        """
+        order_index = {node_id: i for i, node_id in enumerate(execution_order)}
+        in_degree = {node_id: len(self.reverse_adjacency.get(node_id, [])) for node_id in self.nodes}
+        ready = [order_index[node_id] for node_id, degree in in_degree.items() if degree == 0]
+        heapq.heapify(ready)
+
+        initial_context = self.context
+        outputs: Dict[str, Dict[str, Any]] = {}
+        running: Dict[asyncio.Task, str] = {}
+
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_concurrency and self.status == "running":
+                    node_id = execution_order[heapq.heappop(ready)]
+                    task = asyncio.ensure_future(self._execute_node(node_id, dict(self.context)))
+                    running[task] = node_id
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: order_index[running[t]]):
+                    node_id = running.pop(task)
+                    node_def = self.nodes[node_id]
+                    error = task.exception()
+
+                    if error is None:
+                        outputs[node_id] = task.result()
+                        self.node_results[node_id] = {
+                            "status": "success",
+                            "result": outputs[node_id]
+                        }
+                    else:
+                        # 节点执行失败
+                        self.node_results[node_id] = {
+                            "status": "error",
+                            "error": str(error)
+                        }
+                        self.errors.append(f"节点 {node_id} 执行失败: {str(error)}")
+
+                        # 是否继续执行？默认遇到错误停止
+                        if not node_def.get("config", {}).get("continue_on_error", False):
+                            return True
+
+                    for neighbor in self.adjacency.get(node_id, []):
+                        in_degree[neighbor] -= 1
+                        if in_degree[neighbor] == 0:
+                            heapq.heappush(ready, order_index[neighbor])
+
+                # 按拓扑顺序重建上下文，使合并结果与完成先后无关
+                self.context = self._merge_outputs(initial_context, outputs, execution_order)
+
+            return False
+        finally:
+            for task, node_id in running.items():
+                task.cancel()
+                self.node_results.setdefault(node_id, {"status": "cancelled"})
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+
+    async def _execute_node(self, node_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个节点（context 为启动时的上下文快照）"""
+        executor = get_node_executor(self.nodes[node_id])
+        return await executor.execute(context)
+
+    @staticmethod
+    def _merge_outputs(
+        initial_context: Dict[str, Any],
+        outputs: Dict[str, Dict[str, Any]],
+        execution_order: List[str]
+    ) -> Dict[str, Any]:
+        """按拓扑顺序把已完成节点的输出合并到上下文"""
+        context = dict(initial_context)
+        for node_id in execution_order:
+            result = outputs.get(node_id)
+            if result:
+                context.update(result)
+        return context
+
     def get_status(self) -> Dict[str, Any]:
         """获取执行状态"""
         return {
@@ -0,0 +1,307 @@
+"""
+共享异步 LLM 客户端
+
+工作流节点与 Agent 共用的 OpenAI 兼容 /v1/chat/completions 客户端：
+- 每个 base URL 一个进程级客户端，持有一个 keep-alive 连接池
+- 连接池运行在独立的后台事件循环上，任意线程/事件循环中的协程都可复用，
+  不会因为每个工作流新建事件循环而重建 TCP/TLS 连接
+- 超时与重试次数来自环境变量，可按调用覆盖
+- 支持流式返回（SSE）逐 token 输出
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Optional
+
+import requests
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+logger = logging.getLogger(__name__)
+
+# 配置
+MODEL_API_URL = os.getenv("MODEL_API_URL", "http://vllm-serving:8000")
+LLM_CLIENT_TIMEOUT = float(os.getenv("LLM_CLIENT_TIMEOUT", "30"))
+LLM_CLIENT_CONNECT_TIMEOUT = float(os.getenv("LLM_CLIENT_CONNECT_TIMEOUT", "5"))
+LLM_CLIENT_MAX_RETRIES = int(os.getenv("LLM_CLIENT_MAX_RETRIES", "2"))
+LLM_CLIENT_MAX_CONNECTIONS = int(os.getenv("LLM_CLIENT_MAX_CONNECTIONS", "256"))
+LLM_CLIENT_KEEPALIVE_TIMEOUT = float(os.getenv("LLM_CLIENT_KEEPALIVE_TIMEOUT", "60"))
+
+# 可重试的 HTTP 状态码
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_STREAM_END = object()
+
+
+class LLMResponse:
+    """LLM 响应（接口与 requests.Response 的常用部分一致）"""
+
+    def __init__(self, status_code: int, data: Optional[Dict[str, Any]] = None, text: str = ""):
+        self.status_code = status_code
+        self._data = data
+        self.text = text
+
+    def json(self) -> Dict[str, Any]:
+        if self._data is None:
+            return json.loads(self.text) if self.text else {}
+        return self._data
+
+
+class LLMClient:
+    """共享异步 LLM 客户端"""
+
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: float = None,
+        max_retries: int = None,
+        max_connections: int = None,
+    ):
+        """
+        初始化客户端
+
+        Args:
+            base_url: LLM 服务地址
+            timeout: 单次请求总超时（秒）
+            max_retries: 连接失败或 429/5xx 时的重试次数
+            max_connections: 连接池上限
+        """
+        self.base_url = (base_url or MODEL_API_URL).rstrip("/")
+        self.timeout = timeout or LLM_CLIENT_TIMEOUT
+        self.max_retries = LLM_CLIENT_MAX_RETRIES if max_retries is None else max_retries
+        self.max_connections = max_connections or LLM_CLIENT_MAX_CONNECTIONS
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._http: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    # ==================== 事件循环与连接池 ====================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动持有连接池的后台事件循环"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread, self._session = loop, thread, None
+            return self._loop
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """在后台事件循环上获取 aiohttp 会话"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=LLM_CLIENT_KEEPALIVE_TIMEOUT,
+                ),
+            )
+        return self._session
+
+    async def _run_on_client_loop(self, coro):
+        """把协程提交到客户端事件循环并在调用方事件循环上等待结果"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    # ==================== 请求 ====================
+
+    async def chat_completion(
+        self,
+        payload: Dict[str, Any],
+        timeout: float = None,
+        retries: int = None,
+    ) -> LLMResponse:
+        """
+        调用 /v1/chat/completions
+
+        连接错误、超时以及 429/5xx 响应按指数退避重试；重试耗尽后
+        非 200 响应原样返回，连接错误抛出最后一次异常。
+
+        Args:
+            payload: 请求体
+            timeout: 覆盖默认超时
+            retries: 覆盖默认重试次数
+
+        Returns:
+            LLMResponse
+        """
+        payload = dict(payload)
+        payload.pop("stream", None)
+        return await self._run_on_client_loop(
+            self._post_with_retry(payload, timeout or self.timeout, self._retries(retries))
+        )
+
+    async def stream_chat_completion(
+        self,
+        payload: Dict[str, Any],
+        timeout: float = None,
+    ) -> AsyncIterator[str]:
+        """
+        流式调用 /v1/chat/completions，逐段产出 content 增量
+
+        Raises:
+            RuntimeError: 非 200 响应
+        """
+        caller_loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def put(item):
+            caller_loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        async def pump():
+            try:
+                async for delta in self._stream(dict(payload, stream=True), timeout or self.timeout):
+                    put(delta)
+            except BaseException as e:
+                put(e)
+            finally:
+                put(_STREAM_END)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._ensure_loop())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def _retries(self, retries: Optional[int]) -> int:
+        return self.max_retries if retries is None else max(0, retries)
+
+    async def _post_with_retry(self, payload: Dict[str, Any], timeout: float, retries: int) -> LLMResponse:
+        """带指数退避的请求（运行在客户端事件循环上）"""
+        for attempt in range(retries + 1):
+            try:
+                response = await self._post(payload, timeout)
+                if response.status_code not in _RETRYABLE_STATUS or attempt == retries:
+                    return response
+                logger.warning(
+                    f"LLM API returned {response.status_code}, retrying ({attempt + 1}/{retries})"
+                )
+            except (asyncio.TimeoutError, requests.exceptions.RequestException, OSError) as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"LLM 调用失败 (attempt {attempt + 1}/{retries + 1}): {e}")
+            except Exception as e:
+                if not (HAS_AIOHTTP and isinstance(e, aiohttp.ClientError)) or attempt == retries:
+                    raise
+                logger.warning(f"LLM 调用失败 (attempt {attempt + 1}/{retries + 1}): {e}")
+            await asyncio.sleep(min(2 ** attempt * 0.5, 8))
+
+    async def _post(self, payload: Dict[str, Any], timeout: float) -> LLMResponse:
+        """单次请求"""
+        url = f"{self.base_url}/v1/chat/completions"
+        if not HAS_AIOHTTP:
+            # aiohttp 不可用时回退到线程池中的同步连接池
+            loop = asyncio.get_running_loop()
+            resp = await loop.run_in_executor(None, self._post_sync, url, payload, timeout)
+            return LLMResponse(resp.status_code, text=resp.text)
+
+        client_timeout = aiohttp.ClientTimeout(total=timeout, connect=LLM_CLIENT_CONNECT_TIMEOUT)
+        async with self._get_session().post(url, json=payload, timeout=client_timeout) as resp:
+            if resp.status == 200:
+                return LLMResponse(resp.status, data=await resp.json(content_type=None))
+            return LLMResponse(resp.status, text=await resp.text())
+
+    def _post_sync(self, url: str, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        if self._http is None:
+            self._http = requests.Session()
+        return self._http.post(url, json=payload, timeout=timeout)
+
+    async def _stream(self, payload: Dict[str, Any], timeout: float) -> AsyncIterator[str]:
+        """解析 SSE 流（运行在客户端事件循环上）"""
+        if not HAS_AIOHTTP:
+            # 无 aiohttp 时退化为一次性返回
+            payload.pop("stream", None)
+            response = await self._post(payload, timeout)
+            if response.status_code != 200:
+                raise RuntimeError(f"LLM API error: {response.status_code}")
+            yield response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+            return
+
+        url = f"{self.base_url}/v1/chat/completions"
+        client_timeout = aiohttp.ClientTimeout(total=timeout, connect=LLM_CLIENT_CONNECT_TIMEOUT)
+        async with self._get_session().post(url, json=payload, timeout=client_timeout) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"LLM API error: {resp.status}")
+            async for raw_line in resp.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                delta = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    # ==================== 生命周期 ====================
+
+    def close(self) -> None:
+        """关闭连接池并停止后台事件循环"""
+        with self._lock:
+            loop, session = self._loop, self._session
+            self._loop = self._thread = self._session = None
+        if loop is not None and not loop.is_closed():
+            if session is not None and not session.closed:
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+            loop.call_soon_threadsafe(loop.stop)
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+
+# ==================== 全局客户端 ====================
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(base_url: str = None) -> LLMClient:
+    """
+    获取指定 base URL 的共享 LLM 客户端
+
+    Args:
+        base_url: LLM 服务地址，默认 MODEL_API_URL
+
+    Returns:
+        LLMClient: 进程级共享实例
+    """
+    key = (base_url or MODEL_API_URL).rstrip("/")
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = LLMClient(key)
+                _clients[key] = client
+                logger.info(f"LLM client initialized: {key}")
+    return client
+
+
+def reset_llm_clients() -> None:
+    """关闭并清空所有共享客户端（主要用于测试）"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
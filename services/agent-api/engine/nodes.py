@@ -8,10 +8,11 @@ Phase 7: Sprint 7.1-7.2 - Agent 编排与控制流
 import json
 import logging
 import os
-import requests
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
 
+from .llm_client import get_llm_client
+
 logger = logging.getLogger(__name__)
 
 # 配置
@@ -437,6 +438,8 @@ class LLMNode(BaseNode):
         self.max_tokens = config.get("max_tokens", 2000)
         self.system_prompt = config.get("system_prompt", "你是一个有用的AI助手。")
         self.input_key = config.get("input_from", "input")
+        # 流式输出：逐 token 回调上下文中的 _on_token(node_id, token)
+        self.stream = config.get("stream", False)
 
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """调用 LLM 生成文本"""
@@ -459,21 +462,22 @@ class LLMNode(BaseNode):
         if not user_message:
             user_message = str(context.get("_initial_input", {}).get("query", ""))
 
-        # 调用 LLM API
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+
+        # 调用 LLM API（共享连接池，不阻塞事件循环）
         try:
-            response = requests.post(
-                f"{MODEL_API_URL}/v1/chat/completions",
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                },
-                timeout=30
-            )
+            if self.stream:
+                return await self._execute_stream(payload, context)
+
+            response = await get_llm_client(MODEL_API_URL).chat_completion(payload)
 
             if response.status_code == 200:
                 result = response.json()
@@ -502,6 +506,23 @@ class LLMNode(BaseNode):
                 }
             }
 
+    async def _execute_stream(self, payload: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        """流式调用 LLM，逐 token 回调并拼接完整输出"""
+        on_token = context.get("_on_token")
+        tokens = []
+        async for token in get_llm_client(MODEL_API_URL).stream_chat_completion(payload):
+            tokens.append(token)
+            if callable(on_token):
+                on_token(self.node_id, token)
+
+        return {
+            self.node_id: {
+                "output": "".join(tokens),
+                "tokens": len(tokens),
+                "model": self.model
+            }
+        }
+
 
 class OutputNode(BaseNode):
     """输出节点 - 收集并返回最终结果"""
@@ -760,18 +781,14 @@ class ThinkNode(BaseNode):
 
         # 调用 LLM
         try:
-            response = requests.post(
-                f"{MODEL_API_URL}/v1/chat/completions",
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": self.temperature,
-                    "max_tokens": 1000
-                },
-                timeout=30
-            )
+            response = await get_llm_client(MODEL_API_URL).chat_completion({
+                "model": self.model,
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": self.temperature,
+                "max_tokens": 1000
+            })
 
             if response.status_code == 200:
                 result = response.json()
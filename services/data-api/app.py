@@ -3915,6 +3915,11 @@ def generate_lineage_from_sql():
                     saved_count["edges"] += 1
 
                 db.commit()
+
+                # 新边写入后丢弃内存血缘图，下次查询重新加载
+                if GRAPH_ENABLED and saved_count["edges"]:
+                    from services.lineage_graph import get_lineage_graph_index
+                    get_lineage_graph_index().invalidate()
             except Exception as e:
                 db.rollback()
                 return jsonify({
@@ -7332,6 +7337,83 @@ def mask_table_data(table_id: str):
         return jsonify({"code": 50000, "message": str(e)}), 500
 
 
+@app.route("/api/v1/masking/export", methods=["POST"])
+@require_jwt()
+def masking_export():
+    """
+    流式脱敏导出
+    服务端游标分块读取查询结果，按当前用户角色脱敏后增量编码为 CSV/JSONL/XLSX，
+    分块返回给客户端或分片上传到 MinIO，内存占用与导出行数无关
+    """
+    import uuid
+
+    try:
+        from flask import Response, stream_with_context
+        from werkzeug.utils import secure_filename
+        from src.data_masking import get_dynamic_masking_service
+        from src.export_writers import CONTENT_TYPES, EXPORT_FORMATS
+        from src.sql_executor import QueryConfig, SQLSanitizer, get_sql_executor
+
+        data = request.get_json() or {}
+        sql = data.get("sql")
+        database = data.get("database")
+        export_format = (data.get("format") or "csv").lower()
+        destination = data.get("destination", "download")
+
+        if not sql or not database:
+            return jsonify({"code": 40000, "message": "sql and database are required"}), 400
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"code": 40000, "message": f"Unknown export format: {export_format}"}), 400
+
+        is_safe, error = SQLSanitizer.is_safe(SQLSanitizer.sanitize(sql))
+        if not is_safe:
+            return jsonify({"code": 40000, "message": error}), 400
+
+        service = get_dynamic_masking_service()
+        user_role = service.resolve_role(getattr(g, "roles", None) or [])
+
+        max_rows = int(os.getenv("MASKING_EXPORT_MAX_ROWS", "1000000"))
+        config = QueryConfig(
+            timeout_seconds=int(os.getenv("MASKING_EXPORT_TIMEOUT", "600")),
+            max_rows=min(int(data.get("max_rows", max_rows)), max_rows),
+            datasource=data.get("datasource", "default"),
+            user_id=getattr(g, "user_id", None),
+        )
+        batches = get_sql_executor().iter_batches(sql, database, config)
+        chunks, allow_export = service.stream_mask_for_export(
+            batches, user_role, export_format, table_name=data.get("table_name")
+        )
+        if not allow_export:
+            return jsonify({"code": 40300, "message": f"Export not allowed for role: {user_role}"}), 403
+
+        fmt = EXPORT_FORMATS[export_format]
+        content_type = CONTENT_TYPES[fmt]
+
+        if destination == "minio":
+            from src.storage import get_storage_client
+
+            # 对象名始终由服务端生成，不接受客户端指定，避免覆盖导出桶中的任意对象
+            object_name = f"exports/{uuid.uuid4().hex}.{fmt}"
+            size = get_storage_client().put_object_stream(
+                object_name, chunks, content_type=content_type
+            )
+            return jsonify({
+                "code": 0,
+                "message": "success",
+                "data": {"object_name": object_name, "size": size, "format": fmt}
+            })
+
+        filename = secure_filename(data.get("filename") or "") or f"export.{fmt}"
+        return Response(
+            stream_with_context(chunks),
+            mimetype=content_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    except Exception as e:
+        logger.error(f"脱敏导出失败: {e}")
+        return jsonify({"code": 50000, "message": str(e)}), 500
+
+
 # ==================== ShardingSphere 透明脱敏 API ====================
 
 @app.route("/api/v1/masking/shardingsphere/status", methods=["GET"])
@@ -15225,6 +15307,10 @@ def create_cdc_task():
             tables=data.get("tables", []),
         )
         result = service.create_cdc_task(cdc_id, config)
+        if result:
+            # 表变更时使 SQL 结果缓存失效
+            from src.sql_executor import get_sql_executor
+            service.register_event_handler(cdc_id, get_sql_executor().on_cdc_event)
         return jsonify({
             "code": 0,
             "message": "CDC 任务创建成功",
@@ -3,8 +3,12 @@ AI 资产检索服务
 支持自然语言搜索、语义检索、智能推荐
 """
 
+import hashlib
 import logging
+import os
 import re
+import threading
+import time
 from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, text
@@ -12,9 +16,18 @@ from datetime import datetime, timedelta
 
 from models.assets import DataAsset, AssetCategory
 from models.metadata import MetadataDatabase, MetadataTable, MetadataColumn
+from services.asset_vector_index import ASSET_VECTOR_INDEX_PATH, FILTER_FIELDS, AssetVectorIndex
 
 logger = logging.getLogger(__name__)
 
+# 资产向量索引对账间隔（秒）：检查已被物理删除的资产
+ASSET_VECTOR_RECONCILE_INTERVAL = int(os.getenv("ASSET_VECTOR_RECONCILE_INTERVAL", "600"))
+# 资产向量索引后台同步间隔（秒）；资产创建/更新时会提前唤醒
+ASSET_VECTOR_SYNC_INTERVAL = float(os.getenv("ASSET_VECTOR_SYNC_INTERVAL", "60"))
+
+# 语义检索相似度阈值
+SEMANTIC_MIN_SCORE = 0.3
+
 
 class AIAssetSearchService:
     """AI 资产检索服务"""
@@ -28,6 +41,12 @@ class AIAssetSearchService:
         """
         self.embedding_service = embedding_service
         self._query_cache = {}
+        self._vector_index: Optional[AssetVectorIndex] = None
+        self._vector_index_load_lock = threading.Lock()
+        self._vector_index_lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_wakeup = threading.Event()
+        self._sync_stop = threading.Event()
 
     # ==================== 自然语言搜索 ====================
 
@@ -284,58 +303,189 @@ class AIAssetSearchService:
         """
         语义搜索（基于向量相似度）
 
-        需要 embedding_service 支持
+        需要 embedding_service 支持。查询路径只读索引，资产向量由后台同步
+        （start_vector_index_sync）计算；索引尚未完成首次同步时降级到关键词搜索。
         """
         if not self.embedding_service:
             # 降级到关键词搜索
             return self.natural_search(db, tenant_id, query, limit, filters)
 
         try:
-            # 获取查询向量
-            query_embedding = self.embedding_service.encode(query)
-
-            # 获取所有资产
-            assets_query = db.query(DataAsset)
-            if hasattr(DataAsset, 'status'):
-                assets_query = assets_query.filter(DataAsset.status == "active")
-
-            if filters:
-                if "asset_type" in filters:
-                    assets_query = assets_query.filter(
-                        DataAsset.asset_type == filters["asset_type"]
-                    )
-
-            assets = assets_query.all()
-
-            # 计算相似度
-            results = []
-            for asset in assets:
-                # 生成资产文本表示
-                asset_text = self._asset_to_text(asset)
-                asset_embedding = self.embedding_service.encode(asset_text)
+            index = self._get_vector_index()
+            if index.synced_until is None:
+                self.start_vector_index_sync()
+                return self.natural_search(db, tenant_id, query, limit, filters)
 
-                # 计算余弦相似度
-                similarity = self._cosine_similarity(query_embedding, asset_embedding)
-
-                if similarity > 0.3:  # 相似度阈值
-                    results.append({
-                        "asset": asset.to_dict(),
-                        "similarity_score": similarity
-                    })
+            # 查询向量化 + 一次索引检索
+            query_embedding = self.embedding_service.encode(query)
 
-            # 按相似度排序
-            results.sort(key=lambda x: x["similarity_score"], reverse=True)
+            index_filters = {
+                field: value for field, value in (filters or {}).items()
+                if field in FILTER_FIELDS and field != "status"
+            }
+            hits, total = index.search(query_embedding, limit, index_filters, SEMANTIC_MIN_SCORE)
+
+            assets = {}
+            if hits:
+                assets = {
+                    asset.asset_id: asset
+                    for asset in db.query(DataAsset).filter(
+                        DataAsset.asset_id.in_([asset_id for asset_id, _ in hits])
+                    ).all()
+                }
+
+            results = [
+                {"asset": assets[asset_id].to_dict(), "similarity_score": score}
+                for asset_id, score in hits if asset_id in assets
+            ]
 
             return {
                 "query": query,
-                "results": results[:limit],
-                "total": len(results),
+                "results": results,
+                "total": total,
                 "search_type": "semantic"
             }
         except Exception as e:
             logger.error(f"语义检索失败，降级到关键词搜索: {e}")
             return self.natural_search(db, tenant_id, query, limit, filters)
 
+    # ==================== 资产向量索引 ====================
+
+    def _get_vector_index(self) -> AssetVectorIndex:
+        """获取资产向量索引（配置了持久化路径时从文件恢复）"""
+        with self._vector_index_load_lock:
+            if self._vector_index is None:
+                index = None
+                if ASSET_VECTOR_INDEX_PATH and os.path.exists(ASSET_VECTOR_INDEX_PATH):
+                    try:
+                        index = AssetVectorIndex.load(ASSET_VECTOR_INDEX_PATH)
+                        logger.info(f"已加载资产向量索引: {len(index)} 个资产")
+                    except Exception as e:
+                        logger.warning(f"加载资产向量索引失败，将重新构建: {e}")
+                self._vector_index = index or AssetVectorIndex()
+            return self._vector_index
+
+    def start_vector_index_sync(self, session_factory=None,
+                                interval: float = ASSET_VECTOR_SYNC_INTERVAL) -> bool:
+        """
+        启动资产向量索引后台同步线程（已在运行时不重复启动）
+
+        Args:
+            session_factory: 创建数据库会话的工厂，默认使用 models.SessionLocal
+            interval: 同步间隔（秒）
+
+        Returns:
+            是否新启动了线程
+        """
+        if not self.embedding_service:
+            return False
+        with self._vector_index_load_lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return False
+            if session_factory is None:
+                from models import SessionLocal
+                session_factory = SessionLocal
+            self._sync_stop.clear()
+            self._sync_thread = threading.Thread(
+                target=self._sync_loop, args=(session_factory, interval),
+                name="asset-vector-sync", daemon=True
+            )
+            self._sync_thread.start()
+            return True
+
+    def stop_vector_index_sync(self):
+        """停止后台同步线程"""
+        self._sync_stop.set()
+        self._sync_wakeup.set()
+
+    def notify_assets_changed(self):
+        """资产创建/更新后调用：唤醒后台同步，尽快把变更写入索引"""
+        self._sync_wakeup.set()
+
+    def _sync_loop(self, session_factory, interval: float):
+        while not self._sync_stop.is_set():
+            self._sync_wakeup.clear()
+            db = None
+            try:
+                db = session_factory()
+                self.sync_vector_index(db)
+            except Exception as e:
+                logger.warning(f"资产向量索引同步失败: {e}")
+            finally:
+                if db is not None:
+                    db.close()
+            self._sync_wakeup.wait(interval)
+
+    def sync_vector_index(self, db: Session) -> AssetVectorIndex:
+        """
+        增量同步资产向量索引
+
+        - 只读取 updated_at 不早于同步水位的资产，文本未变的资产不重新向量化
+        - 非 active 资产从索引移除
+        - 每隔 ASSET_VECTOR_RECONCILE_INTERVAL 秒按 asset_id 对账，移除已删除的资产
+        """
+        with self._vector_index_lock:
+            index = self._get_vector_index()
+
+            assets_query = db.query(DataAsset)
+            if index.synced_until is not None:
+                assets_query = assets_query.filter(DataAsset.updated_at >= index.synced_until)
+            assets = assets_query.all()
+            changed = self._index_assets(index, assets)
+
+            updated = [asset.updated_at for asset in assets if asset.updated_at]
+            if updated:
+                index.synced_until = max(updated + ([index.synced_until] if index.synced_until else []))
+            elif index.synced_until is None:
+                index.synced_until = datetime.utcnow()
+
+            now = time.time()
+            if now - index.last_full_sync >= ASSET_VECTOR_RECONCILE_INTERVAL:
+                id_query = db.query(DataAsset.asset_id)
+                if hasattr(DataAsset, 'status'):
+                    id_query = id_query.filter(DataAsset.status == "active")
+                changed += index.retain(row[0] for row in id_query.all())
+                index.last_full_sync = now
+
+            if changed and ASSET_VECTOR_INDEX_PATH:
+                try:
+                    index.save(ASSET_VECTOR_INDEX_PATH)
+                except Exception as e:
+                    logger.warning(f"保存资产向量索引失败: {e}")
+            return index
+
+    def _index_assets(self, index: AssetVectorIndex, assets: List[DataAsset]) -> int:
+        """写入资产向量，只对文本变化的资产调用向量化，返回变更数"""
+        changed = 0
+        pending = []
+        for asset in assets:
+            if getattr(asset, "status", "active") != "active":
+                changed += index.remove(asset.asset_id)
+                continue
+
+            attrs = {field: getattr(asset, field, None) for field in FILTER_FIELDS}
+            text = self._asset_to_text(asset)
+            fingerprint = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if index.fingerprint(asset.asset_id) == fingerprint:
+                index.update_attrs(asset.asset_id, attrs)
+            else:
+                pending.append((asset.asset_id, text, fingerprint, attrs))
+
+        if pending:
+            vectors = self._encode_texts([text for _, text, _, _ in pending])
+            for (asset_id, _, fingerprint, attrs), vector in zip(pending, vectors):
+                if vector is not None and index.upsert(asset_id, vector, fingerprint, attrs):
+                    changed += 1
+            logger.info(f"资产向量索引已更新: {changed} 个资产（向量化 {len(pending)} 个）")
+        return changed
+
+    def _encode_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量向量化（服务支持 get_embeddings_batch 时一次请求多条）"""
+        encode_batch = getattr(self.embedding_service, "get_embeddings_batch", None)
+        if encode_batch is not None:
+            return encode_batch(texts)
+        return [self.embedding_service.encode(text) for text in texts]
+
     def _asset_to_text(self, asset: DataAsset) -> str:
         """将资产转换为文本表示用于向量化"""
         parts = []
@@ -361,19 +511,6 @@ class AIAssetSearchService:
 
         return " ".join(parts)
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """计算余弦相似度"""
-        import math
-
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = math.sqrt(sum(a * a for a in vec1))
-        norm2 = math.sqrt(sum(b * b for b in vec2))
-
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-
-        return dot_product / (norm1 * norm2)
-
     # ==================== 智能推荐 ====================
 
     def recommend_assets(
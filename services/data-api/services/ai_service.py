@@ -47,6 +47,9 @@ class AIServiceConfig:
     # 健康检查缓存
     health_cache_ttl: int = 30  # 秒
 
+    # 结构化输出（response_format=json_object）
+    structured_output: bool = True
+
     @classmethod
     def from_env(cls) -> "AIServiceConfig":
         """从环境变量加载配置"""
@@ -62,6 +65,7 @@ class AIServiceConfig:
             max_retries=int(os.getenv("AI_MAX_RETRIES", "2")),
             retry_delay=float(os.getenv("AI_RETRY_DELAY", "1.0")),
             health_cache_ttl=int(os.getenv("AI_HEALTH_CACHE_TTL", "30")),
+            structured_output=os.getenv("AI_STRUCTURED_OUTPUT", "true").lower() == "true",
         )
 
 
@@ -88,6 +92,7 @@ class AIService:
         messages: List[Dict[str, str]],
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
+        response_format: Optional[Dict[str, Any]] = None,
     ) -> str:
         """
         调用 vLLM Chat Completion API（支持重试）
@@ -96,6 +101,7 @@ class AIService:
             messages: 对话消息列表
             max_tokens: 最大生成 token 数
             temperature: 温度参数
+            response_format: 结构化输出格式（如 {"type": "json_object"}）
 
         Returns:
             生成的文本内容
@@ -121,6 +127,8 @@ class AIService:
             "max_tokens": max_tokens or self.config.max_tokens,
             "temperature": temperature or self.config.temperature,
         }
+        if response_format:
+            payload["response_format"] = response_format
 
         last_error = None
         for attempt in range(self.config.max_retries + 1):
@@ -551,6 +559,123 @@ class AIService:
                 "suggested_masking": "",
             }
 
+    def batch_analyze_sensitivity(
+        self,
+        columns: List[Dict[str, Any]],
+        table_name: str = "",
+    ) -> List[Dict[str, Any]]:
+        """
+        批量分析多个列的敏感性（一次请求，结构化 JSON 输出）
+
+        Args:
+            columns: 列信息列表，每个包含 name, type, samples
+            table_name: 表名（提供上下文）
+
+        Returns:
+            与 columns 等长、顺序一致的结果列表，每项格式同 analyze_sensitivity；
+            未能得到结果的列带有 "failed": True
+        """
+        if not columns:
+            return []
+
+        cols_info = []
+        for i, col in enumerate(columns):
+            samples = [str(s)[:100] for s in (col.get("samples") or [])[:10]]
+            samples_str = json.dumps(samples, ensure_ascii=False) if samples else "无"
+            cols_info.append(f"{i}. {col['name']} ({col.get('type') or '未知'}): 样本={samples_str}")
+        cols_str = "\n".join(cols_info)
+
+        prompt = f"""你是一个数据安全专家。请逐一分析以下数据库列是否包含敏感信息。
+
+表名: {table_name or "未知"}
+列列表（序号. 列名 (数据类型): 样本）:
+{cols_str}
+
+敏感数据类型说明：
+- pii: 个人身份信息（姓名、身份证、手机号、邮箱、地址等）
+- financial: 金融信息（银行卡号、账户余额、交易记录等）
+- health: 健康医疗信息
+- credential: 凭证信息（密码、密钥、令牌等）
+- none: 非敏感数据
+
+敏感级别说明：
+- public: 可公开
+- internal: 内部使用
+- confidential: 机密
+- restricted: 严格限制
+
+请以 JSON 对象返回，columns 数组中每列一项并带上序号（只返回 JSON，不要其他内容）：
+{{
+    "columns": [
+        {{
+            "index": 序号,
+            "is_sensitive": true或false,
+            "sensitivity_type": "pii/financial/health/credential/none",
+            "sensitivity_level": "public/internal/confidential/restricted",
+            "confidence": 0.0到1.0之间的数字,
+            "reason": "判断理由（简洁说明）",
+            "suggested_masking": "建议的脱敏方式（如：部分掩码、哈希等）"
+        }}
+    ]
+}}"""
+
+        def failed(reason: str) -> Dict[str, Any]:
+            return {
+                "is_sensitive": False,
+                "sensitivity_type": "none",
+                "sensitivity_level": "public",
+                "confidence": 0.0,
+                "reason": reason,
+                "suggested_masking": "",
+                "failed": True,
+            }
+
+        try:
+            messages = [{"role": "user", "content": prompt}]
+            response = self._chat_completion(
+                messages,
+                max_tokens=min(self.config.max_tokens * 4, 256 + 160 * len(columns)),
+                temperature=0.1,
+                response_format={"type": "json_object"} if self.config.structured_output else None,
+            )
+
+            content = response.strip()
+            if content.startswith("```"):
+                lines = content.split("\n")
+                content = "\n".join(lines[1:-1])
+
+            parsed = json.loads(content)
+            items = parsed.get("columns", []) if isinstance(parsed, dict) else parsed
+
+            by_index = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    by_index[int(item.get("index"))] = item
+                except (TypeError, ValueError):
+                    continue
+
+            results = []
+            for i in range(len(columns)):
+                item = by_index.get(i)
+                if item is None:
+                    results.append(failed("AI 未返回该列结果"))
+                    continue
+                results.append({
+                    "is_sensitive": bool(item.get("is_sensitive", False)),
+                    "sensitivity_type": item.get("sensitivity_type", "none"),
+                    "sensitivity_level": item.get("sensitivity_level", "public"),
+                    "confidence": float(item.get("confidence", 0.5)),
+                    "reason": item.get("reason", ""),
+                    "suggested_masking": item.get("suggested_masking", ""),
+                })
+            return results
+
+        except Exception as e:
+            logger.warning(f"AI 批量敏感性分析失败: {e}")
+            return [failed(f"AI 分析失败: {str(e)}") for _ in columns]
+
     # ========== ETL 清洗规则推荐 ==========
 
     def recommend_cleaning_rules(
@@ -90,6 +90,7 @@ class AssetAutoCatalogService:
                     existing.row_count = row_count
 
                 db_session.commit()
+                self._notify_asset_search()
                 result["success"] = True
                 result["asset_id"] = existing.asset_id
                 result["action"] = "updated"
@@ -129,6 +130,7 @@ class AssetAutoCatalogService:
 
                 db_session.add(asset)
                 db_session.commit()
+                self._notify_asset_search()
 
                 result["success"] = True
                 result["asset_id"] = asset_id
@@ -241,6 +243,14 @@ class AssetAutoCatalogService:
 
     # ===== 内部方法 =====
 
+    def _notify_asset_search(self):
+        """资产已变更：唤醒 AI 语义检索的向量索引后台同步"""
+        try:
+            from services.ai_asset_search import get_ai_asset_search_service
+            get_ai_asset_search_service().notify_assets_changed()
+        except Exception as e:
+            logger.debug(f"通知资产向量索引同步失败: {e}")
+
     def _fetch_column_info(
         self,
         database: str,
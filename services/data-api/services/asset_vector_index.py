@@ -0,0 +1,225 @@
+"""
+资产向量索引
+
+为 AI 语义检索维护资产向量的内存索引，查询时只需一次查询向量化 + 一次矩阵检索：
+- 向量按行存放在归一化的 float32 矩阵中，余弦相似度即内积
+- 可过滤的元数据（资产类型、分类、数据等级、数据库、状态）按列存放，
+  过滤条件先生成行掩码再打分（过滤下推）
+- 每行记录资产文本指纹，资产更新但文本未变时不重新向量化
+- 可选持久化到本地 .npz 文件，重启后只需增量同步
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 可下推到索引的过滤字段（与 DataAsset 列名一致）
+FILTER_FIELDS = ("asset_type", "category_id", "data_level", "database_name", "status")
+
+# 持久化文件路径（为空时只保存在内存中）
+ASSET_VECTOR_INDEX_PATH = os.getenv("ASSET_VECTOR_INDEX_PATH", "")
+
+
+class AssetVectorIndex:
+    """资产向量索引（NumPy 暴力内积检索）"""
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._capacity = max(1, initial_capacity)
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._active = np.zeros(self._capacity, dtype=bool)
+        self._attrs: Dict[str, np.ndarray] = {
+            field: np.empty(self._capacity, dtype=object) for field in FILTER_FIELDS
+        }
+        self._rows: Dict[str, int] = {}
+        self._asset_ids: List[Optional[str]] = [None] * self._capacity
+        self._fingerprints: Dict[str, str] = {}
+        self._free_rows: List[int] = []
+        self._size = 0
+        # 已同步到的资产更新时间（增量同步水位）
+        self.synced_until: Optional[datetime] = None
+        self.last_full_sync: float = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id in self._rows
+
+    def asset_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def fingerprint(self, asset_id: str) -> Optional[str]:
+        return self._fingerprints.get(asset_id)
+
+    # ---------- 写入 ----------
+
+    def _grow(self, capacity: int):
+        extra = capacity - self._capacity
+        if self._vectors is not None:
+            self._vectors = np.vstack([self._vectors, np.zeros((extra, self._dim), dtype=np.float32)])
+        self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+        for field in FILTER_FIELDS:
+            self._attrs[field] = np.concatenate([self._attrs[field], np.empty(extra, dtype=object)])
+        self._asset_ids.extend([None] * extra)
+        self._capacity = capacity
+
+    def upsert(self, asset_id: str, vector: List[float], fingerprint: str,
+               attrs: Optional[Dict[str, Optional[str]]] = None) -> bool:
+        """
+        写入或覆盖资产向量
+
+        Returns:
+            是否写入（零向量或维度不符时返回 False）
+        """
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if vec.ndim != 1 or not norm:
+            return False
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vec.shape[0]
+                self._vectors = np.zeros((self._capacity, self._dim), dtype=np.float32)
+            elif vec.shape[0] != self._dim:
+                logger.warning(f"资产 {asset_id} 向量维度 {vec.shape[0]} 与索引维度 {self._dim} 不符，跳过")
+                return False
+
+            row = self._rows.get(asset_id)
+            if row is None:
+                if self._free_rows:
+                    row = self._free_rows.pop()
+                else:
+                    if self._size >= self._capacity:
+                        self._grow(self._capacity * 2)
+                    row = self._size
+                    self._size += 1
+                self._rows[asset_id] = row
+                self._asset_ids[row] = asset_id
+
+            self._vectors[row] = vec / norm
+            self._active[row] = True
+            for field in FILTER_FIELDS:
+                self._attrs[field][row] = (attrs or {}).get(field)
+            self._fingerprints[asset_id] = fingerprint
+            return True
+
+    def update_attrs(self, asset_id: str, attrs: Dict[str, Optional[str]]) -> bool:
+        """只更新过滤字段（文本未变时无需重新向量化）"""
+        with self._lock:
+            row = self._rows.get(asset_id)
+            if row is None:
+                return False
+            for field in FILTER_FIELDS:
+                self._attrs[field][row] = attrs.get(field)
+            return True
+
+    def remove(self, asset_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(asset_id, None)
+            if row is None:
+                return False
+            self._active[row] = False
+            self._asset_ids[row] = None
+            self._fingerprints.pop(asset_id, None)
+            self._free_rows.append(row)
+            return True
+
+    def retain(self, asset_ids: Iterable[str]) -> int:
+        """只保留给定的资产，返回移除数量"""
+        keep = set(asset_ids)
+        with self._lock:
+            stale = [asset_id for asset_id in self._rows if asset_id not in keep]
+            for asset_id in stale:
+                self.remove(asset_id)
+        return len(stale)
+
+    # ---------- 检索 ----------
+
+    def search(self, query_vector: List[float], top_k: int = 20,
+               filters: Optional[Dict[str, str]] = None,
+               min_score: float = 0.0) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        检索最相似的资产
+
+        Args:
+            query_vector: 查询向量
+            top_k: 返回数量
+            filters: {字段: 值}，字段取自 FILTER_FIELDS，在打分前生效
+            min_score: 相似度阈值
+
+        Returns:
+            ([(asset_id, 相似度)], 超过阈值的总数)
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        with self._lock:
+            if self._vectors is None or not norm or query.shape != (self._dim,):
+                return [], 0
+
+            mask = self._active[:self._size].copy()
+            for field, value in (filters or {}).items():
+                if field in self._attrs:
+                    mask &= self._attrs[field][:self._size] == value
+            rows = np.flatnonzero(mask)
+            if not rows.size:
+                return [], 0
+
+            scores = self._vectors[rows] @ (query / norm)
+            passing = scores > min_score
+            rows, scores = rows[passing], scores[passing]
+            total = int(rows.size)
+            if not total:
+                return [], 0
+
+            if total > top_k:
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                top = np.arange(total)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._asset_ids[rows[i]], float(scores[i])) for i in top], total
+
+    # ---------- 持久化 ----------
+
+    def save(self, path: str):
+        """保存到 .npz 文件（先写临时文件再替换）"""
+        with self._lock:
+            asset_ids = list(self._rows)
+            rows = [self._rows[a] for a in asset_ids]
+            meta = {
+                "asset_ids": asset_ids,
+                "fingerprints": [self._fingerprints[a] for a in asset_ids],
+                "attrs": {f: [self._attrs[f][r] for r in rows] for f in FILTER_FIELDS},
+                "synced_until": self.synced_until.isoformat() if self.synced_until else None,
+            }
+            vectors = self._vectors[rows] if self._vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, vectors=vectors, meta=np.array(json.dumps(meta, default=str)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "AssetVectorIndex":
+        """从 .npz 文件加载"""
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            meta = json.loads(str(data["meta"]))
+
+        index = cls(initial_capacity=max(len(meta["asset_ids"]), 1024))
+        for i, asset_id in enumerate(meta["asset_ids"]):
+            index.upsert(
+                asset_id, vectors[i], meta["fingerprints"][i],
+                {f: meta["attrs"][f][i] for f in FILTER_FIELDS},
+            )
+        if meta.get("synced_until"):
+            index.synced_until = datetime.fromisoformat(meta["synced_until"])
+        return index
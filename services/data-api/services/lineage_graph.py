@@ -0,0 +1,316 @@
+"""
+血缘图内存索引
+
+把血缘边加载为紧凑的内存图，上下游追溯、影响分析与路径查询在内存中 BFS 完成：
+- LineageGraph：节点键映射为整数 id，邻接关系存为 CSR 数组（正向 + 反向），
+  新增的边先进入增量邻接表，积累到一定数量后合并进 CSR
+- LineageGraphIndex：按键（如租户）缓存图，过期后整体重新加载，期间可增量追加边
+"""
+
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 内存血缘图的整体重新加载间隔（秒）
+LINEAGE_GRAPH_TTL = int(os.getenv("LINEAGE_GRAPH_TTL", "300"))
+
+# 血缘边: (源节点键, 目标节点键, 关系类型, 源节点类型, 目标节点类型)
+EdgeTuple = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+# 追溯结果: (节点键, 深度, 上一跳节点键, 关系类型)
+TraversalHit = Tuple[str, int, str, str]
+
+UPSTREAM = "upstream"
+DOWNSTREAM = "downstream"
+
+
+class _CSR:
+    """压缩稀疏行邻接（offsets[i]:offsets[i+1] 为节点 i 的邻居区间）"""
+
+    def __init__(self):
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.relations = array("l")
+
+    @classmethod
+    def build(cls, node_count: int, edges: List[Tuple[int, int, int]]) -> "_CSR":
+        csr = cls()
+        counts = [0] * (node_count + 1)
+        for source, _, _ in edges:
+            counts[source + 1] += 1
+        for i in range(node_count):
+            counts[i + 1] += counts[i]
+        csr.offsets = array("l", counts)
+
+        cursor = list(counts[:node_count])
+        targets = [0] * len(edges)
+        relations = [0] * len(edges)
+        for source, target, relation in edges:
+            position = cursor[source]
+            targets[position] = target
+            relations[position] = relation
+            cursor[source] += 1
+        csr.targets = array("l", targets)
+        csr.relations = array("l", relations)
+        return csr
+
+    def neighbors(self, node: int) -> Iterable[Tuple[int, int]]:
+        if node + 1 >= len(self.offsets):
+            return ()
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.relations[start:end])
+
+
+class LineageGraph:
+    """紧凑的有向血缘图"""
+
+    def __init__(self, compact_threshold: int = 1024):
+        """
+        Args:
+            compact_threshold: 增量边数超过该值（且超过已压缩边数的 10%）时合并进 CSR
+        """
+        self.compact_threshold = compact_threshold
+        self._ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._types: List[Optional[str]] = []
+        self._relation_ids: Dict[str, int] = {}
+        self._relation_names: List[str] = []
+        self._edges: Set[Tuple[int, int, int]] = set()
+
+        self._forward = _CSR()
+        self._backward = _CSR()
+        self._compacted_edges = 0
+        self._forward_delta: Dict[int, List[Tuple[int, int]]] = {}
+        self._backward_delta: Dict[int, List[Tuple[int, int]]] = {}
+        self._delta_edges = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[EdgeTuple], **kwargs) -> "LineageGraph":
+        graph = cls(**kwargs)
+        graph.add_edges(edges)
+        graph.compact()
+        return graph
+
+    # ---------- 构建 ----------
+
+    def _node(self, key: str, node_type: Optional[str]) -> int:
+        node = self._ids.get(key)
+        if node is None:
+            node = len(self._keys)
+            self._ids[key] = node
+            self._keys.append(key)
+            self._types.append(node_type)
+        elif node_type and not self._types[node]:
+            self._types[node] = node_type
+        return node
+
+    def _relation(self, relation: Optional[str]) -> int:
+        relation = relation or ""
+        relation_id = self._relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = len(self._relation_names)
+            self._relation_ids[relation] = relation_id
+            self._relation_names.append(relation)
+        return relation_id
+
+    def add_edges(self, edges: Iterable[EdgeTuple]) -> int:
+        """追加边（重复边忽略），返回新增边数"""
+        added = 0
+        with self._lock:
+            for source_key, target_key, relation, source_type, target_type in edges:
+                if not source_key or not target_key:
+                    continue
+                source = self._node(source_key, source_type)
+                target = self._node(target_key, target_type)
+                relation_id = self._relation(relation)
+                edge = (source, target, relation_id)
+                if edge in self._edges:
+                    continue
+                self._edges.add(edge)
+                self._forward_delta.setdefault(source, []).append((target, relation_id))
+                self._backward_delta.setdefault(target, []).append((source, relation_id))
+                self._delta_edges += 1
+                added += 1
+
+            if self._delta_edges > max(self.compact_threshold, self._compacted_edges // 10):
+                self.compact()
+        return added
+
+    def compact(self) -> None:
+        """把增量边合并进 CSR"""
+        with self._lock:
+            if not self._delta_edges and self._compacted_edges == len(self._edges):
+                return
+            edges = list(self._edges)
+            node_count = len(self._keys)
+            self._forward = _CSR.build(node_count, edges)
+            self._backward = _CSR.build(node_count, [(t, s, r) for s, t, r in edges])
+            self._compacted_edges = len(edges)
+            self._forward_delta = {}
+            self._backward_delta = {}
+            self._delta_edges = 0
+
+    # ---------- 查询 ----------
+
+    @property
+    def node_count(self) -> int:
+        return len(self._keys)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def node_type(self, key: str) -> Optional[str]:
+        node = self._ids.get(key)
+        return self._types[node] if node is not None else None
+
+    def _neighbors(self, node: int, direction: str) -> List[Tuple[int, int]]:
+        if direction == UPSTREAM:
+            csr, delta = self._backward, self._backward_delta
+        else:
+            csr, delta = self._forward, self._forward_delta
+        neighbors = list(csr.neighbors(node))
+        neighbors.extend(delta.get(node, ()))
+        return neighbors
+
+    def neighbors(self, key: str, direction: str = DOWNSTREAM) -> List[Tuple[str, str]]:
+        """直接相邻节点 [(节点键, 关系类型)]"""
+        with self._lock:
+            node = self._ids.get(key)
+            if node is None:
+                return []
+            return [
+                (self._keys[n], self._relation_names[r])
+                for n, r in self._neighbors(node, direction)
+            ]
+
+    def traverse(
+        self,
+        start_keys: Iterable[str],
+        direction: str = DOWNSTREAM,
+        max_depth: Optional[int] = None,
+        expand: Optional[Callable[[str, Optional[str]], bool]] = None,
+    ) -> List[TraversalHit]:
+        """
+        从起点按层 BFS
+
+        Args:
+            start_keys: 起点节点键
+            direction: upstream / downstream
+            max_depth: 最大深度（None 表示不限）
+            expand: (节点键, 节点类型) -> 是否继续从该节点向外追溯
+
+        Returns:
+            按发现顺序排列的 (节点键, 深度, 上一跳节点键, 关系类型)，每个节点只出现一次
+        """
+        with self._lock:
+            starts = [self._ids[k] for k in start_keys if k in self._ids]
+            visited = set(starts)
+            queue = deque((node, 0) for node in starts)
+            hits: List[TraversalHit] = []
+
+            while queue:
+                node, depth = queue.popleft()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for neighbor, relation in self._neighbors(node, direction):
+                    if neighbor in visited:
+                        continue
+                    visited.add(neighbor)
+                    key = self._keys[neighbor]
+                    hits.append((key, depth + 1, self._keys[node], self._relation_names[relation]))
+                    if expand is None or expand(key, self._types[neighbor]):
+                        queue.append((neighbor, depth + 1))
+            return hits
+
+    def find_path(self, source_key: str, target_key: str, max_depth: int = 5) -> Optional[List[str]]:
+        """下游方向最短路径（节点键列表），不存在时返回 None"""
+        with self._lock:
+            if source_key not in self._ids or target_key not in self._ids:
+                return None
+            source, target = self._ids[source_key], self._ids[target_key]
+            parents: Dict[int, int] = {source: -1}
+            queue = deque([(source, 0)])
+            while queue:
+                node, depth = queue.popleft()
+                if node == target:
+                    path = []
+                    while node != -1:
+                        path.append(self._keys[node])
+                        node = parents[node]
+                    return path[::-1]
+                if depth >= max_depth:
+                    continue
+                for neighbor, _ in self._neighbors(node, DOWNSTREAM):
+                    if neighbor not in parents:
+                        parents[neighbor] = node
+                        queue.append((neighbor, depth + 1))
+            return None
+
+
+class LineageGraphIndex:
+    """按键缓存的血缘图（过期整体重载，期间增量追加）"""
+
+    def __init__(self, ttl: int = LINEAGE_GRAPH_TTL):
+        self.ttl = ttl
+        self._graphs: Dict[str, Tuple[LineageGraph, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Iterable[EdgeTuple]]) -> LineageGraph:
+        """
+        获取图，不存在或已过期时调用 loader 重新加载
+
+        Args:
+            key: 图的键（如 "lineage"、"lineage:<tenant_id>"）
+            loader: 返回全部边的函数
+        """
+        with self._lock:
+            entry = self._graphs.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                return entry[0]
+
+        started = time.time()
+        graph = LineageGraph.from_edges(loader())
+        logger.info(
+            f"血缘图已加载 [{key}]: {graph.node_count} 个节点, {graph.edge_count} 条边, "
+            f"耗时 {time.time() - started:.3f}s"
+        )
+        with self._lock:
+            self._graphs[key] = (graph, started)
+        return graph
+
+    def add_edges(self, key: str, edges: Iterable[EdgeTuple]) -> None:
+        """向已加载的图追加边（未加载时忽略，下次查询会完整加载）"""
+        with self._lock:
+            entry = self._graphs.get(key)
+        if entry is not None:
+            entry[0].add_edges(edges)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """丢弃缓存的图（key 为 None 时全部丢弃）"""
+        with self._lock:
+            if key is None:
+                self._graphs.clear()
+            else:
+                self._graphs.pop(key, None)
+
+
+_lineage_graph_index: Optional[LineageGraphIndex] = None
+
+
+def get_lineage_graph_index() -> LineageGraphIndex:
+    """获取血缘图索引单例"""
+    global _lineage_graph_index
+    if _lineage_graph_index is None:
+        _lineage_graph_index = LineageGraphIndex()
+    return _lineage_graph_index
@@ -6,10 +6,11 @@
 import logging
 from typing import Dict, List, Optional, Any, Set, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, true
 
 from models.metadata import MetadataDatabase, MetadataTable, MetadataColumn
 from models.lineage import LineageNode, LineageEdge
+from services.lineage_graph import DOWNSTREAM, LineageGraph, TraversalHit, get_lineage_graph_index
 try:
     import services.lineage_analyzer as lineage_module
 except ImportError:
@@ -17,6 +18,27 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 批量加载血缘节点时每条 IN 查询的最大 id 数
+LINEAGE_NODE_BATCH_SIZE = 500
+
+
+def _tenant_filter(model, tenant_id: str):
+    """租户过滤条件（模型没有 tenant_id 列时不过滤）"""
+    column = getattr(model, "tenant_id", None)
+    return column == tenant_id if column is not None else true()
+
+
+def _lineage_graph_key(tenant_id: str) -> str:
+    """
+    内存血缘图的缓存键
+
+    血缘边表有 tenant_id 列时按租户分图；没有时各租户加载的是同一份全量边，
+    共用一个键，避免为每个租户重复缓存相同的图。
+    """
+    if getattr(LineageEdge, "tenant_id", None) is not None:
+        return f"lineage:{tenant_id}"
+    return "lineage"
+
 
 class MetadataGraphBuilder:
     """元数据图谱构建器"""
@@ -246,102 +268,159 @@ class MetadataGraphBuilder:
         visited_nodes: Set,
         visited_edges: Set
     ):
-        """递归查找血缘依赖"""
+        """在内存血缘图中按层查找血缘依赖（只经由表节点继续追溯）"""
         if depth <= 0:
             return
 
-        # 查询血缘边
-        if direction == "upstream":
-            # 查找上游（作为目标）
-            lineage_edges = db.query(LineageEdge).filter(
-                and_(
-                    LineageEdge.tenant_id == tenant_id,
-                    LineageEdge.target_node_id.like(f"%{table.table_name}%")
-                )
-            ).all()
-        else:
-            # 查找下游（作为源）
-            lineage_edges = db.query(LineageEdge).filter(
-                and_(
-                    LineageEdge.tenant_id == tenant_id,
-                    LineageEdge.source_node_id.like(f"%{table.table_name}%")
-                )
-            ).all()
+        start_ids = self._resolve_table_lineage_nodes(db, tenant_id, table)
+        graph = self._lineage_graph(db, tenant_id)
+        hits = graph.traverse(
+            start_ids, direction, max_depth=depth,
+            expand=lambda key, node_type: node_type == "table",
+        )
+        lineage_nodes = self._load_lineage_nodes(db, tenant_id, [hit[0] for hit in hits])
+
+        # 起点映射到中心节点；只保留节点存在且上一跳已保留的结果
+        display_ids = {node_id: source_node_id for node_id in start_ids}
+        for related_node_id, _, parent_id, relation_type in self._reachable_hits(
+            hits, start_ids, lineage_nodes
+        ):
+            related_node = lineage_nodes[related_node_id]
+            parent_display_id = display_ids[parent_id]
+            new_node_id = f"lineage_{related_node.id}"
+            display_ids[related_node_id] = new_node_id
 
-        for edge in lineage_edges:
-            # 确定关联的节点
             if direction == "upstream":
-                related_node_id = edge.source_node_id
+                edge_key = (related_node_id, parent_id)
             else:
-                related_node_id = edge.target_node_id
-
-            edge_id = f"{edge.source_node_id}_{edge.target_node_id}"
-
-            if edge_id in visited_edges:
+                edge_key = (parent_id, related_node_id)
+            if new_node_id in visited_nodes or edge_key in visited_edges:
                 continue
+            visited_nodes.add(new_node_id)
+            visited_edges.add(edge_key)
 
-            # 查找或创建关联节点
-            if related_node_id not in visited_nodes:
-                related_node = db.query(LineageNode).filter(
-                    and_(
-                        LineageNode.tenant_id == tenant_id,
-                        LineageNode.node_id == related_node_id
-                    )
-                ).first()
+            nodes.append({
+                "id": new_node_id,
+                "label": related_node.name,
+                "type": related_node.node_type,  # table, column, dataset, job
+                "node_type": related_node.node_type,
+                "properties": {
+                    "database_name": related_node.database_name,
+                    "table_name": related_node.table_name,
+                    "column_name": related_node.column_name,
+                }
+            })
 
-                if related_node:
-                    new_node_id = f"lineage_{related_node.id}"
-                    visited_nodes.add(new_node_id)
+            # 添加边
+            if direction == "upstream":
+                edges.append({
+                    "source": new_node_id,
+                    "target": parent_display_id,
+                    "label": relation_type,
+                    "type": "lineage",
+                    "direction": "upstream",
+                    "relation_type": relation_type,
+                })
+            else:
+                edges.append({
+                    "source": parent_display_id,
+                    "target": new_node_id,
+                    "label": relation_type,
+                    "type": "lineage",
+                    "direction": "downstream",
+                    "relation_type": relation_type,
+                })
 
-                    nodes.append({
-                        "id": new_node_id,
-                        "label": related_node.name,
-                        "type": related_node.node_type,  # table, column, dataset, job
-                        "node_type": related_node.node_type,
-                        "properties": {
-                            "database_name": related_node.database_name,
-                            "table_name": related_node.table_name,
-                            "column_name": related_node.column_name,
-                        }
-                    })
+    def _lineage_graph(self, db: Session, tenant_id: str) -> LineageGraph:
+        """获取租户的内存血缘图（首次或过期时一次查询加载全部边，键见 _lineage_graph_key）"""
+        def load():
+            rows = db.query(
+                LineageEdge.source_node_id,
+                LineageEdge.target_node_id,
+                LineageEdge.relation_type,
+                LineageEdge.source_type,
+                LineageEdge.target_type,
+            ).filter(_tenant_filter(LineageEdge, tenant_id)).all()
+            return [tuple(row) for row in rows]
+
+        return get_lineage_graph_index().get(_lineage_graph_key(tenant_id), load)
+
+    def _load_lineage_nodes(
+        self,
+        db: Session,
+        tenant_id: str,
+        node_ids: List[str]
+    ) -> Dict[str, LineageNode]:
+        """按 node_id 批量加载血缘节点"""
+        result = {}
+        unique_ids = list(dict.fromkeys(node_ids))
+        for start in range(0, len(unique_ids), LINEAGE_NODE_BATCH_SIZE):
+            chunk = unique_ids[start:start + LINEAGE_NODE_BATCH_SIZE]
+            rows = db.query(LineageNode).filter(
+                and_(
+                    _tenant_filter(LineageNode, tenant_id),
+                    LineageNode.node_id.in_(chunk)
+                )
+            ).all()
+            for row in rows:
+                result[row.node_id] = row
+        return result
 
-                    # 添加边
-                    if direction == "upstream":
-                        edges.append({
-                            "source": new_node_id,
-                            "target": source_node_id,
-                            "label": edge.relation_type,
-                            "type": "lineage",
-                            "direction": "upstream",
-                            "relation_type": edge.relation_type,
-                        })
-                    else:
-                        edges.append({
-                            "source": source_node_id,
-                            "target": new_node_id,
-                            "label": edge.relation_type,
-                            "type": "lineage",
-                            "direction": "downstream",
-                            "relation_type": edge.relation_type,
-                        })
-
-                    visited_edges.add(edge_id)
-
-                    # 如果关联节点是表，递归查找
-                    if related_node.node_type == "table":
-                        related_table = db.query(MetadataTable).filter(
-                            and_(
-                                MetadataTable.tenant_id == tenant_id,
-                                MetadataTable.table_name == related_node.table_name
-                            )
-                        ).first()
-
-                        if related_table:
-                            self._find_lineage_dependencies(
-                                db, tenant_id, related_table, new_node_id,
-                                direction, depth - 1, nodes, edges,
-                                visited_nodes, visited_edges
-                            )
+    def _resolve_table_lineage_nodes(
+        self,
+        db: Session,
+        tenant_id: str,
+        table: MetadataTable
+    ) -> List[str]:
+        """查找表对应的血缘节点 id（按表名与库名精确匹配）"""
+        conditions = [
+            _tenant_filter(LineageNode, tenant_id),
+            LineageNode.node_type == "table",
+            LineageNode.table_name == table.table_name,
+        ]
+        if table.database_name:
+            conditions.append(or_(
+                LineageNode.database_name == table.database_name,
+                LineageNode.database_name.is_(None)
+            ))
+        rows = db.query(LineageNode.node_id).filter(and_(*conditions)).all()
+        return [row[0] for row in rows]
+
+    def _resolve_lineage_nodes(
+        self,
+        db: Session,
+        tenant_id: str,
+        node_id: str,
+        node_type: str
+    ) -> List[str]:
+        """把节点 id 或名称解析为血缘节点 id（精确匹配 node_id / full_name / 名称+类型）"""
+        rows = db.query(LineageNode.node_id).filter(
+            and_(
+                _tenant_filter(LineageNode, tenant_id),
+                or_(
+                    LineageNode.node_id == node_id,
+                    LineageNode.full_name == node_id,
+                    and_(LineageNode.name == node_id, LineageNode.node_type == node_type)
+                )
+            )
+        ).all()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _reachable_hits(
+        hits: List[TraversalHit],
+        start_ids: List[str],
+        lineage_nodes: Dict[str, LineageNode]
+    ) -> List[TraversalHit]:
+        """过滤追溯结果：节点须存在于血缘节点表，且经由已保留的节点到达"""
+        kept = set(start_ids)
+        reachable = []
+        for hit in hits:
+            node_id, _, parent_id, _ = hit
+            if node_id in lineage_nodes and parent_id in kept:
+                kept.add(node_id)
+                reachable.append(hit)
+        return reachable
 
     def build_column_relation_graph(
         self,
@@ -597,56 +676,28 @@ class MetadataGraphBuilder:
         impacted_nodes = []
         impacted_edges = []
 
-        # 查找所有下游边
-        downstream_edges = db.query(LineageEdge).filter(
-            and_(
-                LineageEdge.tenant_id == tenant_id,
-                LineageEdge.source_node_id.like(f"%{node_id}%")
-            )
-        ).all()
-
-        visited = set()
-        to_visit = [edge.target_node_id for edge in downstream_edges]
-
-        while to_visit:
-            current_id = to_visit.pop(0)
-            if current_id in visited:
-                continue
-
-            visited.add(current_id)
-
-            # 查找节点详情
-            node = db.query(LineageNode).filter(
-                and_(
-                    LineageNode.tenant_id == tenant_id,
-                    LineageNode.node_id == current_id
-                )
-            ).first()
+        # 精确解析起点，在内存血缘图中追溯所有下游
+        start_ids = self._resolve_lineage_nodes(db, tenant_id, node_id, node_type)
+        graph = self._lineage_graph(db, tenant_id)
+        hits = graph.traverse(start_ids, DOWNSTREAM)
+        lineage_nodes = self._load_lineage_nodes(db, tenant_id, [hit[0] for hit in hits])
+
+        for current_id, _, _, _ in self._reachable_hits(hits, start_ids, lineage_nodes):
+            node = lineage_nodes[current_id]
+            impacted_nodes.append({
+                "id": f"lineage_{node.id}",
+                "label": node.name,
+                "type": node.node_type,
+                "full_name": node.full_name,
+            })
 
-            if node:
-                impacted_nodes.append({
-                    "id": f"lineage_{node.id}",
-                    "label": node.name,
-                    "type": node.node_type,
-                    "full_name": node.full_name,
+            for target_node_id, relation_type in graph.neighbors(current_id, DOWNSTREAM):
+                impacted_edges.append({
+                    "source": f"lineage_{node.id}",
+                    "target": target_node_id,
+                    "type": relation_type,
                 })
 
-                # 继续查找下游
-                further_edges = db.query(LineageEdge).filter(
-                    and_(
-                        LineageEdge.tenant_id == tenant_id,
-                        LineageEdge.source_node_id == current_id
-                    )
-                ).all()
-
-                for edge in further_edges:
-                    to_visit.append(edge.target_node_id)
-                    impacted_edges.append({
-                        "source": f"lineage_{node.id}",
-                        "target": edge.target_node_id,
-                        "type": edge.relation_type,
-                    })
-
         return {
             "impacted_nodes": impacted_nodes,
             "impacted_edges": impacted_edges,
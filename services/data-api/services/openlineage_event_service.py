@@ -37,9 +37,19 @@ from models.lineage_event import (
     create_column_masked_event,
 )
 from database import db_manager
+from services.lineage_graph import (
+    DOWNSTREAM,
+    UPSTREAM,
+    EdgeTuple,
+    LineageGraph,
+    get_lineage_graph_index,
+)
 
 logger = logging.getLogger(__name__)
 
+# 内存血缘图在 LineageGraphIndex 中的键
+OPENLINEAGE_GRAPH_KEY = "openlineage"
+
 
 class OpenLineageEventService:
     """
@@ -73,6 +83,8 @@ class OpenLineageEventService:
         self._running = False
         self._worker_thread: Optional[threading.Thread] = None
         self._lock = threading.Lock()
+        # FQN -> (namespace, name)，用于把内存图中的节点键还原为数据集标识
+        self._dataset_names: Dict[str, Tuple[str, str]] = {}
 
         # 统计
         self._stats = {
@@ -288,6 +300,9 @@ class OpenLineageEventService:
 
             session.commit()
 
+            # 增量更新内存血缘图
+            get_lineage_graph_index().add_edges(OPENLINEAGE_GRAPH_KEY, self._edge_tuples(edges))
+
             self._stats["events_persisted"] += len(batch)
             self._stats["edges_created"] += len(edges)
 
@@ -403,6 +418,67 @@ class OpenLineageEventService:
 
     # ==================== 血缘查询 ====================
 
+    def _edge_tuples(self, edges: List[Dict[str, Any]]) -> List[EdgeTuple]:
+        """血缘边转换为内存图的边（FQN 为节点键，转换逻辑作为关系）"""
+        tuples = []
+        for edge in edges:
+            source_fqn = f"{edge['source_namespace']}.{edge['source_name']}"
+            target_fqn = f"{edge['target_namespace']}.{edge['target_name']}"
+            self._dataset_names[source_fqn] = (edge["source_namespace"], edge["source_name"])
+            self._dataset_names[target_fqn] = (edge["target_namespace"], edge["target_name"])
+            tuples.append((
+                source_fqn,
+                target_fqn,
+                edge.get("transformation"),
+                edge.get("source_type"),
+                edge.get("target_type"),
+            ))
+        return tuples
+
+    def _lineage_graph(self) -> LineageGraph:
+        """获取内存血缘图（首次或过期时一次查询加载全部边）"""
+        def load():
+            session = db_manager.get_session()
+            try:
+                rows = session.query(
+                    LineageEdgeModel.source_namespace,
+                    LineageEdgeModel.source_name,
+                    LineageEdgeModel.source_type,
+                    LineageEdgeModel.target_namespace,
+                    LineageEdgeModel.target_name,
+                    LineageEdgeModel.target_type,
+                    LineageEdgeModel.transformation,
+                ).all()
+            finally:
+                session.close()
+            return self._edge_tuples([row._asdict() for row in rows])
+
+        return get_lineage_graph_index().get(OPENLINEAGE_GRAPH_KEY, load)
+
+    def _traverse(
+        self,
+        dataset_namespace: str,
+        dataset_name: str,
+        direction: str,
+        max_depth: int,
+    ) -> List[Dict[str, Any]]:
+        """在内存血缘图中按层追溯上游或下游数据集"""
+        graph = self._lineage_graph()
+        start_fqn = f"{dataset_namespace}.{dataset_name}"
+
+        result = []
+        for fqn, depth, _, transformation in graph.traverse([start_fqn], direction, max_depth):
+            namespace, name = self._dataset_names.get(fqn) or fqn.split(".", 1)
+            result.append({
+                "fqn": fqn,
+                "namespace": namespace,
+                "name": name,
+                "type": graph.node_type(fqn),
+                "depth": depth,
+                "transformation": transformation or None,
+            })
+        return result
+
     def get_upstream(
         self,
         dataset_namespace: str,
@@ -420,57 +496,11 @@ class OpenLineageEventService:
         Returns:
             上游数据集列表
         """
-        session = None
         try:
-            session = db_manager.get_session()
-
-            visited = set()
-            result = []
-            current_level = [(dataset_namespace, dataset_name)]
-
-            for depth in range(max_depth):
-                if not current_level:
-                    break
-
-                next_level = []
-
-                for namespace, name in current_level:
-                    fqn = f"{namespace}.{name}"
-                    if fqn in visited:
-                        continue
-                    visited.add(fqn)
-
-                    # 查找上游边
-                    edges = session.query(LineageEdgeModel).filter(
-                        LineageEdgeModel.target_namespace == namespace,
-                        LineageEdgeModel.target_name == name,
-                    ).all()
-
-                    for edge in edges:
-                        source_fqn = edge.source_fqn
-                        if source_fqn not in visited:
-                            result.append({
-                                "fqn": source_fqn,
-                                "namespace": edge.source_namespace,
-                                "name": edge.source_name,
-                                "type": edge.source_type,
-                                "depth": depth + 1,
-                                "transformation": edge.transformation,
-                            })
-                            next_level.append(
-                                (edge.source_namespace, edge.source_name)
-                            )
-
-                current_level = next_level
-
-            return result
-
+            return self._traverse(dataset_namespace, dataset_name, UPSTREAM, max_depth)
         except Exception as e:
             logger.error(f"Failed to get upstream: {e}", exc_info=True)
             return []
-        finally:
-            if session:
-                session.close()
 
     def get_downstream(
         self,
@@ -489,57 +519,11 @@ class OpenLineageEventService:
         Returns:
             下游数据集列表
         """
-        session = None
         try:
-            session = db_manager.get_session()
-
-            visited = set()
-            result = []
-            current_level = [(dataset_namespace, dataset_name)]
-
-            for depth in range(max_depth):
-                if not current_level:
-                    break
-
-                next_level = []
-
-                for namespace, name in current_level:
-                    fqn = f"{namespace}.{name}"
-                    if fqn in visited:
-                        continue
-                    visited.add(fqn)
-
-                    # 查找下游边
-                    edges = session.query(LineageEdgeModel).filter(
-                        LineageEdgeModel.source_namespace == namespace,
-                        LineageEdgeModel.source_name == name,
-                    ).all()
-
-                    for edge in edges:
-                        target_fqn = edge.target_fqn
-                        if target_fqn not in visited:
-                            result.append({
-                                "fqn": target_fqn,
-                                "namespace": edge.target_namespace,
-                                "name": edge.target_name,
-                                "type": edge.target_type,
-                                "depth": depth + 1,
-                                "transformation": edge.transformation,
-                            })
-                            next_level.append(
-                                (edge.target_namespace, edge.target_name)
-                            )
-
-                current_level = next_level
-
-            return result
-
+            return self._traverse(dataset_namespace, dataset_name, DOWNSTREAM, max_depth)
         except Exception as e:
             logger.error(f"Failed to get downstream: {e}", exc_info=True)
             return []
-        finally:
-            if session:
-                session.close()
 
     def get_path(
         self,
@@ -557,55 +541,21 @@ class OpenLineageEventService:
             source_name: 源数据集名称
             target_namespace: 目标数据集命名空间
             target_name: 目标数据集名称
-            max_depth: 最大搜索深度
+            max_depth: 最大搜索深度（路径包含的最大节点数）
 
         Returns:
             路径 FQN 列表，如果不存在则返回 None
         """
-        # 使用 BFS 搜索路径
-        from collections import deque
+        start_fqn = f"{source_namespace}.{source_name}"
+        end_fqn = f"{target_namespace}.{target_name}"
+        if start_fqn == end_fqn:
+            return [start_fqn]
 
-        session = None
         try:
-            session = db_manager.get_session()
-
-            start_fqn = f"{source_namespace}.{source_name}"
-            end_fqn = f"{target_namespace}.{target_name}"
-
-            # (fqn, path)
-            queue = deque([(start_fqn, [start_fqn])])
-            visited = {start_fqn}
-
-            while queue:
-                current_fqn, path = queue.popleft()
-
-                if len(path) > max_depth:
-                    continue
-
-                if current_fqn == end_fqn:
-                    return path
-
-                # 获取下游节点
-                namespace, name = current_fqn.split(".", 1)
-                edges = session.query(LineageEdgeModel).filter(
-                    LineageEdgeModel.source_namespace == namespace,
-                    LineageEdgeModel.source_name == name,
-                ).all()
-
-                for edge in edges:
-                    next_fqn = edge.target_fqn
-                    if next_fqn not in visited:
-                        visited.add(next_fqn)
-                        queue.append((next_fqn, path + [next_fqn]))
-
-            return None
-
+            return self._lineage_graph().find_path(start_fqn, end_fqn, max_depth=max_depth - 1)
         except Exception as e:
             logger.error(f"Failed to get path: {e}", exc_info=True)
             return None
-        finally:
-            if session:
-                session.close()
 
     def get_impact_analysis(
         self,
@@ -12,18 +12,30 @@ Phase 2: 数据安全管理增强 - 自动化敏感数据识别与脱敏
 - 变更检测：只扫描新增或变更的表/列
 """
 
+import json
 import logging
 import os
 import re
 import threading
 import time
 from collections import defaultdict
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple
 
 from services.ai_service import get_ai_service, AIService
+from services.sensitivity_scan_engine import (
+    BatchClassifier,
+    ClassificationCache,
+    ContentMatcher,
+    ScanCheckpoint,
+    column_fingerprint,
+    fetch_table_samples,
+    group_columns_by_table,
+    scan_tables_concurrently,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +43,11 @@ logger = logging.getLogger(__name__)
 AUTO_SCAN_SAMPLE_SIZE = int(os.getenv("AUTO_SCAN_SAMPLE_SIZE", "200"))
 AUTO_SCAN_CONFIDENCE_THRESHOLD = int(os.getenv("AUTO_SCAN_CONFIDENCE_THRESHOLD", "60"))
 AUTO_SCAN_BATCH_SIZE = int(os.getenv("AUTO_SCAN_BATCH_SIZE", "50"))
+AUTO_SCAN_MAX_WORKERS = int(os.getenv("AUTO_SCAN_MAX_WORKERS", "8"))
+AUTO_SCAN_MAX_WORKERS_PER_DATABASE = int(os.getenv("AUTO_SCAN_MAX_WORKERS_PER_DATABASE", "2"))
+AUTO_SCAN_AI_BATCH_SIZE = int(os.getenv("AUTO_SCAN_AI_BATCH_SIZE", "20"))
+AUTO_SCAN_AI_CONCURRENCY = int(os.getenv("AUTO_SCAN_AI_CONCURRENCY", "4"))
+AUTO_SCAN_AI_CACHE_SIZE = int(os.getenv("AUTO_SCAN_AI_CACHE_SIZE", "50000"))
 
 
 class AutoScanMode(str, Enum):
@@ -103,7 +120,11 @@ class AutoScanProgress:
     total_columns: int = 0
     # 扫描阶段
     scanned_columns: int = 0
+    completed_tables: int = 0
+    resumed: bool = False                   # 是否从检查点续扫
     sensitive_found: int = 0
+    ai_requests: int = 0                    # 本次扫描发出的 AI 批量请求数
+    ai_cache_hits: int = 0                  # 命中列指纹缓存、无需调用 AI 的列数
     # 细分
     pii_count: int = 0
     financial_count: int = 0
@@ -140,7 +161,11 @@ class AutoScanProgress:
             "total_tables": self.total_tables,
             "total_columns": self.total_columns,
             "scanned_columns": self.scanned_columns,
+            "completed_tables": self.completed_tables,
+            "resumed": self.resumed,
             "sensitive_found": self.sensitive_found,
+            "ai_requests": self.ai_requests,
+            "ai_cache_hits": self.ai_cache_hits,
             "breakdown": {
                 "pii": self.pii_count,
                 "financial": self.financial_count,
@@ -182,6 +207,13 @@ COLUMN_NAME_SENSITIVITY_HINTS = {
     },
 }
 
+# 预编译的列名规则：每个子类型一个组合正则，按定义顺序匹配
+_COLUMN_NAME_MATCHERS = [
+    (sensitivity_type, sub_type, re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE))
+    for sensitivity_type, sub_types in COLUMN_NAME_SENSITIVITY_HINTS.items()
+    for sub_type, patterns in sub_types.items()
+]
+
 # 敏感级别映射
 SENSITIVITY_LEVEL_MAP = {
     "pii": "confidential",
@@ -230,6 +262,16 @@ class SensitivityAutoScanService:
         self._lock = threading.Lock()
         self._ai_service = ai_service
         self._ai_available = False  # 缓存 AI 可用性状态
+        self._content_matcher = ContentMatcher()
+        # 最近一次未完成扫描的检查点（取消后可续扫）
+        self._checkpoint: Optional[ScanCheckpoint] = None
+        # AI 分类：多列合并请求、批次并发，结果按列指纹跨扫描复用
+        self._ai_classifier = BatchClassifier(
+            self._ai_classify_batch,
+            batch_size=AUTO_SCAN_AI_BATCH_SIZE,
+            max_concurrency=AUTO_SCAN_AI_CONCURRENCY,
+            cache=ClassificationCache(AUTO_SCAN_AI_CACHE_SIZE),
+        )
 
     @property
     def is_running(self) -> bool:
@@ -243,6 +285,7 @@ class SensitivityAutoScanService:
         self,
         policy: AutoScanPolicy = None,
         db_session=None,
+        resume: bool = False,
     ) -> AutoScanProgress:
         """
         启动自动扫描
@@ -250,6 +293,7 @@ class SensitivityAutoScanService:
         Args:
             policy: 扫描策略配置
             db_session: 数据库会话（用于读取元数据和回写）
+            resume: 是否从上次取消的扫描（相同策略）检查点续扫
 
         Returns:
             AutoScanProgress 扫描进度对象
@@ -271,7 +315,7 @@ class SensitivityAutoScanService:
         # 后台线程执行
         thread = threading.Thread(
             target=self._execute_auto_scan,
-            args=(policy, db_session),
+            args=(policy, db_session, resume),
             daemon=True,
         )
         thread.start()
@@ -359,7 +403,7 @@ class SensitivityAutoScanService:
 
     # ===== 内部执行方法 =====
 
-    def _execute_auto_scan(self, policy: AutoScanPolicy, db_session=None):
+    def _execute_auto_scan(self, policy: AutoScanPolicy, db_session=None, resume: bool = False):
         """执行自动扫描（后台线程）"""
         progress = self._current_progress
         try:
@@ -388,48 +432,50 @@ class SensitivityAutoScanService:
                 self._running = False
                 return
 
-            # 阶段2: 扫描敏感数据
+            # 阶段2: 按表并发扫描敏感数据
             progress.status = AutoScanStatus.SCANNING
-            sensitive_results = []
-
-            for col_info in columns_to_scan:
-                if not self._running:
-                    break
-
-                result = self._scan_single_column(col_info, policy, db_session)
-                progress.scanned_columns += 1
-
-                if result and result.get("is_sensitive"):
-                    sensitive_results.append(result)
-                    progress.sensitive_found += 1
-
-                    # 更新分类计数
-                    stype = result.get("sensitivity_type", "")
-                    if stype == "pii":
-                        progress.pii_count += 1
-                    elif stype == "financial":
-                        progress.financial_count += 1
-                    elif stype == "health":
-                        progress.health_count += 1
-                    elif stype == "credential":
-                        progress.credential_count += 1
-
-                    progress.sensitive_columns.append({
-                        "database": result.get("database", ""),
-                        "table": result.get("table", ""),
-                        "column": result.get("column", ""),
-                        "type": stype,
-                        "sub_type": result.get("sensitivity_sub_type", ""),
-                        "level": result.get("sensitivity_level", ""),
-                        "confidence": result.get("confidence", 0),
-                    })
+            checkpoint = self._load_checkpoint(policy, resume)
+            self._restore_progress(progress, checkpoint)
+
+            tables = group_columns_by_table(columns_to_scan)
+            pending = [key for key in tables if key not in checkpoint.completed_tables]
+
+            # 工作线程各自从连接池取连接；拿不到引擎时退化为共享会话串行扫描
+            engine = self._get_engine(db_session)
+            max_workers = AUTO_SCAN_MAX_WORKERS if engine is not None else 1
+            ai_requests = self._ai_classifier.requests
+            ai_cache_hits = self._ai_classifier.cache_hits
+
+            scanned = scan_tables_concurrently(
+                pending,
+                lambda key: self._scan_table(tables[key], policy, engine, db_session),
+                max_workers=max_workers,
+                max_per_database=AUTO_SCAN_MAX_WORKERS_PER_DATABASE,
+                should_continue=lambda: self._running,
+            )
+            for table_key, results in scanned:
+                column_count = len(tables[table_key])
+                if isinstance(results, Exception):
+                    # 失败的表不写入检查点，续扫时重试
+                    progress.scanned_columns += column_count
+                    continue
+
+                checkpoint.record(table_key, column_count, results)
+                progress.scanned_columns += column_count
+                progress.completed_tables += 1
+                for result in results:
+                    self._record_sensitive(progress, result)
+                progress.ai_requests = self._ai_classifier.requests - ai_requests
+                progress.ai_cache_hits = self._ai_classifier.cache_hits - ai_cache_hits
 
             if not self._running:
                 progress.status = AutoScanStatus.FAILED
-                progress.error_message = "扫描被取消"
+                progress.error_message = "扫描被取消（可从检查点续扫）"
                 progress.completed_at = datetime.now()
                 return
 
+            sensitive_results = checkpoint.results
+
             # 阶段3: 更新元数据
             if policy.auto_update_metadata and db_session and sensitive_results:
                 progress.status = AutoScanStatus.UPDATING
@@ -446,6 +492,7 @@ class SensitivityAutoScanService:
 
             progress.status = AutoScanStatus.COMPLETED
             progress.completed_at = datetime.now()
+            self._checkpoint = None
 
             logger.info(
                 f"自动扫描完成: 扫描 {progress.scanned_columns} 列, "
@@ -463,6 +510,129 @@ class SensitivityAutoScanService:
         finally:
             self._running = False
 
+    def _policy_key(self, policy: AutoScanPolicy) -> str:
+        """影响扫描范围与结果的策略字段（用于匹配检查点）"""
+        fields = (
+            "mode", "databases", "exclude_databases", "exclude_table_patterns",
+            "sample_size", "confidence_threshold",
+        )
+        data = policy.to_dict()
+        return json.dumps({k: data[k] for k in fields}, sort_keys=True)
+
+    def _load_checkpoint(self, policy: AutoScanPolicy, resume: bool) -> ScanCheckpoint:
+        """续扫时复用相同策略的检查点，否则新建"""
+        key = self._policy_key(policy)
+        if resume and self._checkpoint is not None and self._checkpoint.policy_key == key:
+            logger.info(f"自动扫描: 从检查点续扫，已完成 {len(self._checkpoint.completed_tables)} 个表")
+        else:
+            self._checkpoint = ScanCheckpoint(policy_key=key)
+        return self._checkpoint
+
+    def _restore_progress(self, progress: AutoScanProgress, checkpoint: ScanCheckpoint) -> None:
+        """把检查点中已完成的部分计入进度"""
+        progress.resumed = bool(checkpoint.completed_tables)
+        progress.completed_tables = len(checkpoint.completed_tables)
+        progress.scanned_columns = checkpoint.scanned_columns
+        for result in checkpoint.results:
+            self._record_sensitive(progress, result)
+
+    def _record_sensitive(self, progress: AutoScanProgress, result: Dict[str, Any]) -> None:
+        """累计敏感列计数与明细"""
+        progress.sensitive_found += 1
+
+        # 更新分类计数
+        stype = result.get("sensitivity_type", "")
+        if stype == "pii":
+            progress.pii_count += 1
+        elif stype == "financial":
+            progress.financial_count += 1
+        elif stype == "health":
+            progress.health_count += 1
+        elif stype == "credential":
+            progress.credential_count += 1
+
+        progress.sensitive_columns.append({
+            "database": result.get("database", ""),
+            "table": result.get("table", ""),
+            "column": result.get("column", ""),
+            "type": stype,
+            "sub_type": result.get("sensitivity_sub_type", ""),
+            "level": result.get("sensitivity_level", ""),
+            "confidence": result.get("confidence", 0),
+        })
+
+    @staticmethod
+    def _get_engine(db_session):
+        """获取会话绑定的引擎（工作线程各自取连接）"""
+        get_bind = getattr(db_session, "get_bind", None)
+        if get_bind is None:
+            return None
+        try:
+            return get_bind()
+        except Exception:
+            return None
+
+    def _scan_table(
+        self,
+        table_columns: List[Dict[str, Any]],
+        policy: AutoScanPolicy,
+        engine=None,
+        db_session=None,
+    ) -> List[Dict[str, Any]]:
+        """
+        扫描一张表的所有待扫描列（在工作线程中执行）
+
+        一次查询取回所有列的样本；批量样本中没有非空值的稀疏列再单独采样。
+        批量采样失败时退回逐列采样。
+
+        Returns:
+            敏感列结果列表
+        """
+        database = table_columns[0]["database"]
+        table = table_columns[0]["table"]
+        names = [col["column"] for col in table_columns]
+
+        samples: Dict[str, List[Any]] = {}
+        connection = engine.connect() if engine is not None else nullcontext(db_session)
+        with connection as conn:
+            if conn is not None:
+                try:
+                    samples = fetch_table_samples(conn, database, table, names, policy.sample_size)
+                except Exception as e:
+                    logger.warning(f"批量采样失败，改为逐列采样 [{database}.{table}]: {e}")
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                for name in names:
+                    if not samples.get(name):
+                        samples[name] = self._fetch_sample_data(
+                            database, table, name, policy.sample_size, conn
+                        )
+
+        # 规则匹配；需要 AI 复核的列合并为批量请求
+        prepared = []
+        ai_indexes = []
+        for i, col_info in enumerate(table_columns):
+            sample_values = samples.get(col_info["column"], [])
+            name_match, content_match, needs_ai = self._prepare_column(col_info, sample_values)
+            prepared.append((col_info, sample_values, name_match, content_match))
+            if needs_ai:
+                ai_indexes.append(i)
+
+        ai_results = dict(zip(ai_indexes, self._classify_with_ai(
+            [(prepared[i][0], prepared[i][1]) for i in ai_indexes]
+        )))
+
+        results = []
+        for i, (col_info, sample_values, name_match, content_match) in enumerate(prepared):
+            result = self._resolve_column(
+                col_info, policy, sample_values, name_match, content_match, ai_results.get(i)
+            )
+            if result and result.get("is_sensitive"):
+                results.append(result)
+        return results
+
     def _discover_columns(
         self,
         policy: AutoScanPolicy,
@@ -538,53 +708,52 @@ class SensitivityAutoScanService:
 
         return columns
 
-    def _scan_single_column(
+    def _prepare_column(
         self,
         col_info: Dict[str, Any],
-        policy: AutoScanPolicy,
-        db_session=None,
-    ) -> Optional[Dict[str, Any]]:
-        """扫描单个列"""
-        column_name = col_info["column"]
-        column_type = col_info.get("column_type", "")
+        sample_values: List[Any],
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], bool]:
+        """
+        列名与正则内容匹配
 
+        Returns:
+            (列名匹配, 内容匹配, 是否需要 AI 深度分析)
+        """
         # 1. 列名快速预筛选
-        name_match = self._match_column_name(column_name)
+        name_match = self._match_column_name(col_info["column"])
 
-        # 2. 尝试获取样本数据
-        sample_values = []
-        if db_session:
-            sample_values = self._fetch_sample_data(
-                col_info["database"],
-                col_info["table"],
-                column_name,
-                policy.sample_size,
-                db_session,
-            )
-
-        # 3. 正则表达式内容分析
+        # 2. 正则表达式内容分析
         content_match = None
         if sample_values:
             content_match = self._scan_sample_values(sample_values)
 
-        # 4. LLM 深度分析（当正则匹配置信度不足或需要验证时）
-        ai_match = None
+        # 3. LLM 深度分析（当正则匹配置信度不足或需要验证时）
+        should_use_ai = False
         if sample_values and self._ai_available:
             # 使用 AI 分析的情况:
             # - 列名匹配但正则没匹配（需要验证）
             # - 正则匹配但置信度较低
             # - 都没匹配但样本数据看起来像敏感数据（通过 AI 兜底检测）
-            should_use_ai = (
+            should_use_ai = bool(
                 (name_match and not content_match) or
                 (content_match and content_match.get("confidence", 0) < 80) or
                 (not name_match and not content_match)  # AI 兜底
             )
-            if should_use_ai:
-                ai_match = self._ai_analyze_sensitivity(
-                    column_name, column_type, sample_values
-                )
+        return name_match, content_match, should_use_ai
+
+    def _resolve_column(
+        self,
+        col_info: Dict[str, Any],
+        policy: AutoScanPolicy,
+        sample_values: List[Any],
+        name_match: Optional[Dict[str, Any]],
+        content_match: Optional[Dict[str, Any]],
+        ai_match: Optional[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """综合列名、正则与 AI 结果得出列的敏感性结论"""
+        column_name = col_info["column"]
 
-        # 5. 综合判断 - 优先级: AI > 正则+列名 > 正则 > 列名
+        # 综合判断 - 优先级: AI > 正则+列名 > 正则 > 列名
         best_match = None
 
         # AI 结果优先（如果置信度足够高）
@@ -646,186 +815,99 @@ class SensitivityAutoScanService:
 
         return None
 
-    def _ai_analyze_sensitivity(
+    @staticmethod
+    def _ai_sample_strings(sample_values: List[Any]) -> List[str]:
+        """送入 AI 的样本（前 10 个，每个截断到 100 字符）"""
+        return [str(v)[:100] for v in sample_values[:10] if v is not None]
+
+    def _classify_with_ai(
         self,
-        column_name: str,
-        column_type: str,
-        sample_values: List[Any],
-    ) -> Optional[Dict[str, Any]]:
+        columns: List[Tuple[Dict[str, Any], List[Any]]],
+    ) -> List[Optional[Dict[str, Any]]]:
         """
-        使用 LLM 深度分析列数据的敏感性
+        使用 LLM 深度分析多个列的敏感性
+
+        列名、类型与样本均未变化的列直接复用缓存结果；其余列合并为批量请求。
 
         Args:
-            column_name: 列名
-            column_type: 数据类型
-            sample_values: 样本值列表
+            columns: (列信息, 样本值列表) 列表
 
         Returns:
-            AI 分析结果，包含敏感性判断、类型、置信度和理由
+            与 columns 等长的 AI 分析结果（失败或无样本时为 None）
         """
-        try:
-            ai_service = self._ai_service or get_ai_service()
-
-            # 转换样本值为字符串
-            str_values = [str(v)[:100] for v in sample_values[:10] if v is not None]
-
+        items = []
+        positions = []
+        for i, (col_info, sample_values) in enumerate(columns):
+            str_values = self._ai_sample_strings(sample_values)
             if not str_values:
-                return None
-
-            result = ai_service.analyze_sensitivity(
-                column_name=column_name,
-                data_type=column_type,
-                sample_values=str_values,
-            )
+                continue
+            column_type = col_info.get("column_type", "")
+            items.append((
+                column_fingerprint(col_info["column"], column_type, str_values),
+                {
+                    "name": col_info["column"],
+                    "type": column_type,
+                    "samples": str_values,
+                    "table": col_info.get("table", ""),
+                },
+            ))
+            positions.append(i)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(columns)
+        if items:
+            for i, result in zip(positions, self._ai_classifier.classify(items)):
+                results[i] = result
+        return results
+
+    def _ai_classify_batch(self, payloads: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """一次 AI 请求分析一批列（BatchClassifier 回调，在 AI 线程池中执行）"""
+        ai_service = self._ai_service or get_ai_service()
+        raw_results = ai_service.batch_analyze_sensitivity(
+            payloads, table_name=payloads[0].get("table", "")
+        )
+        return [self._convert_ai_result(result) for result in raw_results]
 
-            # 转换 AI 服务返回的结果格式
-            if result.get("is_sensitive"):
-                # 将 AI 的 confidence (0-1) 转换为我们的格式 (0-100)
-                confidence = result.get("confidence", 0.5)
-                if isinstance(confidence, float) and confidence <= 1:
-                    confidence = int(confidence * 100)
+    @staticmethod
+    def _convert_ai_result(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """转换 AI 服务返回的结果格式（失败结果返回 None，不进入缓存）"""
+        if result.get("failed"):
+            return None
 
-                return {
-                    "is_sensitive": True,
-                    "sensitivity_type": result.get("sensitivity_type", "pii"),
-                    "sensitivity_level": result.get("sensitivity_level", "confidential"),
-                    "confidence": confidence,
-                    "reason": result.get("reason", ""),
-                    "suggested_masking": result.get("suggested_masking", "partial_mask"),
-                }
+        if result.get("is_sensitive"):
+            # 将 AI 的 confidence (0-1) 转换为我们的格式 (0-100)
+            confidence = result.get("confidence", 0.5)
+            if isinstance(confidence, float) and confidence <= 1:
+                confidence = int(confidence * 100)
 
             return {
-                "is_sensitive": False,
-                "confidence": 0,
+                "is_sensitive": True,
+                "sensitivity_type": result.get("sensitivity_type", "pii"),
+                "sensitivity_level": result.get("sensitivity_level", "confidential"),
+                "confidence": confidence,
+                "reason": result.get("reason", ""),
+                "suggested_masking": result.get("suggested_masking", "partial_mask"),
             }
 
-        except Exception as e:
-            logger.debug(f"AI 敏感性分析失败 [{column_name}]: {e}")
-            return None
+        return {
+            "is_sensitive": False,
+            "confidence": 0,
+        }
 
     def _match_column_name(self, column_name: str) -> Optional[Dict[str, Any]]:
         """通过列名规则匹配敏感类型"""
         col_lower = column_name.lower()
-        for sensitivity_type, sub_types in COLUMN_NAME_SENSITIVITY_HINTS.items():
-            for sub_type, patterns in sub_types.items():
-                for pattern in patterns:
-                    if re.search(pattern, col_lower, re.IGNORECASE):
-                        return {
-                            "type": sensitivity_type,
-                            "sub_type": sub_type,
-                            "confidence": 70,
-                        }
-        return None
-
-    def _scan_sample_values(self, values: List[Any]) -> Optional[Dict[str, Any]]:
-        """扫描样本值识别敏感类型"""
-        if not values:
-            return None
-
-        # 将值转为字符串
-        str_values = [str(v) for v in values if v is not None and str(v).strip()]
-        if not str_values:
-            return None
-
-        # 敏感数据正则模式
-        content_patterns = {
-            # === PII 个人身份信息 ===
-            ("pii", "phone"): [
-                r"^1[3-9]\d{9}$",                          # 中国手机号
-                r"^(?:\+86)?1[3-9]\d{9}$",                 # 带国际区号
-                r"^(?:\+?1)?[2-9]\d{2}[2-9]\d{6}$",       # 北美电话号码
-                r"^0\d{2,3}-?\d{7,8}$",                    # 中国固定电话
-            ],
-            ("pii", "email"): [
-                r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$",
-            ],
-            ("pii", "id_card"): [
-                r"^\d{17}[\dXx]$",                          # 18位身份证
-                r"^\d{15}$",                                 # 15位身份证（旧版）
-                r"^[A-Z]\d{6}\(?[0-9A-Z]\)?$",             # 香港身份证
-                r"^[A-Z][12]\d{8}$",                        # 台湾身份证
-            ],
-            ("pii", "name"): [
-                r"^[\u4e00-\u9fa5]{2,4}$",                  # 中文姓名（2-4个汉字）
-            ],
-            ("pii", "address"): [
-                r".*(?:省|市|区|县|镇|村|路|街|号|栋|单元|室).*",
-                r".*(?:大道|广场|花园|小区|公寓|大厦|工业园).*",
-            ],
-            ("pii", "passport"): [
-                r"^[EeGg]\d{8}$",                           # 中国护照
-                r"^[A-Z]{1,2}\d{6,9}$",                     # 通用护照格式
-            ],
-            ("pii", "ip_address"): [
-                r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$",   # IPv4
-                r"^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$",  # IPv6
-            ],
-            # === 金融信息 ===
-            ("financial", "bank_card"): [
-                r"^\d{16,19}$",                              # 银行卡号
-                r"^62\d{14,17}$",                            # 银联卡
-            ],
-            ("financial", "credit_card"): [
-                r"^4\d{12}(?:\d{3})?$",                      # Visa
-                r"^5[1-5]\d{14}$",                           # MasterCard
-                r"^3[47]\d{13}$",                            # American Express
-                r"^6(?:011|5\d{2})\d{12}$",                  # Discover
-            ],
-            # === 凭证信息 ===
-            ("credential", "password"): [
-                # 密码不适合正则检测，依赖列名匹配和 AI 分析
-            ],
-            ("credential", "api_key"): [
-                r"^sk-[A-Za-z0-9]{32,}$",                   # OpenAI API Key
-                r"^(?:AKIA|ASIA)[A-Z0-9]{16}$",             # AWS Access Key
-                r"^ghp_[A-Za-z0-9]{36}$",                   # GitHub Personal Token
-                r"^gho_[A-Za-z0-9]{36}$",                   # GitHub OAuth Token
-                r"^xox[bps]-[A-Za-z0-9-]+$",                # Slack Token
-            ],
-            ("credential", "token"): [
-                r"^eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}$",  # JWT
-                r"^[A-Fa-f0-9]{32,64}$",                    # Hex token (32-64 chars)
-            ],
-            ("credential", "secret_key"): [
-                r"^-----BEGIN (?:RSA |EC )?PRIVATE KEY-----",  # PEM private key
-                r"^[A-Za-z0-9/+=]{40,}$",                   # Base64 secret (40+ chars)
-            ],
-            # === 健康信息 ===
-            ("health", "medical_record"): [
-                r"^\d{2}-\d{5,8}$",                          # 病历号格式
-                r"^MR\d{6,10}$",                             # Medical Record ID
-            ],
-        }
-
-        # 检查每种模式的匹配率
-        best_match = None
-        best_rate = 0
-
-        for (stype, sub_type), patterns in content_patterns.items():
-            if not patterns:
-                continue
-            matched = 0
-            sample = str_values[:100]
-            for val in sample:
-                for pat in patterns:
-                    if re.match(pat, val.strip()):
-                        matched += 1
-                        break
-
-            match_rate = matched / len(sample) if sample else 0
-
-            if match_rate > 0.3 and match_rate > best_rate:
-                best_rate = match_rate
-                confidence = int(min(95, 60 + match_rate * 30))
-                best_match = {
-                    "type": stype,
+        for sensitivity_type, sub_type, regex in _COLUMN_NAME_MATCHERS:
+            if regex.search(col_lower):
+                return {
+                    "type": sensitivity_type,
                     "sub_type": sub_type,
-                    "confidence": confidence,
-                    "match_rate": round(match_rate, 3),
-                    "matched_by": "content_regex",
+                    "confidence": 70,
                 }
+        return None
 
-        return best_match
+    def _scan_sample_values(self, values: List[Any]) -> Optional[Dict[str, Any]]:
+        """扫描样本值识别敏感类型（预编译的组合正则）"""
+        return self._content_matcher.scan(values)
 
     def _fetch_sample_data(
         self,
@@ -0,0 +1,416 @@
+"""
+敏感数据扫描引擎
+
+为 SensitivityAutoScanService 提供可独立使用的扫描组件：
+- ContentMatcher：每个敏感类别预编译一个组合正则（alternation），逐值一次匹配
+- fetch_table_samples：一次查询取回一张表所有待扫描列的样本
+- scan_tables_concurrently：表级并发扫描，有界线程池 + 每个数据库的并发上限
+- ScanCheckpoint：记录已完成的表，扫描取消后可从断点续扫
+- BatchClassifier：多列合并为一次 AI 请求、批次并发执行，按列指纹缓存分类结果
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 敏感数据内容正则模式（按 (敏感类型, 子类型) 分类，对去除首尾空白的值做 re.match）
+CONTENT_PATTERNS = {
+    # === PII 个人身份信息 ===
+    ("pii", "phone"): [
+        r"^1[3-9]\d{9}$",                          # 中国手机号
+        r"^(?:\+86)?1[3-9]\d{9}$",                 # 带国际区号
+        r"^(?:\+?1)?[2-9]\d{2}[2-9]\d{6}$",       # 北美电话号码
+        r"^0\d{2,3}-?\d{7,8}$",                    # 中国固定电话
+    ],
+    ("pii", "email"): [
+        r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$",
+    ],
+    ("pii", "id_card"): [
+        r"^\d{17}[\dXx]$",                          # 18位身份证
+        r"^\d{15}$",                                 # 15位身份证（旧版）
+        r"^[A-Z]\d{6}\(?[0-9A-Z]\)?$",             # 香港身份证
+        r"^[A-Z][12]\d{8}$",                        # 台湾身份证
+    ],
+    ("pii", "name"): [
+        r"^[\u4e00-\u9fa5]{2,4}$",                  # 中文姓名（2-4个汉字）
+    ],
+    ("pii", "address"): [
+        r".*(?:省|市|区|县|镇|村|路|街|号|栋|单元|室).*",
+        r".*(?:大道|广场|花园|小区|公寓|大厦|工业园).*",
+    ],
+    ("pii", "passport"): [
+        r"^[EeGg]\d{8}$",                           # 中国护照
+        r"^[A-Z]{1,2}\d{6,9}$",                     # 通用护照格式
+    ],
+    ("pii", "ip_address"): [
+        r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$",   # IPv4
+        r"^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$",  # IPv6
+    ],
+    # === 金融信息 ===
+    ("financial", "bank_card"): [
+        r"^\d{16,19}$",                              # 银行卡号
+        r"^62\d{14,17}$",                            # 银联卡
+    ],
+    ("financial", "credit_card"): [
+        r"^4\d{12}(?:\d{3})?$",                      # Visa
+        r"^5[1-5]\d{14}$",                           # MasterCard
+        r"^3[47]\d{13}$",                            # American Express
+        r"^6(?:011|5\d{2})\d{12}$",                  # Discover
+    ],
+    # === 凭证信息 ===
+    ("credential", "password"): [
+        # 密码不适合正则检测，依赖列名匹配和 AI 分析
+    ],
+    ("credential", "api_key"): [
+        r"^sk-[A-Za-z0-9]{32,}$",                   # OpenAI API Key
+        r"^(?:AKIA|ASIA)[A-Z0-9]{16}$",             # AWS Access Key
+        r"^ghp_[A-Za-z0-9]{36}$",                   # GitHub Personal Token
+        r"^gho_[A-Za-z0-9]{36}$",                   # GitHub OAuth Token
+        r"^xox[bps]-[A-Za-z0-9-]+$",                # Slack Token
+    ],
+    ("credential", "token"): [
+        r"^eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}$",  # JWT
+        r"^[A-Fa-f0-9]{32,64}$",                    # Hex token (32-64 chars)
+    ],
+    ("credential", "secret_key"): [
+        r"^-----BEGIN (?:RSA |EC )?PRIVATE KEY-----",  # PEM private key
+        r"^[A-Za-z0-9/+=]{40,}$",                   # Base64 secret (40+ chars)
+    ],
+    # === 健康信息 ===
+    ("health", "medical_record"): [
+        r"^\d{2}-\d{5,8}$",                          # 病历号格式
+        r"^MR\d{6,10}$",                             # Medical Record ID
+    ],
+}
+
+
+class ContentMatcher:
+    """
+    预编译的内容匹配器
+
+    每个类别的多条正则合并为一个 alternation，只在构造时编译一次；
+    re.match 对 alternation 的语义与逐条尝试任一匹配相同。
+    """
+
+    def __init__(
+        self,
+        patterns: Dict[Tuple[str, str], List[str]] = None,
+        sample_limit: int = 100,
+    ):
+        self.sample_limit = sample_limit
+        self._categories = [
+            (stype, sub_type, re.compile("|".join(f"(?:{p})" for p in pats)).match)
+            for (stype, sub_type), pats in (patterns or CONTENT_PATTERNS).items()
+            if pats
+        ]
+
+    def scan(self, values: List[Any]) -> Optional[Dict[str, Any]]:
+        """
+        扫描样本值，返回匹配率最高（且超过 30%）的类别
+
+        Returns:
+            {"type", "sub_type", "confidence", "match_rate", "matched_by"} 或 None
+        """
+        if not values:
+            return None
+
+        str_values = [str(v) for v in values if v is not None and str(v).strip()]
+        if not str_values:
+            return None
+
+        sample = [v.strip() for v in str_values[:self.sample_limit]]
+
+        best_match = None
+        best_rate = 0
+        for stype, sub_type, match in self._categories:
+            matched = sum(1 for val in sample if match(val))
+            match_rate = matched / len(sample)
+
+            if match_rate > 0.3 and match_rate > best_rate:
+                best_rate = match_rate
+                best_match = {
+                    "type": stype,
+                    "sub_type": sub_type,
+                    "confidence": int(min(95, 60 + match_rate * 30)),
+                    "match_rate": round(match_rate, 3),
+                    "matched_by": "content_regex",
+                }
+
+        return best_match
+
+
+def _quote(identifier: str) -> str:
+    """MySQL 标识符转义"""
+    return "`" + str(identifier).replace("`", "``") + "`"
+
+
+def fetch_table_samples(
+    conn,
+    database: str,
+    table: str,
+    columns: List[str],
+    sample_size: int,
+) -> Dict[str, List[Any]]:
+    """
+    一次查询获取一张表多个列的样本（丢弃 NULL 与空字符串）
+
+    Args:
+        conn: SQLAlchemy Connection / Session
+        database: 数据库名
+        table: 表名
+        columns: 列名列表
+        sample_size: 采样行数
+
+    Returns:
+        列名 -> 非空样本值列表
+    """
+    from sqlalchemy import text
+
+    select_list = ", ".join(_quote(c) for c in columns)
+    sql = text(f"SELECT {select_list} FROM {_quote(database)}.{_quote(table)} LIMIT :limit")
+
+    samples: Dict[str, List[Any]] = {c: [] for c in columns}
+    for row in conn.execute(sql, {"limit": sample_size}):
+        for column, value in zip(columns, row):
+            if value is None or value == "":
+                continue
+            samples[column].append(value)
+    return samples
+
+
+@dataclass
+class ScanCheckpoint:
+    """扫描检查点（已完成的表及其结果）"""
+    policy_key: str
+    completed_tables: Set[str] = field(default_factory=set)
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    scanned_columns: int = 0
+
+    def record(self, table_key: str, column_count: int, results: List[Dict[str, Any]]) -> None:
+        self.completed_tables.add(table_key)
+        self.scanned_columns += column_count
+        self.results.extend(results)
+
+
+def group_columns_by_table(
+    columns: List[Dict[str, Any]],
+) -> "OrderedDict[str, List[Dict[str, Any]]]":
+    """按 database.table 分组，保持发现顺序"""
+    tables: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for col in columns:
+        tables.setdefault(f"{col['database']}.{col['table']}", []).append(col)
+    return tables
+
+
+def _interleave_by_database(table_keys: List[str]) -> List[str]:
+    """按数据库轮询排列，避免同库的表堆在队首而占满并发上限"""
+    by_database: "OrderedDict[str, List[str]]" = OrderedDict()
+    for key in table_keys:
+        by_database.setdefault(key.split(".", 1)[0], []).append(key)
+    queues = list(by_database.values())
+    ordered = []
+    while queues:
+        for queue in list(queues):
+            ordered.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+    return ordered
+
+
+def scan_tables_concurrently(
+    table_keys: List[str],
+    scan_table: Callable[[str], Any],
+    max_workers: int = 8,
+    max_per_database: int = 2,
+    should_continue: Callable[[], bool] = lambda: True,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    并发扫描多张表，按完成顺序产出结果
+
+    Args:
+        table_keys: "database.table" 列表
+        scan_table: 扫描单表的函数（在工作线程中执行）
+        max_workers: 线程池大小
+        max_per_database: 单个数据库的最大并发表数
+        should_continue: 返回 False 时停止提交新表（已在执行的表会完成）
+
+    Yields:
+        (table_key, scan_table 的返回值)；单表失败时返回值为异常对象，
+        因取消而未执行的表不产出
+    """
+    semaphores: Dict[str, threading.BoundedSemaphore] = {}
+    for key in table_keys:
+        semaphores.setdefault(key.split(".", 1)[0], threading.BoundedSemaphore(max(1, max_per_database)))
+
+    def run(key: str):
+        semaphore = semaphores[key.split(".", 1)[0]]
+        with semaphore:
+            if not should_continue():
+                return None
+            return scan_table(key)
+
+    pending_keys = deque(_interleave_by_database(table_keys))
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="sensitivity-scan")
+    try:
+        # 只保持有限的在途任务，便于及时响应取消
+        in_flight: Dict[Any, str] = {}
+        window = max(1, max_workers) * 2
+        while pending_keys or in_flight:
+            while pending_keys and len(in_flight) < window and should_continue():
+                key = pending_keys.popleft()
+                in_flight[executor.submit(run, key)] = key
+            if not in_flight:
+                break
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"表扫描失败 [{key}]: {e}")
+                    result = e
+                if result is not None:
+                    yield key, result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def column_fingerprint(column_name: str, column_type: str, sample_values: List[Any]) -> str:
+    """
+    列指纹：列名 + 类型 + 样本值哈希
+
+    列名、类型与样本都未变化时指纹不变，可直接复用上次的 AI 分类结果。
+    """
+    payload = json.dumps(
+        [str(column_name).lower(), str(column_type or "").lower(), [str(v) for v in sample_values]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """按列指纹缓存 AI 分类结果（线程安全 LRU）"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(fingerprint)
+            if value is not None:
+                self._entries.move_to_end(fingerprint)
+            return value
+
+    def set(self, fingerprint: str, value: Any) -> None:
+        if value is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[fingerprint] = value
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class BatchClassifier:
+    """
+    批量 AI 分类
+
+    先查指纹缓存，未命中的列按 batch_size 合并为一次请求；
+    所有调用方共享同一个有界线程池，批次之间并发执行且总并发受 max_concurrency 限制。
+    """
+
+    def __init__(
+        self,
+        classify_batch: Callable[[List[Any]], List[Optional[Any]]],
+        batch_size: int = 20,
+        max_concurrency: int = 4,
+        cache: Optional[ClassificationCache] = None,
+    ):
+        """
+        Args:
+            classify_batch: 分类一批负载的函数，返回等长结果列表（None 表示失败，不缓存）
+            batch_size: 每次请求的最大列数
+            max_concurrency: 同时在途的请求数上限
+            cache: 指纹缓存（为 None 时不缓存）
+        """
+        self.classify_batch = classify_batch
+        self.batch_size = max(1, batch_size)
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency), thread_name_prefix="sensitivity-ai"
+        )
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.requests = 0
+
+    def _run_batch(self, payloads: List[Any]) -> List[Optional[Any]]:
+        with self._lock:
+            self.requests += 1
+        try:
+            results = list(self.classify_batch(payloads))
+        except Exception as e:
+            logger.warning(f"AI 批量分类失败: {e}")
+            return [None] * len(payloads)
+        if len(results) != len(payloads):
+            logger.warning(f"AI 批量分类结果数量不符: {len(results)} != {len(payloads)}")
+            return [None] * len(payloads)
+        return results
+
+    def classify(self, items: List[Tuple[str, Any]]) -> List[Optional[Any]]:
+        """
+        分类一组列
+
+        Args:
+            items: (指纹, 负载) 列表
+
+        Returns:
+            与 items 等长的结果列表
+        """
+        results: List[Optional[Any]] = [None] * len(items)
+        misses: "OrderedDict[str, Tuple[Any, List[int]]]" = OrderedDict()
+        hits = 0
+        for i, (fingerprint, payload) in enumerate(items):
+            cached = self.cache.get(fingerprint) if self.cache is not None else None
+            if cached is not None:
+                results[i] = cached
+                hits += 1
+            elif fingerprint in misses:
+                misses[fingerprint][1].append(i)
+            else:
+                misses[fingerprint] = (payload, [i])
+        with self._lock:
+            self.cache_hits += hits
+
+        pending = list(misses.items())
+        futures = []
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            futures.append((chunk, self._executor.submit(self._run_batch, [p for _, (p, _) in chunk])))
+
+        for chunk, future in futures:
+            for (fingerprint, (_, indexes)), result in zip(chunk, future.result()):
+                if self.cache is not None:
+                    self.cache.set(fingerprint, result)
+                for i in indexes:
+                    results[i] = result
+        return results
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
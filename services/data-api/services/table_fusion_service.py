@@ -8,6 +8,7 @@ Phase 2.0: 跨表关联键自动检测、JOIN质量评分、融合规则推荐
 - 置信度阈值自适应校准
 """
 
+import asyncio
 import logging
 import re
 import math
@@ -150,34 +151,37 @@ class TableFusionService:
         self._embedding_service = None
 
     def _get_embedding_service(self):
-        """获取 Embedding 服务"""
+        """获取 Embedding 服务（向量经共享 Embedding 缓存按内容寻址复用）"""
         if self._embedding_service is None:
             try:
-                from services.embedding_service import get_embedding_service
-                self._embedding_service = get_embedding_service()
+                from src.semantic_search import EmbeddingService
+                self._embedding_service = EmbeddingService()
             except ImportError:
                 logger.warning("Embedding 服务不可用，将使用基础语义匹配")
         return self._embedding_service
 
-    async def _get_embedding(self, text: str) -> Optional[List[float]]:
-        """获取文本的 Embedding 向量"""
-        # 检查缓存
-        if text in self._embedding_cache:
-            return self._embedding_cache[text]
+    async def _get_embeddings(self, texts: List[str]) -> Dict[str, List[float]]:
+        """批量获取文本的 Embedding 向量，只请求未缓存的文本"""
+        pending = [t for t in dict.fromkeys(texts) if t not in self._embedding_cache]
 
-        service = self._get_embedding_service()
-        if service is None:
-            return None
+        if pending:
+            service = self._get_embedding_service()
+            if service is None:
+                return {}
+            try:
+                loop = asyncio.get_running_loop()
+                embeddings = await loop.run_in_executor(None, service.get_embeddings_batch, pending)
+                for text_value, embedding in zip(pending, embeddings):
+                    if embedding:
+                        self._embedding_cache[text_value] = embedding
+            except Exception as e:
+                logger.warning(f"获取 Embedding 失败: {e}")
 
-        try:
-            embedding = await service.embed_text(text)
-            if embedding and len(embedding) > 0:
-                self._embedding_cache[text] = embedding
-                return embedding
-        except Exception as e:
-            logger.warning(f"获取 Embedding 失败: {e}")
+        return {t: self._embedding_cache[t] for t in texts if t in self._embedding_cache}
 
-        return None
+    async def _get_embedding(self, text: str) -> Optional[List[float]]:
+        """获取文本的 Embedding 向量"""
+        return (await self._get_embeddings([text])).get(text)
 
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """计算余弦相似度"""
@@ -275,24 +279,21 @@ class TableFusionService:
         if service is None:
             return []
 
-        # 获取源列的 Embeddings
-        source_embeddings = {}
-        for col in source_columns:
-            if col["name"] in exclude:
-                continue
-            embedding = await self._get_embedding(col["name"])
-            if embedding:
-                source_embeddings[col["name"]] = embedding
+        # 一次批量获取源列与目标列的 Embeddings
+        source_names = [col["name"] for col in source_columns if col["name"] not in exclude]
+        target_names = [col["name"] for col in target_columns if col["name"] not in exclude]
+        embeddings = await self._get_embeddings(source_names + target_names)
 
+        source_embeddings = {name: embeddings[name] for name in source_names if name in embeddings}
         if not source_embeddings:
             return []
 
-        # 获取目标列的 Embeddings 并计算相似度
+        # 计算目标列与源列的相似度
         for target_col in target_columns:
             if target_col["name"] in exclude:
                 continue
 
-            target_embedding = await self._get_embedding(target_col["name"])
+            target_embedding = embeddings.get(target_col["name"])
             if not target_embedding:
                 continue
 
@@ -0,0 +1,384 @@
+"""
+预警检测器状态存储
+P6.2: 智能预警推送
+
+为批量规则检测维护每个指标的滚动统计，新值到达时 O(1) 增量更新，
+检测时不再按规则回查历史窗口：
+- MetricSeries: 指标的有序时序（按保留时长淘汰）+ EWMA / EW 方差
+- WindowStats: 时间窗口内的 Welford 均值/方差（滑入滑出均为 O(1)），
+  窗口最多保留最近 ALERT_WINDOW_MAX_POINTS 个值；首次查询分位数后
+  增量维护窗口的有序副本，分位数直接按位置插值（滑动分位数）
+- ModelCache: 孤立森林等已训练模型缓存，按时间间隔或新增点数重训
+- DetectorStateStore: 按 MonitoringMetricValue.id 水位增量同步全部指标，
+  每次回扫水位以下 ALERT_SYNC_ID_LAG 个 id（按 id 去重），补读乱序提交的行
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# EWMA 平滑系数
+ALERT_EWMA_ALPHA = float(os.getenv("ALERT_EWMA_ALPHA", "0.3"))
+# 已训练异常检测模型的重训间隔（秒）与重训所需新增点数
+ALERT_MODEL_RETRAIN_INTERVAL = int(os.getenv("ALERT_MODEL_RETRAIN_INTERVAL", "3600"))
+ALERT_MODEL_RETRAIN_POINTS = int(os.getenv("ALERT_MODEL_RETRAIN_POINTS", "500"))
+# 单个检测窗口最多保留的值个数（高频指标的窗口按时间和个数共同截断）
+ALERT_WINDOW_MAX_POINTS = int(os.getenv("ALERT_WINDOW_MAX_POINTS", "10000"))
+# 增量同步时回扫的 id 范围（并发事务可能晚于更大的 id 提交）
+ALERT_SYNC_ID_LAG = int(os.getenv("ALERT_SYNC_ID_LAG", "1000"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: datetime) -> float:
+    """UTC naive datetime -> 秒"""
+    return (value - _EPOCH).total_seconds()
+
+
+class WindowStats:
+    """时间窗口内的 Welford 均值/方差"""
+
+    def __init__(self, window_seconds: float, max_points: Optional[int] = None):
+        self.window_seconds = window_seconds
+        self.max_points = max_points or ALERT_WINDOW_MAX_POINTS
+        self.head = 0  # 窗口在 MetricSeries 中的起始位置
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        # 窗口值的有序副本（首次查询分位数时建立，之后随滑入滑出增量维护）
+        self.sorted_values: Optional[List[float]] = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.sorted_values is not None:
+            insort(self.sorted_values, value)
+
+    def remove(self, value: float):
+        if self.sorted_values is not None:
+            del self.sorted_values[bisect_left(self.sorted_values, value)]
+        if self.count <= 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self._m2 -= delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """总体方差（与 np.std 默认一致）"""
+        return max(self._m2, 0.0) / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def quantiles(self, qs: List[float]) -> np.ndarray:
+        """有序副本上的线性插值分位数（与 np.quantile 默认一致）"""
+        values = self.sorted_values
+        if not values:
+            return np.full(len(qs), np.nan)
+        result = np.empty(len(qs))
+        for i, q in enumerate(qs):
+            position = q * (len(values) - 1)
+            low = int(math.floor(position))
+            high = min(low + 1, len(values) - 1)
+            result[i] = values[low] + (values[high] - values[low]) * (position - low)
+        return result
+
+
+class MetricSeries:
+    """
+    单个指标的时序与滚动统计
+
+    新值按时间戳有序追加（迟到的值按到达顺序处理），超过保留时长的值被淘汰，
+    但始终保留最新值。
+    """
+
+    def __init__(self, retention_seconds: float = 0.0, ewma_alpha: float = ALERT_EWMA_ALPHA):
+        self.retention_seconds = retention_seconds
+        self.ewma_alpha = ewma_alpha
+        self._timestamps: List[float] = []
+        self._values: List[float] = []
+        self._head = 0
+        self._windows: Dict[float, WindowStats] = {}
+        self.ewma: Optional[float] = None
+        self.ewm_variance = 0.0
+        # 最新值到达前的 EWMA 预测及其标准差（用于 EWMA 偏离检测）
+        self.forecast: Optional[float] = None
+        self.forecast_std = 0.0
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self._values) - self._head
+
+    @property
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """最新的 (时间戳, 值)"""
+        if not len(self):
+            return None
+        return self._timestamps[-1], self._values[-1]
+
+    def window(self, window_seconds: float, now: Optional[float] = None) -> WindowStats:
+        """获取（必要时创建）时间窗口统计，窗口截止到 now（默认最新值的时间）"""
+        stats = self._windows.get(window_seconds)
+        if stats is None:
+            stats = WindowStats(window_seconds)
+            if now is None:
+                now = self._timestamps[-1] if len(self) else 0.0
+            cutoff = now - window_seconds
+            stats.head = max(
+                bisect_left(self._timestamps, cutoff, lo=self._head),
+                len(self._values) - stats.max_points,
+            )
+            for value in self._values[stats.head:]:
+                stats.add(value)
+            self._windows[window_seconds] = stats
+            self.retention_seconds = max(self.retention_seconds, window_seconds)
+        return stats
+
+    def append(self, timestamp: float, value: float):
+        """追加新值，O(1) 更新各窗口统计与 EWMA"""
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            timestamp = self._timestamps[-1]
+        self._timestamps.append(timestamp)
+        self._values.append(value)
+        for stats in self._windows.values():
+            stats.add(value)
+            if stats.count > stats.max_points:
+                stats.remove(self._values[stats.head])
+                stats.head += 1
+
+        self.forecast = self.ewma
+        self.forecast_std = math.sqrt(self.ewm_variance)
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            # 指数加权均值与方差（West 增量公式）
+            diff = value - self.ewma
+            increment = self.ewma_alpha * diff
+            self.ewma += increment
+            self.ewm_variance = (1 - self.ewma_alpha) * (self.ewm_variance + diff * increment)
+        self.updates += 1
+
+    def evict(self, now: float):
+        """按窗口与保留时长淘汰过期值"""
+        for stats in self._windows.values():
+            cutoff = now - stats.window_seconds
+            while stats.head < len(self._values) and self._timestamps[stats.head] < cutoff:
+                stats.remove(self._values[stats.head])
+                stats.head += 1
+
+        cutoff = now - self.retention_seconds
+        head = self._head
+        while head < len(self._values) - 1 and self._timestamps[head] < cutoff:
+            head += 1
+        self._head = head
+        if head > 1024 and head * 2 > len(self._values):
+            # 压缩已淘汰的前缀
+            self._timestamps = self._timestamps[head:]
+            self._values = self._values[head:]
+            for stats in self._windows.values():
+                stats.head -= head
+            self._head = 0
+
+    def value_at(self, timestamp: float) -> Optional[float]:
+        """不晚于给定时间的最近一个值"""
+        index = bisect_right(self._timestamps, timestamp, lo=self._head) - 1
+        return self._values[index] if index >= self._head else None
+
+    def window_values(self, window_seconds: float, now: Optional[float] = None) -> np.ndarray:
+        stats = self.window(window_seconds, now)
+        return np.asarray(self._values[stats.head:], dtype=float)
+
+    def quantiles(self, window_seconds: float, qs: List[float], now: Optional[float] = None) -> np.ndarray:
+        """窗口内的分位数（有序副本只在首次查询时排序一次）"""
+        stats = self.window(window_seconds, now)
+        if stats.sorted_values is None:
+            stats.sorted_values = sorted(self._values[stats.head:])
+        return stats.quantiles(qs)
+
+
+class ModelCache:
+    """已训练模型缓存（按间隔或新增点数重训）"""
+
+    def __init__(self, retrain_interval: float = ALERT_MODEL_RETRAIN_INTERVAL,
+                 retrain_points: int = ALERT_MODEL_RETRAIN_POINTS):
+        self.retrain_interval = retrain_interval
+        self.retrain_points = retrain_points
+        # key -> (模型, 训练时间, 训练时的 series.updates)
+        self._models: Dict[Any, Tuple[Any, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, updates: int, train: Callable[[], Any]) -> Any:
+        """
+        获取模型，不存在或需要重训时调用 train
+
+        Args:
+            key: 模型键（如 (metric_id, algorithm, window, sensitivity)）
+            updates: 指标当前累计更新次数
+            train: 训练函数
+        """
+        with self._lock:
+            entry = self._models.get(key)
+        now = time.time()
+        if entry is not None:
+            model, trained_at, trained_updates = entry
+            if now - trained_at < self.retrain_interval and updates - trained_updates < self.retrain_points:
+                return model
+
+        model = train()
+        with self._lock:
+            self._models[key] = (model, now, updates)
+        return model
+
+    def discard(self, keep: Callable[[Any], bool]):
+        with self._lock:
+            for key in [k for k in self._models if not keep(k)]:
+                del self._models[key]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+class DetectorStateStore:
+    """全部指标的检测器状态（按 MonitoringMetricValue.id 水位增量同步）"""
+
+    def __init__(self, id_lag: int = ALERT_SYNC_ID_LAG):
+        self._series: Dict[str, MetricSeries] = {}
+        self._last_id = 0
+        self.id_lag = id_lag
+        # 回扫范围内已处理过的 id
+        self._recent_ids: set = set()
+        self.models = ModelCache()
+        self._lock = threading.RLock()
+
+    def series(self, metric_id: str) -> Optional[MetricSeries]:
+        return self._series.get(metric_id)
+
+    def sync(self, db, retention: Dict[str, float], now: Optional[datetime] = None) -> int:
+        """
+        增量同步指标值
+
+        首次出现的指标按保留时长回填一次，之后读取 id 大于 (水位 - id_lag) 的行，
+        跳过已处理过的 id：晚于更大 id 提交的行在下一次同步时补读。
+
+        Args:
+            db: 数据库会话
+            retention: {metric_id: 需要保留的历史时长（秒）}
+            now: 当前时间（UTC）
+
+        Returns:
+            本次读取的指标值数量
+        """
+        from sqlalchemy import func
+        from models.data_monitoring import MonitoringMetricValue
+
+        now_ts = to_epoch(now or datetime.utcnow())
+        loaded = 0
+        with self._lock:
+            for metric_id in [m for m in self._series if m not in retention]:
+                del self._series[metric_id]
+            self.models.discard(lambda key: key[0] in retention)
+
+            new_metrics = []
+            for metric_id, seconds in retention.items():
+                series = self._series.get(metric_id)
+                if series is None:
+                    new_metrics.append(metric_id)
+                elif seconds > series.retention_seconds:
+                    # 需要更长的历史，重新回填
+                    del self._series[metric_id]
+                    new_metrics.append(metric_id)
+
+            if self._last_id == 0:
+                self._last_id = db.query(
+                    MonitoringMetricValue.id
+                ).order_by(MonitoringMetricValue.id.desc()).limit(1).scalar() or 0
+
+            if new_metrics:
+                start = _EPOCH + timedelta(seconds=now_ts - max(retention[m] for m in new_metrics))
+                columns = (
+                    MonitoringMetricValue.id, MonitoringMetricValue.metric_id,
+                    MonitoringMetricValue.timestamp, MonitoringMetricValue.value,
+                )
+                window_rows = db.query(*columns).filter(
+                    MonitoringMetricValue.metric_id.in_(new_metrics),
+                    MonitoringMetricValue.timestamp >= start,
+                    MonitoringMetricValue.id <= self._last_id,
+                ).all()
+                # 每个指标的最新值（可能早于回填窗口，阈值检测仍需要）
+                latest_ids = db.query(func.max(MonitoringMetricValue.id)).filter(
+                    MonitoringMetricValue.metric_id.in_(new_metrics),
+                    MonitoringMetricValue.id <= self._last_id,
+                ).group_by(MonitoringMetricValue.metric_id)
+                latest_rows = db.query(*columns).filter(MonitoringMetricValue.id.in_(latest_ids)).all()
+
+                rows = {row[0]: row for row in window_rows + latest_rows}
+                # 回扫范围内的行已由回填覆盖（或早于回填窗口），之后不再追加
+                self._recent_ids.update(row_id for (row_id,) in db.query(MonitoringMetricValue.id).filter(
+                    MonitoringMetricValue.metric_id.in_(new_metrics),
+                    MonitoringMetricValue.id > self._last_id - self.id_lag,
+                    MonitoringMetricValue.id <= self._last_id,
+                ))
+                for metric_id in new_metrics:
+                    self._series[metric_id] = MetricSeries(retention[metric_id])
+                for _, metric_id, timestamp, value in sorted(
+                    (row for row in rows.values() if row[2] is not None and row[3] is not None),
+                    key=lambda row: (row[2], row[0]),
+                ):
+                    self._series[metric_id].append(to_epoch(timestamp), value)
+                loaded += len(rows)
+
+            rows = db.query(
+                MonitoringMetricValue.id, MonitoringMetricValue.metric_id,
+                MonitoringMetricValue.timestamp, MonitoringMetricValue.value,
+            ).filter(
+                MonitoringMetricValue.id > self._last_id - self.id_lag
+            ).order_by(MonitoringMetricValue.id).all()
+            for row_id, metric_id, timestamp, value in rows:
+                if row_id in self._recent_ids:
+                    continue
+                self._recent_ids.add(row_id)
+                self._last_id = max(self._last_id, row_id)
+                loaded += 1
+                series = self._series.get(metric_id)
+                if series is not None and timestamp is not None and value is not None:
+                    series.append(to_epoch(timestamp), value)
+            floor = self._last_id - self.id_lag
+            self._recent_ids = {row_id for row_id in self._recent_ids if row_id > floor}
+
+            for series in self._series.values():
+                series.evict(now_ts)
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._last_id = 0
+            self._recent_ids.clear()
+            self.models.clear()
+
+
+_detector_state_store: Optional[DetectorStateStore] = None
+
+
+def get_detector_state_store() -> DetectorStateStore:
+    """获取检测器状态存储单例"""
+    global _detector_state_store
+    if _detector_state_store is None:
+        _detector_state_store = DetectorStateStore()
+    return _detector_state_store
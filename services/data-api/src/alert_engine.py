@@ -5,13 +5,18 @@ P6.2: 智能预警推送
 支持三种检测类型:
 - threshold: 阈值检测（大于、小于、等于）
 - change_rate: 变化率检测（环比、同比）
-- anomaly: 异常检测（Z-Score、孤立森林）
+- anomaly: 异常检测（Z-Score、EWMA、滑动分位数、孤立森林）
+
+批量检测（check_all_enabled_rules）基于 DetectorStateStore 的增量滚动统计，
+所有启用规则按条件类型分组，对最新值做一次向量化计算。
 """
 
 import logging
 import uuid
 import asyncio
 from datetime import datetime, timedelta
+from functools import lru_cache
+from statistics import NormalDist
 from typing import Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -20,8 +25,16 @@ import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+try:
+    from src.alert_detectors import DetectorStateStore, get_detector_state_store, to_epoch
+except ImportError:
+    from alert_detectors import DetectorStateStore, get_detector_state_store, to_epoch
+
 logger = logging.getLogger(__name__)
 
+# 异常检测所需的最少历史点数
+MIN_ANOMALY_POINTS = 10
+
 
 class ConditionType(str, Enum):
     """条件类型枚举"""
@@ -40,6 +53,22 @@ class Operator(str, Enum):
     NEQ = "neq"    # 不等于
 
 
+# 运算符 -> 向量化比较函数（标量同样适用）
+OPERATOR_FUNCS = {
+    Operator.GT.value: np.greater,
+    Operator.GTE.value: np.greater_equal,
+    Operator.LT.value: np.less,
+    Operator.LTE.value: np.less_equal,
+    Operator.EQ.value: np.equal,
+    Operator.NEQ.value: np.not_equal,
+}
+
+OPERATOR_TEXT = {
+    "gt": "大于", "gte": "大于等于", "lt": "小于",
+    "lte": "小于等于", "eq": "等于", "neq": "不等于"
+}
+
+
 @dataclass
 class AlertResult:
     """告警检测结果"""
@@ -56,11 +85,18 @@ def generate_id(prefix: str = "") -> str:
     return f"{prefix}{uuid.uuid4().hex[:12]}"
 
 
+@lru_cache(maxsize=64)
+def z_threshold(sensitivity: float) -> float:
+    """sensitivity 转换为双侧 Z-Score 阈值（0.95 -> ~1.96, 0.99 -> ~2.58）"""
+    return NormalDist().inv_cdf((1 + sensitivity) / 2)
+
+
 class AlertEngine:
     """智能预警引擎"""
 
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, state_store: DetectorStateStore = None):
         self.db = db_session
+        self.state_store = state_store or get_detector_state_store()
 
     def check_metric_rule(self, rule, current_value: float = None) -> AlertResult:
         """
@@ -73,7 +109,7 @@ class AlertEngine:
         Returns:
             AlertResult: 检测结果
         """
-        from models.data_monitoring import MetricValue
+        from models.data_monitoring import MonitoringMetricValue as MetricValue
 
         # 获取当前指标值
         if current_value is None:
@@ -118,30 +154,14 @@ class AlertEngine:
         operator = config.get("operator", "gt")
         threshold = config.get("value", 0)
 
-        should_alert = False
-        if operator == Operator.GT:
-            should_alert = current_value > threshold
-        elif operator == Operator.GTE:
-            should_alert = current_value >= threshold
-        elif operator == Operator.LT:
-            should_alert = current_value < threshold
-        elif operator == Operator.LTE:
-            should_alert = current_value <= threshold
-        elif operator == Operator.EQ:
-            should_alert = current_value == threshold
-        elif operator == Operator.NEQ:
-            should_alert = current_value != threshold
-
-        operator_text = {
-            "gt": "大于", "gte": "大于等于", "lt": "小于",
-            "lte": "小于等于", "eq": "等于", "neq": "不等于"
-        }
+        compare = OPERATOR_FUNCS.get(operator)
+        should_alert = bool(compare(current_value, threshold)) if compare else False
 
         return AlertResult(
             should_alert=should_alert,
             current_value=current_value,
             threshold_value=threshold,
-            message=f"当前值 {current_value} {operator_text.get(operator, operator)} 阈值 {threshold}"
+            message=f"当前值 {current_value} {OPERATOR_TEXT.get(operator, operator)} 阈值 {threshold}"
         )
 
     def _check_change_rate(self, metric_id: str, current_value: float, config: dict) -> AlertResult:
@@ -154,7 +174,7 @@ class AlertEngine:
             "value": 0.2  # 20%
         }
         """
-        from models.data_monitoring import MetricValue
+        from models.data_monitoring import MonitoringMetricValue as MetricValue
 
         period = config.get("period", "1h")
         operator = config.get("operator", "gt")
@@ -203,8 +223,10 @@ class AlertEngine:
             "sensitivity": 0.95,
             "window": "24h"
         }
+
+        批量检测（evaluate_rules）另支持 ewma、quantile 两种算法。
         """
-        from models.data_monitoring import MetricValue
+        from models.data_monitoring import MonitoringMetricValue as MetricValue
 
         algorithm = config.get("algorithm", "zscore")
         sensitivity = config.get("sensitivity", 0.95)
@@ -221,7 +243,7 @@ class AlertEngine:
 
         values = [v[0] for v in historical_values]
 
-        if len(values) < 10:
+        if len(values) < MIN_ANOMALY_POINTS:
             return AlertResult(
                 should_alert=False,
                 current_value=current_value,
@@ -253,19 +275,15 @@ class AlertEngine:
             )
 
         z_score = abs((current_value - mean) / std)
+        threshold = z_threshold(sensitivity)
 
-        # sensitivity 转换为 Z-Score 阈值
-        # 0.95 -> ~2.0, 0.99 -> ~2.58
-        from scipy import stats
-        z_threshold = stats.norm.ppf((1 + sensitivity) / 2)
-
-        should_alert = z_score > z_threshold
+        should_alert = z_score > threshold
 
         return AlertResult(
             should_alert=should_alert,
             current_value=current_value,
             anomaly_score=z_score,
-            message=f"Z-Score: {z_score:.2f}，阈值: {z_threshold:.2f}"
+            message=f"Z-Score: {z_score:.2f}，阈值: {threshold:.2f}"
         )
 
     def _isolation_forest_detection(self, current_value: float, historical_values: List[float],
@@ -409,20 +427,30 @@ class AlertEngine:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
 
+            # 同一指标上同时触发的多条规则视为同一事件，在合并窗口内每个接收方只收到一条合并通知
+            extra = {
+                "alert_id": alert.alert_id,
+                "severity": alert.severity,
+                "rule_id": rule.rule_id,
+                "digest_key": f"metric:{rule.metric_id}",
+            }
+            pairs = [(channel, target) for channel in channels for target in targets]
+
             try:
-                for channel in channels:
-                    for target in targets:
-                        result = loop.run_until_complete(
-                            service.send(channel, target, title, message, {
-                                "alert_id": alert.alert_id,
-                                "severity": alert.severity,
-                                "rule_id": rule.rule_id
-                            })
-                        )
-                        if result.success:
-                            logger.info(f"通知发送成功: {channel} -> {target}")
-                        else:
-                            logger.warning(f"通知发送失败: {channel} -> {target}: {result.error}")
+                results = loop.run_until_complete(asyncio.gather(*[
+                    service.send(channel, target, title, message, extra)
+                    for channel, target in pairs
+                ]))
+                for (channel, target), result in zip(pairs, results):
+                    response_data = result.response_data or {}
+                    if result.success and response_data.get("digested"):
+                        logger.info(f"通知已加入合并队列: {channel} -> {target}")
+                    elif result.success and response_data.get("suppressed"):
+                        logger.info(f"重复通知已忽略: {channel} -> {target}")
+                    elif result.success:
+                        logger.info(f"通知发送成功: {channel} -> {target}")
+                    else:
+                        logger.warning(f"通知发送失败: {channel} -> {target}: {result.error}")
             finally:
                 loop.close()
 
@@ -506,11 +534,18 @@ class AlertEngine:
             MetricAlertRule.is_enabled == True
         ).all()
 
+        try:
+            results = self.evaluate_rules(rules)
+        except Exception as e:
+            logger.error(f"批量检测规则时发生错误: {e}")
+            return []
+
         triggered_alerts = []
 
-        for rule in rules:
+        for rule, result in zip(rules, results):
+            if result is None:
+                continue
             try:
-                result = self.check_metric_rule(rule)
                 if result.should_alert and rule.can_trigger():
                     alert_id = self.trigger_alert(rule, result)
                     if alert_id:
@@ -520,6 +555,295 @@ class AlertEngine:
 
         return triggered_alerts
 
+    # ==================== 批量检测 ====================
+
+    def _rule_retention(self, rule) -> float:
+        """规则需要保留的指标历史时长（秒）"""
+        config = rule.condition_config or {}
+        if rule.condition_type == ConditionType.CHANGE_RATE:
+            # 保留两个周期，保证能找到不晚于 (now - period) 的历史值
+            return 2 * self._parse_period(config.get("period", "1h")).total_seconds()
+        if rule.condition_type == ConditionType.ANOMALY:
+            return self._parse_period(config.get("window", "24h")).total_seconds()
+        return 0.0
+
+    def evaluate_rules(self, rules: List, now: datetime = None) -> List[Optional[AlertResult]]:
+        """
+        批量检测规则
+
+        先按 MonitoringMetricValue.id 水位增量同步所有相关指标，再按条件类型分组，
+        对各规则指标的最新值做向量化计算。
+
+        Args:
+            rules: MetricAlertRule 列表
+            now: 当前时间（UTC）
+
+        Returns:
+            与 rules 一一对应的检测结果（检测出错的规则为 None）
+        """
+        now = now or datetime.utcnow()
+        now_ts = to_epoch(now)
+
+        retention: Dict[str, float] = {}
+        for rule in rules:
+            if rule.metric_id:
+                retention[rule.metric_id] = max(retention.get(rule.metric_id, 0.0), self._rule_retention(rule))
+        self.state_store.sync(self.db, retention, now)
+
+        results: List[Optional[AlertResult]] = [None] * len(rules)
+        current = np.zeros(len(rules))
+        groups: Dict[str, List[int]] = {}
+
+        for i, rule in enumerate(rules):
+            series = self.state_store.series(rule.metric_id) if rule.metric_id else None
+            latest = series.latest if series is not None else None
+            if latest is None:
+                results[i] = AlertResult(should_alert=False, current_value=0, message="无法获取指标值")
+                continue
+            current[i] = latest[1]
+
+            condition_type = rule.condition_type
+            if condition_type == ConditionType.ANOMALY:
+                algorithm = (rule.condition_config or {}).get("algorithm", "zscore")
+                groups.setdefault(f"anomaly:{algorithm}", []).append(i)
+            elif condition_type in (ConditionType.THRESHOLD, ConditionType.CHANGE_RATE):
+                groups.setdefault(condition_type, []).append(i)
+            else:
+                results[i] = AlertResult(
+                    should_alert=False,
+                    current_value=float(current[i]),
+                    message=f"未知的条件类型: {condition_type}"
+                )
+
+        handlers = {
+            ConditionType.THRESHOLD.value: self._batch_threshold,
+            ConditionType.CHANGE_RATE.value: self._batch_change_rate,
+            "anomaly:zscore": self._batch_zscore,
+            "anomaly:ewma": self._batch_ewma,
+            "anomaly:quantile": self._batch_quantile,
+            "anomaly:isolation_forest": self._batch_isolation_forest,
+        }
+        for group, indexes in groups.items():
+            handler = handlers.get(group)
+            group_rules = [rules[i] for i in indexes]
+            try:
+                if handler is None:
+                    algorithm = group.split(":", 1)[1]
+                    group_results = [
+                        AlertResult(
+                            should_alert=False,
+                            current_value=float(current[i]),
+                            message=f"未知的异常检测算法: {algorithm}"
+                        )
+                        for i in indexes
+                    ]
+                else:
+                    group_results = handler(group_rules, current[indexes], now_ts)
+            except Exception as e:
+                logger.error(f"批量检测 {group} 规则时发生错误: {e}")
+                continue
+            for i, result in zip(indexes, group_results):
+                results[i] = result
+
+        return results
+
+    def _batch_threshold(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量阈值检测"""
+        configs = [rule.condition_config or {} for rule in rules]
+        operators = np.array([config.get("operator", "gt") for config in configs], dtype=object)
+        thresholds = np.array([config.get("value", 0) for config in configs], dtype=float)
+
+        alerts = np.zeros(len(rules), dtype=bool)
+        for operator, compare in OPERATOR_FUNCS.items():
+            mask = operators == operator
+            if mask.any():
+                alerts[mask] = compare(values[mask], thresholds[mask])
+
+        return [
+            AlertResult(
+                should_alert=bool(alerts[i]),
+                current_value=float(values[i]),
+                threshold_value=config.get("value", 0),
+                message=f"当前值 {float(values[i])} {OPERATOR_TEXT.get(operators[i], operators[i])} "
+                        f"阈值 {config.get('value', 0)}"
+            )
+            for i, config in enumerate(configs)
+        ]
+
+    def _batch_change_rate(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量变化率检测"""
+        configs = [rule.condition_config or {} for rule in rules]
+        periods = [config.get("period", "1h") for config in configs]
+        operators = np.array([config.get("operator", "gt") for config in configs], dtype=object)
+        thresholds = np.array([config.get("value", 0.1) for config in configs], dtype=float)
+
+        historical = np.array([
+            self.state_store.series(rule.metric_id).value_at(
+                now_ts - self._parse_period(period).total_seconds()
+            )
+            for rule, period in zip(rules, periods)
+        ], dtype=float)  # None -> nan
+        valid = ~np.isnan(historical) & (historical != 0)
+
+        rates = np.zeros(len(rules))
+        rates[valid] = (values[valid] - historical[valid]) / np.abs(historical[valid])
+        magnitude = np.abs(rates)
+        alerts = np.where(
+            operators == Operator.GT.value, magnitude > thresholds,
+            np.where(operators == Operator.LT.value, magnitude < thresholds, False)
+        ) & valid
+
+        results = []
+        for i, period in enumerate(periods):
+            if not valid[i]:
+                results.append(AlertResult(
+                    should_alert=False,
+                    current_value=float(values[i]),
+                    message=f"无法获取 {period} 前的历史数据"
+                ))
+                continue
+            results.append(AlertResult(
+                should_alert=bool(alerts[i]),
+                current_value=float(values[i]),
+                threshold_value=float(historical[i]),
+                change_rate=float(rates[i]),
+                message=f"变化率 {rates[i]:.2%}，阈值 {thresholds[i]:.2%}"
+            ))
+        return results
+
+    def _anomaly_windows(self, rules: List, now_ts: float):
+        """异常检测规则的 (配置, 窗口统计, 灵敏度数组)"""
+        configs = [rule.condition_config or {} for rule in rules]
+        windows = [
+            self.state_store.series(rule.metric_id).window(
+                self._parse_period(config.get("window", "24h")).total_seconds(), now_ts
+            )
+            for rule, config in zip(rules, configs)
+        ]
+        sensitivities = np.array([config.get("sensitivity", 0.95) for config in configs], dtype=float)
+        return configs, windows, sensitivities
+
+    def _insufficient(self, value: float) -> AlertResult:
+        return AlertResult(
+            should_alert=False,
+            current_value=value,
+            message="历史数据不足，无法进行异常检测"
+        )
+
+    def _batch_zscore(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量 Z-Score 检测（窗口内 Welford 均值/标准差）"""
+        _, windows, sensitivities = self._anomaly_windows(rules, now_ts)
+        counts = np.array([w.count for w in windows])
+        means = np.array([w.mean for w in windows])
+        stds = np.array([w.std for w in windows])
+        thresholds = np.array([z_threshold(float(s)) for s in sensitivities])
+
+        scores = np.divide(np.abs(values - means), stds, out=np.zeros(len(rules)), where=stds > 0)
+        alerts = scores > thresholds
+
+        results = []
+        for i in range(len(rules)):
+            value = float(values[i])
+            if counts[i] < MIN_ANOMALY_POINTS:
+                results.append(self._insufficient(value))
+            elif stds[i] == 0:
+                results.append(AlertResult(
+                    should_alert=False,
+                    current_value=value,
+                    message="标准差为0，无法计算Z-Score"
+                ))
+            else:
+                results.append(AlertResult(
+                    should_alert=bool(alerts[i]),
+                    current_value=value,
+                    anomaly_score=float(scores[i]),
+                    message=f"Z-Score: {scores[i]:.2f}，阈值: {thresholds[i]:.2f}"
+                ))
+        return results
+
+    def _batch_ewma(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量 EWMA 偏离检测（最新值相对到达前 EWMA 预测的偏离）"""
+        series = [self.state_store.series(rule.metric_id) for rule in rules]
+        sensitivities = np.array([(rule.condition_config or {}).get("sensitivity", 0.95) for rule in rules])
+        forecasts = np.array([s.forecast if s.forecast is not None else np.nan for s in series], dtype=float)
+        stds = np.array([s.forecast_std for s in series], dtype=float)
+        updates = np.array([s.updates for s in series])
+        thresholds = np.array([z_threshold(float(s)) for s in sensitivities])
+
+        valid = (updates > MIN_ANOMALY_POINTS) & (stds > 0)
+        scores = np.divide(np.abs(values - forecasts), stds, out=np.zeros(len(rules)), where=valid)
+        alerts = valid & (scores > thresholds)
+
+        return [
+            AlertResult(
+                should_alert=bool(alerts[i]),
+                current_value=float(values[i]),
+                threshold_value=float(forecasts[i]),
+                anomaly_score=float(scores[i]),
+                message=f"EWMA 偏离: {scores[i]:.2f}，阈值: {thresholds[i]:.2f}"
+            ) if valid[i] else self._insufficient(float(values[i]))
+            for i in range(len(rules))
+        ]
+
+    def _batch_quantile(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量滑动分位数检测（最新值超出窗口内 [(1-s)/2, (1+s)/2] 分位区间）"""
+        configs, windows, sensitivities = self._anomaly_windows(rules, now_ts)
+        bounds = np.full((len(rules), 2), np.nan)
+        for i, (rule, config, window) in enumerate(zip(rules, configs, windows)):
+            if window.count >= MIN_ANOMALY_POINTS:
+                tail = (1 - sensitivities[i]) / 2
+                bounds[i] = self.state_store.series(rule.metric_id).quantiles(
+                    window.window_seconds, [tail, 1 - tail], now_ts
+                )
+        valid = ~np.isnan(bounds[:, 0])
+        alerts = valid & ((values < bounds[:, 0]) | (values > bounds[:, 1]))
+
+        return [
+            AlertResult(
+                should_alert=bool(alerts[i]),
+                current_value=float(values[i]),
+                message=f"分位区间: [{bounds[i, 0]:.4g}, {bounds[i, 1]:.4g}]"
+            ) if valid[i] else self._insufficient(float(values[i]))
+            for i in range(len(rules))
+        ]
+
+    def _batch_isolation_forest(self, rules: List, values: np.ndarray, now_ts: float) -> List[AlertResult]:
+        """批量孤立森林检测（模型按指标缓存，定期重训）"""
+        try:
+            from sklearn.ensemble import IsolationForest
+        except ImportError:
+            logger.warning("sklearn not installed, falling back to zscore")
+            return self._batch_zscore(rules, values, now_ts)
+
+        configs, windows, sensitivities = self._anomaly_windows(rules, now_ts)
+        results = []
+        for i, (rule, config, window) in enumerate(zip(rules, configs, windows)):
+            value = float(values[i])
+            if window.count < MIN_ANOMALY_POINTS:
+                results.append(self._insufficient(value))
+                continue
+
+            series = self.state_store.series(rule.metric_id)
+            sensitivity = float(sensitivities[i])
+
+            def train(series=series, window=window, sensitivity=sensitivity):
+                X = series.window_values(window.window_seconds, now_ts).reshape(-1, 1)
+                return IsolationForest(contamination=1 - sensitivity, random_state=42).fit(X)
+
+            model = self.state_store.models.get(
+                (rule.metric_id, "isolation_forest", window.window_seconds, sensitivity),
+                series.updates, train,
+            )
+            prediction = model.predict([[value]])[0]
+            anomaly_score = -model.score_samples([[value]])[0]
+            results.append(AlertResult(
+                should_alert=bool(prediction == -1),
+                current_value=value,
+                anomaly_score=float(anomaly_score),
+                message=f"孤立森林异常分数: {anomaly_score:.4f}"
+            ))
+        return results
+
 
 def get_alert_engine(db_session: Session) -> AlertEngine:
     """获取告警引擎实例"""
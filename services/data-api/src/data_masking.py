@@ -16,11 +16,19 @@ import os
 import re
 import secrets
 import base64
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass, field
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # 加密密钥（生产环境应从安全存储获取）
@@ -270,6 +278,108 @@ DEFAULT_MASKING_RULES = [
 ]
 
 
+# 脱敏计划缓存条数上限
+MASKING_PLAN_CACHE_SIZE = int(os.getenv("MASKING_PLAN_CACHE_SIZE", "256"))
+
+# 列函数：输入一列值，输出等长的脱敏结果
+ColumnKernel = Callable[[List[Any]], List[Any]]
+
+
+class MaskingPlan:
+    """
+    编译后的脱敏计划
+
+    针对一个结果集结构预先解析好每列的列函数，不需要脱敏的列为 None 直接跳过。
+    执行时按列处理，规则匹配与策略分派只在编译时做一次，而不是每个单元格一次。
+    """
+
+    def __init__(
+        self,
+        kernels: Dict[str, Optional[ColumnKernel]],
+        compile_column: Callable[[str], Optional[ColumnKernel]] = None,
+    ):
+        """
+        Args:
+            kernels: 列名 -> 列函数（None 表示不脱敏）
+            compile_column: 遇到计划外的列时用于补充编译
+        """
+        self.kernels = dict(kernels)
+        self._compile_column = compile_column
+
+    @property
+    def masked_columns(self) -> List[str]:
+        """需要脱敏的列"""
+        return [name for name, kernel in self.kernels.items() if kernel is not None]
+
+    def _kernel(self, column: str) -> Optional[ColumnKernel]:
+        if column not in self.kernels:
+            self.kernels[column] = self._compile_column(column) if self._compile_column else None
+        return self.kernels[column]
+
+    def apply(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按列执行脱敏，返回新的行列表（不修改输入）"""
+        if not rows:
+            return []
+
+        masked = [dict(row) for row in rows]
+        first_keys = rows[0].keys()
+
+        if all(row.keys() == first_keys for row in rows):
+            for column in first_keys:
+                kernel = self._kernel(column)
+                if kernel is None:
+                    continue
+                for target, value in zip(masked, kernel([row[column] for row in rows])):
+                    target[column] = value
+            return masked
+
+        # 行结构不一致：逐列收集包含该列的行
+        columns = dict.fromkeys(key for row in rows for key in row)
+        for column in columns:
+            kernel = self._kernel(column)
+            if kernel is None:
+                continue
+            indexes = [i for i, row in enumerate(rows) if column in row]
+            values = kernel([rows[i][column] for i in indexes])
+            for i, value in zip(indexes, values):
+                masked[i][column] = value
+        return masked
+
+    def apply_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """对单行执行脱敏"""
+        return self.apply([row])[0]
+
+
+class _PlanCache:
+    """线程安全的 LRU 脱敏计划缓存"""
+
+    def __init__(self, max_entries: int = MASKING_PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[Any, MaskingPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compile(self, key: Any, compile_plan: Callable[[], MaskingPlan]) -> MaskingPlan:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        plan = compile_plan()
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._plans)
+
+
 class DataMaskingService:
     """数据脱敏服务"""
 
@@ -302,6 +412,18 @@ class DataMaskingService:
             MaskingStrategy.PRESERVE_FORMAT: self._preserve_format,
         }
 
+        # 可按列批量执行的策略（其余策略逐值调用处理器）
+        self._kernel_builders: Dict[MaskingStrategy, Callable] = {
+            MaskingStrategy.PARTIAL_MASK: self._partial_mask_kernel,
+            MaskingStrategy.FULL_MASK: self._full_mask_kernel,
+            MaskingStrategy.HASH: self._hash_mask_kernel,
+            MaskingStrategy.TRUNCATE_HASH: self._truncate_hash_kernel,
+            MaskingStrategy.NULLIFY: self._nullify_kernel,
+            MaskingStrategy.NUMBER_RANGE: self._number_range_kernel,
+        }
+
+        self._plan_cache = _PlanCache()
+
     def mask_value(
         self,
         value: Any,
@@ -379,20 +501,7 @@ class DataMaskingService:
         Returns:
             脱敏后的行数据
         """
-        masked_row = {}
-        column_metadata = column_metadata or {}
-
-        for col_name, value in row.items():
-            meta = column_metadata.get(col_name, {})
-            masked_row[col_name] = self.mask_value(
-                value=value,
-                column_name=col_name,
-                sensitivity_type=meta.get("sensitivity_type"),
-                sensitivity_level=meta.get("sensitivity_level"),
-                data_type=meta.get("data_type"),
-            )
-
-        return masked_row
+        return self.compile_plan(list(row), column_metadata).apply_row(row)
 
     def mask_dataframe(
         self,
@@ -409,7 +518,9 @@ class DataMaskingService:
         Returns:
             脱敏后的数据列表
         """
-        return [self.mask_row(row, column_metadata) for row in data]
+        if not data:
+            return []
+        return self.compile_plan(list(data[0]), column_metadata).apply(data)
 
     def create_masking_config(
         self,
@@ -501,6 +612,200 @@ class DataMaskingService:
                 return rule
         return None
 
+    # ===== 脱敏计划编译 =====
+
+    def compile_plan(
+        self,
+        columns: List[str],
+        column_metadata: Dict[str, Dict[str, Any]] = None,
+    ) -> MaskingPlan:
+        """
+        编译结果集的脱敏计划（按列结构、列元数据与规则集缓存）
+
+        Args:
+            columns: 结果集列名
+            column_metadata: 列元数据，格式同 mask_row
+
+        Returns:
+            脱敏计划
+        """
+        column_metadata = column_metadata or {}
+
+        def column_key(name: str) -> Tuple:
+            meta = column_metadata.get(name, {})
+            return (
+                name,
+                meta.get("sensitivity_type"),
+                meta.get("sensitivity_level"),
+                meta.get("data_type"),
+            )
+
+        def compile_column(name: str) -> Optional[ColumnKernel]:
+            meta = column_metadata.get(name, {})
+            rule = self._find_matching_rule(
+                name,
+                meta.get("sensitivity_type"),
+                meta.get("sensitivity_level"),
+                meta.get("data_type"),
+            )
+            if not rule:
+                return None
+            return self.compile_kernel(rule.strategy, rule.options, column_name=name)
+
+        key = (
+            tuple(column_key(name) for name in columns),
+            tuple((id(rule), rule.enabled) for rule in self.rules),
+        )
+        return self._plan_cache.get_or_compile(
+            key,
+            lambda: MaskingPlan(
+                {name: compile_column(name) for name in columns},
+                compile_column=compile_column,
+            ),
+        )
+
+    def clear_plan_cache(self) -> None:
+        """清空脱敏计划缓存（原地修改规则选项后调用）"""
+        self._plan_cache.clear()
+
+    def compile_kernel(
+        self,
+        strategy: MaskingStrategy,
+        options: Dict[str, Any] = None,
+        column_name: str = "",
+        safe: bool = True,
+    ) -> Optional[ColumnKernel]:
+        """
+        编译单列的列函数，结果与逐值调用 mask_value 一致
+
+        Args:
+            strategy: 脱敏策略
+            options: 策略选项
+            column_name: 列名（用于日志）
+            safe: 是否与规则路径一致，失败的值返回 "***"；
+                  False 时与 strategy_override 路径一致，异常直接抛出
+
+        Returns:
+            列函数，策略不可用时返回 None（不脱敏）
+        """
+        handler = self._strategy_handlers.get(strategy)
+        if not handler:
+            return None
+
+        options = dict(options or {})
+
+        def per_value(values: List[Any]) -> List[Any]:
+            return [None if v is None else handler(v, options) for v in values]
+
+        builder = self._kernel_builders.get(strategy)
+        kernel = (builder(options) if builder else None) or per_value
+
+        if not safe:
+            return kernel
+
+        def mask_one(value: Any) -> Any:
+            if value is None:
+                return None
+            try:
+                return handler(value, options)
+            except Exception as e:
+                logger.warning(f"脱敏失败 [{column_name}]: {e}")
+                return "***"
+
+        def safe_kernel(values: List[Any]) -> List[Any]:
+            try:
+                return kernel(values)
+            except Exception:
+                # 批量执行失败时逐值回退，单个失败值返回安全默认值
+                return [mask_one(v) for v in values]
+
+        return safe_kernel
+
+    # ===== 列函数（与对应的逐值处理器输出一致）=====
+
+    def _partial_mask_kernel(self, options: Dict[str, Any]) -> Optional[ColumnKernel]:
+        if options.get("email_mode"):
+            return None
+
+        mask_char = options.get("mask_char", "*")
+        keep_start = options.get("keep_start", 0)
+        keep_end = options.get("keep_end", 0)
+        max_visible = options.get("max_visible", None)
+
+        if max_visible is not None and max_visible == 0:
+            return lambda values: [
+                None if v is None else mask_char * min(len(str(v)), 8) for v in values
+            ]
+
+        keep = keep_start + keep_end
+
+        def mask(str_value: str) -> str:
+            total_len = len(str_value)
+            if keep >= total_len:
+                return str_value
+            head = str_value[:keep_start] + mask_char * (total_len - keep)
+            return head + str_value[total_len - keep_end:] if keep_end else head
+
+        return lambda values: [None if v is None else mask(str(v)) for v in values]
+
+    def _full_mask_kernel(self, options: Dict[str, Any]) -> ColumnKernel:
+        replacement = options.get("replacement", "******")
+        return lambda values: [None if v is None else replacement for v in values]
+
+    def _nullify_kernel(self, options: Dict[str, Any]) -> ColumnKernel:
+        return lambda values: [None] * len(values)
+
+    def _hash_mask_kernel(self, options: Dict[str, Any]) -> ColumnKernel:
+        digest = hashlib.md5 if options.get("algorithm", "sha256") == "md5" else hashlib.sha256
+        truncate = options.get("truncate", None) or None
+        secret = MASKING_SECRET_KEY.encode()
+        return lambda values: [
+            None if v is None else digest(str(v).encode() + secret).hexdigest()[:truncate]
+            for v in values
+        ]
+
+    def _truncate_hash_kernel(self, options: Dict[str, Any]) -> ColumnKernel:
+        hash_length = options.get("hash_length", 8)
+        prefix = options.get("prefix", "")
+        secret = MASKING_SECRET_KEY.encode()
+        return lambda values: [
+            None if v is None
+            else f"{prefix}{hashlib.sha256(str(v).encode() + secret).hexdigest()[:hash_length]}"
+            for v in values
+        ]
+
+    def _number_range_kernel(self, options: Dict[str, Any]) -> Optional[ColumnKernel]:
+        ranges = options.get("ranges", [(0, float('inf'), "数值")])
+        if not ranges:
+            return None
+        # numpy 会把标签统一成同一类型，仅在全部为字符串标签时走向量化路径
+        if not NUMPY_AVAILABLE or not all(isinstance(label, str) for _, _, label in ranges):
+            return None
+
+        def kernel(values: List[Any]) -> List[Any]:
+            result: List[Any] = [None] * len(values)
+            indexes, numbers = [], []
+            for i, v in enumerate(values):
+                if v is None:
+                    continue
+                try:
+                    numbers.append(float(v))
+                    indexes.append(i)
+                except (ValueError, TypeError):
+                    result[i] = str(v)
+            if numbers:
+                arr = np.asarray(numbers, dtype=float)
+                labels = np.select(
+                    [(arr >= low) & (arr < high) for low, high, _ in ranges],
+                    [label for _, _, label in ranges],
+                    default="其他",
+                )
+                for i, label in zip(indexes, labels.tolist()):
+                    result[i] = label
+            return result
+
+        return kernel
+
     # ===== 脱敏策略实现 =====
 
     def _partial_mask(self, value: Any, options: Dict[str, Any]) -> str:
@@ -849,6 +1154,16 @@ class DynamicMaskingService:
         },
     }
 
+    # 多角色用户取脱敏最宽松的角色
+    ROLE_PRIORITY = [
+        RoleType.ADMIN.value,
+        RoleType.DATA_OWNER.value,
+        RoleType.AUDITOR.value,
+        RoleType.ANALYST.value,
+        RoleType.REPORTER.value,
+        RoleType.GUEST.value,
+    ]
+
     def __init__(self, base_service: DataMaskingService = None):
         """
         初始化动态脱敏服务
@@ -869,6 +1184,9 @@ class DynamicMaskingService:
         # 条件脱敏规则
         self.conditional_rules: List[Dict[str, Any]] = []
 
+        # 按 (列结构, 角色, 策略版本) 缓存的脱敏计划
+        self._plan_cache = _PlanCache()
+
         # 初始化默认策略
         self._init_default_policy()
 
@@ -1002,15 +1320,10 @@ class DynamicMaskingService:
         if value is None:
             return None
 
-        policy = self.get_active_policy()
-        if not policy:
+        role_config = self._resolve_role_config(user_role)
+        if role_config is None:
             return value
 
-        role_config = policy.role_configs.get(user_role)
-        if not role_config:
-            # 未知角色，使用默认（访客级别）
-            role_config = self.DEFAULT_ROLE_CONFIGS.get(RoleType.GUEST.value)
-
         mask_level = role_config.get("mask_level", "partial")
 
         # 无脱敏（管理员、数据所有者）
@@ -1044,6 +1357,9 @@ class DynamicMaskingService:
         """
         对 SQL 查询结果进行实时脱敏
 
+        按 (列结构, 角色, 策略版本) 编译一次脱敏计划后按列执行；
+        角色脱敏只取决于角色配置，table_metadata 不参与计划编译。
+
         Args:
             result: SQL 查询结果
             user_role: 用户角色
@@ -1062,24 +1378,8 @@ class DynamicMaskingService:
         Returns:
             脱敏后的结果
         """
-        masked_result = []
-
-        for row in result:
-            masked_row = {}
-            for col_name, value in row.items():
-                # 查找列的元数据
-                col_meta = self._find_column_metadata(col_name, table_metadata)
-
-                masked_row[col_name] = self.mask_for_role(
-                    value=value,
-                    column_name=col_name,
-                    user_role=user_role,
-                    sensitivity_level=col_meta.get("sensitivity_level", "internal"),
-                    sensitivity_type=col_meta.get("sensitivity_type"),
-                    table_name=col_meta.get("table_name"),
-                    context=context,
-                )
-            masked_result.append(masked_row)
+        columns = list(result[0]) if result else []
+        masked_result = self.compile_role_plan(columns, user_role).apply(result)
 
         # 记录审计日志
         self._log_masking_operation(
@@ -1091,6 +1391,68 @@ class DynamicMaskingService:
 
         return masked_result
 
+    def _resolve_role_config(self, user_role: str) -> Optional[Dict[str, Any]]:
+        """解析角色配置，无激活策略时返回 None（不脱敏）"""
+        policy = self.get_active_policy()
+        if not policy:
+            return None
+
+        role_config = policy.role_configs.get(user_role)
+        if not role_config:
+            # 未知角色，使用默认（访客级别）
+            role_config = self.DEFAULT_ROLE_CONFIGS.get(RoleType.GUEST.value)
+        return role_config
+
+    def compile_role_plan(self, columns: List[str], user_role: str) -> MaskingPlan:
+        """
+        编译角色的脱敏计划，结果与逐值调用 mask_for_role 一致
+
+        角色脱敏只取决于角色配置，计划按 (列结构, 角色, 策略版本) 缓存，
+        策略更新或切换后自动重新编译。
+
+        Args:
+            columns: 结果集列名
+            user_role: 用户角色
+
+        Returns:
+            脱敏计划
+        """
+        policy = self.get_active_policy()
+        key = (
+            tuple(columns),
+            user_role,
+            (policy.policy_id, policy.version, policy.updated_at) if policy else None,
+        )
+
+        def compile_plan() -> MaskingPlan:
+            kernel = self._compile_role_kernel(self._resolve_role_config(user_role))
+            return MaskingPlan(
+                {name: kernel for name in columns},
+                compile_column=lambda name: kernel,
+            )
+
+        return self._plan_cache.get_or_compile(key, compile_plan)
+
+    def _compile_role_kernel(self, role_config: Optional[Dict[str, Any]]) -> Optional[ColumnKernel]:
+        """按角色配置编译列函数（与 mask_for_role 的分支一一对应）"""
+        if role_config is None:
+            return None
+
+        mask_level = role_config.get("mask_level", "partial")
+        if mask_level == "none":
+            return None
+        if mask_level == "full":
+            return self.base_service.compile_kernel(MaskingStrategy.FULL_MASK, safe=False)
+        if mask_level == "reversible":
+            return self.base_service.compile_kernel(MaskingStrategy.ENCRYPT, safe=False)
+
+        keep_chars = role_config.get("pii_keep_chars", 2)
+        return self.base_service.compile_kernel(
+            MaskingStrategy.PARTIAL_MASK,
+            {"keep_start": keep_chars, "keep_end": 0},
+            safe=False,
+        )
+
     def _find_column_metadata(
         self,
         column_name: str,
@@ -1406,6 +1768,97 @@ class DynamicMaskingService:
 
         return masked_data, allow_export
 
+    def stream_mask_for_export(
+        self,
+        batches: Iterable[List[Dict[str, Any]]],
+        user_role: str,
+        export_format: str = "csv",
+        table_name: str = None,
+        columns: List[str] = None,
+    ) -> Tuple[Iterator[bytes], bool]:
+        """
+        流式脱敏导出
+
+        行批次逐批经过编译好的脱敏计划，再由增量写入器编码输出，
+        内存占用只与单批大小有关。导出结束（或中断）时记录一次审计日志。
+
+        Args:
+            batches: 行批次迭代器（如 SQLExecutor.iter_batches）
+            user_role: 用户角色
+            export_format: 导出格式（csv, excel, json）
+            table_name: 表名（审计日志）
+            columns: 列名（结果为空时仍输出表头）
+
+        Returns:
+            (导出字节块迭代器, 是否允许导出)
+        """
+        try:
+            from src.export_writers import create_export_writer
+        except ImportError:
+            from export_writers import create_export_writer
+
+        policy = self.get_active_policy()
+        role_config = policy.role_configs.get(user_role, {}) if policy else {}
+        allow_export = role_config.get("allow_export", False)
+
+        writer = create_export_writer(export_format)
+        chunks = self._iter_masked_export(batches, user_role, writer, table_name, columns)
+        return chunks, allow_export
+
+    def _iter_masked_export(
+        self,
+        batches: Iterable[List[Dict[str, Any]]],
+        user_role: str,
+        writer,
+        table_name: Optional[str],
+        columns: Optional[List[str]],
+    ) -> Iterator[bytes]:
+        """逐批脱敏并编码，结束时记录审计日志"""
+        plan = None
+        record_count = 0
+        error_message = None
+        try:
+            for batch in batches:
+                if not batch:
+                    continue
+                if plan is None:
+                    columns = list(batch[0])
+                    plan = self.compile_role_plan(columns, user_role)
+                    yield writer.header(columns)
+                masked = plan.apply(batch)
+                record_count += len(masked)
+                yield writer.write(masked)
+
+            if plan is None:
+                yield writer.header(columns or [])
+            yield from writer.finish()
+        except GeneratorExit:
+            error_message = "export aborted"
+            raise
+        except Exception as e:
+            error_message = str(e)
+            raise
+        finally:
+            # 提前结束时关闭上游（如取消服务端查询）
+            close = getattr(batches, "close", None)
+            if close:
+                close()
+            self._log_masking_operation(
+                user_role=user_role,
+                table_name=table_name or "unknown",
+                operation="export",
+                record_count=record_count,
+                success=error_message is None,
+                error_message=error_message,
+            )
+
+    def resolve_role(self, roles: List[str]) -> str:
+        """从用户的角色列表中选出脱敏最宽松的已知角色，无已知角色时为访客"""
+        for role in self.ROLE_PRIORITY:
+            if role in roles:
+                return role
+        return RoleType.GUEST.value
+
     def create_masking_preview_for_role(
         self,
         sample_data: List[Dict[str, Any]],
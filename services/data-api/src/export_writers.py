@@ -0,0 +1,168 @@
+"""
+增量导出写入器
+
+把按批到达的行（字典列表）编码为 CSV / JSONL / XLSX 字节块，内存占用只与单批大小有关：
+
+- CSV / JSONL：每批编码后立即输出
+- XLSX：openpyxl write-only 模式逐行写入临时文件，结束时按块读出
+"""
+
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# 输出块大小（XLSX 读出临时文件时使用）
+EXPORT_CHUNK_BYTES = 1024 * 1024
+
+# 导出格式别名 -> 规范格式
+EXPORT_FORMATS = {
+    "csv": "csv",
+    "json": "jsonl",
+    "jsonl": "jsonl",
+    "excel": "xlsx",
+    "xlsx": "xlsx",
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class ExportWriter:
+    """增量导出写入器基类"""
+
+    format = ""
+
+    def __init__(self):
+        self.columns: List[str] = []
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self.format]
+
+    @property
+    def extension(self) -> str:
+        return self.format
+
+    def header(self, columns: List[str]) -> bytes:
+        """写入表头"""
+        self.columns = list(columns)
+        return b""
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        """写入一批行，返回可立即输出的字节"""
+        raise NotImplementedError
+
+    def finish(self) -> Iterator[bytes]:
+        """结束写入，输出剩余字节"""
+        return iter(())
+
+
+class CSVExportWriter(ExportWriter):
+    """CSV 写入器"""
+
+    format = "csv"
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = io.StringIO()
+        self._writer = None
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self, columns: List[str]) -> bytes:
+        super().header(columns)
+        self._writer = csv.DictWriter(self._buffer, fieldnames=self.columns, extrasaction="ignore")
+        self._writer.writeheader()
+        return self._drain()
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        self._writer.writerows(rows)
+        return self._drain()
+
+
+class JSONLExportWriter(ExportWriter):
+    """JSON Lines 写入器（每行一个 JSON 对象）"""
+
+    format = "jsonl"
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps(row, default=str, ensure_ascii=False) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+class XLSXExportWriter(ExportWriter):
+    """XLSX 写入器（openpyxl write-only 模式）"""
+
+    format = "xlsx"
+
+    def __init__(self, sheet_title: str = "export"):
+        if not OPENPYXL_AVAILABLE:
+            raise ValueError("XLSX export requires openpyxl")
+        super().__init__()
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(title=sheet_title)
+
+    def header(self, columns: List[str]) -> bytes:
+        super().header(columns)
+        self._sheet.append(self.columns)
+        return b""
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        for row in rows:
+            self._sheet.append([_xlsx_cell(row.get(col)) for col in self.columns])
+        return b""
+
+    def finish(self) -> Iterator[bytes]:
+        with tempfile.TemporaryFile() as output:
+            self._workbook.save(output)
+            output.seek(0)
+            while True:
+                chunk = output.read(EXPORT_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _xlsx_cell(value: Any) -> Any:
+    """openpyxl 不支持的类型转为字符串"""
+    if value is None or isinstance(value, (str, int, float, Decimal, datetime, date, time)):
+        return value
+    return str(value)
+
+
+def create_export_writer(export_format: str) -> ExportWriter:
+    """
+    按格式创建写入器
+
+    Args:
+        export_format: csv, json/jsonl, excel/xlsx
+
+    Raises:
+        ValueError: 未知格式或依赖缺失
+    """
+    fmt = EXPORT_FORMATS.get((export_format or "").lower())
+    if fmt == "csv":
+        return CSVExportWriter()
+    if fmt == "jsonl":
+        return JSONLExportWriter()
+    if fmt == "xlsx":
+        return XLSXExportWriter()
+    raise ValueError(f"Unknown export format: {export_format}")
@@ -4555,7 +4555,11 @@ def start_auto_scan():
         )
 
         with db_manager.get_session() as session:
-            progress = service.start_auto_scan(policy=policy, db_session=session)
+            progress = service.start_auto_scan(
+                policy=policy,
+                db_session=session,
+                resume=data.get("resume", False),
+            )
 
         return jsonify({
             "code": 0,
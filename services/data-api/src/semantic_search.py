@@ -12,7 +12,6 @@ Phase 4: 基于 Milvus 的向量语义检索
 import json
 import logging
 import os
-import hashlib
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
@@ -119,13 +118,28 @@ class SearchResult:
         }
 
 
+def _get_shared_embedding_cache():
+    """获取共享 Embedding 缓存（shared 模块不可用或缓存关闭时返回 None）"""
+    try:
+        from shared.embedding_cache import get_embedding_cache
+    except ImportError:
+        logger.warning("无法导入共享 Embedding 缓存，向量将不做缓存")
+        return None
+    try:
+        return get_embedding_cache()
+    except Exception as e:
+        logger.warning(f"共享 Embedding 缓存不可用: {e}")
+        return None
+
+
 class EmbeddingService:
     """向量嵌入服务"""
 
-    def __init__(self, api_url: str = None, model: str = None):
+    def __init__(self, api_url: str = None, model: str = None, embedding_cache=None):
         self.api_url = api_url or MODEL_API_URL
         self.model = model or EMBEDDING_MODEL
-        self._cache: Dict[str, List[float]] = {}
+        # 按 (模型, 归一化文本哈希) 寻址的共享缓存，与 agent-api 共用
+        self._cache = embedding_cache if embedding_cache is not None else _get_shared_embedding_cache()
 
     def get_embedding(self, text: str) -> Optional[List[float]]:
         """
@@ -137,48 +151,26 @@ class EmbeddingService:
         Returns:
             嵌入向量或 None
         """
-        # 检查缓存
-        cache_key = hashlib.md5(text.encode()).hexdigest()
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
-        try:
-            response = requests.post(
-                f"{self.api_url}/v1/embeddings",
-                json={
-                    "model": self.model,
-                    "input": text,
-                },
-                timeout=30,
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                embedding = data["data"][0]["embedding"]
-                # 缓存结果
-                self._cache[cache_key] = embedding
-                return embedding
-            else:
-                logger.warning(f"Embedding API 返回错误: {response.status_code}")
-                return None
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Embedding API 请求失败: {e}")
-            return None
-        except (KeyError, IndexError) as e:
-            logger.error(f"Embedding 响应解析失败: {e}")
-            return None
+        return self.get_embeddings_batch([text])[0]
 
     def get_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
         批量获取文本的向量嵌入
 
+        只有缓存未命中的文本会发送到 Embedding API。
+
         Args:
             texts: 输入文本列表
 
         Returns:
             嵌入向量列表
         """
+        if self._cache is None:
+            return self._request_embeddings(texts)
+        return self._cache.get_or_compute(self.model, texts, self._request_embeddings)
+
+    def _request_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """调用 Embedding API（分批请求，失败项为 None）"""
         results = []
         # 分批处理，避免单次请求过大
         batch_size = 10
@@ -209,8 +201,9 @@ class EmbeddingService:
         return results
 
     def clear_cache(self):
-        """清空缓存"""
-        self._cache.clear()
+        """清空本进程缓存"""
+        if self._cache is not None:
+            self._cache.clear_local()
 
 
 class SemanticSearchService:
@@ -13,11 +13,14 @@ import logging
 import os
 import re
 import time
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Set, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime
 import threading
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +62,8 @@ class QueryResult:
     warnings: List[str] = field(default_factory=list)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    datasource: str = "default"
+    cached: bool = False
 
 
 @dataclass
@@ -69,6 +74,9 @@ class QueryConfig:
     readonly: bool = True
     allow_temp_tables: bool = False
     user_id: Optional[str] = None
+    datasource: str = "default"
+    use_cache: bool = False
+    cache_ttl: Optional[int] = None
 
 
 class SQLSanitizer:
@@ -200,6 +208,310 @@ class SQLSanitizer:
         return True, None
 
 
+class QueryCancelled(Exception):
+    """查询被取消"""
+
+
+@dataclass
+class _RunningQuery:
+    """正在执行的查询（用于取消）"""
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    connection_id: Optional[int] = None
+    datasource: str = "default"
+
+
+DEFAULT_DATASOURCE = "default"
+
+
+@dataclass
+class DataSourceConfig:
+    """数据源连接配置"""
+    name: str
+    url: str
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    timeout_seconds: int = 30  # 新连接的默认 max_execution_time
+
+
+class EngineRegistry:
+    """
+    按数据源管理 SQLAlchemy 引擎
+
+    每个数据源独立的连接池；会话设置在建立连接时执行一次，并记录在
+    连接的 info 字典中，后续查询只在设置不同时才重新执行。
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, DataSourceConfig] = {}
+        self._engines: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, config: DataSourceConfig) -> None:
+        """注册或更新数据源（连接参数变化时释放旧连接池）"""
+        with self._lock:
+            old = self._configs.get(config.name)
+            self._configs[config.name] = config
+            if old is not None and old != config:
+                engine = self._engines.pop(config.name, None)
+                if engine is not None:
+                    engine.dispose()
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._configs.keys())
+
+    def get_config(self, name: str) -> DataSourceConfig:
+        config = self._configs.get(name)
+        if config is None:
+            raise ValueError(f"Unknown datasource: {name}")
+        return config
+
+    def get_engine(self, name: str = DEFAULT_DATASOURCE):
+        """获取（延迟创建）数据源引擎"""
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is None:
+                engine = self._create_engine(self.get_config(name))
+                self._engines[name] = engine
+        return engine
+
+    def _create_engine(self, config: DataSourceConfig):
+        try:
+            from sqlalchemy import create_engine, event
+        except ImportError:
+            raise ImportError("SQLAlchemy is required. Install with: pip install sqlalchemy")
+
+        engine = create_engine(
+            config.url,
+            pool_pre_ping=True,
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+            pool_timeout=config.pool_timeout,
+            execution_options={
+                "isolation_level": "AUTOCOMMIT"  # 只读模式
+            }
+        )
+
+        if engine.dialect.name == 'mysql':
+            timeout_ms = config.timeout_seconds * 1000
+
+            @event.listens_for(engine, "connect")
+            def _init_session(dbapi_conn, connection_record):
+                # 每个物理连接只执行一次：默认超时与连接 ID
+                cursor = dbapi_conn.cursor()
+                try:
+                    cursor.execute(f"SET SESSION max_execution_time = {int(timeout_ms)}")
+                    cursor.execute("SELECT CONNECTION_ID()")
+                    connection_record.info['connection_id'] = cursor.fetchone()[0]
+                    connection_record.info['timeout_ms'] = timeout_ms
+                finally:
+                    cursor.close()
+
+        logger.info(f"SQL engine created for datasource: {config.name}")
+        return engine
+
+    def dispose(self) -> None:
+        """释放所有连接池"""
+        with self._lock:
+            engines, self._engines = self._engines, {}
+        for engine in engines.values():
+            engine.dispose()
+
+
+# 用于提取 FROM / JOIN 后的表名（含逗号分隔的多表）
+_TABLE_REF_PATTERN = re.compile(
+    r'\b(?:FROM|JOIN)\s+((?:[`\w.]+(?:\s+(?:AS\s+)?`?\w+`?)?\s*,\s*)*[`\w.]+)',
+    re.IGNORECASE
+)
+_QUOTED_PATTERN = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_SQL_KEYWORDS = frozenset(SQLSanitizer.ALLOWED_KEYWORDS)
+
+# MySQL 协议字段类型码 -> Arrow 类型名。只收录能由类型码唯一确定的类型：
+# BIGINT（可能无符号溢出）、DECIMAL、BLOB/TEXT、BINARY/VARCHAR 等仍按数据推断
+_MYSQL_ARROW_TYPES = {
+    1: 'int64',       # TINY
+    2: 'int64',       # SHORT
+    3: 'int64',       # LONG
+    9: 'int64',       # INT24
+    13: 'int64',      # YEAR
+    4: 'float64',     # FLOAT
+    5: 'float64',     # DOUBLE
+    7: 'timestamp',   # TIMESTAMP
+    12: 'timestamp',  # DATETIME
+    10: 'date',       # DATE
+    14: 'date',       # NEWDATE
+    245: 'string',    # JSON
+}
+
+
+def _column_types_from_description(description) -> List[Optional[str]]:
+    """由 MySQL 游标 description 得到各列的 Arrow 类型名（无法确定的为 None）"""
+    return [_MYSQL_ARROW_TYPES.get(column[1]) for column in description or []]
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    规范化 SQL 用于缓存键：折叠空白、去掉末尾分号、关键字大写
+
+    引号内的字面量和标识符保持原样（表名在部分系统上大小写敏感）。
+    """
+    sql = SQLSanitizer.sanitize(sql)
+    parts = _QUOTED_PATTERN.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(
+            r'\b[A-Za-z_]+\b',
+            lambda m: m.group(0).upper() if m.group(0).upper() in _SQL_KEYWORDS else m.group(0),
+            parts[i]
+        )
+    return ''.join(parts)
+
+
+def extract_tables(sql: str) -> List[str]:
+    """提取 SQL 引用的表名（小写，去掉库名前缀与反引号）"""
+    tables = []
+    for match in _TABLE_REF_PATTERN.finditer(_LITERAL_PATTERN.sub("''", sql)):
+        for ref in match.group(1).split(','):
+            name = ref.strip().split()[0].replace('`', '')
+            name = name.split('.')[-1].lower()
+            if name and name not in tables:
+                tables.append(name)
+    return tables
+
+
+class QueryResultCache:
+    """
+    查询结果缓存
+
+    键为 (数据源, 数据库, 规范化 SQL, 参数, 最大行数) 的哈希。条目在 TTL 到期
+    或所引用表的版本号被 bump（CDC / 元数据同步）后失效。
+    """
+
+    def __init__(self, max_entries: int = 500, default_ttl: int = 300, max_rows: int = 10000):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._table_versions: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        datasource: str,
+        database: str,
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_rows: int = 0
+    ) -> str:
+        import hashlib
+        payload = json.dumps(
+            [datasource, database, normalize_sql(sql), params or {}, max_rows],
+            sort_keys=True,
+            default=str,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _versions_for(self, database: str, tables: List[str]) -> Dict[Tuple[str, str], int]:
+        versions = {}
+        for table in tables:
+            for scope in (database, '*'):
+                versions[(scope, table)] = self._table_versions.get((scope, table), 0)
+        return versions
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取仍然有效的缓存条目"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stale = any(
+                    self._table_versions.get(scope_table, 0) != version
+                    for scope_table, version in entry['versions'].items()
+                )
+                if stale or entry['expires_at'] <= time.time():
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def snapshot_versions(self, database: str, sql: str) -> Dict[Tuple[str, str], int]:
+        """
+        记录 SQL 所引用表的当前版本号
+
+        应在执行查询之前调用并传给 set()，这样执行期间发生的 bump 会使结果失效。
+        """
+        tables = extract_tables(sql)
+        with self._lock:
+            return self._versions_for(database, tables)
+
+    def set(
+        self,
+        key: str,
+        database: str,
+        sql: str,
+        columns: List[str],
+        rows: List[List[Any]],
+        ttl: Optional[int] = None,
+        versions: Optional[Dict[Tuple[str, str], int]] = None
+    ) -> bool:
+        """
+        缓存结果（超过行数上限不缓存）
+
+        Args:
+            versions: 执行前由 snapshot_versions() 记录的表版本；为空时取当前版本
+        """
+        if len(rows) > self.max_rows:
+            return False
+        if versions is None:
+            versions = self.snapshot_versions(database, sql)
+        with self._lock:
+            self._entries[key] = {
+                'columns': list(columns),
+                'rows': rows,
+                'versions': dict(versions),
+                'expires_at': time.time() + (ttl if ttl is not None else self.default_ttl),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def bump_table_version(self, table: str, database: Optional[str] = None) -> None:
+        """
+        表数据或结构变化，使引用该表的缓存失效
+
+        Args:
+            table: 表名（可带库名前缀 db.table）
+            database: 数据库名；为空时对所有数据库生效
+        """
+        if '.' in table and database is None:
+            database, table = table.rsplit('.', 1)
+        key = (database or '*', table.replace('`', '').lower())
+        with self._lock:
+            self._table_versions[key] = self._table_versions.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
 class SQLExecutor:
     """
     SQL 执行器
@@ -210,56 +522,265 @@ class SQLExecutor:
     - 只读查询执行
     - 超时控制
     - 结果分页
-    - 查询历史记录
+    - 查询历史记录（仅元数据，不保存结果行）
+    - 服务端游标分块读取，NDJSON / Arrow IPC 流式输出
+    - 有界线程池异步执行，取消时在服务端 KILL QUERY
+    - 按数据源的引擎注册表与可选的结果缓存
     """
 
+    # 历史记录上限
+    MAX_HISTORY = 1000
+
     def __init__(
         self,
         db_url: str = None,
         default_timeout: int = 30,
-        max_rows: int = 1000
+        max_rows: int = 1000,
+        max_workers: int = None,
+        chunk_size: int = 500,
+        registry: EngineRegistry = None,
+        result_cache: QueryResultCache = None
     ):
         """
         初始化执行器
 
         Args:
-            db_url: 数据库连接 URL
+            db_url: 默认数据源的数据库连接 URL
             default_timeout: 默认超时时间（秒）
             max_rows: 默认最大返回行数
+            max_workers: 异步查询线程池大小
+            chunk_size: 服务端游标每次读取的行数
+            registry: 数据源引擎注册表
+            result_cache: 查询结果缓存
         """
         self.db_url = db_url or os.environ.get('DATABASE_URL')
         self.default_timeout = default_timeout
         self.max_rows = max_rows
+        self.max_workers = max_workers or int(os.environ.get('SQL_EXECUTOR_MAX_WORKERS', '8'))
+        self.chunk_size = chunk_size
+
+        self.registry = registry or EngineRegistry()
+        if self.db_url:
+            self.registry.register(DataSourceConfig(
+                name=DEFAULT_DATASOURCE,
+                url=self.db_url,
+                timeout_seconds=default_timeout
+            ))
+        # 额外数据源: SQL_DATASOURCES='{"name": {"url": "...", "pool_size": 10}}'
+        for name, options in json.loads(os.environ.get('SQL_DATASOURCES', '{}')).items():
+            self.register_datasource(name, **options)
+
+        self.result_cache = result_cache or QueryResultCache(
+            max_entries=int(os.environ.get('SQL_RESULT_CACHE_MAX_ENTRIES', '500')),
+            default_ttl=int(os.environ.get('SQL_RESULT_CACHE_TTL', '300'))
+        )
 
-        self._engine = None
-        self._query_history: Dict[str, QueryResult] = {}
+        self._pool = None
+        self._query_history: "OrderedDict[str, QueryResult]" = OrderedDict()
+        self._running: Dict[str, _RunningQuery] = {}
         self._lock = threading.Lock()
 
     @property
     def engine(self):
-        """延迟初始化数据库引擎"""
-        if self._engine is None:
+        """默认数据源的数据库引擎"""
+        return self.registry.get_engine(DEFAULT_DATASOURCE)
+
+    def register_datasource(self, name: str, url: str, **options) -> None:
+        """
+        注册数据源
+
+        Args:
+            name: 数据源名称（QueryConfig.datasource）
+            url: 数据库连接 URL
+            **options: pool_size / max_overflow / pool_timeout / timeout_seconds
+        """
+        self.registry.register(DataSourceConfig(name=name, url=url, **options))
+
+    def invalidate_table(self, table: str, database: str = None) -> None:
+        """表发生变更，使引用该表的结果缓存失效"""
+        self.result_cache.bump_table_version(table, database)
+
+    def on_cdc_event(self, event) -> bool:
+        """CDC 事件处理器（CDCService.register_event_handler）"""
+        self.invalidate_table(event.table, event.database or None)
+        return True
+
+    def on_metadata_synced(self, sync_result, etl_result) -> None:
+        """元数据同步后回调（MetadataSyncService.register_post_sync_callback）"""
+        if etl_result.target_table:
+            self.invalidate_table(etl_result.target_table)
+
+    @property
+    def pool(self):
+        """异步查询线程池（有界）"""
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="sql-executor"
+                    )
+        return self._pool
+
+    def _prepare(self, sql: str, database: str, config: QueryConfig) -> Tuple[Optional[str], Optional[str]]:
+        """
+        清洗并校验 SQL
+
+        Returns:
+            (可执行的 SQL, 错误信息)
+        """
+        # 清洗 SQL
+        sanitized_sql = SQLSanitizer.sanitize(sql)
+
+        # 安全检查
+        if config.readonly:
+            is_safe, error = SQLSanitizer.is_safe(sanitized_sql)
+            if not is_safe:
+                return None, error
+
+        # 添加 LIMIT 子句（如果没有）
+        if 'LIMIT' not in sanitized_sql.upper():
+            sanitized_sql = f"{sanitized_sql} LIMIT {config.max_rows}"
+
+        # 验证数据库名称
+        is_valid, db_error = SQLSanitizer.validate_database_name(database)
+        if not is_valid:
+            return None, db_error
+
+        return sanitized_sql, None
+
+    def _iter_chunks(
+        self,
+        query_id: str,
+        sanitized_sql: str,
+        database: str,
+        config: QueryConfig,
+        on_columns=None,
+        params: Optional[Dict[str, Any]] = None,
+        on_column_types=None
+    ):
+        """
+        使用服务端游标分块读取结果
+
+        on_column_types 在 MySQL 下以游标 description 推出的列类型回调（见 _column_types_from_description）
+
+        Yields:
+            行列表（每块最多 chunk_size 行，总计最多 max_rows 行）
+        """
+        from sqlalchemy import text
+
+        running = self._running.get(query_id) or _RunningQuery()
+
+        # _untrack 先于连接退出：连接归还连接池之前查询已移出运行表
+        with self.registry.get_engine(config.datasource).connect() as conn, self._untrack(query_id):
+            is_mysql = conn.dialect.name == 'mysql'
+
+            if is_mysql:
+                # 会话状态记录在连接 info 中，只在与本次查询不同时才重新设置
+                session = conn.info
+
+                if 'connection_id' not in session:
+                    session['connection_id'] = conn.execute(text("SELECT CONNECTION_ID()")).scalar()
+                # 记录连接 ID，取消时在服务端 KILL QUERY
+                running.connection_id = session['connection_id']
+
+                # 设置查询超时（MySQL 特定）- 使用参数化查询
+                timeout_ms = config.timeout_seconds * 1000
+                if session.get('timeout_ms') != timeout_ms:
+                    conn.execute(text("SET SESSION max_execution_time = :timeout"), {"timeout": timeout_ms})
+                    session['timeout_ms'] = timeout_ms
+
+                # 选择数据库 - 使用反引号转义已验证的数据库名
+                # 注意：数据库名已通过 validate_database_name 验证，只包含安全字符
+                # Defense-in-depth: Assert that database name matches safe pattern
+                assert DATABASE_NAME_PATTERN.match(database), f"Database name failed safety assertion: {database}"
+                if session.get('database') != database:
+                    conn.execute(text(f"USE `{database}`"))
+                    session['database'] = database
+
+            if running.cancel_event.is_set():
+                raise QueryCancelled()
+
+            # stream_results 使用服务端游标，避免一次性把结果读入内存
+            cursor_result = conn.execution_options(stream_results=True).execute(text(sanitized_sql), params or {})
             try:
-                from sqlalchemy import create_engine
-                self._engine = create_engine(
-                    self.db_url,
-                    pool_pre_ping=True,
-                    pool_size=5,
-                    max_overflow=10,
-                    pool_timeout=30,
-                    execution_options={
-                        "isolation_level": "AUTOCOMMIT"  # 只读模式
-                    }
-                )
-            except ImportError:
-                raise ImportError("SQLAlchemy is required. Install with: pip install sqlalchemy")
-        return self._engine
+                if on_columns:
+                    on_columns(list(cursor_result.keys()))
+                cursor = getattr(cursor_result, 'cursor', None)
+                if on_column_types and is_mysql and cursor is not None:
+                    on_column_types(_column_types_from_description(cursor.description))
+
+                remaining = config.max_rows
+                while remaining > 0:
+                    if running.cancel_event.is_set():
+                        raise QueryCancelled()
+                    rows = cursor_result.fetchmany(min(self.chunk_size, remaining))
+                    if not rows:
+                        break
+                    remaining -= len(rows)
+                    yield [list(row) for row in rows]
+            finally:
+                cursor_result.close()
+
+        if running.cancel_event.is_set():
+            raise QueryCancelled()
+
+    @contextmanager
+    def _untrack(self, query_id: str):
+        """退出时把查询移出运行表，取消操作不会再对已复用的连接执行 KILL QUERY"""
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running.pop(query_id, None)
+
+    def _begin(self, result: QueryResult) -> None:
+        """登记查询到历史与运行表"""
+        with self._lock:
+            running = self._running.setdefault(result.query_id, _RunningQuery())
+            running.datasource = result.datasource
+            self._record_history(result)
+
+    def _finish(self, result: QueryResult, error: Optional[Exception], timeout_seconds: int) -> None:
+        """根据异常设置最终状态，并把元数据写入历史"""
+        if error is not None:
+            error_msg = str(error)
+            if isinstance(error, QueryCancelled) or result.status == QueryStatus.CANCELLED:
+                result.status = QueryStatus.CANCELLED
+                result.error = "Query was cancelled"
+            elif 'timeout' in error_msg.lower() or 'max_execution_time' in error_msg.lower():
+                logger.error(f"SQL execution failed: {error_msg}")
+                result.status = QueryStatus.TIMEOUT
+                result.error = f"Query exceeded timeout of {timeout_seconds} seconds"
+            else:
+                logger.error(f"SQL execution failed: {error_msg}")
+                result.status = QueryStatus.FAILED
+                result.error = error_msg
+        else:
+            result.status = QueryStatus.COMPLETED
+
+        result.completed_at = datetime.now()
+        with self._lock:
+            self._running.pop(result.query_id, None)
+            self._record_history(result)
+
+    def _record_history(self, result: QueryResult) -> None:
+        """保存到历史记录（仅元数据，不含结果行），调用方持有锁"""
+        from dataclasses import replace
+        self._query_history[result.query_id] = replace(result, rows=[])
+        self._query_history.move_to_end(result.query_id)
+        # 限制历史记录大小
+        while len(self._query_history) > self.MAX_HISTORY:
+            self._query_history.popitem(last=False)
 
     def execute(
         self,
         sql: str,
         database: str,
-        config: QueryConfig = None
+        config: QueryConfig = None,
+        query_id: str = None,
+        params: Optional[Dict[str, Any]] = None
     ) -> QueryResult:
         """
         执行 SQL 查询
@@ -268,103 +789,252 @@ class SQLExecutor:
             sql: SQL 语句
             database: 数据库名称
             config: 查询配置
+            query_id: 查询 ID（默认自动生成）
+            params: 绑定参数
 
         Returns:
             QueryResult 对象
         """
         import uuid
-        from datetime import datetime
 
         config = config or QueryConfig()
-        query_id = str(uuid.uuid4())
+        query_id = query_id or str(uuid.uuid4())
 
         result = QueryResult(
             query_id=query_id,
             sql=sql,
             database=database,
             status=QueryStatus.PENDING,
-            started_at=datetime.now()
+            started_at=datetime.now(),
+            datasource=config.datasource
         )
 
-        try:
-            # 清洗 SQL
-            sanitized_sql = SQLSanitizer.sanitize(sql)
-
-            # 安全检查
-            if config.readonly:
-                is_safe, error = SQLSanitizer.is_safe(sanitized_sql)
-                if not is_safe:
-                    result.status = QueryStatus.FAILED
-                    result.error = error
-                    return result
-
-            # 添加 LIMIT 子句（如果没有）
-            if 'LIMIT' not in sanitized_sql.upper():
-                sanitized_sql = f"{sanitized_sql} LIMIT {config.max_rows}"
-
-            result.status = QueryStatus.RUNNING
-
-            # 验证数据库名称
-            is_valid, db_error = SQLSanitizer.validate_database_name(database)
-            if not is_valid:
-                result.status = QueryStatus.FAILED
-                result.error = db_error
+        sanitized_sql, error = self._prepare(sql, database, config)
+        if error:
+            result.status = QueryStatus.FAILED
+            result.error = error
+            result.completed_at = datetime.now()
+            with self._lock:
+                self._running.pop(query_id, None)
+                self._record_history(result)
+            return result
+
+        # 结果缓存（仅在 use_cache 时启用）
+        cache_key = None
+        cache_versions = None
+        if config.use_cache:
+            cache_key = QueryResultCache.make_key(
+                config.datasource, database, sanitized_sql, params, config.max_rows
+            )
+            # 在执行前记录表版本，执行期间的写入会让本次结果在写入缓存时即失效
+            cache_versions = self.result_cache.snapshot_versions(database, sanitized_sql)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                result.columns = list(cached['columns'])
+                result.rows = [list(row) for row in cached['rows']]
+                result.row_count = len(result.rows)
+                result.cached = True
+                result.status = QueryStatus.COMPLETED
+                result.completed_at = datetime.now()
+                with self._lock:
+                    self._record_history(result)
                 return result
 
-            # 执行查询
-            start_time = time.time()
+        result.status = QueryStatus.RUNNING
+        self._begin(result)
 
-            with self.engine.connect() as conn:
-                from sqlalchemy import text
+        # 执行查询
+        start_time = time.time()
+        failure = None
+        try:
+            def set_columns(columns):
+                result.columns = columns
 
-                # 设置查询超时（MySQL 特定）- 使用参数化查询
-                timeout_ms = config.timeout_seconds * 1000
-                conn.execute(text("SET SESSION max_execution_time = :timeout"), {"timeout": timeout_ms})
+            for chunk in self._iter_chunks(query_id, sanitized_sql, database, config, set_columns, params):
+                result.rows.extend(chunk)
+            result.row_count = len(result.rows)
+        except Exception as e:
+            failure = e
 
-                # 选择数据库 - 使用反引号转义已验证的数据库名
-                # 注意：数据库名已通过 validate_database_name 验证，只包含安全字符
-                # Defense-in-depth: Assert that database name matches safe pattern
-                assert DATABASE_NAME_PATTERN.match(database), f"Database name failed safety assertion: {database}"
-                conn.execute(text(f"USE `{database}`"))
+        result.execution_time_ms = int((time.time() - start_time) * 1000)
+        self._finish(result, failure, config.timeout_seconds)
 
-                # 执行查询 - 使用 text() 包装已清洗的 SQL
-                cursor_result = conn.execute(text(sanitized_sql))
+        if cache_key and result.status == QueryStatus.COMPLETED:
+            self.result_cache.set(
+                cache_key, database, sanitized_sql, result.columns,
+                [list(row) for row in result.rows], ttl=config.cache_ttl,
+                versions=cache_versions
+            )
+        return result
 
-                # 获取列名
-                result.columns = list(cursor_result.keys())
+    def stream(
+        self,
+        sql: str,
+        database: str,
+        config: QueryConfig = None,
+        format: str = 'ndjson',
+        query_id: str = None
+    ):
+        """
+        流式执行 SQL 查询，按块输出结果（可直接作为 Flask Response 的生成器）
 
-                # 获取数据
-                rows = cursor_result.fetchall()
-                result.rows = [list(row) for row in rows]
-                result.row_count = len(result.rows)
+        Args:
+            sql: SQL 语句
+            database: 数据库名称
+            config: 查询配置
+            format: 输出格式 (ndjson, arrow)
+            query_id: 查询 ID（默认自动生成）
 
-            execution_time = (time.time() - start_time) * 1000
-            result.execution_time_ms = int(execution_time)
-            result.status = QueryStatus.COMPLETED
-            result.completed_at = datetime.now()
+        Yields:
+            ndjson: 首行为 {"query_id", "columns"}，随后每行一个 JSON 数组，
+                末行为 {"status", "row_count", "error"}
+            arrow: Arrow IPC stream 字节块（需要 pyarrow）
+        """
+        import uuid
 
+        if format not in ('ndjson', 'arrow'):
+            raise ValueError(f"Unknown stream format: {format}")
+
+        config = config or QueryConfig()
+        query_id = query_id or str(uuid.uuid4())
+
+        result = QueryResult(
+            query_id=query_id,
+            sql=sql,
+            database=database,
+            status=QueryStatus.PENDING,
+            started_at=datetime.now(),
+            datasource=config.datasource
+        )
+
+        sanitized_sql, error = self._prepare(sql, database, config)
+        if error:
+            result.status = QueryStatus.FAILED
+            result.error = error
+            if format == 'ndjson':
+                yield json.dumps({'query_id': query_id, 'status': result.status.value, 'error': error}) + '\n'
+                return
+            raise ValueError(error)
+
+        result.status = QueryStatus.RUNNING
+        self._begin(result)
+
+        def set_columns(columns):
+            result.columns = columns
+
+        encoder = _ArrowEncoder() if format == 'arrow' else None
+        start_time = time.time()
+        failure = None
+        chunks = self._iter_chunks(
+            query_id, sanitized_sql, database, config, set_columns,
+            on_column_types=encoder.declare_types if encoder is not None else None
+        )
+        try:
+            header_sent = False
+            for chunk in chunks:
+                result.row_count += len(chunk)
+                if encoder is not None:
+                    yield encoder.encode(result.columns, chunk)
+                    continue
+                if not header_sent:
+                    header_sent = True
+                    yield json.dumps({'query_id': query_id, 'columns': result.columns}) + '\n'
+                yield ''.join(json.dumps(row, default=str, ensure_ascii=False) + '\n' for row in chunk)
+            if encoder is None and not header_sent:
+                yield json.dumps({'query_id': query_id, 'columns': result.columns}) + '\n'
+        except GeneratorExit:
+            # 客户端断开：取消服务端查询
+            self.cancel_query(query_id)
+            failure = QueryCancelled()
+            raise
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"SQL execution failed: {error_msg}")
+            failure = e
+        finally:
+            chunks.close()
+            result.execution_time_ms = int((time.time() - start_time) * 1000)
+            self._finish(result, failure, config.timeout_seconds)
+
+        if encoder is not None:
+            if failure is not None:
+                raise failure
+            yield encoder.close(result.columns)
+        else:
+            yield json.dumps({
+                'status': result.status.value,
+                'row_count': result.row_count,
+                'execution_time_ms': result.execution_time_ms,
+                'error': result.error
+            }) + '\n'
 
-            if 'timeout' in error_msg.lower() or 'max_execution_time' in error_msg.lower():
-                result.status = QueryStatus.TIMEOUT
-                result.error = f"Query exceeded timeout of {config.timeout_seconds} seconds"
-            else:
-                result.status = QueryStatus.FAILED
-                result.error = error_msg
+    def iter_batches(
+        self,
+        sql: str,
+        database: str,
+        config: QueryConfig = None,
+        query_id: str = None,
+        params: Optional[Dict[str, Any]] = None
+    ):
+        """
+        流式执行 SQL 查询，按块产出字典行（导出等下游管道的数据源）
 
-            result.completed_at = datetime.now()
+        Args:
+            sql: SQL 语句
+            database: 数据库名称
+            config: 查询配置
+            query_id: 查询 ID（默认自动生成）
+            params: 绑定参数
 
-        # 保存到历史记录
-        with self._lock:
-            self._query_history[query_id] = result
-            # 限制历史记录大小
-            if len(self._query_history) > 1000:
-                oldest_id = min(self._query_history.keys(), key=lambda k: self._query_history[k].started_at)
-                del self._query_history[oldest_id]
+        Yields:
+            行字典列表（每块最多 chunk_size 行）
 
-        return result
+        Raises:
+            ValueError: SQL 未通过安全检查
+            QueryCancelled: 查询被取消
+        """
+        import uuid
+
+        config = config or QueryConfig()
+        query_id = query_id or str(uuid.uuid4())
+
+        result = QueryResult(
+            query_id=query_id,
+            sql=sql,
+            database=database,
+            status=QueryStatus.PENDING,
+            started_at=datetime.now(),
+            datasource=config.datasource
+        )
+
+        sanitized_sql, error = self._prepare(sql, database, config)
+        if error:
+            raise ValueError(error)
+
+        result.status = QueryStatus.RUNNING
+        self._begin(result)
+
+        def set_columns(columns):
+            result.columns = columns
+
+        start_time = time.time()
+        failure = None
+        chunks = self._iter_chunks(query_id, sanitized_sql, database, config, set_columns, params)
+        try:
+            for chunk in chunks:
+                result.row_count += len(chunk)
+                columns = result.columns
+                yield [dict(zip(columns, row)) for row in chunk]
+        except GeneratorExit:
+            # 消费方提前关闭：取消服务端查询
+            self.cancel_query(query_id)
+            failure = QueryCancelled()
+            raise
+        except Exception as e:
+            failure = e
+            raise
+        finally:
+            chunks.close()
+            result.execution_time_ms = int((time.time() - start_time) * 1000)
+            self._finish(result, failure, config.timeout_seconds)
 
     def execute_async(
         self,
@@ -374,43 +1044,79 @@ class SQLExecutor:
         callback: callable = None
     ) -> str:
         """
-        异步执行 SQL 查询
+        异步执行 SQL 查询（提交到有界线程池）
 
         Args:
             sql: SQL 语句
             database: 数据库名称
             config: 查询配置
-            callback: 完成回调
+            callback: 完成回调，参数为包含结果行的 QueryResult
 
         Returns:
-            查询 ID
+            查询 ID（与 get_result / cancel_query 使用的 ID 一致）
         """
         import uuid
-        import threading
 
         query_id = str(uuid.uuid4())
 
+        # 立即登记为 PENDING，排队期间即可查询和取消
+        with self._lock:
+            self._running[query_id] = _RunningQuery()
+            self._record_history(QueryResult(
+                query_id=query_id,
+                sql=sql,
+                database=database,
+                status=QueryStatus.PENDING,
+                started_at=datetime.now()
+            ))
+
         def run_query():
-            result = self.execute(sql, database, config)
+            running = self._running.get(query_id)
+            if running is None or running.cancel_event.is_set():
+                # 排队期间已取消
+                with self._lock:
+                    self._running.pop(query_id, None)
+                return
+            result = self.execute(sql, database, config, query_id=query_id)
             if callback:
-                callback(result)
-
-        thread = threading.Thread(target=run_query, daemon=True)
-        thread.start()
+                try:
+                    callback(result)
+                except Exception as e:
+                    logger.error(f"SQL query callback failed: {e}")
 
+        self.pool.submit(run_query)
         return query_id
 
     def get_result(self, query_id: str) -> Optional[QueryResult]:
-        """获取查询结果"""
-        return self._query_history.get(query_id)
+        """获取查询结果（元数据，不包含结果行）"""
+        with self._lock:
+            return self._query_history.get(query_id)
 
     def cancel_query(self, query_id: str) -> bool:
-        """取消查询（如果正在运行）"""
-        result = self._query_history.get(query_id)
-        if result and result.status == QueryStatus.RUNNING:
+        """
+        取消查询（如果正在排队或运行）
+
+        设置取消标记，并在 MySQL 上对查询所在连接执行 KILL QUERY。
+        """
+        with self._lock:
+            running = self._running.get(query_id)
+            result = self._query_history.get(query_id)
+            if running is None or result is None:
+                return False
+            running.cancel_event.set()
             result.status = QueryStatus.CANCELLED
-            return True
-        return False
+            connection_id = running.connection_id
+            datasource = running.datasource
+
+        if connection_id is not None:
+            try:
+                from sqlalchemy import text
+                with self.registry.get_engine(datasource).connect() as conn:
+                    conn.execute(text(f"KILL QUERY {int(connection_id)}"))
+                logger.info(f"Killed query {query_id} on connection {connection_id}")
+            except Exception as e:
+                logger.warning(f"Failed to kill query {query_id}: {e}")
+        return True
 
     def format_result(self, result: QueryResult, format: str = 'json') -> Any:
         """
@@ -477,9 +1183,10 @@ class SQLExecutor:
             limit: 最大数量
 
         Returns:
-            QueryResult 列表
+            QueryResult 列表（仅元数据）
         """
-        results = list(self._query_history.values())
+        with self._lock:
+            results = list(self._query_history.values())
 
         if database:
             results = [r for r in results if r.database == database]
@@ -487,6 +1194,104 @@ class SQLExecutor:
         results.sort(key=lambda r: r.started_at, reverse=True)
         return results[:limit]
 
+    def shutdown(self, wait: bool = False) -> None:
+        """关闭异步线程池并释放连接池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+        self.registry.dispose()
+
+
+class _ArrowEncoder:
+    """
+    把行块增量编码为 Arrow IPC stream（需要 pyarrow）
+
+    schema 在第一块时确定：优先使用 declare_types 声明的列类型（来自游标 description），
+    未声明的列按第一块数据推断；第一块中全为 NULL 的未声明列按 string 输出，
+    后续块的非空值转为字符串，避免与 null 类型 schema 冲突。
+    """
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for Arrow output. Install with: pip install pyarrow")
+        import io
+        self._pa = pa
+        self._sink = io.BytesIO()
+        self._writer = None
+        self._schema = None
+        self._declared: List[Optional[str]] = []
+        self._stringify: Set[int] = set()
+
+    def declare_types(self, types: List[Optional[str]]) -> None:
+        """声明列类型（Arrow 类型名，None 表示按数据推断），须在第一块之前调用"""
+        self._declared = list(types)
+
+    def _declared_type(self, index: int):
+        name = self._declared[index] if index < len(self._declared) else None
+        if name is None:
+            return None
+        pa = self._pa
+        return {
+            'int64': pa.int64(),
+            'float64': pa.float64(),
+            'timestamp': pa.timestamp('us'),
+            'date': pa.date32(),
+            'string': pa.string(),
+        }[name]
+
+    def _column_values(self, rows: List[List[Any]], index: int) -> List[Any]:
+        values = [row[index] for row in rows]
+        if index in self._stringify:
+            values = [None if value is None else str(value) for value in values]
+        return values
+
+    def _take(self) -> bytes:
+        """返回自上次调用以来新写入的字节"""
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def encode(self, columns: List[str], rows: List[List[Any]]) -> bytes:
+        pa = self._pa
+        if self._writer is None:
+            # 声明类型优先，其余按第一块推断；后续块按相同类型构造
+            arrays = []
+            for i in range(len(columns)):
+                declared = self._declared_type(i)
+                if declared is not None:
+                    arrays.append(pa.array(self._column_values(rows, i), type=declared))
+                    continue
+                array = pa.array(self._column_values(rows, i))
+                if pa.types.is_null(array.type):
+                    self._stringify.add(i)
+                    array = pa.array(self._column_values(rows, i), type=pa.string())
+                arrays.append(array)
+            batch = pa.RecordBatch.from_arrays(arrays, names=columns)
+            self._schema = batch.schema
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+        else:
+            schema = self._schema
+            arrays = [
+                pa.array(self._column_values(rows, i), type=schema.field(i).type)
+                for i in range(len(columns))
+            ]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        self._writer.write_batch(batch)
+        return self._take()
+
+    def close(self, columns: List[str]) -> bytes:
+        pa = self._pa
+        if self._writer is None:
+            schema = pa.schema([
+                (name, self._declared_type(i) or pa.null()) for i, name in enumerate(columns)
+            ])
+            self._writer = pa.ipc.new_stream(self._sink, schema)
+        self._writer.close()
+        return self._take()
+
 
 # 全局实例
 _executor: Optional[SQLExecutor] = None
@@ -497,4 +1302,14 @@ def get_sql_executor() -> SQLExecutor:
     global _executor
     if _executor is None:
         _executor = SQLExecutor()
+        # 元数据同步（ETL 写入）后使相关表的结果缓存失效
+        try:
+            from src.metadata_sync import get_metadata_sync_service
+        except ImportError:
+            try:
+                from metadata_sync import get_metadata_sync_service
+            except ImportError:
+                get_metadata_sync_service = None
+        if get_metadata_sync_service is not None:
+            get_metadata_sync_service().register_post_sync_callback(_executor.on_metadata_synced)
     return _executor
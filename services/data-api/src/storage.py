@@ -3,10 +3,11 @@ MinIO 存储客户端
 管理 MinIO 对象存储操作
 """
 
+import io
 import os
 import uuid
 from datetime import timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 import logging
 
 try:
@@ -21,6 +22,34 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+# 流式上传分片大小
+STREAM_PART_SIZE = int(os.getenv('MINIO_STREAM_PART_SIZE', str(8 * 1024 * 1024)))
+
+
+class _ChunkStream(io.RawIOBase):
+    """把字节块迭代器包装为可 read() 的流"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b''
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self.bytes_read += size
+        return size
+
+
 class MinIOClient:
     """MinIO 客户端封装"""
 
@@ -191,6 +220,54 @@ class MinIOClient:
             logger.error(f"Failed to upload object: {e}")
             return False
 
+    def put_object_stream(
+        self,
+        object_name: str,
+        chunks: Iterable[bytes],
+        bucket_name: Optional[str] = None,
+        content_type: str = 'application/octet-stream',
+        part_size: int = STREAM_PART_SIZE
+    ) -> int:
+        """
+        分片上传字节块流（长度未知，内存占用不超过一个分片）
+
+        Args:
+            object_name: 对象名称
+            chunks: 字节块迭代器
+            bucket_name: 桶名称
+            content_type: 内容类型
+            part_size: 分片大小（MinIO 要求至少 5MiB）
+
+        Returns:
+            上传的字节数
+
+        Raises:
+            S3Error: 上传失败
+        """
+        bucket = bucket_name or self.default_bucket
+
+        if not self._initialized:
+            self.init_client()
+
+        stream = _ChunkStream(chunks)
+
+        if not MINIO_AVAILABLE or not self._client:
+            logger.warning(f"Mock upload: {bucket}/{object_name}")
+            while stream.read(part_size):
+                pass
+            return stream.bytes_read
+
+        self._client.put_object(
+            bucket,
+            object_name,
+            stream,
+            length=-1,
+            part_size=part_size,
+            content_type=content_type
+        )
+        logger.info(f"Uploaded: {bucket}/{object_name} ({stream.bytes_read} bytes)")
+        return stream.bytes_read
+
     def get_object(
         self,
         object_name: str,
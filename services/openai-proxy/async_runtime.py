@@ -0,0 +1,144 @@
+"""
+常驻异步运行时
+
+Flask 视图是同步的，而上游客户端（AsyncOpenAI）是异步的。所有上游调用都提交到
+同一个后台事件循环线程上执行，使 AsyncOpenAI 内部的 httpx 连接池在请求之间复用，
+而不是每个请求新建、关闭一个事件循环。
+
+- run(coro): 在后台循环上执行协程，阻塞等待结果
+- iterate(agen): 把异步生成器桥接为同步生成器（用于 SSE 透传）
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _Raised:
+    """在线程间传递生产者异常"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class AsyncRuntime:
+    """后台事件循环线程"""
+
+    def __init__(self, name: str = "openai-proxy-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环（首次访问时启动）"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                logger.info(f"Async runtime started: {self.name}")
+            return self._loop
+
+    def in_runtime_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine):
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """在后台循环上执行协程并阻塞等待结果"""
+        if self.in_runtime_thread():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() cannot be called from the runtime thread")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[Any], max_buffered: int = 64) -> Iterator[Any]:
+        """
+        把异步生成器转换为同步生成器
+
+        生产者在后台循环上运行，通过有界队列把元素交给调用线程；
+        调用方提前停止迭代（如客户端断开）时取消生产者。
+        """
+        items: "queue.Queue[Any]" = queue.Queue(maxsize=max_buffered)
+        stopped = threading.Event()
+
+        async def put(item):
+            # 队列满时让出事件循环，避免阻塞其他请求
+            while not stopped.is_set():
+                try:
+                    items.put_nowait(item)
+                    return
+                except queue.Full:
+                    await asyncio.sleep(0.005)
+
+        async def produce():
+            try:
+                async for item in agen:
+                    if stopped.is_set():
+                        break
+                    await put(item)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                await put(_Raised(e))
+            finally:
+                await put(_END)
+                aclose = getattr(agen, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+        future = self.submit(produce())
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    break
+                if isinstance(item, _Raised):
+                    raise item.error
+                yield item
+        finally:
+            stopped.set()
+            future.cancel()
+
+    def shutdown(self) -> None:
+        """停止后台循环"""
+        with self._lock:
+            loop, self._loop, self._thread = self._loop, None, None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_runtime: Optional[AsyncRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AsyncRuntime:
+    """获取进程级异步运行时"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = AsyncRuntime()
+    return _runtime
+
+
+def run_async(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """在进程级异步运行时上执行协程"""
+    return get_runtime().run(coro, timeout)
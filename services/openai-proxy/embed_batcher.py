@@ -0,0 +1,186 @@
+"""
+Embedding 动态微批处理
+
+大量调用方每次只提交一两条文本。批处理器在常驻事件循环上运行，把同一后端、
+同一模型、在 max_wait 时间窗内到达的请求合并为一次上游调用（受最大条数与
+token 预算约束），再按偏移量把结果拆回各调用方。
+
+- embed(client, model, inputs): 排队等待合并，返回与单次上游调用相同结构的响应；
+  token 数组形式的输入（List[int] / List[List[int]]）不参与合并，直接发往后端
+- 批次填充率与排队延迟通过 PrometheusMetrics.record_batch 上报
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（约 4 字符 / token）"""
+    return max(1, len(text) // 4)
+
+
+class _Pending:
+    """一个等待合并的调用方请求"""
+
+    __slots__ = ("inputs", "tokens", "future", "enqueued_at")
+
+    def __init__(self, inputs: List[str], future: asyncio.Future):
+        self.inputs = inputs
+        self.tokens = sum(estimate_tokens(text) for text in inputs)
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _Group:
+    """同一 (分组, model) 的待发送队列"""
+
+    __slots__ = ("client", "model", "pending", "size", "tokens", "timer")
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+        self.pending: List[_Pending] = []
+        self.size = 0
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """
+    Embedding 请求微批处理器
+
+    所有方法必须在同一个事件循环上调用（见 async_runtime），因此内部状态
+    不需要加锁。
+    """
+
+    def __init__(
+        self,
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 64,
+        max_batch_tokens: int = 8192,
+        metrics=None,
+        name: str = "embeddings",
+    ):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.metrics = metrics
+        self.name = name
+        self._groups: Dict[tuple, _Group] = {}
+
+    async def embed(self, client, model: str, inputs: List[str], group: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交一个请求，等待所在批次完成后返回该请求自己的结果
+
+        Args:
+            group: 合并分组（如后端名）。同组不同客户端（多副本）的请求可合并，
+                批次使用首个请求的客户端；默认按客户端分组
+        """
+        if not inputs or not all(isinstance(text, str) for text in inputs):
+            # token 数组输入无法按条拆分合并，也无法按字符估算 token，直接调用
+            response = await client.embeddings.create(model=model, input=inputs)
+            return response.model_dump()
+
+        loop = asyncio.get_running_loop()
+        key = (group if group is not None else id(client), model)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(client, model)
+
+        item = _Pending(list(inputs), loop.create_future())
+
+        # 加入后会超出上限时，先把已排队的请求发出去
+        if group.pending and (
+            group.size + len(item.inputs) > self.max_batch_size
+            or group.tokens + item.tokens > self.max_batch_tokens
+        ):
+            self._flush(key)
+            group = self._groups[key] = _Group(client, model)
+
+        group.pending.append(item)
+        group.size += len(item.inputs)
+        group.tokens += item.tokens
+
+        if group.size >= self.max_batch_size or group.tokens >= self.max_batch_tokens:
+            self._flush(key)
+        elif group.timer is None:
+            group.timer = loop.call_later(self.max_wait, self._flush, key)
+
+        return await item.future
+
+    def _flush(self, key: tuple) -> None:
+        """把当前队列作为一个批次发出"""
+        group = self._groups.pop(key, None)
+        if group is None or not group.pending:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+            group.timer = None
+        asyncio.ensure_future(self._send(group))
+
+    async def _send(self, group: _Group) -> None:
+        """执行一次合并后的上游调用并拆分结果"""
+        started = time.monotonic()
+        merged: List[str] = []
+        for item in group.pending:
+            merged.extend(item.inputs)
+
+        if self.metrics is not None:
+            self.metrics.record_batch(
+                batcher=self.name,
+                fill_ratio=min(1.0, len(merged) / self.max_batch_size),
+                queue_delays=[started - item.enqueued_at for item in group.pending],
+            )
+
+        try:
+            response = await group.client.embeddings.create(model=group.model, input=merged)
+            result = response.model_dump()
+        except asyncio.CancelledError:
+            for item in group.pending:
+                item.future.cancel()
+            raise
+        except Exception as e:
+            for item in group.pending:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        data = sorted(result.get("data") or [], key=lambda d: d.get("index", 0))
+        if len(data) != len(merged):
+            error = RuntimeError(
+                f"Upstream returned {len(data)} embeddings for {len(merged)} inputs"
+            )
+            for item in group.pending:
+                if not item.future.done():
+                    item.future.set_exception(error)
+            return
+
+        usage = result.get("usage") or {}
+        total_tokens = sum(item.tokens for item in group.pending)
+        logger.debug(
+            f"Embedding batch: model={group.model}, requests={len(group.pending)}, "
+            f"inputs={len(merged)}"
+        )
+
+        offset = 0
+        for item in group.pending:
+            count = len(item.inputs)
+            own = [dict(d, index=i) for i, d in enumerate(data[offset:offset + count])]
+            offset += count
+            if item.future.done():
+                continue
+
+            # 按估算 token 占比拆分上游 usage
+            share = item.tokens / total_tokens
+            item.future.set_result(dict(
+                result,
+                data=own,
+                usage={
+                    "prompt_tokens": round(usage.get("prompt_tokens", 0) * share),
+                    "total_tokens": round(usage.get("total_tokens", 0) * share),
+                },
+            ))
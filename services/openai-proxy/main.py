@@ -30,6 +30,11 @@ except ImportError:
 
 from flask import Flask, jsonify, request, Response, stream_with_context, g
 
+from async_runtime import get_runtime, run_async
+from embed_batcher import EmbeddingBatcher
+from response_cache import ResponseCache, is_cacheable, make_cache_key
+from upstream_pool import ReplicaPool, parse_urls
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -192,16 +197,60 @@ except ImportError:
 
 # ==================== vLLM 集成 ====================
 
-# vLLM 服务端点配置
+# vLLM 服务端点配置（逗号分隔多个副本）
 VLLM_CHAT_URL = os.getenv("VLLM_CHAT_URL", "http://vllm-chat:8000")
 VLLM_EMBED_URL = os.getenv("VLLM_EMBED_URL", "http://vllm-embed:8000")
 VLLM_HEALTH_CHECK_TIMEOUT = int(os.getenv("VLLM_HEALTH_CHECK_TIMEOUT", "5"))
 
-# vLLM 健康状态缓存
-_vllm_chat_healthy = None
-_vllm_embed_healthy = None
-_vllm_last_check = 0
-VLLM_HEALTH_CACHE_TTL = 30  # 健康检查缓存30秒
+# 按模型指定副本列表（JSON: {"model": ["http://a:8000", "http://b:8000"]}），
+# 未列出的模型使用 VLLM_CHAT_URL / VLLM_EMBED_URL
+VLLM_CHAT_ENDPOINTS = json.loads(os.getenv("VLLM_CHAT_ENDPOINTS", "{}"))
+VLLM_EMBED_ENDPOINTS = json.loads(os.getenv("VLLM_EMBED_ENDPOINTS", "{}"))
+
+# 主动探活间隔与被动摘除策略
+VLLM_PROBE_INTERVAL = float(os.getenv("VLLM_PROBE_INTERVAL", "10"))
+VLLM_EJECT_FAILURES = int(os.getenv("VLLM_EJECT_FAILURES", "3"))
+VLLM_EJECT_SECONDS = float(os.getenv("VLLM_EJECT_SECONDS", "30"))
+
+VLLM_HEALTH_CACHE_TTL = 30  # Ollama 健康检查缓存30秒
+
+# Embedding 微批处理：合并时间窗内到达的小请求为一次上游调用
+EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "true").lower() == "true"
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "8192"))
+
+embed_batcher = EmbeddingBatcher(
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_batch_tokens=EMBED_BATCH_MAX_TOKENS,
+    metrics=metrics if PROMETHEUS_ENABLED else None,
+)
+
+# 确定性 Chat Completions 响应缓存（默认关闭）
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL)
+
+
+def _record_response_cache(hit: bool, template: Optional[str]) -> None:
+    """按 Prompt 模板记录响应缓存命中率"""
+    if PROMETHEUS_ENABLED and metrics:
+        # 模板名来自客户端，未注册的统一归为 other，避免指标标签基数无界
+        if not template:
+            name = "none"
+        elif template in PROMPT_TEMPLATES:
+            name = template
+        else:
+            name = "other"
+        label = f"chat_completions:{name}"
+        if hit:
+            metrics.record_cache_hit(cache=label)
+        else:
+            metrics.record_cache_miss(cache=label)
+
 
 # ==================== Ollama 集成 ====================
 
@@ -217,47 +266,64 @@ _ollama_healthy = None
 _ollama_last_check = 0
 
 
-def _check_vllm_health(url: str) -> bool:
-    """检查 vLLM 服务健康状态"""
-    global _vllm_last_check, _vllm_chat_healthy, _vllm_embed_healthy
-    try:
-        import time
-        current_time = time.time()
+def _vllm_client_factory(base_url: str, http_client=None):
+    """为单个 vLLM 副本创建客户端"""
+    return AsyncOpenAI(
+        api_key="dummy",  # vLLM不需要真实API key
+        base_url=base_url,
+        http_client=http_client
+    )
 
-        # 使用缓存避免频繁检查
-        if current_time - _vllm_last_check < VLLM_HEALTH_CACHE_TTL:
-            if url == VLLM_CHAT_URL:
-                return _vllm_chat_healthy if _vllm_chat_healthy is not None else False
-            elif url == VLLM_EMBED_URL:
-                return _vllm_embed_healthy if _vllm_embed_healthy is not None else False
 
-        response = requests.get(
-            f"{url}/health",
-            timeout=VLLM_HEALTH_CHECK_TIMEOUT
+def _build_pools(kind: str, default_urls: str, per_model: dict):
+    """构建默认副本池与按模型的副本池，并启动后台探活"""
+    default_pool = ReplicaPool(
+        f"vllm-{kind}",
+        parse_urls(default_urls),
+        _vllm_client_factory,
+        probe_interval=VLLM_PROBE_INTERVAL,
+        probe_timeout=VLLM_HEALTH_CHECK_TIMEOUT,
+        max_failures=VLLM_EJECT_FAILURES,
+        eject_seconds=VLLM_EJECT_SECONDS,
+    )
+    model_pools = {
+        model: ReplicaPool(
+            f"vllm-{kind}:{model}",
+            urls if isinstance(urls, list) else parse_urls(urls),
+            _vllm_client_factory,
+            probe_interval=VLLM_PROBE_INTERVAL,
+            probe_timeout=VLLM_HEALTH_CHECK_TIMEOUT,
+            max_failures=VLLM_EJECT_FAILURES,
+            eject_seconds=VLLM_EJECT_SECONDS,
         )
-        is_healthy = response.status_code == 200
+        for model, urls in per_model.items()
+    }
+    if OPENAI_AVAILABLE:
+        for pool in [default_pool, *model_pools.values()]:
+            pool.start()
+    return default_pool, model_pools
 
-        # 更新缓存
-        _vllm_last_check = current_time
-        if url == VLLM_CHAT_URL:
-            _vllm_chat_healthy = is_healthy
-        elif url == VLLM_EMBED_URL:
-            _vllm_embed_healthy = is_healthy
 
-        return is_healthy
-    except Exception as e:
-        logger.debug(f"vLLM health check failed for {url}: {e}")
-        return False
+vllm_chat_pool, vllm_chat_model_pools = _build_pools("chat", VLLM_CHAT_URL, VLLM_CHAT_ENDPOINTS)
+vllm_embed_pool, vllm_embed_model_pools = _build_pools("embed", VLLM_EMBED_URL, VLLM_EMBED_ENDPOINTS)
+
+
+def _vllm_chat_pool_for(model: Optional[str] = None) -> ReplicaPool:
+    return vllm_chat_model_pools.get(model, vllm_chat_pool)
+
 
+def _vllm_embed_pool_for(model: Optional[str] = None) -> ReplicaPool:
+    return vllm_embed_model_pools.get(model, vllm_embed_pool)
 
-def is_vllm_chat_available() -> bool:
-    """检查 vLLM Chat 服务是否可用"""
-    return _check_vllm_health(VLLM_CHAT_URL)
 
+def is_vllm_chat_available(model: Optional[str] = None) -> bool:
+    """检查 vLLM Chat 服务是否有可用副本（读取后台探活结果）"""
+    return _vllm_chat_pool_for(model).available()
 
-def is_vllm_embed_available() -> bool:
-    """检查 vLLM Embedding 服务是否可用"""
-    return _check_vllm_health(VLLM_EMBED_URL)
+
+def is_vllm_embed_available(model: Optional[str] = None) -> bool:
+    """检查 vLLM Embedding 服务是否有可用副本（读取后台探活结果）"""
+    return _vllm_embed_pool_for(model).available()
 
 
 # ==================== Ollama 健康检查与客户端 ====================
@@ -320,48 +386,22 @@ def get_ollama_client():
 
 # OpenAI 客户端（外部API备用）
 _openai_client = None
-_vllm_chat_client = None
-_vllm_embed_client = None
-
 
-def get_vllm_chat_client():
-    """获取 vLLM Chat 客户端（优先）"""
-    global _vllm_chat_client
 
+def get_vllm_chat_client(model: Optional[str] = None):
+    """获取 vLLM Chat 客户端（优先），在途请求最少的副本"""
     if not OPENAI_AVAILABLE:
         logger.warning("OpenAI library not available")
         return None
-
-    if is_vllm_chat_available():
-        if _vllm_chat_client is None:
-            _vllm_chat_client = AsyncOpenAI(
-                api_key="dummy",  # vLLM不需要真实API key
-                base_url=VLLM_CHAT_URL
-            )
-            logger.info(f"vLLM Chat client initialized: {VLLM_CHAT_URL}")
-        return _vllm_chat_client
-
-    return None
+    return _vllm_chat_pool_for(model).get_client()
 
 
-def get_vllm_embed_client():
-    """获取 vLLM Embedding 客户端（优先）"""
-    global _vllm_embed_client
-
+def get_vllm_embed_client(model: Optional[str] = None):
+    """获取 vLLM Embedding 客户端（优先），在途请求最少的副本"""
     if not OPENAI_AVAILABLE:
         logger.warning("OpenAI library not available")
         return None
-
-    if is_vllm_embed_available():
-        if _vllm_embed_client is None:
-            _vllm_embed_client = AsyncOpenAI(
-                api_key="dummy",
-                base_url=VLLM_EMBED_URL
-            )
-            logger.info(f"vLLM Embed client initialized: {VLLM_EMBED_URL}")
-        return _vllm_embed_client
-
-    return None
+    return _vllm_embed_pool_for(model).get_client()
 
 
 def get_openai_client():
@@ -386,11 +426,11 @@ def get_openai_client():
     return _openai_client
 
 
-def get_chat_client():
+def get_chat_client(model: Optional[str] = None):
     """获取聊天客户端（优先级: vLLM → Ollama → OpenAI, 可通过 LLM_BACKEND 强制指定）"""
     # 强制指定后端
     if LLM_BACKEND == "vllm":
-        client = get_vllm_chat_client()
+        client = get_vllm_chat_client(model)
         if client:
             return client, "vllm"
         return None, None
@@ -406,7 +446,7 @@ def get_chat_client():
         return None, None
 
     # auto 模式: vLLM → Ollama → OpenAI
-    client = get_vllm_chat_client()
+    client = get_vllm_chat_client(model)
     if client:
         return client, "vllm"
 
@@ -491,8 +531,14 @@ def health():
         "vllm": {
             "chat_available": vllm_chat_ok,
             "chat_url": VLLM_CHAT_URL,
+            "chat_replicas": vllm_chat_pool.status(),
             "embed_available": vllm_embed_ok,
-            "embed_url": VLLM_EMBED_URL
+            "embed_url": VLLM_EMBED_URL,
+            "embed_replicas": vllm_embed_pool.status(),
+            "model_replicas": {
+                **{f"chat:{m}": p.status() for m, p in vllm_chat_model_pools.items()},
+                **{f"embed:{m}": p.status() for m, p in vllm_embed_model_pools.items()},
+            }
         },
         "ollama": {
             "available": ollama_ok,
@@ -538,17 +584,12 @@ def list_models():
         })
 
     try:
-        # 使用同步方式请求模型列表
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
         async def _list():
             models = await client.models.list()
             return models.model_dump()
 
-        models_data = loop.run_until_complete(_list())
-        loop.close()
+        # 在常驻事件循环上执行，复用客户端连接池
+        models_data = run_async(_list())
 
         # 添加后端信息
         if isinstance(models_data, dict) and "data" in models_data:
@@ -621,7 +662,7 @@ def chat_completions():
             messages.insert(0, {"role": "system", "content": system_message})
 
     # 获取聊天客户端（优先vLLM，降级OpenAI）
-    client, backend = get_chat_client()
+    client, backend = get_chat_client(model)
 
     if not client:
         # C-03 安全修复: 生产环境必须配置 LLM 服务
@@ -704,6 +745,20 @@ def chat_completions():
             "_warning": "This is a mock response. Configure VLLM_CHAT_URL or OPENAI_API_KEY for real responses."
         })
 
+    # 响应缓存：仅对确定性请求生效
+    cache_key = None
+    if RESPONSE_CACHE_ENABLED and is_cacheable(data, temperature):
+        cache_key = make_cache_key(
+            backend, model, messages, dict(data, temperature=temperature, max_tokens=max_tokens)
+        )
+        cached = response_cache.get_stream(cache_key) if stream else response_cache.get_completion(cache_key)
+        _record_response_cache(cached is not None, prompt_template)
+        if cached is not None:
+            logger.info(f"Chat completion cache hit: backend={backend}, model={model}")
+            if stream:
+                return Response(stream_with_context(cached), content_type="text/event-stream")
+            return jsonify(dict(cached, backend=backend, cached=True))
+
     # 真实 LLM 调用（vLLM 或 OpenAI）
     import time
     start_time = time.time()
@@ -712,26 +767,29 @@ def chat_completions():
     completion_tokens = 0
 
     try:
-        import asyncio
-
         if stream:
-            # 流式响应
-            async def generate_stream():
+            # 流式响应：直接透传上游 SSE 字节，不逐块反序列化再序列化
+            async def relay_stream():
                 nonlocal status
+                captured = [] if cache_key else None
                 try:
-                    stream_response = await client.chat.completions.create(
+                    async with client.chat.completions.with_streaming_response.create(
                         model=model,
                         messages=messages,
                         temperature=temperature,
                         max_tokens=max_tokens,
                         stream=True
-                    )
-
-                    async for chunk in stream_response:
-                        chunk_data = chunk.model_dump()
-                        yield f"data: {json.dumps(chunk_data)}\n\n"
-
-                    yield "data: [DONE]\n\n"
+                    ) as upstream:
+                        async for chunk in upstream.iter_bytes():
+                            if captured is not None:
+                                captured.append(chunk)
+                            yield chunk
+
+                    # 完整收到 [DONE] 才写入缓存
+                    if captured is not None:
+                        body = b"".join(captured)
+                        if body.rstrip().endswith(b"data: [DONE]"):
+                            response_cache.set_stream(cache_key, body)
 
                 except OpenAIError as e:
                     status = "error"
@@ -741,16 +799,10 @@ def chat_completions():
                     }
                     yield f"data: {json.dumps(error_data)}\n\n"
 
-            def sync_generate():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    for chunk in loop.run_until_complete(generate_stream()):
-                        yield chunk
-                finally:
-                    loop.close()
-
-            return Response(stream_with_context(sync_generate()), content_type="text/event-stream")
+            return Response(
+                stream_with_context(get_runtime().iterate(relay_stream())),
+                content_type="text/event-stream"
+            )
 
         else:
             # 非流式响应
@@ -763,15 +815,12 @@ def chat_completions():
                 )
                 return response.model_dump()
 
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                result = loop.run_until_complete(_create())
-            finally:
-                loop.close()
+            result = run_async(_create())
+            if cache_key:
+                response_cache.set_completion(cache_key, result)
 
             # 添加后端信息
-            result["backend"] = backend
+            result = dict(result, backend=backend)
 
             # 提取 token 使用情况
             usage = result.get('usage', {})
@@ -827,7 +876,7 @@ def embeddings():
         inputs = input_text
 
     # 获取 embedding 客户端（优先vLLM → Ollama → OpenAI）
-    client = get_vllm_embed_client()
+    client = get_vllm_embed_client(model)
     backend = "vllm" if client else None
 
     if not client:
@@ -886,22 +935,18 @@ def embeddings():
     status = "success"
 
     try:
-        import asyncio
-
         async def _create_embeddings():
-            # 批量处理（vLLM/OpenAI都支持）
+            if EMBED_BATCH_ENABLED:
+                # 与并发到达的其他请求合并为一次上游调用
+                # 同一后端的各副本共享批次，批次发往首个请求选中的副本
+                return await embed_batcher.embed(client, model, inputs, group=backend)
             response = await client.embeddings.create(
                 model=model,
                 input=inputs
             )
             return response.model_dump()
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(_create_embeddings())
-        finally:
-            loop.close()
+        result = run_async(_create_embeddings())
 
         # 添加后端信息
         result["backend"] = backend
@@ -0,0 +1,144 @@
+"""
+Chat Completions 响应缓存
+
+很多调用逐字节重复（模板化 system prompt、temperature=0 的 ReAct 步骤、元数据
+扫描的字段注释 prompt）。对确定性请求按 (backend, model, messages, 采样参数)
+的规范化哈希缓存上游响应：
+
+- 仅在 temperature == 0 或请求显式携带 "cache": true 时生效，"cache": false 绕过
+- 有界 LRU + TTL
+- 非流式响应保存完整 completion；流式响应保存上游 SSE 原始字节
+- 流式客户端命中仅有 completion 的条目时，按 SSE 格式回放
+
+前缀（KV）缓存属于推理服务职责（vLLM --enable-prefix-caching），此处只做精确匹配。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+# 影响输出、需要纳入缓存键的采样参数
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "max_tokens", "stop", "seed", "n",
+    "presence_penalty", "frequency_penalty", "logit_bias",
+    "response_format", "tools", "tool_choice",
+)
+
+
+def is_cacheable(data: Dict[str, Any], temperature: float) -> bool:
+    """请求是否允许走响应缓存"""
+    flag = data.get("cache")
+    if flag is not None:
+        return bool(flag)
+    return temperature == 0 and data.get("n", 1) == 1
+
+
+def make_cache_key(backend: str, model: str, messages: list, params: Dict[str, Any]) -> str:
+    """规范化请求并计算缓存键"""
+    sampling = {k: params[k] for k in SAMPLING_PARAMS if params.get(k) is not None}
+    canonical = json.dumps(
+        {"backend": backend, "model": model, "messages": messages, "params": sampling},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def completion_to_sse(completion: Dict[str, Any]) -> Iterator[str]:
+    """把完整 completion 转为等价的 SSE chunk 序列"""
+    base = {
+        "id": completion.get("id"),
+        "object": "chat.completion.chunk",
+        "created": completion.get("created"),
+        "model": completion.get("model"),
+    }
+    for choice in completion.get("choices", []):
+        message = choice.get("message") or {}
+        delta = {"role": message.get("role", "assistant"), "content": message.get("content")}
+        if message.get("tool_calls"):
+            delta["tool_calls"] = [
+                dict(call, index=i) for i, call in enumerate(message["tool_calls"])
+            ]
+        chunk = dict(base, choices=[{"index": choice.get("index", 0), "delta": delta, "finish_reason": None}])
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        final = dict(base, choices=[{
+            "index": choice.get("index", 0),
+            "delta": {},
+            "finish_reason": choice.get("finish_reason", "stop"),
+        }])
+        yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class ResponseCache:
+    """线程安全的有界 TTL 响应缓存"""
+
+    def __init__(self, max_entries: int = 1000, ttl: int = 3600, max_entry_bytes: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, field: str, value: Any) -> None:
+        entry = self._get(key)
+        if entry is None:
+            entry = self._entries[key] = {"expires_at": time.time() + self.ttl}
+        entry[field] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_completion(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的完整 completion（非流式）"""
+        with self._lock:
+            entry = self._get(key)
+            return entry.get("completion") if entry else None
+
+    def get_stream(self, key: str) -> Optional[Iterator[Any]]:
+        """获取可回放给流式客户端的 SSE 序列"""
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                return None
+            sse = entry.get("sse")
+            completion = entry.get("completion")
+        if sse is not None:
+            return iter([sse])
+        if completion is not None:
+            return completion_to_sse(completion)
+        return None
+
+    def set_completion(self, key: str, completion: Dict[str, Any]) -> None:
+        """缓存完整 completion"""
+        with self._lock:
+            self._put(key, "completion", completion)
+
+    def set_stream(self, key: str, body: bytes) -> None:
+        """缓存上游 SSE 原始字节（超过单条上限则放弃）"""
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._put(key, "sse", body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,248 @@
+"""
+上游多副本负载均衡
+
+每个模型可以配置多个 vLLM 副本。ReplicaPool 负责：
+
+- 路由：选择在途请求最少的副本，相同时选近期延迟（EWMA）更低的
+- 被动摘除：连续失败（连接错误 / 5xx）达到阈值后摘除一段时间
+- 主动探活：后台线程周期性请求 /health，请求路径上不做健康检查；
+  尚未探活的副本视为可用，避免启动后首轮探测完成前所有请求都无副本可选
+
+每个副本持有独立的客户端，在途计数与延迟由 httpx 传输层统计，调用方无需改动。
+一次请求（包括流式响应）只使用一个客户端，因此天然固定在一个副本上。
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """单个上游副本的状态"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy: Optional[bool] = None  # None 表示尚未探活
+        self.outstanding = 0
+        self.latency_ewma = 0.0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.client = None
+
+    def routable(self, now: float) -> bool:
+        # 尚未探活（None）按可用处理，失败由被动摘除兜底
+        return self.healthy is not False and now >= self.ejected_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected": time.time() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency_ewma * 1000, 1),
+        }
+
+
+if HTTPX_AVAILABLE:
+
+    class _TrackedStream(httpx.AsyncByteStream):
+        """响应体读完或关闭时结束在途计数"""
+
+        def __init__(self, stream, on_close: Callable[[], None]):
+            self._stream = stream
+            self._on_close = on_close
+            self._closed = False
+
+        async def __aiter__(self):
+            async for chunk in self._stream:
+                yield chunk
+
+        async def aclose(self):
+            try:
+                await self._stream.aclose()
+            finally:
+                if not self._closed:
+                    self._closed = True
+                    self._on_close()
+
+    class _TrackedTransport(httpx.AsyncBaseTransport):
+        """统计副本在途请求数、延迟与失败的传输层"""
+
+        def __init__(self, pool: "ReplicaPool", replica: Replica):
+            self._pool = pool
+            self._replica = replica
+            self._inner = httpx.AsyncHTTPTransport()
+
+        async def handle_async_request(self, request):
+            started = self._pool._begin(self._replica)
+            try:
+                response = await self._inner.handle_async_request(request)
+            except Exception:
+                self._pool._end(self._replica, started, ok=False)
+                raise
+            ok = response.status_code < 500
+            response.stream = _TrackedStream(
+                response.stream,
+                lambda: self._pool._end(self._replica, started, ok=ok),
+            )
+            return response
+
+        async def aclose(self):
+            await self._inner.aclose()
+
+
+class ReplicaPool:
+    """一组可互换的上游副本"""
+
+    def __init__(
+        self,
+        name: str,
+        urls: List[str],
+        client_factory: Callable[..., Any],
+        health_path: str = "/health",
+        probe_interval: float = 10.0,
+        probe_timeout: float = 5.0,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        latency_alpha: float = 0.2,
+    ):
+        """
+        Args:
+            name: 池名称（日志与 /health 展示）
+            urls: 副本基础 URL 列表
+            client_factory: (base_url, http_client) -> 客户端
+            health_path: 探活路径
+            probe_interval: 主动探活间隔（秒）
+            probe_timeout: 探活超时（秒）
+            max_failures: 连续失败多少次后摘除
+            eject_seconds: 摘除时长（秒）
+            latency_alpha: 延迟 EWMA 平滑系数
+        """
+        self.name = name
+        self.replicas = [Replica(url) for url in urls if url]
+        self.client_factory = client_factory
+        self.health_path = health_path
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- 路由 ----------
+
+    def pick(self) -> Optional[Replica]:
+        """选择在途请求最少的可用副本"""
+        now = time.time()
+        with self._lock:
+            candidates = [r for r in self.replicas if r.routable(now)]
+            if not candidates:
+                return None
+            best = min((r.outstanding, r.latency_ewma) for r in candidates)
+            tied = [r for r in candidates if (r.outstanding, r.latency_ewma) == best]
+            return random.choice(tied)
+
+    def available(self) -> bool:
+        now = time.time()
+        with self._lock:
+            return any(r.routable(now) for r in self.replicas)
+
+    def get_client(self):
+        """返回被选中副本的客户端，无可用副本时返回 None"""
+        replica = self.pick()
+        if replica is None:
+            return None
+        if replica.client is None:
+            with self._lock:
+                if replica.client is None:
+                    http_client = None
+                    if HTTPX_AVAILABLE:
+                        http_client = httpx.AsyncClient(transport=_TrackedTransport(self, replica))
+                    replica.client = self.client_factory(replica.url, http_client)
+                    logger.info(f"{self.name} client initialized: {replica.url}")
+        return replica.client
+
+    # ---------- 在途统计与被动摘除 ----------
+
+    def _begin(self, replica: Replica) -> float:
+        with self._lock:
+            replica.outstanding += 1
+        return time.monotonic()
+
+    def _end(self, replica: Replica, started: float, ok: bool) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            replica.outstanding = max(0, replica.outstanding - 1)
+            if ok:
+                replica.failures = 0
+                if replica.latency_ewma:
+                    replica.latency_ewma += self.latency_alpha * (elapsed - replica.latency_ewma)
+                else:
+                    replica.latency_ewma = elapsed
+                return
+            replica.failures += 1
+            if replica.failures >= self.max_failures:
+                replica.ejected_until = time.time() + self.eject_seconds
+                replica.failures = 0
+                logger.warning(
+                    f"{self.name} replica ejected for {self.eject_seconds}s: {replica.url}"
+                )
+
+    # ---------- 主动探活 ----------
+
+    def probe_once(self) -> None:
+        """探测所有副本（在后台线程中调用）"""
+        for replica in self.replicas:
+            try:
+                response = requests.get(
+                    f"{replica.url}{self.health_path}",
+                    timeout=self.probe_timeout
+                )
+                healthy = response.status_code == 200
+            except Exception as e:
+                logger.debug(f"{self.name} health check failed for {replica.url}: {e}")
+                healthy = False
+            with self._lock:
+                if healthy != replica.healthy:
+                    logger.info(f"{self.name} replica {replica.url} healthy={healthy}")
+                replica.healthy = healthy
+
+    def start(self) -> None:
+        """启动后台探活线程（首次探测立即执行）"""
+        if not self.replicas or (self._probe_thread and self._probe_thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.probe_once()
+                self._stop.wait(self.probe_interval)
+
+        self._probe_thread = threading.Thread(target=loop, name=f"{self.name}-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r.to_dict() for r in self.replicas]
+
+
+def parse_urls(value: str) -> List[str]:
+    """解析逗号分隔的 URL 列表"""
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
@@ -55,6 +55,7 @@ try:
         RedisCache,
         get_cache,
         cached,
+        cached_batch,
         cached_metadata,
         cached_model_list,
         cached_workflow,
@@ -66,6 +67,7 @@ try:
         "RedisCache",
         "get_cache",
         "cached",
+        "cached_batch",
         "cached_metadata",
         "cached_model_list",
         "cached_workflow",
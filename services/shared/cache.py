@@ -5,16 +5,28 @@ Sprint 14: Redis Sentinel 高可用支持
 
 提供 Redis 缓存功能，支持多种缓存策略和 TTL 配置
 
+两级缓存：RedisCache 前置一个进程内有界 LRU（近端缓存），TTL 不超过 Redis
+中的剩余 TTL；delete/delete_pattern/clear 通过 Redis pub/sub 广播失效消息，
+各 Pod 收到后清除本地副本。
+
 SECURITY: This module uses JSON serialization with HMAC signature verification
 instead of pickle to prevent remote code execution attacks.
 """
 
+import fnmatch
 import hashlib
 import hmac
 import json
 import logging
+import math
 import os
-from typing import Any, Optional, Callable, TypeVar, Union, Dict
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Callable, TypeVar, Union, Dict, List, Tuple, Iterable
 from functools import wraps
 from datetime import timedelta
 
@@ -74,6 +86,34 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# 近端缓存清理过期键的最小间隔（秒）
+_PURGE_INTERVAL = 60
+
+# SCAN/批量删除每批键数量
+_BATCH_SIZE = 500
+
+# 释放租约：仅当持有者 token 匹配时删除
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _record_cache_metric(event: str, cache_name: str) -> None:
+    """上报缓存命中/未命中/淘汰指标（未初始化 Prometheus 时静默跳过）"""
+    try:
+        from .prometheus_metrics import get_metrics
+    except ImportError:
+        return
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    recorder = getattr(metrics, f"record_cache_{event}", None)
+    if recorder:
+        recorder(cache_name)
+
 
 class CacheBackend:
     """缓存后端接口"""
@@ -98,82 +138,181 @@ class CacheBackend:
         """检查键是否存在"""
         return False
 
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，只返回命中的键"""
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存值"""
+        return all([self.set(key, value, ttl) for key, value in mapping.items()])
+
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存值，返回删除数量"""
+        return sum(1 for key in keys if self.delete(key))
+
+    def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """获取重算租约，成功返回 token，已被他人持有返回 None
+
+        单进程后端没有跨进程竞争，总是成功。
+        """
+        return uuid.uuid4().hex
+
+    def release_lease(self, key: str, token: str) -> bool:
+        """释放重算租约"""
+        return True
+
 
 class MemoryCache(CacheBackend):
-    """内存缓存实现 - 用于本地开发或 Redis 不可用时的回退"""
+    """内存缓存实现 - 用于本地开发或 Redis 不可用时的回退
 
-    def __init__(self):
-        self._cache: Dict[str, Any] = {}
+    有界 LRU：超过 max_size 时淘汰最久未访问的键，过期键在读取时
+    或定期清理时移除。同时作为 RedisCache 的进程内近端缓存使用。
+    """
+
+    def __init__(self, max_size: int = 10000, name: str = "memory"):
+        """
+        Args:
+            max_size: 最大键数量，<= 0 表示不限制
+            name: 指标标签中的缓存名称
+        """
+        self.max_size = max_size
+        self.name = name
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
         self._expiry: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
-        import time
-
-        # 检查是否过期
-        if key in self._expiry:
-            if time.time() > self._expiry[key]:
-                self.delete(key)
-                return None
+        with self._lock:
+            if key not in self._cache or self._is_expired(key):
+                self._discard(key)
+                self.misses += 1
+                hit = False
+                value = None
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                hit = True
+                value = self._cache[key]
 
-        return self._cache.get(key)
+        _record_cache_metric("hit" if hit else "miss", self.name)
+        return value
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """设置缓存值"""
-        import time
+        evicted = 0
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            if ttl:
+                self._expiry[key] = time.time() + ttl
+            else:
+                self._expiry.pop(key, None)
+            evicted = self._enforce_capacity()
 
-        self._cache[key] = value
-        if ttl:
-            self._expiry[key] = time.time() + ttl
+        for _ in range(evicted):
+            _record_cache_metric("eviction", self.name)
         return True
 
     def delete(self, key: str) -> bool:
         """删除缓存值"""
-        self._cache.pop(key, None)
-        self._expiry.pop(key, None)
+        with self._lock:
+            self._discard(key)
         return True
 
     def clear(self) -> bool:
         """清空所有缓存"""
-        self._cache.clear()
-        self._expiry.clear()
+        with self._lock:
+            self._cache.clear()
+            self._expiry.clear()
         return True
 
     def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        import time
+        with self._lock:
+            if key not in self._cache:
+                return False
 
-        if key not in self._cache:
-            return False
-
-        # 检查是否过期
-        if key in self._expiry and time.time() > self._expiry[key]:
-            self.delete(key)
-            return False
+            # 检查是否过期
+            if self._is_expired(key):
+                self._discard(key)
+                return False
 
-        return True
+            return True
 
     def delete_pattern(self, pattern: str) -> int:
         """删除匹配模式的所有键"""
-        import fnmatch
+        with self._lock:
+            keys_to_delete = [k for k in self._cache.keys() if fnmatch.fnmatch(k, pattern)]
+            for k in keys_to_delete:
+                self._discard(k)
+        return len(keys_to_delete)
+
+    def stats(self) -> Dict[str, int]:
+        """获取命中/未命中/淘汰统计"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _is_expired(self, key: str) -> bool:
+        expiry = self._expiry.get(key)
+        return expiry is not None and time.time() > expiry
+
+    def _discard(self, key: str) -> None:
+        self._cache.pop(key, None)
+        self._expiry.pop(key, None)
+
+    def _purge_expired(self) -> None:
+        """移除所有已过期的键"""
+        now = time.time()
+        for k in [k for k, exp in self._expiry.items() if now > exp]:
+            self._discard(k)
+        self._last_purge = time.monotonic()
+
+    def _enforce_capacity(self) -> int:
+        """超出容量时按 LRU 顺序淘汰，返回淘汰数量（调用方持有锁）"""
+        if self.max_size <= 0 or len(self._cache) <= self.max_size:
+            return 0
+
+        if time.monotonic() - self._last_purge > _PURGE_INTERVAL:
+            self._purge_expired()
 
-        count = 0
-        keys_to_delete = [k for k in self._cache.keys() if fnmatch.fnmatch(k, pattern)]
-        for k in keys_to_delete:
-            self.delete(k)
-            count += 1
-        return count
+        evicted = 0
+        while len(self._cache) > self.max_size:
+            k, _ = self._cache.popitem(last=False)
+            self._expiry.pop(k, None)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
 
 
 class RedisCache(CacheBackend):
     """Redis 缓存实现 - Sprint 14: 支持 Sentinel 高可用"""
 
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, near_cache: Optional[bool] = None):
         """
         初始化 Redis 缓存
 
         Args:
             redis_client: Redis 客户端实例（可选）
+            near_cache: 是否启用进程内近端缓存，None 时读取 CACHE_NEAR_ENABLED
         """
         if redis_client:
             self.client = redis_client
@@ -181,6 +320,61 @@ class RedisCache(CacheBackend):
         else:
             self.client, self._sentinel = self._create_client()
 
+        self._instance_id = uuid.uuid4().hex
+        self._near_cache: Optional[MemoryCache] = None
+        self._near_ttl = 0
+        self._near_generation = 0
+        self._invalidation_channel: Optional[str] = None
+        self._pubsub = None
+        self._pubsub_thread = None
+        self._replica = None
+        if self.client:
+            self._init_near_cache(near_cache)
+
+    def _init_near_cache(self, enabled: Optional[bool]):
+        """初始化近端缓存并订阅跨 Pod 失效消息
+
+        订阅失败时不启用近端缓存，避免在收不到失效通知的情况下返回陈旧数据。
+        """
+        redis_config = get_config().redis
+        if enabled is None:
+            enabled = redis_config.near_cache_enabled
+        if not enabled:
+            return
+
+        try:
+            channel = redis_config.invalidation_channel
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{channel: self._on_invalidation_message})
+            self._pubsub_thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"Cache invalidation subscribe failed, near cache disabled: {e}")
+            self._pubsub = None
+            return
+
+        self._invalidation_channel = channel
+        self._near_ttl = redis_config.near_cache_ttl
+        self._near_cache = MemoryCache(max_size=redis_config.near_cache_max_size, name="near")
+        logger.info(
+            f"Near cache enabled: max_size={redis_config.near_cache_max_size}, "
+            f"ttl={self._near_ttl}s, channel={channel}"
+        )
+
+    def close(self):
+        """停止失效订阅线程"""
+        if self._pubsub_thread is not None:
+            try:
+                self._pubsub_thread.stop()
+            except Exception as e:
+                logger.debug(f"Stop invalidation listener failed: {e}")
+            self._pubsub_thread = None
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception as e:
+                logger.debug(f"Close invalidation pubsub failed: {e}")
+            self._pubsub = None
+
     def _create_client(self):
         """创建 Redis 客户端 - 支持 Sentinel 模式"""
         if not REDIS_AVAILABLE:
@@ -249,72 +443,117 @@ class RedisCache(CacheBackend):
         return master, sentinel
 
     def get_replica(self):
-        """获取只读副本连接 (用于读取负载均衡)"""
+        """获取只读副本连接 (用于读取负载均衡)
+
+        副本客户端自带 Sentinel 发现与连接池，创建一次后复用。
+        """
         if self._sentinel is None:
             return self.client
+        if self._replica is not None:
+            return self._replica
 
         config = get_config()
         redis_config = config.redis
 
         try:
-            slave = self._sentinel.slave_for(
+            self._replica = self._sentinel.slave_for(
                 redis_config.sentinel_master,
                 socket_timeout=redis_config.socket_timeout,
                 password=redis_config.password,
                 db=redis_config.db,
                 decode_responses=False,
             )
-            return slave
+            return self._replica
         except Exception as e:
             logger.warning(f"Failed to get replica, using master: {e}")
             return self.client
 
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: str, near: bool = True) -> Optional[Any]:
         """获取缓存值
 
+        先查进程内近端缓存，未命中再读 Redis 并回填近端缓存。
+
         SECURITY: Uses JSON deserialization with HMAC signature verification
         to prevent cache poisoning attacks. If Redis is compromised, attacker
         cannot inject malicious data without knowing the signing key.
+        Near cache entries hold the already-verified JSON payload.
+
+        Args:
+            key: 缓存键
+            near: 是否使用近端缓存（需要强一致读取时传 False）
         """
         if not self.client:
             return _get_memory_cache().get(key)
 
+        use_near = near and self._near_cache is not None
+        if use_near:
+            payload = self._near_cache.get(key)
+            if payload is not None:
+                return json.loads(payload)
+
         try:
-            data = self.client.get(self._make_key(key))
-            if data:
-                try:
-                    # Parse the stored format: {"signature": "...", "data": "..."}
-                    envelope = json.loads(data.decode('utf-8'))
-
-                    if isinstance(envelope, dict) and 'signature' in envelope and 'data' in envelope:
-                        # New secure format with signature
-                        json_data = envelope['data'].encode('utf-8')
-                        signature = envelope['signature']
-
-                        if not _verify_signature(json_data, signature):
-                            logger.warning(f"Cache signature verification failed for key {key}. Data may be tampered.")
-                            # Delete potentially compromised cache entry
-                            self.delete(key)
-                            return None
-
-                        return json.loads(json_data)
-                    else:
-                        # Legacy unsigned data - treat as untrusted
-                        logger.warning(f"Legacy unsigned cache entry found for key {key}. Ignoring for security.")
-                        self.delete(key)
-                        return None
-
-                except (json.JSONDecodeError, UnicodeDecodeError, KeyError) as e:
-                    logger.warning(f"Cache deserialization failed for key {key}: {e}")
-                    return None
-            return None
+            redis_key = self._make_key(key)
+            generation = self._near_generation
+            pttl = None
+            if use_near:
+                # 同时取剩余 TTL，保证近端副本不会比 Redis 活得更久
+                pipe = self.client.pipeline(transaction=False)
+                pipe.get(redis_key)
+                pipe.pttl(redis_key)
+                data, pttl = pipe.execute()
+            else:
+                data = self.client.get(redis_key)
+
+            if not data:
+                _record_cache_metric("miss", "redis")
+                return None
+
+            payload = self._unwrap_envelope(key, data)
+            if payload is None:
+                return None
+
+            _record_cache_metric("hit", "redis")
+            if use_near and generation == self._near_generation:
+                self._set_near(key, payload, pttl / 1000 if pttl and pttl > 0 else None)
+            return json.loads(payload)
         except Exception as e:
             logger.warning(f"Redis get error: {e}")
             return None
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+    def _unwrap_envelope(self, key: str, data: bytes) -> Optional[str]:
+        """校验签名信封，返回内层 JSON 字符串；校验失败返回 None"""
+        try:
+            # Parse the stored format: {"signature": "...", "data": "..."}
+            envelope = json.loads(data.decode('utf-8'))
+
+            if isinstance(envelope, dict) and 'signature' in envelope and 'data' in envelope:
+                # New secure format with signature
+                json_data = envelope['data']
+                signature = envelope['signature']
+
+                if not _verify_signature(json_data.encode('utf-8'), signature):
+                    logger.warning(f"Cache signature verification failed for key {key}. Data may be tampered.")
+                    # Delete potentially compromised cache entry
+                    self.delete(key)
+                    return None
+
+                return json_data
+            else:
+                # Legacy unsigned data - treat as untrusted
+                logger.warning(f"Legacy unsigned cache entry found for key {key}. Ignoring for security.")
+                self.delete(key)
+                return None
+
+        except (json.JSONDecodeError, UnicodeDecodeError, KeyError) as e:
+            logger.warning(f"Cache deserialization failed for key {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, near: bool = True) -> bool:
         """设置缓存值
 
+        写 Redis 的同时写穿本 Pod 的近端缓存。其他 Pod 上的旧副本不主动失效，
+        最长在近端 TTL 内过期；需要立即全局生效时请使用 delete。
+
         SECURITY: Uses JSON serialization with HMAC signature to prevent
         cache poisoning attacks.
 
@@ -327,21 +566,19 @@ class RedisCache(CacheBackend):
             return _get_memory_cache().set(key, value, ttl)
 
         try:
-            # Serialize to JSON
-            json_data = json.dumps(value, ensure_ascii=False, default=str)
-            json_bytes = json_data.encode('utf-8')
-
-            # Create signed envelope
-            signature = _sign_data(json_bytes)
-            envelope = json.dumps({
-                "signature": signature,
-                "data": json_data
-            })
+            json_data, envelope = self._make_envelope(value)
 
             if ttl:
-                return self.client.setex(self._make_key(key), ttl, envelope)
+                result = self.client.setex(self._make_key(key), ttl, envelope)
             else:
-                return self.client.set(self._make_key(key), envelope)
+                result = self.client.set(self._make_key(key), envelope)
+
+            if self._near_cache is not None:
+                if near:
+                    self._set_near(key, json_data, ttl)
+                else:
+                    self._near_cache.delete(key)
+            return result
         except (TypeError, ValueError) as e:
             # Value is not JSON serializable
             logger.warning(f"Cannot cache value for key {key}: not JSON serializable: {e}")
@@ -350,6 +587,20 @@ class RedisCache(CacheBackend):
             logger.warning(f"Redis set error: {e}")
             return False
 
+    @staticmethod
+    def _make_envelope(value: Any) -> Tuple[str, str]:
+        """序列化并签名，返回 (JSON 数据, 签名信封)"""
+        # Serialize to JSON
+        json_data = json.dumps(value, ensure_ascii=False, default=str)
+
+        # Create signed envelope
+        signature = _sign_data(json_data.encode('utf-8'))
+        envelope = json.dumps({
+            "signature": signature,
+            "data": json_data
+        })
+        return json_data, envelope
+
     def delete(self, key: str) -> bool:
         """删除缓存值"""
         if not self.client:
@@ -360,6 +611,9 @@ class RedisCache(CacheBackend):
         except Exception as e:
             logger.warning(f"Redis delete error: {e}")
             return False
+        finally:
+            # 先删 Redis 再广播，避免其他 Pod 在删除前重新回填旧值
+            self._invalidate_near({"op": "delete", "key": key})
 
     def clear(self) -> bool:
         """清空所有缓存"""
@@ -377,6 +631,8 @@ class RedisCache(CacheBackend):
         except Exception as e:
             logger.warning(f"Redis clear error: {e}")
             return False
+        finally:
+            self._invalidate_near({"op": "clear"})
 
     def exists(self, key: str) -> bool:
         """检查键是否存在"""
@@ -399,14 +655,214 @@ class RedisCache(CacheBackend):
             return _get_memory_cache().delete_pattern(pattern)
 
         try:
+            # SCAN 增量遍历，按批 DEL，避免 KEYS 阻塞 Redis 和逐键往返
             full_pattern = f"agent:{pattern}"
-            keys = self.client.keys(full_pattern)
-            if keys:
-                return self.client.delete(*keys)
-            return 0
+            deleted = 0
+            batch = []
+            for key in self.client.scan_iter(match=full_pattern, count=_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= _BATCH_SIZE:
+                    deleted += self.client.delete(*batch)
+                    batch = []
+            if batch:
+                deleted += self.client.delete(*batch)
+            return deleted
         except Exception as e:
             logger.warning(f"Redis delete_pattern error: {e}")
             return 0
+        finally:
+            self._invalidate_near({"op": "pattern", "pattern": pattern})
+
+    # ==================== 批量操作 ====================
+
+    def get_many(self, keys: List[str], near: bool = True) -> Dict[str, Any]:
+        """批量获取缓存值，只返回命中的键
+
+        近端缓存未命中的键通过一次 MGET 从只读副本读取（同一 pipeline
+        内附带 PTTL 用于限制近端 TTL），每个值仍单独校验签名。
+        """
+        if not self.client:
+            return _get_memory_cache().get_many(keys)
+
+        result: Dict[str, Any] = {}
+        use_near = near and self._near_cache is not None
+        missing = []
+        for key in dict.fromkeys(keys):
+            payload = self._near_cache.get(key) if use_near else None
+            if payload is not None:
+                result[key] = json.loads(payload)
+            else:
+                missing.append(key)
+
+        if not missing:
+            return result
+
+        try:
+            redis_keys = [self._make_key(k) for k in missing]
+            generation = self._near_generation
+            pipe = self.get_replica().pipeline(transaction=False)
+            pipe.mget(redis_keys)
+            if use_near:
+                for redis_key in redis_keys:
+                    pipe.pttl(redis_key)
+            responses = pipe.execute()
+            values, pttls = responses[0], responses[1:] or [None] * len(missing)
+
+            for key, data, pttl in zip(missing, values, pttls):
+                if not data:
+                    _record_cache_metric("miss", "redis")
+                    continue
+                payload = self._unwrap_envelope(key, data)
+                if payload is None:
+                    continue
+                _record_cache_metric("hit", "redis")
+                if use_near and generation == self._near_generation:
+                    self._set_near(key, payload, pttl / 1000 if pttl and pttl > 0 else None)
+                result[key] = json.loads(payload)
+        except Exception as e:
+            logger.warning(f"Redis get_many error: {e}")
+
+        return result
+
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None, near: bool = True) -> bool:
+        """批量设置缓存值（单次 pipeline 往返）"""
+        if not self.client:
+            return _get_memory_cache().set_many(mapping, ttl)
+        if not mapping:
+            return True
+
+        try:
+            payloads = {}
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                json_data, envelope = self._make_envelope(value)
+                payloads[key] = json_data
+                if ttl:
+                    pipe.setex(self._make_key(key), ttl, envelope)
+                else:
+                    pipe.set(self._make_key(key), envelope)
+            results = pipe.execute()
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Cannot cache values in set_many: not JSON serializable: {e}")
+            return False
+        except Exception as e:
+            logger.warning(f"Redis set_many error: {e}")
+            return False
+
+        if self._near_cache is not None:
+            for key, json_data in payloads.items():
+                if near:
+                    self._set_near(key, json_data, ttl)
+                else:
+                    self._near_cache.delete(key)
+        return all(results)
+
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存值（单条 DEL 命令），返回删除数量"""
+        if not self.client:
+            return _get_memory_cache().delete_many(keys)
+        if not keys:
+            return 0
+
+        try:
+            return self.client.delete(*[self._make_key(k) for k in keys])
+        except Exception as e:
+            logger.warning(f"Redis delete_many error: {e}")
+            return 0
+        finally:
+            self._invalidate_near({"op": "delete_many", "keys": list(keys)})
+
+    # ==================== 重算租约 ====================
+
+    def _lease_key(self, key: str) -> str:
+        return self._make_key(f"lease:{key}")
+
+    def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """通过 SET NX PX 获取跨 Pod 的重算租约
+
+        Redis 不可用时放行（返回 token），由调用方在本进程内计算。
+        """
+        token = uuid.uuid4().hex
+        if not self.client:
+            return token
+
+        try:
+            acquired = self.client.set(self._lease_key(key), token, nx=True, px=int(ttl * 1000))
+            return token if acquired else None
+        except Exception as e:
+            logger.warning(f"Redis acquire_lease error: {e}")
+            return token
+
+    def release_lease(self, key: str, token: str) -> bool:
+        """释放租约（仅删除自己持有的租约）"""
+        if not self.client:
+            return True
+
+        try:
+            return bool(self.client.eval(_RELEASE_LEASE_SCRIPT, 1, self._lease_key(key), token))
+        except Exception as e:
+            logger.warning(f"Redis release_lease error: {e}")
+            return False
+
+    # ==================== 近端缓存 ====================
+
+    def near_cache_stats(self) -> Optional[Dict[str, int]]:
+        """获取近端缓存统计，未启用时返回 None"""
+        if self._near_cache is None:
+            return None
+        return self._near_cache.stats()
+
+    def _set_near(self, key: str, payload: str, ttl: Optional[float]):
+        """写入近端缓存，TTL 取近端 TTL 与 Redis TTL 的较小值"""
+        near_ttl = self._near_ttl
+        if ttl:
+            near_ttl = min(near_ttl, ttl)
+        if near_ttl > 0:
+            self._near_cache.set(key, payload, near_ttl)
+
+    def _apply_invalidation(self, message: Dict[str, Any]):
+        """在本地近端缓存上执行失效操作"""
+        if self._near_cache is None:
+            return
+        # 使正在进行中的 Redis 读取放弃回填，避免写回失效前的旧值
+        self._near_generation += 1
+        op = message.get("op")
+        if op == "delete":
+            self._near_cache.delete(message.get("key", ""))
+        elif op == "delete_many":
+            for key in message.get("keys", []):
+                self._near_cache.delete(key)
+        elif op == "pattern":
+            self._near_cache.delete_pattern(message.get("pattern", ""))
+        elif op == "clear":
+            self._near_cache.clear()
+
+    def _invalidate_near(self, message: Dict[str, Any]):
+        """失效本地副本并广播到其他 Pod"""
+        if self._near_cache is None:
+            return
+        self._apply_invalidation(message)
+        try:
+            self.client.publish(
+                self._invalidation_channel,
+                json.dumps({**message, "origin": self._instance_id}),
+            )
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+
+    def _on_invalidation_message(self, message: Dict[str, Any]):
+        """pub/sub 回调：处理其他 Pod 的失效消息"""
+        try:
+            data = message.get("data")
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            payload = json.loads(data)
+        except (TypeError, ValueError, UnicodeDecodeError) as e:
+            logger.warning(f"Invalid cache invalidation message: {e}")
+            return
+        if not isinstance(payload, dict) or payload.get("origin") == self._instance_id:
+            return
+        self._apply_invalidation(payload)
 
 
 # 内存缓存回退实例
@@ -417,7 +873,7 @@ def _get_memory_cache() -> MemoryCache:
     """获取内存缓存实例"""
     global _memory_cache
     if _memory_cache is None:
-        _memory_cache = MemoryCache()
+        _memory_cache = MemoryCache(max_size=get_config().redis.memory_cache_max_size)
     return _memory_cache
 
 
@@ -433,11 +889,128 @@ def get_cache() -> RedisCache:
     return _cache
 
 
+class _SingleFlightCall:
+    """一次进行中的计算"""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """进程内请求合并：同一个键的并发调用只执行一次，其余调用等待共享结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _SingleFlightCall] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """执行 fn，若同键调用已在进行中则等待其结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SingleFlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self, key: str) -> bool:
+        """检查键是否有进行中的计算"""
+        with self._lock:
+            return key in self._calls
+
+
+_single_flight = SingleFlight()
+
+# 后台提前刷新线程池
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    """获取后台刷新线程池"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_executor_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("CACHE_REFRESH_WORKERS", "4")),
+                    thread_name_prefix="cache-refresh",
+                )
+    return _refresh_executor
+
+
+# 防击穿模式下缓存值的包装字段
+_SWR_MARKER = "__swr__"
+
+# 等待其他 Pod 重算时的轮询间隔（秒）
+_LEASE_POLL_INTERVAL = 0.05
+
+# 已提交但尚未完成的后台刷新键
+_pending_refreshes: set = set()
+_pending_refreshes_lock = threading.Lock()
+
+
+def _wrap_entry(value: Any, ttl: int, delta: float) -> Dict[str, Any]:
+    """包装缓存值，附带逻辑过期时间与重算耗时"""
+    return {_SWR_MARKER: 1, "value": value, "expires_at": time.time() + ttl, "delta": delta}
+
+
+def _unwrap_entry(raw: Any) -> Optional[Dict[str, Any]]:
+    """解析包装后的缓存值，格式不符视为未命中"""
+    if isinstance(raw, dict) and raw.get(_SWR_MARKER) == 1 and "value" in raw:
+        return raw
+    return None
+
+
+def _should_refresh_early(entry: Dict[str, Any], beta: float, now: float) -> bool:
+    """概率提前刷新（XFetch）：越接近过期、重算越慢，越可能提前刷新"""
+    if beta <= 0:
+        return False
+    delta = max(float(entry.get("delta", 0.0)), 0.0)
+    return now - delta * beta * math.log(1.0 - random.random()) >= entry["expires_at"]
+
+
+def _default_cache_key(key_prefix: str, func: Callable, args: tuple, kwargs: dict) -> str:
+    """默认缓存键生成策略"""
+    parts = [key_prefix, func.__name__]
+    if args:
+        parts.extend(str(a) for a in args)
+    if kwargs:
+        parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    return ":".join(parts)
+
+
 def cached(
     ttl: int = 300,
     key_prefix: str = "",
     key_builder: Optional[Callable[..., str]] = None,
-    cache_condition: Optional[Callable[..., bool]] = None
+    cache_condition: Optional[Callable[..., bool]] = None,
+    near_cache: bool = True,
+    stampede_protection: bool = False,
+    stale_ttl: int = 0,
+    refresh_beta: float = 1.0,
+    lease_ttl: int = 30,
+    lease_wait: float = 2.0
 ):
     """
     缓存装饰器
@@ -447,34 +1020,123 @@ def cached(
         key_prefix: 缓存键前缀
         key_builder: 自定义键生成函数
         cache_condition: 缓存条件函数，返回 True 才缓存
+        near_cache: 是否使用进程内近端缓存（要求跨 Pod 强一致时设为 False）
+        stampede_protection: 启用防击穿：进程内合并并发未命中，跨 Pod 通过
+            Redis 租约保证只有一个 Pod 重算，并按概率在过期前后台提前刷新
+        stale_ttl: 过期后仍可返回旧值的时间窗口（秒），期间后台重算
+        refresh_beta: 提前刷新的激进程度，0 表示关闭提前刷新
+        lease_ttl: 重算租约的有效期（秒），应大于函数最长执行时间
+        lease_wait: 未拿到租约且无旧值时等待其他 Pod 结果的最长时间（秒），
+            超时后本地计算
 
     Usage:
         @cached(ttl=300, key_prefix="metadata")
         def get_metadata(id):
             ...
+
+        @cached(ttl=60, key_prefix="quota", stampede_protection=True, stale_ttl=30)
+        def get_quota_usage(tenant_id):
+            ...
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        def make_key(*args, **kwargs) -> str:
+            if key_builder:
+                return key_builder(*args, **kwargs)
+            return _default_cache_key(key_prefix, func, args, kwargs)
+
+        def compute_and_store(cache, cache_key: str, args, kwargs):
+            start = time.time()
+            result = func(*args, **kwargs)
+            if result is not None:
+                entry = _wrap_entry(result, ttl, time.time() - start)
+                cache.set(cache_key, entry, ttl + stale_ttl, near=near_cache)
+            return result
+
+        def recompute(cache, cache_key: str, args, kwargs):
+            token = cache.acquire_lease(cache_key, lease_ttl)
+            if token is not None:
+                try:
+                    return compute_and_store(cache, cache_key, args, kwargs)
+                finally:
+                    cache.release_lease(cache_key, token)
+
+            # 其他 Pod 正在重算，短暂等待其结果
+            deadline = time.time() + lease_wait
+            while time.time() < deadline:
+                time.sleep(_LEASE_POLL_INTERVAL)
+                entry = _unwrap_entry(cache.get(cache_key, near=False))
+                if entry is not None and time.time() < entry["expires_at"]:
+                    return entry["value"]
+
+            logger.debug(f"Cache lease wait timed out, computing locally: {cache_key}")
+            return compute_and_store(cache, cache_key, args, kwargs)
+
+        def refresh_in_background(cache, cache_key: str, args, kwargs):
+            with _pending_refreshes_lock:
+                if cache_key in _pending_refreshes or _single_flight.in_flight(cache_key):
+                    return
+                _pending_refreshes.add(cache_key)
+
+            def task():
+                try:
+                    token = cache.acquire_lease(cache_key, lease_ttl)
+                    if token is None:
+                        return
+                    try:
+                        compute_and_store(cache, cache_key, args, kwargs)
+                    finally:
+                        cache.release_lease(cache_key, token)
+                except Exception as e:
+                    logger.warning(f"Background cache refresh failed for {cache_key}: {e}")
+                finally:
+                    with _pending_refreshes_lock:
+                        _pending_refreshes.discard(cache_key)
+
+            logger.debug(f"Cache background refresh: {cache_key}")
+            try:
+                _get_refresh_executor().submit(task)
+            except RuntimeError as e:
+                with _pending_refreshes_lock:
+                    _pending_refreshes.discard(cache_key)
+                logger.warning(f"Cannot schedule cache refresh for {cache_key}: {e}")
+
+        def get_protected(cache, cache_key: str, args, kwargs):
+            entry = _unwrap_entry(cache.get(cache_key, near=near_cache))
+            now = time.time()
+            if entry is not None and now >= entry["expires_at"] and near_cache:
+                # 近端副本可能落后于 Redis，逻辑过期时再确认一次
+                entry = _unwrap_entry(cache.get(cache_key, near=False))
+
+            if entry is not None:
+                if now < entry["expires_at"]:
+                    if _should_refresh_early(entry, refresh_beta, now):
+                        refresh_in_background(cache, cache_key, args, kwargs)
+                    logger.debug(f"Cache hit: {cache_key}")
+                    return entry["value"]
+                if stale_ttl > 0:
+                    refresh_in_background(cache, cache_key, args, kwargs)
+                    logger.debug(f"Cache stale hit: {cache_key}")
+                    return entry["value"]
+
+            logger.debug(f"Cache miss: {cache_key}")
+            return _single_flight.do(
+                cache_key, lambda: recompute(cache, cache_key, args, kwargs)
+            )
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> T:
             # 检查缓存条件
             if cache_condition and not cache_condition(*args, **kwargs):
                 return func(*args, **kwargs)
 
-            # 生成缓存键
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                # 默认键生成策略
-                parts = [key_prefix, func.__name__]
-                if args:
-                    parts.extend(str(a) for a in args)
-                if kwargs:
-                    parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
-                cache_key = ":".join(parts)
-
-            # 尝试从缓存获取
+            cache_key = make_key(*args, **kwargs)
             cache = get_cache()
-            cached_value = cache.get(cache_key)
+
+            if stampede_protection:
+                return get_protected(cache, cache_key, args, kwargs)
+
+            # 尝试从缓存获取（近端缓存 -> Redis）
+            cached_value = cache.get(cache_key, near=near_cache)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_value
@@ -485,25 +1147,86 @@ def cached(
 
             # 只缓存非 None 结果
             if result is not None:
-                cache.set(cache_key, result, ttl)
+                cache.set(cache_key, result, ttl, near=near_cache)
 
             return result
 
         # 添加缓存清除方法
         def clear_cache(*args, **kwargs):
             """清除此函数的缓存"""
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                parts = [key_prefix, func.__name__]
-                if args:
-                    parts.extend(str(a) for a in args)
-                if kwargs:
-                    parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
-                cache_key = ":".join(parts)
+            cache = get_cache()
+            cache.delete(make_key(*args, **kwargs))
+
+        wrapper.clear_cache = clear_cache
+        wrapper.cache_key_prefix = key_prefix or func.__name__
 
+        return wrapper
+
+    return decorator
+
+
+def cached_batch(
+    ttl: int = 300,
+    key_prefix: str = "",
+    near_cache: bool = True
+):
+    """
+    批量缓存装饰器
+
+    被装饰函数的第一个参数是 ID 列表，返回 {id: value} 字典。命中的 ID 通过
+    一次 get_many 读取，只把未命中的 ID 传给函数，结果再通过一次 set_many
+    写回，列表页每页只需一次缓存往返。
+
+    Args:
+        ttl: 缓存时间（秒）
+        key_prefix: 缓存键前缀
+        near_cache: 是否使用进程内近端缓存
+
+    Usage:
+        @cached_batch(ttl=300, key_prefix="asset")
+        def get_assets(asset_ids):
+            return {a.id: a.to_dict() for a in query_assets(asset_ids)}
+    """
+    def decorator(func: Callable[..., Dict[Any, T]]) -> Callable[..., Dict[Any, T]]:
+        def make_key(item_id, args, kwargs) -> str:
+            return _default_cache_key(key_prefix, func, args + (item_id,), kwargs)
+
+        @wraps(func)
+        def wrapper(ids: Iterable[Any], *args, **kwargs) -> Dict[Any, T]:
+            ids = list(dict.fromkeys(ids))
+            if not ids:
+                return {}
+
+            keys = {item_id: make_key(item_id, args, kwargs) for item_id in ids}
+            cache = get_cache()
+            hits = cache.get_many(list(keys.values()), near=near_cache)
+
+            result = {}
+            missing = []
+            for item_id in ids:
+                if keys[item_id] in hits:
+                    result[item_id] = hits[keys[item_id]]
+                else:
+                    missing.append(item_id)
+
+            logger.debug(f"Batch cache {func.__name__}: {len(result)} hits, {len(missing)} misses")
+            if missing:
+                fetched = func(missing, *args, **kwargs) or {}
+                to_store = {
+                    keys[item_id]: value
+                    for item_id, value in fetched.items()
+                    if item_id in keys and value is not None
+                }
+                if to_store:
+                    cache.set_many(to_store, ttl, near=near_cache)
+                result.update(fetched)
+
+            return {item_id: result[item_id] for item_id in ids if item_id in result}
+
+        def clear_cache(ids: Iterable[Any], *args, **kwargs):
+            """清除指定 ID 的缓存"""
             cache = get_cache()
-            cache.delete(cache_key)
+            cache.delete_many([make_key(item_id, args, kwargs) for item_id in ids])
 
         wrapper.clear_cache = clear_cache
         wrapper.cache_key_prefix = key_prefix or func.__name__
@@ -42,7 +42,7 @@ def index_document(self, doc_id: str, collection_name: str,
         self.update_state(state='PROGRESS', meta={'progress': 0, 'status': 'Initializing'})
 
         # 导入向量存储
-        from services.agent_api.services.vector_store import VectorStore
+        from agent_services.vector_store import VectorStore
 
         vector_store = VectorStore()
         count = vector_store.insert(collection_name, texts, embeddings, metadata)
@@ -76,26 +76,56 @@ def index_documents_batch(self, documents: List[Dict]) -> Dict[str, Any]:
         任务结果
     """
     try:
-        results = []
         total = len(documents)
+        counts: Dict[int, int] = {}
+        errors: Dict[int, str] = {}
 
-        for i, doc in enumerate(documents):
-            # 更新进度
-            progress = int((i / total) * 100)
-            self.update_state(
-                state='PROGRESS',
-                meta={'progress': progress, 'status': f'Processing {i+1}/{total}'}
-            )
+        # 导入向量存储
+        from agent_services.vector_store import VectorStore
 
-            # 索引单个文档
-            result = index_document(
-                doc['doc_id'],
-                doc['collection_name'],
-                doc['texts'],
-                doc['embeddings'],
-                doc.get('metadata')
-            )
-            results.append(result)
+        vector_store = VectorStore()
+
+        # 所有文档共用一个写入器：跨文档缓冲、按大批量写入，结束时统一 flush
+        with vector_store.writer() as writer:
+            for i, doc in enumerate(documents):
+                # 更新进度
+                progress = int((i / total) * 100)
+                self.update_state(
+                    state='PROGRESS',
+                    meta={'progress': progress, 'status': f'Processing {i+1}/{total}'}
+                )
+
+                # 字段缺失或行数不一致的文档单独记为失败，不影响其他文档
+                try:
+                    counts[i] = writer.add(
+                        doc['collection_name'],
+                        doc['texts'],
+                        doc['embeddings'],
+                        doc.get('metadata'),
+                        key=i
+                    )
+                except (KeyError, TypeError, ValueError) as e:
+                    errors[i] = f"Invalid document: {e}"
+                    logger.error(f"Document indexing failed: {doc.get('doc_id')}, error: {e}")
+
+        # 写入器 commit 之后才能确定每个文档是否写入成功
+        errors.update(writer.failed)
+        results = []
+        for i, doc in enumerate(documents):
+            if i in errors:
+                results.append(TaskResult(
+                    success=False,
+                    error=errors[i],
+                    metadata={"doc_id": doc.get('doc_id')}
+                ).to_dict())
+            else:
+                results.append(TaskResult(
+                    success=True,
+                    data={"doc_id": doc.get('doc_id'), "count": counts[i]},
+                    metadata={"collection": doc['collection_name']}
+                ).to_dict())
+
+        logger.info(f"Batch indexed {total} documents, {writer.rows_written} chunks")
 
         success_count = sum(1 for r in results if r.get('success'))
 
@@ -336,7 +366,7 @@ def periodic_health_check() -> Dict[str, Any]:
 
         # 检查向量数据库
         try:
-            from services.agent_api.services.vector_store import VectorStore
+            from agent_services.vector_store import VectorStore
             vs = VectorStore()
             checks['milvus'] = VectorStore._connected
         except Exception as e:
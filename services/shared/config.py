@@ -504,6 +504,19 @@ class RedisConfig:
     workflow_ttl: int = field(default_factory=lambda: int(os.getenv('CACHE_WORKFLOW_TTL', '180')))
     search_result_ttl: int = field(default_factory=lambda: int(os.getenv('CACHE_SEARCH_RESULT_TTL', '60')))
 
+    # 进程内近端缓存（Redis 前置 LRU）配置
+    near_cache_enabled: bool = field(default_factory=lambda: os.getenv('CACHE_NEAR_ENABLED', 'true').lower() == 'true')
+    near_cache_max_size: int = field(default_factory=lambda: int(os.getenv('CACHE_NEAR_MAX_SIZE', '2048')))
+    near_cache_ttl: int = field(default_factory=lambda: int(os.getenv('CACHE_NEAR_TTL', '30')))
+    invalidation_channel: str = field(default_factory=lambda: os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate'))
+    memory_cache_max_size: int = field(default_factory=lambda: int(os.getenv('CACHE_MEMORY_MAX_SIZE', '10000')))
+
+    # 共享 Embedding 缓存（按 模型 + 归一化文本哈希 寻址）配置
+    embedding_cache_enabled: bool = field(default_factory=lambda: os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true')
+    embedding_cache_dtype: str = field(default_factory=lambda: os.getenv('EMBEDDING_CACHE_DTYPE', 'float16'))
+    embedding_cache_ttl: int = field(default_factory=lambda: int(os.getenv('EMBEDDING_CACHE_TTL', '2592000')))
+    embedding_cache_local_max_size: int = field(default_factory=lambda: int(os.getenv('EMBEDDING_CACHE_LOCAL_MAX_SIZE', '20000')))
+
     # Sentinel 高可用配置 - Sprint 14
     sentinel_enabled: bool = field(default_factory=lambda: os.getenv('REDIS_SENTINEL_ENABLED', 'false').lower() == 'true')
     sentinel_master: str = field(default_factory=lambda: os.getenv('REDIS_SENTINEL_MASTER', 'mymaster'))
@@ -0,0 +1,255 @@
+"""
+共享 Embedding 缓存
+
+按 (模型, 归一化文本哈希) 内容寻址缓存向量，agent-api 与 data-api 共用：
+- 进程内有界 LRU（MemoryCache）+ Redis 二进制存储，两级批量查询
+- 向量以 float16/float32 紧凑编码（首字节为类型标记），不走 JSON
+- get_or_compute 只把未命中的文本交给模型计算，并对同批重复文本去重
+
+同一段文本在任意服务中嵌入一次后，重建索引、重复查询都直接命中缓存。
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import struct
+import unicodedata
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .cache import MemoryCache, get_cache
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "emb"
+
+# 编码类型标记 -> struct 格式字符
+_DTYPE_CODES = {"float16": (b"h", "e"), "float32": (b"f", "f")}
+_CODE_FORMATS = {code: fmt for code, fmt in _DTYPE_CODES.values()}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+Vector = List[float]
+
+
+def normalize_text(text: str) -> str:
+    """归一化文本：NFC、去首尾空白、合并连续空白"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """生成内容寻址缓存键"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{_KEY_PREFIX}:{model}:{digest}"
+
+
+def encode_vector(vector: Sequence[float], dtype: str = "float16") -> bytes:
+    """把向量编码为紧凑二进制（float16 超出范围 ±65504 时改用 float32）"""
+    code, fmt = _DTYPE_CODES.get(dtype, _DTYPE_CODES["float32"])
+    try:
+        return code + struct.pack(f"<{len(vector)}{fmt}", *vector)
+    except OverflowError:
+        if fmt == "f":
+            raise
+        code, fmt = _DTYPE_CODES["float32"]
+        return code + struct.pack(f"<{len(vector)}{fmt}", *vector)
+
+
+def decode_vector(raw: bytes) -> Optional[Vector]:
+    """解码 encode_vector 的结果，格式不合法时返回 None"""
+    if not raw:
+        return None
+    fmt = _CODE_FORMATS.get(raw[:1])
+    if fmt is None:
+        return None
+    payload = raw[1:]
+    size = struct.calcsize(f"<{fmt}")
+    if len(payload) % size:
+        return None
+    return list(struct.unpack(f"<{len(payload) // size}{fmt}", payload))
+
+
+class EmbeddingCache:
+    """两级 Embedding 缓存（进程内 LRU + Redis）"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        dtype: Optional[str] = None,
+        ttl: Optional[int] = None,
+        local_max_size: Optional[int] = None,
+    ):
+        """
+        初始化 Embedding 缓存
+
+        Args:
+            redis_client: 二进制模式的 Redis 客户端，None 时只使用进程内缓存
+            dtype: 存储精度 float16/float32，None 时读取 EMBEDDING_CACHE_DTYPE
+            ttl: Redis 中的过期时间（秒）
+            local_max_size: 进程内 LRU 最大条目数
+        """
+        redis_config = get_config().redis
+        self.client = redis_client
+        self.dtype = dtype or redis_config.embedding_cache_dtype
+        if self.dtype not in _DTYPE_CODES:
+            logger.warning(f"Unsupported embedding cache dtype {self.dtype}, using float32")
+            self.dtype = "float32"
+        self.ttl = ttl if ttl is not None else redis_config.embedding_cache_ttl
+        self._local = MemoryCache(
+            max_size=local_max_size or redis_config.embedding_cache_local_max_size,
+            name="embedding",
+        )
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[Vector]]:
+        """
+        批量查询向量
+
+        先查进程内 LRU，未命中的键一次 MGET 从 Redis 读取并回填本地。
+
+        Returns:
+            与 texts 对齐的向量列表，未命中为 None
+        """
+        keys = [embedding_cache_key(model, text) for text in texts]
+        raws: List[Optional[bytes]] = [self._local.get(key) for key in keys]
+
+        remote_idx = [i for i, raw in enumerate(raws) if raw is None]
+        if remote_idx and self.client is not None:
+            try:
+                fetched = self.client.mget([keys[i] for i in remote_idx])
+            except Exception as e:
+                logger.warning(f"Embedding cache MGET failed: {e}")
+                fetched = [None] * len(remote_idx)
+            for i, raw in zip(remote_idx, fetched):
+                if raw is not None:
+                    raws[i] = raw
+                    self._local.set(keys[i], raw)
+
+        results = [decode_vector(raw) if raw is not None else None for raw in raws]
+        hits = sum(1 for vec in results if vec is not None)
+        self._hits += hits
+        self._misses += len(results) - hits
+        return results
+
+    def set_many(self, model: str, texts: Sequence[str], vectors: Sequence[Optional[Vector]]) -> None:
+        """批量写入向量（None、空向量或无法编码的向量跳过）"""
+        encoded: Dict[str, bytes] = {}
+        for text, vector in zip(texts, vectors):
+            if not vector:
+                continue
+            try:
+                encoded[embedding_cache_key(model, text)] = encode_vector(vector, self.dtype)
+            except (OverflowError, struct.error) as e:
+                logger.debug(f"Embedding cache skipped unencodable vector: {e}")
+        if not encoded:
+            return
+
+        for key, raw in encoded.items():
+            self._local.set(key, raw)
+
+        if self.client is not None:
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                for key, raw in encoded.items():
+                    if self.ttl:
+                        pipe.set(key, raw, ex=self.ttl)
+                    else:
+                        pipe.set(key, raw)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def get(self, model: str, text: str) -> Optional[Vector]:
+        """查询单条向量"""
+        return self.get_many(model, [text])[0]
+
+    def set(self, model: str, text: str, vector: Vector) -> None:
+        """写入单条向量"""
+        self.set_many(model, [text], [vector])
+
+    def _plan_misses(self, model: str, texts: Sequence[str]):
+        """查询缓存并返回 (结果, 去重后的未命中文本, 未命中文本 -> 下标列表)"""
+        results = self.get_many(model, texts)
+        pending: Dict[str, List[int]] = {}
+        for i, vector in enumerate(results):
+            if vector is None:
+                pending.setdefault(normalize_text(texts[i]), []).append(i)
+        missing = [texts[indices[0]] for indices in pending.values()]
+        return results, missing, list(pending.values())
+
+    def _fill(self, model, results, missing, slots, computed) -> List[Optional[Vector]]:
+        self.set_many(model, missing, computed)
+        for indices, vector in zip(slots, computed):
+            for i in indices:
+                results[i] = vector
+        return results
+
+    def get_or_compute(
+        self,
+        model: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Sequence[Optional[Vector]]],
+    ) -> List[Optional[Vector]]:
+        """
+        查询缓存，只对未命中的文本调用 compute
+
+        Args:
+            model: 模型名称
+            texts: 输入文本
+            compute: 批量计算函数，返回与输入对齐的向量（失败项为 None，不会写入缓存）
+        """
+        results, missing, slots = self._plan_misses(model, texts)
+        if not missing:
+            return results
+        return self._fill(model, results, missing, slots, list(compute(missing)))
+
+    async def aget_or_compute(
+        self,
+        model: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Awaitable[Sequence[Optional[Vector]]]],
+    ) -> List[Optional[Vector]]:
+        """get_or_compute 的异步版本（Redis 读写在线程中执行，不阻塞事件循环）"""
+        results, missing, slots = await asyncio.to_thread(self._plan_misses, model, texts)
+        if not missing:
+            return results
+        vectors = list(await compute(missing))
+        return await asyncio.to_thread(self._fill, model, results, missing, slots, vectors)
+
+    def clear_local(self) -> None:
+        """清空进程内缓存"""
+        self._local.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "local_size": self._local.stats()["size"],
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    获取全局 Embedding 缓存
+
+    Returns:
+        EmbeddingCache 实例；EMBEDDING_CACHE_ENABLED=false 时返回 None
+    """
+    global _embedding_cache
+    if not get_config().redis.embedding_cache_enabled:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(redis_client=get_cache().client)
+    return _embedding_cache
+
+
+def reset_embedding_cache() -> None:
+    """重置全局 Embedding 缓存（主要用于测试）"""
+    global _embedding_cache
+    _embedding_cache = None
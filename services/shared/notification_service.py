@@ -12,21 +12,31 @@
         variables={"alert_name": "CPU告警", "value": "95%"},
         channels=["email", "dingtalk"]
     )
+
+发送经 NotificationDispatcher 统一调度（独立事件循环线程）：
+- SMTP 连接池、keep-alive HTTP 会话复用
+- 按渠道令牌桶限流、并发上限、失败退避重试
+- 时间窗口内重复通知抑制；带 digest_key 的通知按窗口合并为一条
 """
 
 import os
 import json
 import logging
 import asyncio
+import atexit
+import random
 import smtplib
 import hmac
 import hashlib
 import base64
+import threading
 import time
 import urllib.parse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from enum import Enum
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -34,6 +44,38 @@ from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
 
+# 每个渠道的并发发送上限
+NOTIFY_MAX_CONCURRENCY = int(os.getenv("NOTIFY_MAX_CONCURRENCY", "8"))
+# 失败重试次数与退避基数（秒，指数退避 + 抖动）
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+NOTIFY_RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF", "0.5"))
+# 重复通知抑制窗口（秒，0 表示关闭）
+NOTIFY_DEDUPE_WINDOW = float(os.getenv("NOTIFY_DEDUPE_WINDOW", "300"))
+# 带 digest_key 的通知合并窗口（秒，0 表示逐条发送）
+NOTIFY_DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "30"))
+# keep-alive HTTP 连接池大小
+NOTIFY_HTTP_POOL_SIZE = int(os.getenv("NOTIFY_HTTP_POOL_SIZE", "100"))
+# SMTP 连接池大小与空闲连接过期时间（秒）
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_POOL_IDLE_TIMEOUT = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+
+# 按渠道限流：[条数, 秒]（钉钉/企业微信机器人 20 条/分钟，飞书机器人 100 条/分钟）
+DEFAULT_RATE_LIMITS = {
+    "email": [10, 1],
+    "sms": [10, 1],
+    "dingtalk": [20, 60],
+    "wechat_work": [20, 60],
+    "feishu": [100, 60],
+    "webhook": [50, 1],
+}
+NOTIFY_RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("NOTIFY_RATE_LIMITS") or "{}")}
+
+# 可重试的错误码：发送异常、HTTP 429，以及钉钉/企业微信/飞书的频率限制错误码
+RETRYABLE_ERROR_CODES = {"SEND_FAILED", "429", "130101", "45009", "9499", "11232"}
+
+# 合并通知中最多展开的条数
+DIGEST_MAX_ITEMS = 20
+
 
 class ChannelType(str, Enum):
     """通知渠道类型"""
@@ -58,15 +100,162 @@ class NotificationResult:
     response_data: Optional[Dict] = None
 
 
+# ==================== 连接池与限流 ====================
+
+
+class SMTPConnectionPool:
+    """
+    SMTP 连接池
+
+    连接建立（STARTTLS + 登录）后复用，空闲超过 idle_timeout 的连接关闭；
+    被服务端断开的空闲连接在发送时自动重连一次。线程安全（发送在线程池中执行）。
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, use_tls: bool = True,
+                 max_size: int = SMTP_POOL_SIZE, idle_timeout: float = SMTP_POOL_IDLE_TIMEOUT,
+                 timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_size))
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            self._quit(server)
+            raise
+        return server
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> smtplib.SMTP:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                server, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return server
+                self._quit(server)
+        return self._connect()
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str):
+        """用池中的连接发送邮件"""
+        with self._slots:
+            server = self._checkout()
+            try:
+                server.sendmail(from_addr, to_addrs, msg)
+            except smtplib.SMTPServerDisconnected:
+                # 空闲连接已被服务端关闭，重连后再发一次
+                self._quit(server)
+                server = self._connect()
+                try:
+                    server.sendmail(from_addr, to_addrs, msg)
+                except Exception:
+                    self._quit(server)
+                    raise
+            except Exception:
+                self._quit(server)
+                raise
+            self._checkin(server)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._quit(server)
+
+
+class HTTPSessionPool:
+    """keep-alive HTTP 会话（绑定分发器事件循环，其他事件循环使用临时会话）"""
+
+    def __init__(self, limit: int = NOTIFY_HTTP_POOL_SIZE, keepalive_timeout: float = 60):
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+
+    def owns_running_loop(self) -> bool:
+        return self.loop is not None and asyncio.get_running_loop() is self.loop
+
+    async def get(self):
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive_timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class TokenBucket:
+    """令牌桶限流（只在分发器事件循环内使用，无需加锁）"""
+
+    def __init__(self, count: float, per_seconds: float):
+        self.capacity = max(1.0, float(count))
+        self.rate = self.capacity / max(float(per_seconds), 1e-6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class BaseChannel(ABC):
     """通知渠道基类"""
 
     channel_type: ChannelType
     timeout: int = 30
+    # 由 UnifiedNotificationService 注入
+    http_pool: Optional[HTTPSessionPool] = None
 
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
 
+    @asynccontextmanager
+    async def _http_session(self):
+        """在分发器事件循环内复用 keep-alive 会话，否则使用临时会话"""
+        import aiohttp
+
+        if self.http_pool is not None and self.http_pool.owns_running_loop():
+            yield await self.http_pool.get()
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+
     @abstractmethod
     async def send(
         self,
@@ -92,6 +281,11 @@ class EmailChannel(BaseChannel):
         self.smtp_password = config.get("smtp_password") or os.getenv("SMTP_PASSWORD")
         self.smtp_from = config.get("smtp_from") or os.getenv("SMTP_FROM") or self.smtp_user
         self.use_tls = config.get("use_tls", True)
+        self._smtp_pool = SMTPConnectionPool(
+            self.smtp_host, self.smtp_port, self.smtp_user, self.smtp_password, self.use_tls,
+            max_size=int(config.get("pool_size") or SMTP_POOL_SIZE),
+            timeout=self.timeout,
+        )
 
     async def send(
         self,
@@ -149,12 +343,8 @@ class EmailChannel(BaseChannel):
             )
 
     def _send_email_sync(self, recipient: str, msg: MIMEMultipart):
-        """同步发送邮件"""
-        with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-            if self.use_tls:
-                server.starttls()
-            server.login(self.smtp_user, self.smtp_password)
-            server.sendmail(self.smtp_from, [recipient], msg.as_string())
+        """同步发送邮件（复用连接池中的已登录连接）"""
+        self._smtp_pool.sendmail(self.smtp_from, [recipient], msg.as_string())
 
 
 class SMSChannel(BaseChannel):
@@ -325,7 +515,7 @@ class DingTalkChannel(BaseChannel):
             if at_config:
                 payload["at"] = at_config
 
-            async with aiohttp.ClientSession() as session:
+            async with self._http_session() as session:
                 async with session.post(
                     webhook_url,
                     json=payload,
@@ -413,7 +603,7 @@ class WeChatWorkChannel(BaseChannel):
                 if msg_type == "text":
                     payload["text"]["mentioned_list"] = extra["mentioned_list"]
 
-            async with aiohttp.ClientSession() as session:
+            async with self._http_session() as session:
                 async with session.post(
                     webhook_url,
                     json=payload,
@@ -518,7 +708,7 @@ class FeishuChannel(BaseChannel):
                 payload["timestamp"] = timestamp
                 payload["sign"] = sign
 
-            async with aiohttp.ClientSession() as session:
+            async with self._http_session() as session:
                 async with session.post(
                     webhook_url,
                     json=payload,
@@ -606,7 +796,7 @@ class WebhookChannel(BaseChannel):
             headers = extra.get("headers", {"Content-Type": "application/json"})
             method = extra.get("method", "POST").upper()
 
-            async with aiohttp.ClientSession() as session:
+            async with self._http_session() as session:
                 async with session.request(
                     method,
                     webhook_url,
@@ -690,6 +880,278 @@ class InAppChannel(BaseChannel):
             )
 
 
+# ==================== 通知分发 ====================
+
+
+@dataclass
+class _Digest:
+    """合并窗口内累积的通知"""
+    channel: str
+    recipient: str
+    extra: Dict[str, Any]
+    items: List[Tuple[str, str]] = field(default_factory=list)
+    # 已合并条目的去重键，发送成功后才计入去重记录
+    dedupe_keys: List[Tuple[str, str, str]] = field(default_factory=list)
+
+
+class NotificationDispatcher:
+    """
+    通知分发器
+
+    发送在独立的事件循环线程中执行，调用方可以来自任意事件循环（各服务按请求
+    新建并关闭事件循环）；HTTP 会话、限流、并发控制和合并定时器都绑定在该循环上：
+    - 按渠道令牌桶限流 + 并发上限
+    - 可重试错误按指数退避重试
+    - dedupe_window 内相同渠道/接收方/内容的通知只发送一次（extra["dedupe"]=False 关闭），
+      只有发送成功的通知才计入去重
+    - 带 extra["digest_key"] 的通知在 digest_window 内按（渠道, 接收方, digest_key）
+      合并为一条发送；入队时返回 response_data["digested"]=True，表示尚未实际送达
+    - 进程退出时自动 close()，发送尚未到期的合并通知
+    """
+
+    def __init__(self, channels: Dict[str, BaseChannel], config: Dict[str, Any] = None):
+        config = config or {}
+        self._channels = channels
+        self.max_concurrency = int(config.get("max_concurrency", NOTIFY_MAX_CONCURRENCY))
+        self.max_retries = int(config.get("max_retries", NOTIFY_MAX_RETRIES))
+        self.retry_backoff = float(config.get("retry_backoff", NOTIFY_RETRY_BACKOFF))
+        self.dedupe_window = float(config.get("dedupe_window", NOTIFY_DEDUPE_WINDOW))
+        self.digest_window = float(config.get("digest_window", NOTIFY_DIGEST_WINDOW))
+        self.rate_limits = {**NOTIFY_RATE_LIMITS, **config.get("rate_limits", {})}
+        self.http_pool = HTTPSessionPool(int(config.get("http_pool_size", NOTIFY_HTTP_POOL_SIZE)))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        # 以下状态只在分发器事件循环内访问
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._recent: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._digests: Dict[Tuple[str, str, str], _Digest] = {}
+        self._pending_flushes: set = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="notification-dispatcher", daemon=True
+                ).start()
+                self._loop = loop
+                self.http_pool.loop = loop
+                self._semaphores.clear()
+                atexit.register(self.close)
+            return self._loop
+
+    async def _run(self, coro):
+        """在分发器事件循环中执行协程，并在调用方的事件循环中等待结果"""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def dispatch(
+        self,
+        channel: str,
+        recipient: str,
+        subject: str,
+        content: str,
+        extra: Dict[str, Any] = None
+    ) -> NotificationResult:
+        """分发单条通知"""
+        return await self._run(self._dispatch(channel, recipient, subject, content, extra or {}))
+
+    async def flush_digests(self) -> List[NotificationResult]:
+        """立即发送所有待合并的通知"""
+        return await self._run(self._flush_all_digests())
+
+    def close(self):
+        """停止分发线程并关闭连接池（未到期的合并通知会先发送）"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+        atexit.unregister(self.close)
+
+        async def shutdown():
+            await self._flush_all_digests()
+            await self.http_pool.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"Notification dispatcher shutdown failed: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        for channel in self._channels.values():
+            pool = getattr(channel, "_smtp_pool", None)
+            if pool is not None:
+                pool.close()
+
+    # ---------- 去重与合并 ----------
+
+    def _dedupe_key(self, channel: str, recipient: str, subject: str, content: str,
+                    extra: Dict[str, Any]) -> Tuple[str, str, str]:
+        digest = hashlib.sha1(
+            "\x00".join([subject, content, str(extra.get("webhook_url") or "")]).encode("utf-8")
+        ).hexdigest()
+        return channel, recipient, digest
+
+    def _is_duplicate(self, key: Tuple[str, str, str]) -> bool:
+        now = time.monotonic()
+        while self._recent:
+            _, sent_at = next(iter(self._recent.items()))
+            if now - sent_at < self.dedupe_window:
+                break
+            self._recent.popitem(last=False)
+        return key in self._recent
+
+    def _mark_sent(self, keys: List[Tuple[str, str, str]]):
+        """记录发送成功的通知，dedupe_window 内不再重复发送"""
+        now = time.monotonic()
+        for key in keys:
+            self._recent.pop(key, None)
+            self._recent[key] = now
+
+    async def _dispatch(self, channel: str, recipient: str, subject: str, content: str,
+                        extra: Dict[str, Any]) -> NotificationResult:
+        dedupe_key = None
+        if self.dedupe_window > 0 and extra.get("dedupe", True):
+            dedupe_key = self._dedupe_key(channel, recipient, subject, content, extra)
+            if self._is_duplicate(dedupe_key):
+                return NotificationResult(
+                    success=True,
+                    channel=channel,
+                    response_data={"suppressed": True, "reason": "duplicate"}
+                )
+
+        digest_key = extra.get("digest_key")
+        if digest_key and self.digest_window > 0:
+            return self._add_to_digest(
+                channel, recipient, subject, content, extra, str(digest_key), dedupe_key
+            )
+
+        result = await self._deliver(channel, recipient, subject, content, extra)
+        # 发送失败不计入去重，允许调用方重发
+        if result.success and dedupe_key is not None:
+            self._mark_sent([dedupe_key])
+        return result
+
+    def _add_to_digest(self, channel: str, recipient: str, subject: str, content: str,
+                       extra: Dict[str, Any], digest_key: str,
+                       dedupe_key: Optional[Tuple[str, str, str]]) -> NotificationResult:
+        key = (channel, recipient, digest_key)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = _Digest(channel, recipient, extra)
+            asyncio.get_running_loop().call_later(self.digest_window, self._schedule_flush, key)
+        # 同一合并批次内的重复通知只保留一条
+        if dedupe_key is None or dedupe_key not in digest.dedupe_keys:
+            digest.items.append((subject, content))
+            if dedupe_key is not None:
+                digest.dedupe_keys.append(dedupe_key)
+        return NotificationResult(
+            success=True,
+            channel=channel,
+            message_id=f"digest_{hashlib.md5(repr(key).encode('utf-8')).hexdigest()[:12]}",
+            response_data={"digested": True, "digest_key": digest_key, "pending": len(digest.items)}
+        )
+
+    def _schedule_flush(self, key: Tuple[str, str, str]):
+        task = asyncio.ensure_future(self._flush_digest(key))
+        self._pending_flushes.add(task)
+        task.add_done_callback(self._pending_flushes.discard)
+
+    async def _flush_digest(self, key: Tuple[str, str, str]) -> Optional[NotificationResult]:
+        digest = self._digests.pop(key, None)
+        if digest is None:
+            return None
+
+        subject, content = digest.items[0]
+        count = len(digest.items)
+        if count > 1:
+            subject = f"{subject}（共 {count} 条）"
+            sections = [
+                f"[{i}] {item_subject}\n{item_content}"
+                for i, (item_subject, item_content) in enumerate(digest.items[:DIGEST_MAX_ITEMS], 1)
+            ]
+            if count > DIGEST_MAX_ITEMS:
+                sections.append(f"... 另有 {count - DIGEST_MAX_ITEMS} 条通知")
+            content = "\n\n".join(sections)
+
+        result = await self._deliver(digest.channel, digest.recipient, subject, content, digest.extra)
+        if result.success:
+            self._mark_sent(digest.dedupe_keys)
+        else:
+            logger.error(
+                f"Digest notification to {digest.recipient} via {digest.channel} failed: {result.error}"
+            )
+        return result
+
+    async def _flush_all_digests(self) -> List[NotificationResult]:
+        results = await asyncio.gather(*[self._flush_digest(key) for key in list(self._digests)])
+        return [result for result in results if result is not None]
+
+    # ---------- 发送 ----------
+
+    def _semaphore(self, channel: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(channel)
+        if semaphore is None:
+            semaphore = self._semaphores[channel] = asyncio.Semaphore(max(1, self.max_concurrency))
+        return semaphore
+
+    def _bucket(self, channel: str) -> Optional[TokenBucket]:
+        if channel not in self._buckets:
+            limit = self.rate_limits.get(channel)
+            self._buckets[channel] = TokenBucket(*limit) if limit else None
+        return self._buckets[channel]
+
+    @staticmethod
+    def _is_retryable(result: NotificationResult) -> bool:
+        code = str(result.error_code or "")
+        return code in RETRYABLE_ERROR_CODES or (len(code) == 3 and code.startswith("5"))
+
+    async def _deliver(self, channel: str, recipient: str, subject: str, content: str,
+                       extra: Dict[str, Any]) -> NotificationResult:
+        channel_instance = self._channels.get(channel)
+        if not channel_instance:
+            return NotificationResult(
+                success=False,
+                channel=channel,
+                error=f"Unsupported channel: {channel}",
+                error_code="UNSUPPORTED_CHANNEL"
+            )
+
+        bucket = self._bucket(channel)
+        async with self._semaphore(channel):
+            attempt = 0
+            while True:
+                if bucket is not None:
+                    await bucket.acquire()
+                try:
+                    result = await channel_instance.send(recipient, subject, content, extra)
+                except Exception as e:
+                    logger.error(f"Notification via {channel} raised: {e}")
+                    result = NotificationResult(
+                        success=False,
+                        channel=channel,
+                        error=str(e),
+                        error_code="SEND_FAILED"
+                    )
+
+                if result.success or attempt >= self.max_retries or not self._is_retryable(result):
+                    return result
+                delay = self.retry_backoff * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                logger.warning(
+                    f"Notification via {channel} failed ({result.error_code}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+
 class UnifiedNotificationService:
     """
     统一通知服务
@@ -720,6 +1182,9 @@ class UnifiedNotificationService:
         self.config = config or {}
         self._channels: Dict[str, BaseChannel] = {}
         self._init_channels()
+        self.dispatcher = NotificationDispatcher(self._channels, self.config.get("dispatcher", {}))
+        for channel in self._channels.values():
+            channel.http_pool = self.dispatcher.http_pool
 
     def _init_channels(self):
         """初始化通知渠道"""
@@ -739,8 +1204,13 @@ class UnifiedNotificationService:
 
     def register_channel(self, channel_type: str, channel: BaseChannel):
         """注册自定义通知渠道"""
+        channel.http_pool = self.dispatcher.http_pool
         self._channels[channel_type] = channel
 
+    def close(self):
+        """关闭分发器与连接池"""
+        self.dispatcher.close()
+
     async def send(
         self,
         channel: str,
@@ -757,13 +1227,12 @@ class UnifiedNotificationService:
             recipient: 接收方（邮箱/手机号/webhook地址/用户ID）
             subject: 通知标题
             content: 通知内容
-            extra: 额外参数
+            extra: 额外参数（digest_key: 合并键，如告警事件ID；dedupe: 是否去重，默认 True）
 
         Returns:
             NotificationResult
         """
-        channel_instance = self.get_channel(channel)
-        if not channel_instance:
+        if not self.get_channel(channel):
             return NotificationResult(
                 success=False,
                 channel=channel,
@@ -771,7 +1240,7 @@ class UnifiedNotificationService:
                 error_code="UNSUPPORTED_CHANNEL"
             )
 
-        return await channel_instance.send(recipient, subject, content, extra)
+        return await self.dispatcher.dispatch(channel, recipient, subject, content, extra)
 
     async def send_batch(
         self,
@@ -782,7 +1251,7 @@ class UnifiedNotificationService:
         extra: Dict[str, Any] = None
     ) -> List[NotificationResult]:
         """
-        批量发送通知
+        批量发送通知（并发受分发器按渠道的并发上限与限流约束）
 
         Args:
             channel: 渠道类型
@@ -821,16 +1290,11 @@ class UnifiedNotificationService:
         Returns:
             Dict[channel, NotificationResult]
         """
-        tasks = {
-            channel: self.send(channel, recipient, subject, content, extra)
+        results = await asyncio.gather(*[
+            self.send(channel, recipient, subject, content, extra)
             for channel in channels
-        }
-
-        results = {}
-        for channel, task in tasks.items():
-            results[channel] = await task
-
-        return results
+        ])
+        return dict(zip(channels, results))
 
     async def send_notification(
         self,
@@ -869,25 +1333,29 @@ class UnifiedNotificationService:
                     "body_template": "{{content}}",
                 })
 
+        targets = []
+        tasks = []
         for recipient in recipients:
             for template in templates:
                 channel = template["channel"]
                 subject = self._render_template(template.get("subject_template", ""), variables)
                 content = self._render_template(template.get("body_template", ""), variables)
 
-                result = await self.send(
+                targets.append((recipient, channel))
+                tasks.append(self.send(
                     channel=channel,
                     recipient=recipient,
                     subject=subject,
                     content=content,
                     extra=variables.get("extra", {})
-                )
+                ))
 
-                results.append({
-                    "recipient": recipient,
-                    "channel": channel,
-                    "result": result
-                })
+        for (recipient, channel), result in zip(targets, await asyncio.gather(*tasks)):
+            results.append({
+                "recipient": recipient,
+                "channel": channel,
+                "result": result
+            })
 
         return results
 
@@ -915,5 +1383,7 @@ def get_notification_service(config: Dict[str, Any] = None) -> UnifiedNotificati
 def init_notification_service(config: Dict[str, Any]) -> UnifiedNotificationService:
     """初始化统一通知服务"""
     global _notification_service
+    if _notification_service is not None:
+        _notification_service.close()
     _notification_service = UnifiedNotificationService(config)
     return _notification_service
@@ -102,10 +102,14 @@ class PrometheusMetrics:
 
         self._cache_hits_total = None
         self._cache_misses_total = None
+        self._cache_evictions_total = None
 
         self._task_queue_size = None
         self._task_duration_seconds = None
 
+        self._batch_fill_ratio = None
+        self._batch_queue_delay_seconds = None
+
         if app is not None:
             self.init_app(app, service_name)
 
@@ -219,6 +223,12 @@ class PrometheusMetrics:
             ["cache"],
             registry=self.registry
         )
+        self._cache_evictions_total = Counter(
+            "cache_evictions_total",
+            "Total cache evictions",
+            ["cache"],
+            registry=self.registry
+        )
 
         # 任务指标
         self._task_queue_size = Gauge(
@@ -235,6 +245,22 @@ class PrometheusMetrics:
             registry=self.registry
         )
 
+        # 微批处理指标
+        self._batch_fill_ratio = Histogram(
+            "batch_fill_ratio",
+            "Batch size divided by max batch size",
+            ["batcher"],
+            buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+            registry=self.registry
+        )
+        self._batch_queue_delay_seconds = Histogram(
+            "batch_queue_delay_seconds",
+            "Time a request waited before its batch was sent",
+            ["batcher"],
+            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+            registry=self.registry
+        )
+
         # 注册请求中间件
         app.before_request(self._before_request)
         app.after_request(self._after_request)
@@ -415,6 +441,11 @@ class PrometheusMetrics:
         if self._cache_misses_total:
             self._cache_misses_total.labels(cache=cache).inc()
 
+    def record_cache_eviction(self, cache: str = "default"):
+        """记录缓存淘汰"""
+        if self._cache_evictions_total:
+            self._cache_evictions_total.labels(cache=cache).inc()
+
     # 公共方法：任务指标
 
     def record_task_start(self, queue: str = "default"):
@@ -430,6 +461,17 @@ class PrometheusMetrics:
         if self._task_duration_seconds:
             self._task_duration_seconds.labels(task_type=task_type).observe(duration)
 
+    # 公共方法：微批处理指标
+
+    def record_batch(self, batcher: str, fill_ratio: float, queue_delays: List[float]):
+        """记录一次批次发送：填充率按批次记录，排队延迟按请求记录"""
+        if self._batch_fill_ratio:
+            self._batch_fill_ratio.labels(batcher=batcher).observe(fill_ratio)
+
+        if self._batch_queue_delay_seconds:
+            for delay in queue_delays:
+                self._batch_queue_delay_seconds.labels(batcher=batcher).observe(delay)
+
 
 # 装饰器：跟踪业务操作
 
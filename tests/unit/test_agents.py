@@ -205,9 +205,10 @@ class TestFunctionCallingAgent:
         return registry
 
     @pytest.mark.asyncio
-    @patch('engine.agents.requests.post')
-    async def test_run_no_tool_calls(self, mock_post, mock_tool_registry):
+    @patch('engine.agents.get_llm_client')
+    async def test_run_no_tool_calls(self, mock_get_client, mock_tool_registry):
         """测试无工具调用的执行"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.agents import FunctionCallingAgent
 
         mock_response = Mock()
@@ -229,9 +230,10 @@ class TestFunctionCallingAgent:
         assert result["answer"] == "The answer is 42"
 
     @pytest.mark.asyncio
-    @patch('engine.agents.requests.post')
-    async def test_run_api_error(self, mock_post, mock_tool_registry):
+    @patch('engine.agents.get_llm_client')
+    async def test_run_api_error(self, mock_get_client, mock_tool_registry):
         """测试 API 错误处理"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.agents import FunctionCallingAgent
 
         mock_response = Mock()
@@ -257,9 +259,10 @@ class TestPlanExecuteAgent:
         return registry
 
     @pytest.mark.asyncio
-    @patch('engine.agents.requests.post')
-    async def test_make_plan_success(self, mock_post, mock_tool_registry):
+    @patch('engine.agents.get_llm_client')
+    async def test_make_plan_success(self, mock_get_client, mock_tool_registry):
         """测试计划生成成功"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.agents import PlanExecuteAgent
 
         mock_response = Mock()
@@ -280,9 +283,10 @@ class TestPlanExecuteAgent:
         assert plan[0] == "Step 1"
 
     @pytest.mark.asyncio
-    @patch('engine.agents.requests.post')
-    async def test_make_plan_fallback(self, mock_post, mock_tool_registry):
+    @patch('engine.agents.get_llm_client')
+    async def test_make_plan_fallback(self, mock_get_client, mock_tool_registry):
         """测试计划生成失败时的回退"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.agents import PlanExecuteAgent
 
         mock_post.side_effect = Exception("Connection error")
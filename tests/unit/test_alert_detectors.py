@@ -0,0 +1,260 @@
+"""
+预警检测器状态存储与批量检测单元测试
+
+覆盖：
+- 窗口 Welford 统计、EWMA、滑动分位数、模型缓存
+- AlertEngine.evaluate_rules 增量同步与向量化检测（SQLite 内存库）
+"""
+
+import importlib.util
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+_data_api_dir = Path(__file__).parent.parent.parent / "services" / "data-api"
+_src_dir = _data_api_dir / "src"
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, _src_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+alert_detectors = _load("alert_detectors", "alert_detectors.py")
+
+
+class TestMetricSeries:
+    """MetricSeries 滚动统计"""
+
+    def test_window_stats_match_numpy(self):
+        series = alert_detectors.MetricSeries()
+        stats = series.window(50)
+        rng = np.random.default_rng(0)
+        values = rng.normal(100, 5, 200)
+        for ts, value in enumerate(values):
+            series.append(float(ts), float(value))
+            series.evict(float(ts))
+
+        expected = values[-51:]
+        assert stats.count == 51
+        assert stats.mean == pytest.approx(expected.mean())
+        assert stats.std == pytest.approx(expected.std())
+
+    def test_late_window_backfills_from_history(self):
+        series = alert_detectors.MetricSeries(retention_seconds=100)
+        for ts in range(10):
+            series.append(float(ts), float(ts))
+        stats = series.window(3, now=9)
+        assert stats.count == 4
+        assert stats.mean == pytest.approx(7.5)
+
+    def test_eviction_keeps_latest_value(self):
+        series = alert_detectors.MetricSeries(retention_seconds=10)
+        series.append(0.0, 1.0)
+        series.append(5.0, 2.0)
+        series.evict(1000.0)
+        assert len(series) == 1
+        assert series.latest == (5.0, 2.0)
+
+    def test_value_at(self):
+        series = alert_detectors.MetricSeries(retention_seconds=100)
+        for ts, value in [(0, 10.0), (10, 20.0), (20, 30.0)]:
+            series.append(float(ts), value)
+        assert series.value_at(15) == 20.0
+        assert series.value_at(-1) is None
+
+    def test_ewma_forecast_excludes_latest(self):
+        series = alert_detectors.MetricSeries(ewma_alpha=0.5)
+        for value in (10.0, 10.0, 20.0):
+            series.append(0.0, value)
+        assert series.forecast == 10.0
+        assert series.ewma == 15.0
+
+    def test_quantiles(self):
+        series = alert_detectors.MetricSeries()
+        for ts in range(101):
+            series.append(float(ts), float(ts))
+        low, high = series.quantiles(1000, [0.05, 0.95])
+        assert (low, high) == (pytest.approx(5.0), pytest.approx(95.0))
+
+    def test_sliding_quantiles_match_numpy(self):
+        series = alert_detectors.MetricSeries()
+        rng = np.random.default_rng(1)
+        values = rng.normal(0, 1, 300)
+        qs = [0.05, 0.5, 0.95]
+        series.window(50)
+        for ts, value in enumerate(values):
+            series.append(float(ts), float(value))
+            series.evict(float(ts))
+            if ts >= 10:
+                expected = np.quantile(values[max(ts - 50, 0):ts + 1], qs)
+                np.testing.assert_allclose(series.quantiles(50, qs), expected)
+
+    def test_window_bounded_by_max_points(self):
+        series = alert_detectors.MetricSeries(retention_seconds=100)
+        for ts in range(20):
+            series.append(float(ts), float(ts))
+        with patch.object(alert_detectors, "ALERT_WINDOW_MAX_POINTS", 5):
+            stats = series.window(50)
+        assert stats.count == 5
+        assert stats.mean == pytest.approx(17.0)
+        series.quantiles(50, [0.5])
+
+        for ts in range(20, 23):
+            series.append(float(ts), float(ts))
+        assert stats.count == 5
+        assert stats.mean == pytest.approx(20.0)
+        assert stats.sorted_values == [18.0, 19.0, 20.0, 21.0, 22.0]
+        assert list(series.window_values(50)) == [18.0, 19.0, 20.0, 21.0, 22.0]
+
+
+class TestModelCache:
+    """已训练模型缓存"""
+
+    def test_retrain_after_enough_updates(self):
+        cache = alert_detectors.ModelCache(retrain_interval=3600, retrain_points=10)
+        trained = []
+
+        def train():
+            trained.append(1)
+            return len(trained)
+
+        assert cache.get("k", 0, train) == 1
+        assert cache.get("k", 9, train) == 1
+        assert cache.get("k", 10, train) == 2
+        assert len(trained) == 2
+
+
+class TestEvaluateRules:
+    """AlertEngine 批量检测（SQLite 内存库）"""
+
+    NOW = datetime(2026, 3, 1, 12, 0)
+
+    @pytest.fixture
+    def env(self):
+        pytest.importorskip("sqlalchemy")
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        with patch.dict(os.environ, {"DATABASE_URL": "sqlite://"}), \
+                patch.dict(sys.modules), \
+                patch.object(sys, "path", [str(_data_api_dir), str(_src_dir)] + sys.path):
+            for name in [m for m in sys.modules if m == "models" or m.startswith("models.")]:
+                sys.modules.pop(name)
+            engine_module = _load("alert_engine", "alert_engine.py")
+            from models.base import Base
+            from models.data_monitoring import MonitoringMetricValue
+
+            engine = create_engine("sqlite://")
+            Base.metadata.create_all(engine, tables=[MonitoringMetricValue.__table__])
+            session = sessionmaker(bind=engine)()
+
+            def add(metric_id, minutes_ago, value):
+                session.add(MonitoringMetricValue(
+                    metric_id=metric_id, value=value, timestamp=self.NOW - timedelta(minutes=minutes_ago)
+                ))
+
+            store = engine_module.DetectorStateStore()
+            yield engine_module.AlertEngine(session, state_store=store), session, add, store
+            session.close()
+
+    @staticmethod
+    def _rule(metric_id, condition_type, **config):
+        return SimpleNamespace(rule_id=f"r_{metric_id}", metric_id=metric_id,
+                               condition_type=condition_type, condition_config=config)
+
+    def test_threshold_and_change_rate(self, env):
+        engine, session, add, _ = env
+        add("cpu", 5, 50.0)
+        add("cpu", 0, 95.0)
+        add("orders", 70, 100.0)
+        add("orders", 0, 150.0)
+        session.commit()
+
+        rules = [
+            self._rule("cpu", "threshold", operator="gt", value=90),
+            self._rule("cpu", "threshold", operator="lte", value=90),
+            self._rule("orders", "change_rate", period="1h", operator="gt", value=0.2),
+            self._rule("orders", "change_rate", period="6h", operator="gt", value=0.2),
+            self._rule("missing", "threshold", operator="gt", value=0),
+        ]
+        results = engine.evaluate_rules(rules, now=self.NOW)
+        assert [r.should_alert for r in results] == [True, False, True, False, False]
+        assert results[0].message == "当前值 95.0 大于 阈值 90"
+        assert results[2].change_rate == pytest.approx(0.5)
+        assert results[3].message == "无法获取 6h 前的历史数据"
+        assert results[4].message == "无法获取指标值"
+
+    def test_zscore_matches_scalar_detection(self, env):
+        engine, session, add, _ = env
+        values = [10.0, 11.0, 9.0, 10.5, 9.5, 10.0, 10.2, 9.8, 10.1, 9.9, 30.0]
+        for i, value in enumerate(values):
+            add("latency", len(values) - i, value)
+        session.commit()
+
+        result = engine.evaluate_rules(
+            [self._rule("latency", "anomaly", algorithm="zscore", window="1h")], now=self.NOW
+        )[0]
+        expected = engine._zscore_detection(30.0, values, 0.95)
+        assert result.should_alert is True
+        assert result.anomaly_score == pytest.approx(expected.anomaly_score)
+        assert result.message == expected.message
+
+    def test_incremental_sync_reads_only_new_rows(self, env):
+        engine, session, add, store = env
+        for i in range(12):
+            add("qps", 30 - i, 100.0)
+        session.commit()
+        rule = self._rule("qps", "anomaly", algorithm="quantile", window="1h", sensitivity=0.9)
+        assert engine.evaluate_rules([rule], now=self.NOW)[0].should_alert is False
+
+        add("qps", 0, 500.0)
+        session.commit()
+        result = engine.evaluate_rules([rule], now=self.NOW)[0]
+        assert result.should_alert is True
+        assert store.series("qps").window(3600).count == 13
+        # 没有新值时不再读取任何行
+        assert store.sync(session, {"qps": 3600}, self.NOW) == 0
+
+    def test_sync_picks_up_rows_committed_out_of_id_order(self, env):
+        _, session, _, store = env
+        from models.data_monitoring import MonitoringMetricValue
+
+        def add(row_id, minutes_ago, value):
+            session.add(MonitoringMetricValue(
+                id=row_id, metric_id="qps", value=value, timestamp=self.NOW - timedelta(minutes=minutes_ago)
+            ))
+
+        for row_id in range(1, 6):
+            add(row_id, 30 - row_id, 100.0)
+        session.commit()
+        assert store.sync(session, {"qps": 3600}, self.NOW) == 5
+
+        # id 7 先提交，id 6 的事务随后才提交
+        add(7, 2, 200.0)
+        session.commit()
+        assert store.sync(session, {"qps": 3600}, self.NOW) == 1
+        add(6, 1, 300.0)
+        session.commit()
+        assert store.sync(session, {"qps": 3600}, self.NOW) == 1
+
+        series = store.series("qps")
+        assert series.window(3600).count == 7
+        assert sorted(series.window_values(3600)) == [100.0] * 5 + [200.0, 300.0]
+        assert store.sync(session, {"qps": 3600}, self.NOW) == 0
+
+    def test_unknown_algorithm(self, env):
+        engine, session, add, _ = env
+        add("m", 0, 1.0)
+        session.commit()
+        result = engine.evaluate_rules([self._rule("m", "anomaly", algorithm="magic")], now=self.NOW)[0]
+        assert result.message == "未知的异常检测算法: magic"
@@ -0,0 +1,260 @@
+"""
+资产向量索引单元测试
+
+覆盖：
+- AssetVectorIndex 检索、过滤下推、删除复用、持久化
+- AIAssetSearchService 增量同步与只读语义检索（SQLite 内存库）
+"""
+
+import importlib.util
+import os
+import sys
+import time
+import types
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+_data_api_dir = Path(__file__).parent.parent.parent / "services" / "data-api"
+_services_dir = _data_api_dir / "services"
+
+
+def _load(name, filename):
+    """直接按文件加载模块，绕过 services 包初始化（依赖数据库配置）"""
+    spec = importlib.util.spec_from_file_location(name, _services_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+asset_vector_index = _load("asset_vector_index", "asset_vector_index.py")
+
+
+def _index():
+    index = asset_vector_index.AssetVectorIndex(initial_capacity=2)
+    index.upsert("a", [1.0, 0.0, 0.0], "fa", {"asset_type": "table", "data_level": "public"})
+    index.upsert("b", [0.9, 0.1, 0.0], "fb", {"asset_type": "view", "data_level": "public"})
+    index.upsert("c", [0.0, 1.0, 0.0], "fc", {"asset_type": "table", "data_level": "internal"})
+    return index
+
+
+class TestAssetVectorIndex:
+    """AssetVectorIndex 测试"""
+
+    def test_search_ranks_by_cosine(self):
+        hits, total = _index().search([1.0, 0.0, 0.0], top_k=2)
+        assert [asset_id for asset_id, _ in hits] == ["a", "b"]
+        assert hits[0][1] == pytest.approx(1.0)
+        assert total == 2  # c 的相似度为 0，不超过阈值
+
+    def test_filters_applied_before_scoring(self):
+        index = _index()
+        hits, _ = index.search([1.0, 0.0, 0.0], filters={"asset_type": "table"})
+        assert [asset_id for asset_id, _ in hits] == ["a"]
+        hits, _ = index.search([1.0, 1.0, 0.0], filters={"data_level": "internal"})
+        assert [asset_id for asset_id, _ in hits] == ["c"]
+
+    def test_remove_and_row_reuse(self):
+        index = _index()
+        assert index.remove("a") is True
+        assert [asset_id for asset_id, _ in index.search([1.0, 0.0, 0.0])[0]] == ["b"]
+        index.upsert("d", [1.0, 0.0, 0.0], "fd")
+        assert len(index) == 3
+        assert index.search([1.0, 0.0, 0.0], top_k=1)[0][0][0] == "d"
+
+    def test_update_attrs_without_reencoding(self):
+        index = _index()
+        index.update_attrs("a", {"asset_type": "view"})
+        hits, _ = index.search([1.0, 0.0, 0.0], filters={"asset_type": "view"})
+        assert [asset_id for asset_id, _ in hits] == ["a", "b"]
+        assert index.fingerprint("a") == "fa"
+
+    def test_rejects_zero_and_mismatched_vectors(self):
+        index = _index()
+        assert index.upsert("z", [0.0, 0.0, 0.0], "fz") is False
+        assert index.upsert("z", [1.0, 0.0], "fz") is False
+        assert index.search([1.0, 0.0]) == ([], 0)
+
+    def test_save_and_load(self, tmp_path):
+        index = _index()
+        index.remove("b")
+        index.synced_until = datetime(2026, 1, 1, 12, 0)
+        path = str(tmp_path / "assets.npz")
+        index.save(path)
+
+        restored = asset_vector_index.AssetVectorIndex.load(path)
+        assert sorted(restored.asset_ids()) == ["a", "c"]
+        assert restored.fingerprint("c") == "fc"
+        assert restored.synced_until == index.synced_until
+        hits, _ = restored.search([0.0, 1.0, 0.0], filters={"data_level": "internal"})
+        assert [asset_id for asset_id, _ in hits] == ["c"]
+
+
+class FakeEmbeddingService:
+    """按关键词生成向量的假向量化服务，记录向量化的文本"""
+
+    KEYWORDS = ("订单", "用户", "日志")
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return [1.0 if keyword in text else 0.0 for keyword in self.KEYWORDS] + [0.1]
+
+
+class TestSemanticSearch:
+    """AIAssetSearchService.semantic_search（SQLite 内存库）"""
+
+    @pytest.fixture
+    def env(self):
+        pytest.importorskip("sqlalchemy")
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+
+        package = types.ModuleType("services")
+        package.__path__ = [str(_services_dir)]
+        with patch.dict(os.environ, {"DATABASE_URL": "sqlite://"}), \
+                patch.dict(sys.modules, {"services": package}), \
+                patch.object(sys, "path", [str(_data_api_dir)] + sys.path):
+            for name in [m for m in sys.modules if m == "models" or m.startswith("models.")]:
+                sys.modules.pop(name)
+            search_module = _load("ai_asset_search", "ai_asset_search.py")
+            from models.base import Base
+            from models.assets import DataAsset
+
+            # 后台同步线程与测试共用同一个内存库连接
+            engine = create_engine(
+                "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+            )
+            Base.metadata.create_all(engine, tables=[DataAsset.__table__])
+            session = sessionmaker(bind=engine)()
+
+            def add(asset_id, name, description, asset_type="table", **kwargs):
+                session.add(DataAsset(
+                    asset_id=asset_id, name=name, description=description,
+                    asset_type=asset_type, status=kwargs.pop("status", "active"), **kwargs
+                ))
+
+            add("orders", "orders", "订单明细")
+            add("order_view", "order_view", "订单汇总视图", asset_type="view")
+            add("users", "users", "用户信息")
+            add("old_orders", "old_orders", "订单归档", status="archived")
+            session.commit()
+
+            embedding = FakeEmbeddingService()
+            service = search_module.AIAssetSearchService(embedding)
+            yield service, session, embedding, DataAsset
+            session.close()
+
+    def test_search_only_encodes_query(self, env):
+        service, session, embedding, _ = env
+        service.sync_vector_index(session)
+        assert len(embedding.encoded) == 3  # 3 个 active 资产
+
+        first = service.semantic_search(session, "default", "订单")
+        assert first["search_type"] == "semantic"
+        assert sorted(r["asset"]["id"] for r in first["results"]) == ["order_view", "orders"]
+        assert first["total"] == 2
+
+        service.semantic_search(session, "default", "用户")
+        assert len(embedding.encoded) == 3 + 2  # 只向量化查询
+
+    def test_search_does_not_sync_index(self, env):
+        service, session, embedding, DataAsset = env
+        service.sync_vector_index(session)
+        session.query(DataAsset).filter_by(asset_id="users").one().updated_at = \
+            datetime.utcnow() + timedelta(seconds=1)
+        session.commit()
+
+        with patch.object(service, "sync_vector_index") as sync:
+            service.semantic_search(session, "default", "订单")
+        sync.assert_not_called()
+        assert len(embedding.encoded) == 3 + 1
+
+    def test_unsynced_index_falls_back_and_starts_sync(self, env):
+        service, session, embedding, _ = env
+        with patch.object(service, "start_vector_index_sync") as start:
+            result = service.semantic_search(session, "default", "订单")
+        start.assert_called_once_with()
+        assert "search_type" not in result and "intent" in result
+        assert embedding.encoded == []
+
+    def test_background_sync_picks_up_changes(self, env):
+        from sqlalchemy.orm import sessionmaker
+
+        service, session, embedding, DataAsset = env
+        make_session = sessionmaker(bind=session.get_bind())
+        sessions = []
+
+        def factory():
+            sessions.append(make_session())
+            return sessions[-1]
+
+        def wait_until(condition):
+            for _ in range(200):
+                if condition():
+                    return True
+                time.sleep(0.01)
+            return False
+
+        assert service.start_vector_index_sync(factory, interval=60) is True
+        assert service.start_vector_index_sync(factory, interval=60) is False
+        assert wait_until(lambda: service._vector_index is not None and len(service._vector_index) == 3)
+
+        session.add(DataAsset(
+            asset_id="logs", name="logs", description="访问日志", asset_type="table",
+            status="active", updated_at=datetime.utcnow() + timedelta(seconds=1)
+        ))
+        session.commit()
+        service.notify_assets_changed()
+        assert wait_until(lambda: "logs" in service._vector_index)
+
+        service.stop_vector_index_sync()
+        service._sync_thread.join(timeout=1)
+        assert not service._sync_thread.is_alive()
+        assert len(sessions) == 2
+
+    def test_filters_pushed_down(self, env):
+        service, session, _, _ = env
+        service.sync_vector_index(session)
+        result = service.semantic_search(session, "default", "订单", filters={"asset_type": "view"})
+        assert [r["asset"]["id"] for r in result["results"]] == ["order_view"]
+
+    def test_incremental_refresh(self, env):
+        service, session, embedding, DataAsset = env
+        service.sync_vector_index(session)
+        encoded = len(embedding.encoded)
+
+        later = datetime.utcnow() + timedelta(seconds=1)
+        users = session.query(DataAsset).filter_by(asset_id="users").one()
+        users.description = "用户订单关系"
+        users.updated_at = later
+        orders = session.query(DataAsset).filter_by(asset_id="orders").one()
+        orders.status = "deprecated"
+        orders.updated_at = later
+        session.commit()
+
+        service.sync_vector_index(session)
+        # 只有文本变化的 users 重新向量化；orders 只需移出索引
+        assert len(embedding.encoded) == encoded + 1
+        result = service.semantic_search(session, "default", "订单")
+        ids = [r["asset"]["id"] for r in result["results"]]
+        assert "users" in ids and "orders" not in ids
+
+    def test_reconcile_removes_deleted_assets(self, env):
+        service, session, _, DataAsset = env
+        service.sync_vector_index(session)
+        session.query(DataAsset).filter_by(asset_id="orders").delete()
+        session.commit()
+
+        service._vector_index.last_full_sync = 0
+        service.sync_vector_index(session)
+        result = service.semantic_search(session, "default", "订单")
+        assert [r["asset"]["id"] for r in result["results"]] == ["order_view"]
+        assert "orders" not in service._vector_index
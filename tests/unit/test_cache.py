@@ -248,3 +248,413 @@ class TestCacheFunctions:
         count = clear_cache_pattern("user:*")
         assert count == 5
         mock_cache.delete_pattern.assert_called_once_with("user:*")
+
+
+class _FakeRedis:
+    """最小化的内存 Redis 替身（支持 get/set/pipeline/publish）"""
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.published = []
+        self.get_calls = 0
+
+    def get(self, key):
+        self.get_calls += 1
+        return self.store.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode("utf-8") if isinstance(value, str) else value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        if self.store.get(key) == token.encode("utf-8"):
+            return self.delete(key)
+        return 0
+
+    def setex(self, key, ttl, value):
+        self.ttls[key] = ttl
+        return self.set(key, value)
+
+    def pttl(self, key):
+        return self.ttls.get(key, -1) * 1000 if key in self.ttls else -1
+
+    def delete(self, *keys):
+        return sum(1 for k in keys if self.store.pop(k, None) is not None)
+
+    def keys(self, pattern):
+        import fnmatch
+        return [k for k in self.store if fnmatch.fnmatch(k, pattern)]
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+    def pubsub(self, **kwargs):
+        return MagicMock()
+
+    def mget(self, keys):
+        self.get_calls += 1
+        return [self.store.get(k) for k in keys]
+
+    def scan_iter(self, match=None, count=None):
+        return iter(self.keys(match))
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class _Pipe:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                method = getattr(client, name)
+                return lambda *a, **kw: self.calls.append(lambda: method(*a, **kw))
+
+            def execute(self):
+                return [c() for c in self.calls]
+
+        return _Pipe()
+
+
+class TestMemoryCacheLRU:
+    """有界 LRU 内存缓存测试"""
+
+    def test_evicts_least_recently_used(self):
+        """测试超出容量时淘汰最久未访问的键"""
+        cache = MemoryCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+        assert len(cache) == 2
+
+    def test_stats_counts_hits_and_misses(self):
+        """测试命中/未命中统计"""
+        cache = MemoryCache(max_size=10)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_evictions_reported_to_metrics(self):
+        """测试淘汰事件上报 Prometheus"""
+        metrics = Mock()
+        cache = MemoryCache(max_size=1, name="near")
+        with patch("services.shared.prometheus_metrics.get_metrics", return_value=metrics):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            cache.get("b")
+
+        metrics.record_cache_eviction.assert_called_once_with("near")
+        metrics.record_cache_hit.assert_called_once_with("near")
+
+
+class TestNearCache:
+    """Redis 前置近端缓存测试"""
+
+    @pytest.fixture
+    def fake_redis(self):
+        return _FakeRedis()
+
+    def test_repeated_get_served_locally(self, fake_redis):
+        """测试重复读取不再访问 Redis"""
+        writer = RedisCache(redis_client=fake_redis, near_cache=False)
+        writer.set("k", {"v": 1}, ttl=60)
+
+        reader = RedisCache(redis_client=fake_redis, near_cache=True)
+        assert reader.get("k") == {"v": 1}
+        calls = fake_redis.get_calls
+        assert reader.get("k") == {"v": 1}
+        assert fake_redis.get_calls == calls
+        assert reader.near_cache_stats()["hits"] == 1
+
+    def test_near_ttl_capped_by_redis_ttl(self, fake_redis):
+        """测试近端 TTL 不超过 Redis 剩余 TTL"""
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache._near_ttl = 30
+        cache.set("k", "v", ttl=5)
+
+        remaining = cache._near_cache._expiry["k"] - __import__("time").time()
+        assert remaining <= 5
+
+    def test_returns_copy_not_shared_object(self, fake_redis):
+        """测试近端命中返回独立副本"""
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache.set("k", {"items": [1]}, ttl=60)
+
+        cache.get("k")["items"].append(2)
+        assert cache.get("k") == {"items": [1]}
+
+    def test_delete_publishes_invalidation(self, fake_redis):
+        """测试删除时广播失效消息"""
+        import json
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache.set("k", "v", ttl=60)
+        cache.delete("k")
+
+        assert cache._near_cache.get("k") is None
+        channel, message = fake_redis.published[-1]
+        payload = json.loads(message)
+        assert payload["op"] == "delete"
+        assert payload["key"] == "k"
+
+    def test_remote_invalidation_clears_local_copy(self, fake_redis):
+        """测试收到其他 Pod 的失效消息后清除本地副本"""
+        pod_a = RedisCache(redis_client=fake_redis, near_cache=True)
+        pod_b = RedisCache(redis_client=fake_redis, near_cache=True)
+        pod_a.set("user:1", "a", ttl=60)
+        pod_b.get("user:1")
+        assert pod_b._near_cache.exists("user:1")
+
+        pod_a.delete_pattern("user:*")
+        _, message = fake_redis.published[-1]
+        pod_b._on_invalidation_message({"data": message.encode("utf-8")})
+
+        assert not pod_b._near_cache.exists("user:1")
+
+    def test_own_invalidation_message_ignored(self, fake_redis):
+        """测试忽略自身发出的失效消息"""
+        import json
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache.set("k", "v", ttl=60)
+        generation = cache._near_generation
+        cache._on_invalidation_message({
+            "data": json.dumps({"op": "clear", "origin": cache._instance_id})
+        })
+
+        assert cache._near_generation == generation
+        assert cache._near_cache.exists("k")
+
+    def test_subscribe_failure_disables_near_cache(self, fake_redis):
+        """测试订阅失败时不启用近端缓存"""
+        fake_redis.pubsub = Mock(side_effect=ConnectionError("down"))
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        assert cache.near_cache_stats() is None
+
+
+class TestStampedeProtection:
+    """防击穿模式测试"""
+
+    @pytest.fixture
+    def fake_redis(self):
+        return _FakeRedis()
+
+    @pytest.fixture
+    def cache(self, fake_redis):
+        cache = RedisCache(redis_client=fake_redis, near_cache=False)
+        with patch("services.shared.cache.get_cache", return_value=cache):
+            yield cache
+
+    def test_concurrent_misses_share_one_computation(self, cache):
+        """测试并发未命中只执行一次计算"""
+        import threading
+        import time
+        call_count = [0]
+
+        @cached(ttl=60, key_prefix="sf", stampede_protection=True)
+        def build_graph(tenant):
+            call_count[0] += 1
+            time.sleep(0.1)
+            return {"tenant": tenant}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(build_graph("t1")))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert call_count[0] == 1
+        assert results == [{"tenant": "t1"}] * 8
+
+    def test_waits_for_other_pod_holding_lease(self, cache, fake_redis):
+        """测试其他 Pod 持有租约时等待其结果而非重复计算"""
+        import threading
+        from services.shared.cache import _wrap_entry
+        call_count = [0]
+
+        @cached(ttl=60, key_prefix="sf", stampede_protection=True, lease_wait=2.0)
+        def search(q):
+            call_count[0] += 1
+            return "local"
+
+        other_pod = RedisCache(redis_client=fake_redis, near_cache=False)
+        key = "sf:search:x"
+        token = other_pod.acquire_lease(key, 10)
+        assert token is not None
+        assert cache.acquire_lease(key, 10) is None
+
+        threading.Timer(0.1, lambda: other_pod.set(key, _wrap_entry("remote", 60, 0.1), 60)).start()
+
+        assert search("x") == "remote"
+        assert call_count[0] == 0
+        assert other_pod.release_lease(key, token) is True
+
+    def test_stale_value_served_while_revalidating(self, cache):
+        """测试过期后在 stale 窗口内返回旧值并后台刷新"""
+        import time
+        from services.shared.cache import _wrap_entry
+
+        @cached(ttl=60, key_prefix="sf", stampede_protection=True, stale_ttl=30)
+        def quota(tenant):
+            return "fresh"
+
+        stale = _wrap_entry("stale", 60, 0.0)
+        stale["expires_at"] = time.time() - 1
+        cache.set("sf:quota:t1", stale, 90)
+
+        assert quota("t1") == "stale"
+        deadline = time.time() + 5
+        while quota("t1") != "fresh" and time.time() < deadline:
+            time.sleep(0.05)
+        assert quota("t1") == "fresh"
+
+    def test_early_refresh_scheduled_before_expiry(self, cache):
+        """测试概率提前刷新在过期前触发后台重算"""
+        import time
+        call_count = [0]
+
+        @cached(ttl=60, key_prefix="sf", stampede_protection=True)
+        def assets(q):
+            call_count[0] += 1
+            return call_count[0]
+
+        assert assets("a") == 1
+        with patch("services.shared.cache._should_refresh_early", return_value=True):
+            assert assets("a") == 1
+
+        deadline = time.time() + 5
+        while call_count[0] < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        assert call_count[0] == 2
+
+    def test_should_refresh_early_disabled_with_zero_beta(self):
+        """测试 beta=0 时关闭提前刷新"""
+        import time
+        from services.shared.cache import _should_refresh_early, _wrap_entry
+
+        entry = _wrap_entry("v", 0, 100.0)
+        assert _should_refresh_early(entry, 0, time.time() - 1) is False
+        assert _should_refresh_early(entry, 1.0, time.time() + 1) is True
+
+
+class TestBatchOperations:
+    """批量 get/set/delete 测试"""
+
+    @pytest.fixture
+    def fake_redis(self):
+        return _FakeRedis()
+
+    def test_get_many_single_round_trip(self, fake_redis):
+        """测试批量读取只访问一次 Redis"""
+        cache = RedisCache(redis_client=fake_redis, near_cache=False)
+        assert cache.set_many({"a": 1, "b": {"x": 2}}, ttl=60) is True
+
+        fake_redis.get_calls = 0
+        result = cache.get_many(["a", "b", "missing"])
+        assert result == {"a": 1, "b": {"x": 2}}
+        assert fake_redis.get_calls == 1
+
+    def test_get_many_uses_near_cache(self, fake_redis):
+        """测试批量读取优先命中近端缓存"""
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache.set_many({"a": 1, "b": 2}, ttl=60)
+
+        fake_redis.get_calls = 0
+        assert cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+        assert fake_redis.get_calls == 0
+
+    def test_get_many_rejects_tampered_entry(self, fake_redis):
+        """测试批量读取仍校验签名"""
+        import json
+        cache = RedisCache(redis_client=fake_redis, near_cache=False)
+        cache.set_many({"a": 1, "b": 2}, ttl=60)
+        fake_redis.store["agent:b"] = json.dumps({"signature": "bad", "data": "3"}).encode()
+
+        assert cache.get_many(["a", "b"]) == {"a": 1}
+        assert "agent:b" not in fake_redis.store
+
+    def test_delete_many(self, fake_redis):
+        """测试批量删除并广播失效"""
+        import json
+        cache = RedisCache(redis_client=fake_redis, near_cache=True)
+        cache.set_many({"a": 1, "b": 2, "c": 3}, ttl=60)
+
+        assert cache.delete_many(["a", "b"]) == 2
+        assert cache.get_many(["a", "b", "c"]) == {"c": 3}
+        payload = json.loads(fake_redis.published[-1][1])
+        assert payload["op"] == "delete_many"
+        assert payload["keys"] == ["a", "b"]
+
+    def test_delete_pattern_uses_scan(self, fake_redis):
+        """测试模式删除使用 SCAN"""
+        fake_redis.keys = Mock(side_effect=AssertionError("KEYS must not be used"))
+        fake_redis.scan_iter = Mock(return_value=iter([b"agent:user:1", b"agent:user:2"]))
+        fake_redis.store.update({b"agent:user:1": b"x", b"agent:user:2": b"y"})
+        cache = RedisCache(redis_client=fake_redis, near_cache=False)
+
+        assert cache.delete_pattern("user:*") == 2
+
+    def test_memory_fallback_batch(self):
+        """测试内存回退下的批量操作"""
+        cache = MemoryCache()
+        cache.set_many({"a": 1, "b": 2})
+        assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+        assert cache.delete_many(["a", "c"]) == 2
+        assert cache.get_many(["a", "b"]) == {"b": 2}
+
+
+class TestCachedBatchDecorator:
+    """批量缓存装饰器测试"""
+
+    @pytest.fixture
+    def cache(self):
+        cache = RedisCache(redis_client=_FakeRedis(), near_cache=False)
+        with patch("services.shared.cache.get_cache", return_value=cache):
+            yield cache
+
+    def test_only_missing_ids_fetched(self, cache):
+        """测试只对未命中的 ID 调用函数"""
+        from services.shared.cache import cached_batch
+        calls = []
+
+        @cached_batch(ttl=60, key_prefix="asset")
+        def get_assets(ids):
+            calls.append(list(ids))
+            return {i: {"id": i} for i in ids if i != 4}
+
+        assert get_assets([1, 2]) == {1: {"id": 1}, 2: {"id": 2}}
+        result = get_assets([3, 2, 1, 4])
+
+        assert list(result) == [3, 2, 1]
+        assert calls == [[1, 2], [3, 4]]
+
+    def test_clear_cache(self, cache):
+        """测试按 ID 清除缓存"""
+        from services.shared.cache import cached_batch
+        calls = []
+
+        @cached_batch(ttl=60, key_prefix="asset")
+        def get_assets(ids):
+            calls.append(list(ids))
+            return {i: i for i in ids}
+
+        get_assets([1, 2])
+        get_assets.clear_cache([1])
+        get_assets([1, 2])
+
+        assert calls == [[1, 2], [1]]
@@ -153,3 +153,69 @@ class TestAsyncTaskDecorator:
         assert hasattr(my_task, 'submit_async')
         assert hasattr(my_task, 'submit_apply')
         assert hasattr(my_task, 'task')
+
+
+class TestIndexDocumentsBatch:
+    """批量索引任务测试"""
+
+    class _FakeWriter:
+        """在 commit（退出上下文）时才确定失败文档的写入器"""
+
+        def __init__(self, fail_keys):
+            self.fail_keys = fail_keys
+            self.added = []
+            self.failed = {}
+            self.rows_written = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            for key, count in self.added:
+                if key in self.fail_keys:
+                    self.failed[key] = "insert failed"
+                else:
+                    self.rows_written += count
+            return False
+
+        def add(self, collection, texts, embeddings, metadata=None, key=None):
+            if len(texts) != len(embeddings):
+                raise ValueError("texts and embeddings length mismatch")
+            self.added.append((key, len(texts)))
+            return len(texts)
+
+    def test_batch_reports_per_document_results(self):
+        """测试写入器提交后按文档汇总成功与失败"""
+        import sys
+        import types
+        from services.shared.celery_tasks import index_documents_batch
+
+        writer = self._FakeWriter(fail_keys={1})
+        fake_module = types.ModuleType("agent_services.vector_store")
+        fake_module.VectorStore = MagicMock(return_value=MagicMock(writer=MagicMock(return_value=writer)))
+
+        documents = [
+            {"doc_id": "a", "collection_name": "c1", "texts": ["x", "y"], "embeddings": [[0.1], [0.2]]},
+            {"doc_id": "b", "collection_name": "c1", "texts": ["z"], "embeddings": [[0.3]]},
+            {"doc_id": "c", "collection_name": "c2", "texts": ["w"], "embeddings": []},
+        ]
+
+        with patch.dict(sys.modules, {"agent_services.vector_store": fake_module}), \
+                patch.object(index_documents_batch, "update_state"):
+            result = index_documents_batch.run(documents)
+
+        assert result["success"] is True
+        data = result["data"]
+        assert data["total"] == 3
+        assert data["success"] == 1
+        assert data["failed"] == 2
+
+        ok, failed_insert, invalid = data["results"]
+        assert ok["success"] is True
+        assert ok["data"] == {"doc_id": "a", "count": 2}
+        assert failed_insert["success"] is False
+        assert failed_insert["error"] == "insert failed"
+        assert failed_insert["metadata"] == {"doc_id": "b"}
+        assert invalid["success"] is False
+        assert "Invalid document" in invalid["error"]
+        assert writer.rows_written == 2
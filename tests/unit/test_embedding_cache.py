@@ -0,0 +1,165 @@
+"""
+共享 Embedding 缓存单元测试
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根路径以便导入 services.shared
+_project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(_project_root))
+
+import pytest
+from services.shared.embedding_cache import (
+    EmbeddingCache,
+    decode_vector,
+    embedding_cache_key,
+    encode_vector,
+    normalize_text,
+)
+
+
+class _FakeRedis:
+    """支持 mget/pipeline 的内存 Redis 替身"""
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.mget_calls = 0
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+        if ex:
+            self.ttls[key] = ex
+        return True
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class _Pipe:
+            def __init__(self):
+                self.calls = []
+
+            def set(self, *args, **kwargs):
+                self.calls.append((args, kwargs))
+
+            def execute(self):
+                return [client.set(*a, **kw) for a, kw in self.calls]
+
+        return _Pipe()
+
+
+class TestKeysAndEncoding:
+    """缓存键与向量编码"""
+
+    def test_key_ignores_whitespace_differences(self):
+        assert normalize_text("  hello \n  world ") == "hello world"
+        assert embedding_cache_key("m", "hello  world") == embedding_cache_key("m", " hello world\n")
+
+    def test_key_depends_on_model(self):
+        assert embedding_cache_key("a", "text") != embedding_cache_key("b", "text")
+
+    def test_float32_roundtrip_exact(self):
+        vector = [0.5, -0.25, 1.0]
+        raw = encode_vector(vector, "float32")
+        assert len(raw) == 1 + 4 * 3
+        assert decode_vector(raw) == vector
+
+    def test_float16_is_compact_and_close(self):
+        vector = [0.1, -0.2, 0.3, 0.4]
+        raw = encode_vector(vector, "float16")
+        assert len(raw) == 1 + 2 * 4
+        decoded = decode_vector(raw)
+        assert all(abs(a - b) < 1e-3 for a, b in zip(decoded, vector))
+
+    def test_float16_overflow_falls_back_to_float32(self):
+        vector = [70000.0, -1.5]
+        raw = encode_vector(vector, "float16")
+        assert len(raw) == 1 + 4 * 2
+        assert decode_vector(raw) == vector
+
+    def test_decode_invalid_returns_none(self):
+        assert decode_vector(b"") is None
+        assert decode_vector(b"xabc") is None
+
+
+class TestEmbeddingCache:
+    """两级缓存行为"""
+
+    def test_get_many_reads_redis_once_and_backfills_local(self):
+        redis = _FakeRedis()
+        writer = EmbeddingCache(redis_client=redis, dtype="float32", ttl=60)
+        writer.set_many("m", ["a", "b"], [[1.0], [2.0]])
+        assert all(ttl == 60 for ttl in redis.ttls.values())
+
+        reader = EmbeddingCache(redis_client=redis, dtype="float32")
+        assert reader.get_many("m", ["a", "b", "c"]) == [[1.0], [2.0], None]
+        assert redis.mget_calls == 1
+
+        # 第二次命中进程内缓存，只为未命中的 c 访问 Redis
+        assert reader.get_many("m", ["a", "b", "c"]) == [[1.0], [2.0], None]
+        assert redis.mget_calls == 2
+        assert reader.stats()["hits"] == 4
+
+    def test_get_or_compute_only_sends_misses(self):
+        cache = EmbeddingCache(dtype="float32")
+        cache.set("m", "cached", [9.0])
+        calls = []
+
+        def compute(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        result = cache.get_or_compute("m", ["cached", "new", " new ", "other"], compute)
+
+        assert calls == [["new", "other"]]
+        assert result == [[9.0], [3.0], [3.0], [5.0]]
+        # 之后全部命中
+        assert cache.get_or_compute("m", ["new", "other"], compute) == [[3.0], [5.0]]
+        assert len(calls) == 1
+
+    def test_failed_vectors_not_cached(self):
+        cache = EmbeddingCache(dtype="float32")
+        result = cache.get_or_compute("m", ["x"], lambda texts: [None])
+        assert result == [None]
+        assert cache.get("m", "x") is None
+
+    def test_unencodable_vectors_skipped(self):
+        cache = EmbeddingCache(dtype="float16")
+        result = cache.get_or_compute("m", ["big", "huge"], lambda texts: [[70000.0], [1e39]])
+        assert result == [[70000.0], [1e39]]
+        assert cache.get("m", "big") == [70000.0]
+        assert cache.get("m", "huge") is None
+
+    @pytest.mark.asyncio
+    async def test_aget_or_compute(self):
+        cache = EmbeddingCache(dtype="float32")
+
+        async def compute(texts):
+            return [[1.0] for _ in texts]
+
+        assert await cache.aget_or_compute("m", ["a", "a"], compute) == [[1.0], [1.0]]
+        assert cache.get("m", "a") == [1.0]
+
+    def test_local_lru_bounded(self):
+        cache = EmbeddingCache(dtype="float32", local_max_size=2)
+        cache.set_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        assert cache.stats()["local_size"] == 2
+        assert cache.get("m", "a") is None
+
+    def test_redis_errors_degrade_to_miss(self):
+        class _Broken:
+            def mget(self, keys):
+                raise ConnectionError("down")
+
+            def pipeline(self, transaction=True):
+                raise ConnectionError("down")
+
+        cache = EmbeddingCache(redis_client=_Broken(), dtype="float32")
+        cache.set("m", "a", [1.0])
+        assert cache.get("m", "a") == [1.0]
+        assert cache.get("m", "b") is None
@@ -16,7 +16,10 @@ if str(_agent_api_root) not in sys.path:
 
 # 尝试导入，失败则跳过
 try:
-    from services.embedding import EmbeddingService, MODEL_API_URL, EMBEDDING_MODEL, EMBEDDING_DIM
+    from agent_services.embedding import (
+        EmbeddingService, EmbeddingRequestError, MODEL_API_URL, EMBEDDING_MODEL, EMBEDDING_DIM,
+        build_token_batches, estimate_tokens,
+    )
     _IMPORT_SUCCESS = True
 except ImportError as e:
     _IMPORT_SUCCESS = False
@@ -33,6 +36,13 @@ pytestmark = pytest.mark.skipif(
 )
 
 
+@pytest.fixture(autouse=True)
+def _no_shared_embedding_cache():
+    """默认不使用共享 Embedding 缓存，避免用例之间相互命中"""
+    with patch('agent_services.embedding._get_shared_embedding_cache', return_value=None):
+        yield
+
+
 class TestEmbeddingService:
     """EmbeddingService 单元测试"""
 
@@ -72,67 +82,130 @@ class TestEmbeddingService:
         assert all(v == 0.0 for v in result)
 
     @pytest.mark.asyncio
-    @patch('services.embedding.requests.post')
-    async def test_embed_text_success(self, mock_post):
+    async def test_embed_text_success(self):
         """测试成功的文本嵌入"""
         expected_embedding = [0.1] * 1536
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "data": [{"embedding": expected_embedding}]
-        }
-        mock_post.return_value = mock_response
-
         service = EmbeddingService()
-        result = await service.embed_text("test text")
+
+        with patch.object(service, '_post_embeddings', return_value=[expected_embedding]) as mock_post:
+            result = await service.embed_text("test text")
 
         assert result == expected_embedding
-        mock_post.assert_called_once()
+        mock_post.assert_called_once_with(["test text"])
 
     @pytest.mark.asyncio
-    @patch('services.embedding.requests.post')
-    async def test_embed_text_api_error(self, mock_post):
+    async def test_embed_text_api_error(self):
         """测试 API 错误时的降级处理"""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_post.return_value = mock_response
+        service = EmbeddingService(max_retries=1)
 
-        service = EmbeddingService()
-        result = await service.embed_text("test text")
+        with patch.object(service, '_post_embeddings', side_effect=EmbeddingRequestError("Embedding API error: 500")), \
+                patch('agent_services.embedding.EMBEDDING_MOCK_ENABLED', True):
+            result = await service.embed_text("test text")
 
         # 应该返回 mock embedding
         assert len(result) == EMBEDDING_DIM
 
     @pytest.mark.asyncio
-    @patch('services.embedding.requests.post')
-    async def test_embed_text_connection_error(self, mock_post):
+    async def test_embed_text_connection_error(self):
         """测试连接错误时的降级处理"""
-        mock_post.side_effect = Exception("Connection error")
+        service = EmbeddingService(max_retries=1)
 
-        service = EmbeddingService()
-        result = await service.embed_text("test text")
+        with patch.object(service, '_post_embeddings', side_effect=ConnectionError("Connection error")), \
+                patch('agent_services.embedding.EMBEDDING_MOCK_ENABLED', True):
+            result = await service.embed_text("test text")
 
         # 应该返回 mock embedding
         assert len(result) == EMBEDDING_DIM
 
     @pytest.mark.asyncio
-    @patch('services.embedding.requests.post')
-    async def test_embed_texts_batch(self, mock_post):
-        """测试批量文本嵌入"""
-        expected_embedding = [0.1] * 1536
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "data": [{"embedding": expected_embedding}]
-        }
-        mock_post.return_value = mock_response
+    async def test_embed_text_error_without_mock_raises(self):
+        """测试未启用模拟模式时 API 错误抛出 RuntimeError"""
+        service = EmbeddingService(max_retries=1)
+
+        with patch.object(service, '_post_embeddings', side_effect=EmbeddingRequestError("boom", retryable=False)), \
+                patch('agent_services.embedding.EMBEDDING_MOCK_ENABLED', False):
+            with pytest.raises(RuntimeError):
+                await service.embed_text("test text")
 
+    @pytest.mark.asyncio
+    async def test_embed_texts_batch(self):
+        """测试批量文本嵌入：一次请求携带整个微批次"""
         service = EmbeddingService()
-        texts = ["text1", "text2", "text3"]
-        results = await service.embed_texts(texts)
+
+        async def fake_post(batch):
+            return [[float(len(text))] * 1536 for text in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post) as mock_post:
+            texts = ["text1", "text22", "text333"]
+            results = await service.embed_texts(texts)
 
         assert len(results) == 3
         assert all(len(r) == 1536 for r in results)
+        assert [r[0] for r in results] == [5.0, 6.0, 7.0]
+        mock_post.assert_called_once_with(texts)
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_keeps_order_with_blanks(self):
+        """测试空白文本返回零向量且不发送请求"""
+        service = EmbeddingService(max_batch_size=1)
+
+        async def fake_post(batch):
+            return [[1.0] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post) as mock_post:
+            results = await service.embed_texts(["a", "  ", "b"])
+
+        assert mock_post.call_count == 2
+        assert results[0][0] == 1.0
+        assert all(v == 0.0 for v in results[1])
+        assert results[2][0] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_bounded_concurrency(self):
+        """测试并发子批次数不超过 max_concurrency"""
+        service = EmbeddingService(max_batch_size=1, max_concurrency=2)
+        state = {"active": 0, "peak": 0}
+
+        async def fake_post(batch):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return [[0.5] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post):
+            results = await service.embed_texts([f"t{i}" for i in range(8)])
+
+        assert len(results) == 8
+        assert state["peak"] == 2
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_retries_failed_batch(self):
+        """测试失败的子批次单独重试"""
+        service = EmbeddingService(max_retries=3)
+        calls = []
+
+        async def flaky_post(batch):
+            calls.append(list(batch))
+            if len(calls) == 1:
+                raise EmbeddingRequestError("Embedding API error: 503")
+            return [[0.2] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=flaky_post), \
+                patch('agent_services.embedding.asyncio.sleep', return_value=None):
+            results = await service.embed_texts(["x", "y"])
+
+        assert len(calls) == 2
+        assert calls[0] == calls[1] == ["x", "y"]
+        assert results[0][0] == 0.2
+
+    def test_parse_embeddings_restores_index_order(self):
+        """测试按 index 字段还原返回顺序"""
+        body = {"data": [{"index": 1, "embedding": [2.0]}, {"index": 0, "embedding": [1.0]}]}
+        assert EmbeddingService._parse_embeddings(body, 2) == [[1.0], [2.0]]
+
+        with pytest.raises(EmbeddingRequestError):
+            EmbeddingService._parse_embeddings(body, 3)
 
     def test_mock_embedding(self):
         """测试 Mock embedding 生成"""
@@ -160,7 +233,6 @@ class TestEmbeddingService:
         service = EmbeddingService()
 
         with patch.object(service, 'embed_text', return_value=[0.1] * EMBEDDING_DIM):
-            # sync_embed_text 应该调用 asyncio.run
             result = service.sync_embed_text("test")
             assert len(result) == EMBEDDING_DIM
 
@@ -172,6 +244,101 @@ class TestEmbeddingService:
             result = service.sync_embed_texts(["a", "b", "c"])
             assert len(result) == 3
 
+    def test_sync_facade_reuses_one_loop(self):
+        """测试同步接口复用同一个后台事件循环"""
+        service = EmbeddingService()
+        loops = []
+
+        async def fake_post(batch):
+            loops.append(asyncio.get_running_loop())
+            return [[0.1] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post):
+            service.sync_embed_text("a")
+            service.embed_query("b")
+            service.sync_embed_texts(["c", "d"])
+
+        assert len(loops) == 3
+        assert loops[0] is loops[1] is loops[2]
+
+
+class TestEmbeddingCacheIntegration:
+    """共享 Embedding 缓存命中时不再请求模型"""
+
+    @pytest.mark.asyncio
+    async def test_only_cache_misses_are_requested(self):
+        cache = MagicMock()
+        cache.get_many.return_value = [[0.3] * EMBEDDING_DIM, None]
+        service = EmbeddingService(embedding_cache=cache)
+
+        async def fake_post(batch):
+            return [[0.7] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post) as mock_post:
+            results = await service.embed_texts(["cached", "fresh", ""])
+
+        cache.get_many.assert_called_once_with(service.model, ["cached", "fresh"])
+        mock_post.assert_called_once_with(["fresh"])
+        cache.set_many.assert_called_once_with(service.model, ["fresh"], [[0.7] * EMBEDDING_DIM])
+        assert results[0][0] == 0.3
+        assert results[1][0] == 0.7
+        assert all(v == 0.0 for v in results[2])
+
+    @pytest.mark.asyncio
+    async def test_all_cached_makes_no_request(self):
+        cache = MagicMock()
+        cache.get_many.return_value = [[0.3] * EMBEDDING_DIM]
+        service = EmbeddingService(embedding_cache=cache)
+
+        with patch.object(service, '_post_embeddings') as mock_post:
+            results = await service.embed_texts(["cached"])
+
+        mock_post.assert_not_called()
+        assert results[0][0] == 0.3
+
+    @pytest.mark.asyncio
+    async def test_cache_io_runs_off_event_loop(self):
+        import threading
+
+        loop_thread = threading.get_ident()
+        threads = []
+        cache = MagicMock()
+        cache.get_many.side_effect = lambda model, texts: threads.append(threading.get_ident()) or [None]
+        cache.set_many.side_effect = lambda model, texts, vectors: threads.append(threading.get_ident())
+        service = EmbeddingService(embedding_cache=cache)
+
+        async def fake_post(batch):
+            return [[0.7] * EMBEDDING_DIM for _ in batch]
+
+        with patch.object(service, '_post_embeddings', side_effect=fake_post):
+            await service.embed_texts(["fresh"])
+
+        assert len(threads) == 2
+        assert loop_thread not in threads
+
+
+class TestTokenBatching:
+    """按 token 预算切分微批次"""
+
+    def test_estimate_tokens_cjk_heavier_than_ascii(self):
+        assert estimate_tokens("中文文本") > estimate_tokens("abcd")
+
+    def test_batches_respect_token_budget(self):
+        texts = ["a" * 40] * 5  # 每条约 11 token
+        batches = build_token_batches(texts, max_tokens=25, max_size=100)
+        assert batches == [[0, 1], [2, 3], [4]]
+
+    def test_batches_respect_max_size(self):
+        batches = build_token_batches(["x"] * 5, max_tokens=10000, max_size=2)
+        assert batches == [[0, 1], [2, 3], [4]]
+
+    def test_oversized_text_gets_own_batch(self):
+        batches = build_token_batches(["short", "y" * 1000, "tail"], max_tokens=50, max_size=10)
+        assert batches == [[0], [1], [2]]
+
+    def test_blank_texts_skipped(self):
+        assert build_token_batches(["", "  ", "a"], max_tokens=100, max_size=10) == [[2]]
+
 
 class TestEmbeddingServiceIntegration:
     """集成测试（需要真实服务）"""
@@ -8,14 +8,14 @@
 import pytest
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 # 添加 agent-api 路径以便导入 services 子模块
 _agent_api_root = Path(__file__).parent.parent.parent / "services" / "agent-api"
 sys.path.insert(0, str(_agent_api_root))
 
 try:
-    from services.hybrid_retriever import (
+    from agent_services.hybrid_retriever import (
         BM25Index,
         HybridRetriever,
         RetrievalConfig,
@@ -46,6 +46,14 @@ pytestmark = pytest.mark.skipif(
 )
 
 
+@pytest.fixture(autouse=True)
+def _no_external_services():
+    """单元测试不连接 Milvus 和向量化服务"""
+    with patch("agent_services.hybrid_retriever.VectorStore"), \
+            patch("agent_services.hybrid_retriever.get_embedding_service"):
+        yield
+
+
 class TestBM25Index:
     """BM25 索引器测试"""
 
@@ -148,6 +156,126 @@ class TestBM25Index:
         assert index.doc_lengths[0] > 100
 
 
+class TestBM25IncrementalIndex:
+    """BM25 增量更新与持久化测试"""
+
+    @pytest.fixture
+    def documents(self):
+        return [
+            {"id": "a", "text": "python machine learning python"},
+            {"id": "b", "text": "data science and machine learning"},
+            {"id": "c", "text": "deep learning with neural networks"},
+        ]
+
+    def test_unmatched_documents_scored_zero(self, documents):
+        """测试未命中的文档分数为 0 且排在命中文档之后"""
+        index = BM25Index()
+        index.index_documents(documents)
+        scores = index.search("python", top_k=10)
+
+        assert scores[0][0] == "a"
+        assert scores[0][1] > 0
+        assert [s for _, s in scores[1:]] == [0.0, 0.0]
+        assert index.search("python", top_k=10, min_score=0.01) == scores[:1]
+
+    def test_add_documents_matches_full_rebuild(self, documents):
+        """测试增量添加与全量重建结果一致"""
+        incremental = BM25Index()
+        incremental.index_documents(documents[:2])
+        incremental.add_documents(documents[2:])
+
+        full = BM25Index()
+        full.index_documents(documents)
+
+        for query in ("machine learning", "neural networks python"):
+            got = incremental.search(query, top_k=3)
+            expected = full.search(query, top_k=3)
+            assert [d for d, _ in got] == [d for d, _ in expected]
+            assert [s for _, s in got] == pytest.approx([s for _, s in expected])
+
+    def test_delete_documents(self, documents):
+        """测试删除文档后不再被检索"""
+        index = BM25Index()
+        index.index_documents(documents)
+        assert index.delete_documents(["a", "missing"]) == 1
+
+        assert index.doc_count == 2
+        assert index.get_document_text("a") is None
+        assert all(doc_id != "a" for doc_id, _ in index.search("python machine", top_k=10))
+
+    def test_replace_existing_document(self, documents):
+        """测试相同 id 的文档被替换"""
+        index = BM25Index()
+        index.index_documents(documents)
+        index.add_documents([{"id": "a", "text": "rust systems programming"}])
+
+        assert index.doc_count == 3
+        assert index.search("python", top_k=10, min_score=0.01) == []
+        assert index.search("rust", top_k=10)[0][0] == "a"
+
+    def test_compaction_preserves_results(self, documents):
+        """测试合并后结果不变"""
+        index = BM25Index()
+        index.index_documents(documents)
+        index.add_documents([{"id": "d", "text": "python data tools"}])
+        index.delete_documents(["b"])
+        before = index.search("python data learning", top_k=10)
+
+        index._compact()
+        after = index.search("python data learning", top_k=10)
+        assert [d for d, _ in after] == [d for d, _ in before]
+        assert [s for _, s in after] == pytest.approx([s for _, s in before])
+
+    def test_save_and_load_with_mmap(self, documents, tmp_path):
+        """测试索引落盘并以 mmap 加载"""
+        import numpy as np
+
+        index = BM25Index()
+        index.index_documents(documents)
+        index.save(str(tmp_path))
+
+        loaded = BM25Index.load(str(tmp_path), mmap=True)
+        assert isinstance(loaded._post_docs, np.memmap)
+        assert loaded.search("machine learning", top_k=3) == index.search("machine learning", top_k=3)
+
+        loaded.add_documents([{"id": "d", "text": "python again"}])
+        assert loaded.search("again", top_k=1)[0][0] == "d"
+
+    def test_resave_does_not_disturb_mapped_reader(self, documents, tmp_path):
+        """测试重新保存时原子切换版本，已 mmap 的读者不受影响"""
+        import os
+
+        path = str(tmp_path / "bm25")
+        index = BM25Index()
+        index.index_documents(documents)
+        index.save(path)
+        reader = BM25Index.load(path, mmap=True)
+        expected = reader.search("machine learning", top_k=3)
+
+        index.add_documents([{"id": "d", "text": "machine learning again"}])
+        index.save(path)
+
+        assert os.path.islink(path)
+        assert sorted(os.listdir(tmp_path)) == sorted(["bm25", os.readlink(path)])
+        assert reader.search("machine learning", top_k=3) == expected
+        assert BM25Index.load(path).doc_count == 4
+
+    def test_duplicate_ids_in_batch_indexed_once(self, documents):
+        """测试同一批次中重复的 id 只保留最后一个"""
+        index = BM25Index()
+        index.index_documents(documents)
+        index.add_documents([
+            {"id": "d", "text": "python python"},
+            {"id": "d", "text": "neural python"},
+        ])
+
+        reference = BM25Index()
+        reference.index_documents(documents + [{"id": "d", "text": "neural python"}])
+        assert index.doc_count == 4
+        assert index.get_document_text("d") == "neural python"
+        assert index.search("python", top_k=4) == pytest.approx(reference.search("python", top_k=4))
+
+
 class TestRetrievalConfig:
     """检索配置测试"""
 
@@ -198,6 +326,74 @@ class TestRetrievalResult:
         assert result.source == RetrievalMethod.VECTOR
 
 
+class TestMMRSelection:
+    """矩阵化 MMR 测试"""
+
+    @pytest.fixture
+    def retriever(self):
+        """创建不连接外部服务的检索器"""
+        with patch("agent_services.hybrid_retriever.VectorStore"), \
+                patch("agent_services.hybrid_retriever.get_embedding_service"):
+            retriever = HybridRetriever(RetrievalConfig(enable_cache=False, mmr_lambda=0.5))
+        retriever.embedding_service.embed_query.return_value = [1.0, 0.0, 0.0]
+        return retriever
+
+    def test_near_duplicates_are_diversified(self):
+        """测试近似重复的候选不会被连续选中"""
+        import numpy as np
+
+        vectors = np.array([
+            [1.0, 0.0],
+            [0.999, 0.045],
+            [0.0, 1.0],
+        ], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        relevance = np.array([1.0, 0.95, 0.6], dtype=np.float32)
+
+        assert HybridRetriever._mmr_select(relevance, vectors, 2, 0.5) == [0, 2]
+        assert HybridRetriever._mmr_select(relevance, vectors, 2, 1.0) == [0, 1]
+
+    def test_missing_vectors_fall_back_to_relevance(self):
+        """测试无向量时按相关性排序"""
+        import numpy as np
+
+        relevance = np.array([0.2, 1.0, 0.5], dtype=np.float32)
+        vectors = np.zeros((3, 0), dtype=np.float32)
+        assert HybridRetriever._mmr_select(relevance, vectors, 3, 0.5) == [1, 2, 0]
+
+    def test_mmr_search_uses_returned_vectors(self, retriever):
+        """测试 MMR 使用向量检索返回的候选向量，查询只嵌入一次"""
+        retriever.vector_store.search.return_value = {"results": [
+            {"id": "a", "text": "a", "score": 0.9, "embedding": [1.0, 0.0, 0.0]},
+            {"id": "b", "text": "b", "score": 0.89, "embedding": [1.0, 0.01, 0.0]},
+            {"id": "c", "text": "c", "score": 0.5, "embedding": [0.0, 1.0, 0.0]},
+        ]}
+
+        results = retriever.retrieve("q", method=RetrievalMethod.MMR, top_k=2)
+
+        assert [r.id for r in results] == ["a", "c"]
+        assert retriever.embedding_service.embed_query.call_count == 1
+        assert retriever.vector_store.search.call_args_list[0].kwargs["include_embeddings"] is True
+        retriever.vector_store.get_embeddings.assert_not_called()
+
+    def test_missing_candidate_vectors_fetched_by_id(self, retriever):
+        """测试缓存中缺失的候选向量按 id 批量取回"""
+        retriever.vector_store.search.return_value = {"results": [
+            {"id": "a", "text": "a", "score": 0.9},
+            {"id": "b", "text": "b", "score": 0.8},
+        ]}
+        retriever.vector_store.get_embeddings.return_value = {
+            "a": [1.0, 0.0, 0.0],
+            "b": [0.0, 1.0, 0.0],
+        }
+
+        results = retriever.retrieve("q", method=RetrievalMethod.MMR, top_k=2)
+
+        assert [r.id for r in results] == ["a", "b"]
+        retriever.vector_store.get_embeddings.assert_called_once()
+        assert set(retriever._chunk_embeddings) == {"a", "b"}
+
+
 class TestHybridRetriever:
     """混合检索器测试"""
 
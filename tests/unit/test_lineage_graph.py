@@ -0,0 +1,214 @@
+"""
+血缘图内存索引单元测试
+
+覆盖：
+- CSR + 增量邻接的上下游追溯、路径查询
+- 按键缓存与增量追加
+- MetadataGraphBuilder 基于内存图的血缘追溯与影响分析（SQLite）
+"""
+
+import importlib.util
+import os
+import sys
+import types
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+_data_api_dir = Path(__file__).parent.parent.parent / "services" / "data-api"
+_services_dir = _data_api_dir / "services"
+
+
+def _load(name, filename):
+    """直接按文件加载模块，绕过 services 包初始化（依赖数据库配置）"""
+    spec = importlib.util.spec_from_file_location(name, _services_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+lineage_graph = _load("lineage_graph", "lineage_graph.py")
+
+EDGES = [
+    ("a", "b", "derive", "table", "table"),
+    ("b", "c", "transform", "table", "table"),
+    ("b", "col", "derive", "table", "column"),
+    ("col", "d", "derive", "column", "table"),
+    ("c", "a", "copy", "table", "table"),  # 环
+]
+
+
+class TestLineageGraph:
+    """LineageGraph 测试"""
+
+    def test_downstream_bfs_with_depth(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES)
+        hits = graph.traverse(["a"], "downstream", max_depth=2)
+        assert [(key, depth) for key, depth, _, _ in hits] == [("b", 1), ("c", 2), ("col", 2)]
+        assert hits[1] == ("c", 2, "b", "transform")
+
+    def test_upstream_and_cycle(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES)
+        hits = graph.traverse(["a"], "upstream")
+        assert [key for key, _, _, _ in hits] == ["c", "b"]
+
+    def test_expand_predicate_stops_at_non_table_nodes(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES)
+        hits = graph.traverse(["a"], "downstream", expand=lambda key, node_type: node_type == "table")
+        keys = [key for key, _, _, _ in hits]
+        assert "col" in keys
+        assert "d" not in keys
+
+    def test_incremental_edges_visible_before_and_after_compaction(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES[:2], compact_threshold=1000)
+        assert graph.add_edges([("c", "e", "derive", "table", "table"), EDGES[0]]) == 1
+        assert [key for key, _, _, _ in graph.traverse(["a"])] == ["b", "c", "e"]
+
+        graph.compact()
+        assert [key for key, _, _, _ in graph.traverse(["a"])] == ["b", "c", "e"]
+        assert graph.edge_count == 3
+        assert graph.neighbors("e", "upstream") == [("c", "derive")]
+
+    def test_find_path(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES)
+        assert graph.find_path("a", "d") == ["a", "b", "col", "d"]
+        assert graph.find_path("a", "d", max_depth=2) is None
+        assert graph.find_path("a", "missing") is None
+
+    def test_unknown_start_returns_nothing(self):
+        graph = lineage_graph.LineageGraph.from_edges(EDGES)
+        assert graph.traverse(["missing"]) == []
+        assert graph.neighbors("missing") == []
+
+
+class TestLineageGraphIndex:
+    """LineageGraphIndex 测试"""
+
+    def test_loader_called_once_within_ttl(self):
+        index = lineage_graph.LineageGraphIndex(ttl=60)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return EDGES
+
+        assert index.get("t1", loader) is index.get("t1", loader)
+        assert len(calls) == 1
+
+        index.invalidate("t1")
+        index.get("t1", loader)
+        assert len(calls) == 2
+
+    def test_add_edges_updates_loaded_graph_only(self):
+        index = lineage_graph.LineageGraphIndex(ttl=60)
+        index.add_edges("t1", [("x", "y", "", None, None)])
+        graph = index.get("t1", lambda: EDGES)
+        assert "x" not in graph
+
+        index.add_edges("t1", [("d", "z", "derive", "table", "table")])
+        assert ("z", "derive") in graph.neighbors("d")
+
+    def test_expired_graph_is_reloaded(self):
+        index = lineage_graph.LineageGraphIndex(ttl=0)
+        calls = []
+        index.get("t1", lambda: calls.append(1) or EDGES)
+        index.get("t1", lambda: calls.append(1) or EDGES)
+        assert len(calls) == 2
+
+
+class TestMetadataGraphBuilderLineage:
+    """MetadataGraphBuilder 血缘追溯（SQLite 内存库）"""
+
+    @pytest.fixture
+    def env(self):
+        pytest.importorskip("sqlalchemy")
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        package = types.ModuleType("services")
+        package.__path__ = [str(_services_dir)]
+        analyzer = types.ModuleType("services.lineage_analyzer")
+        with patch.dict(os.environ, {"DATABASE_URL": "sqlite://"}), \
+                patch.dict(sys.modules, {"services": package, "services.lineage_analyzer": analyzer}), \
+                patch.object(sys, "path", [str(_data_api_dir)] + sys.path):
+            for name in [m for m in sys.modules if m == "models" or m.startswith("models.")]:
+                sys.modules.pop(name)
+            builder_module = _load("metadata_graph_builder", "metadata_graph_builder.py")
+            from models.base import Base
+            from models.lineage import LineageEdge, LineageNode
+
+            engine = create_engine("sqlite://")
+            Base.metadata.create_all(engine, tables=[LineageNode.__table__, LineageEdge.__table__])
+            session = sessionmaker(bind=engine)()
+
+            def node(node_id, name, node_type="table"):
+                session.add(LineageNode(
+                    node_id=node_id, node_type=node_type, name=name, full_name=f"shop.{name}",
+                    database_name="shop", table_name=name,
+                ))
+
+            def edge(source, target, relation="derive", source_type="table", target_type="table"):
+                session.add(LineageEdge(
+                    edge_id=f"{source}-{target}", source_node_id=source, target_node_id=target,
+                    source_type=source_type, target_type=target_type, relation_type=relation,
+                ))
+
+            node("ln_orders", "orders")
+            node("ln_orders_daily", "orders_daily")
+            node("ln_report", "report")
+            node("ln_raw", "raw_orders")
+            node("ln_orders_archive", "orders_archive")
+            edge("ln_raw", "ln_orders", "copy")
+            edge("ln_orders", "ln_orders_daily")
+            edge("ln_orders_daily", "ln_report", "transform")
+            edge("ln_orders_archive", "ln_report")
+            edge("ln_orders_daily", "ln_missing")  # 节点表中不存在，不应出现
+            session.commit()
+
+            builder_module.get_lineage_graph_index().invalidate()
+            yield builder_module.MetadataGraphBuilder(), session
+            session.close()
+            builder_module.get_lineage_graph_index().invalidate()
+
+    def test_table_lineage_uses_exact_node_match(self, env):
+        builder, session = env
+        table = SimpleNamespace(table_name="orders", database_name="shop")
+        nodes, edges = [], []
+        for direction in ("upstream", "downstream"):
+            builder._find_lineage_dependencies(
+                session, "default", table, "table_1", direction, 3, nodes, edges, {"table_1"}, set()
+            )
+
+        labels = [n["label"] for n in nodes]
+        # LIKE '%orders%' 会误匹配 orders_archive，精确匹配不会
+        assert sorted(labels) == ["orders_daily", "raw_orders", "report"]
+        upstream = [e for e in edges if e["direction"] == "upstream"]
+        assert upstream[0]["target"] == "table_1"
+        assert upstream[0]["relation_type"] == "copy"
+        report_edge = next(e for e in edges if e["label"] == "transform")
+        assert report_edge["source"] != "table_1"
+
+    def test_depth_limit(self, env):
+        builder, session = env
+        table = SimpleNamespace(table_name="orders", database_name="shop")
+        nodes, edges = [], []
+        builder._find_lineage_dependencies(
+            session, "default", table, "table_1", "downstream", 1, nodes, edges, {"table_1"}, set()
+        )
+        assert [n["label"] for n in nodes] == ["orders_daily"]
+
+    def test_tenants_share_graph_without_tenant_column(self, env):
+        builder, session = env
+        index = builder._lineage_graph.__globals__["get_lineage_graph_index"]()
+        first = builder._lineage_graph(session, "tenant_a")
+        assert builder._lineage_graph(session, "tenant_b") is first
+        assert list(index._graphs) == ["lineage"]
+
+    def test_impact_analysis(self, env):
+        builder, session = env
+        result = builder.get_impact_analysis(session, "default", "shop.orders", "table")
+        assert [n["label"] for n in result["impacted_nodes"]] == ["orders_daily", "report"]
+        assert {e["target"] for e in result["impacted_edges"]} == {"ln_report", "ln_missing"}
+        assert builder.get_impact_analysis(session, "default", "ln_orders", "table")["impact_count"] == 2
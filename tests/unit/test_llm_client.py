@@ -0,0 +1,169 @@
+"""
+共享 LLM 客户端单元测试
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+
+class _FakeLLMServer:
+    """在独立线程中运行的最小 OpenAI 兼容服务"""
+
+    def __init__(self, fail_times=0):
+        self.fail_times = fail_times
+        self.requests = []
+        self.peers = set()
+        self.base_url = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+
+    async def _chat(self, request):
+        body = await request.json()
+        self.requests.append(body)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if len(self.requests) <= self.fail_times:
+            return web.Response(status=503, text="busy")
+
+        if body.get("stream"):
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for token in ["Hel", "lo"]:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await resp.write(b"data: [DONE]\n\n")
+            await resp.write_eof()
+            return resp
+
+        await asyncio.sleep(body.get("delay", 0))
+        content = body["messages"][-1]["content"]
+        return web.json_response({"choices": [{"message": {"content": f"echo:{content}"}}]})
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(timeout=5)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _payload(content, **extra):
+    return dict({"model": "m", "messages": [{"role": "user", "content": content}]}, **extra)
+
+
+class TestLLMClient:
+    """LLMClient 测试"""
+
+    def test_chat_completion_reuses_connections_across_event_loops(self):
+        """测试不同事件循环中的调用共用一个连接池"""
+        from engine.llm_client import LLMClient
+
+        with _FakeLLMServer() as server:
+            client = LLMClient(server.base_url, max_retries=0)
+            try:
+                for i in range(3):
+                    response = asyncio.run(client.chat_completion(_payload(f"q{i}")))
+                    assert response.status_code == 200
+                    assert response.json()["choices"][0]["message"]["content"] == f"echo:q{i}"
+                assert len(server.peers) == 1
+            finally:
+                client.close()
+
+    def test_concurrent_requests_multiplex(self):
+        """测试并发请求同时在途"""
+        from engine.llm_client import LLMClient
+
+        async def run(client):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            responses = await asyncio.gather(
+                *(client.chat_completion(_payload(f"q{i}", delay=0.2)) for i in range(10))
+            )
+            return responses, loop.time() - start
+
+        with _FakeLLMServer() as server:
+            client = LLMClient(server.base_url, max_retries=0)
+            try:
+                responses, elapsed = asyncio.run(run(client))
+            finally:
+                client.close()
+
+        assert all(r.status_code == 200 for r in responses)
+        assert elapsed < 1.0
+
+    def test_retries_on_retryable_status(self, monkeypatch):
+        """测试 503 时重试"""
+        from engine import llm_client as module
+
+        async def no_sleep(_):
+            return None
+
+        with _FakeLLMServer(fail_times=1) as server:
+            client = module.LLMClient(server.base_url, max_retries=2)
+            monkeypatch.setattr(module.asyncio, "sleep", no_sleep)
+            try:
+                response = asyncio.run(client.chat_completion(_payload("x")))
+            finally:
+                client.close()
+
+        assert response.status_code == 200
+        assert len(server.requests) == 2
+
+    def test_returns_error_response_after_retries(self):
+        """测试重试耗尽后返回最后一次错误响应"""
+        from engine.llm_client import LLMClient
+
+        with _FakeLLMServer(fail_times=5) as server:
+            client = LLMClient(server.base_url, max_retries=0)
+            try:
+                response = asyncio.run(client.chat_completion(_payload("x")))
+            finally:
+                client.close()
+
+        assert response.status_code == 503
+        assert len(server.requests) == 1
+
+    def test_stream_chat_completion(self):
+        """测试流式输出"""
+        from engine.llm_client import LLMClient
+
+        async def collect(client):
+            return [t async for t in client.stream_chat_completion(_payload("x"))]
+
+        with _FakeLLMServer() as server:
+            client = LLMClient(server.base_url)
+            try:
+                tokens = asyncio.run(collect(client))
+            finally:
+                client.close()
+
+        assert tokens == ["Hel", "lo"]
+        assert server.requests[0]["stream"] is True
+
+    def test_get_llm_client_shared_per_base_url(self):
+        """测试按 base URL 共享客户端"""
+        from engine.llm_client import get_llm_client, reset_llm_clients
+
+        try:
+            a = get_llm_client("http://a:8000/")
+            assert get_llm_client("http://a:8000") is a
+            assert get_llm_client("http://b:8000") is not a
+        finally:
+            reset_llm_clients()
@@ -0,0 +1,264 @@
+"""
+统一通知服务分发器单元测试
+
+覆盖：
+- 去重、合并窗口、退避重试、并发上限、令牌桶限流
+- SMTP 连接池复用与断线重连
+"""
+
+import asyncio
+import smtplib
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加项目根路径以便导入 services.shared
+_project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(_project_root))
+
+import pytest
+from services.shared.notification_service import (
+    BaseChannel,
+    NotificationResult,
+    SMTPConnectionPool,
+    TokenBucket,
+    UnifiedNotificationService,
+)
+
+
+class _FakeChannel(BaseChannel):
+    """记录发送内容的假渠道，可按顺序返回预设错误码"""
+
+    def __init__(self, error_codes=None, delay=0.0):
+        super().__init__({})
+        self.sent = []
+        self.error_codes = list(error_codes or [])
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def send(self, recipient, subject, content, extra=None):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self.sent.append((recipient, subject, content))
+            if self.error_codes:
+                code = self.error_codes.pop(0)
+                return NotificationResult(success=False, channel="fake", error=code, error_code=code)
+            return NotificationResult(success=True, channel="fake")
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def make_service():
+    services = []
+
+    def factory(channel, **dispatcher_config):
+        config = {"retry_backoff": 0, "rate_limits": {"fake": None}, **dispatcher_config}
+        service = UnifiedNotificationService({"dispatcher": config})
+        service.register_channel("fake", channel)
+        services.append(service)
+        return service
+
+    yield factory
+    for service in services:
+        service.close()
+
+
+class TestNotificationDispatcher:
+    """NotificationDispatcher 测试"""
+
+    def test_duplicate_suppressed_within_window(self, make_service):
+        channel = _FakeChannel()
+        service = make_service(channel)
+
+        async def run():
+            first = await service.send("fake", "u1", "告警", "CPU 95%")
+            second = await service.send("fake", "u1", "告警", "CPU 95%")
+            other = await service.send("fake", "u2", "告警", "CPU 95%")
+            forced = await service.send("fake", "u1", "告警", "CPU 95%", {"dedupe": False})
+            return first, second, other, forced
+
+        first, second, other, forced = asyncio.run(run())
+        assert first.success and not (first.response_data or {}).get("suppressed")
+        assert second.response_data == {"suppressed": True, "reason": "duplicate"}
+        assert other.success and forced.success
+        assert [recipient for recipient, _, _ in channel.sent] == ["u1", "u2", "u1"]
+
+    def test_failed_send_not_deduplicated(self, make_service):
+        channel = _FakeChannel(error_codes=["WEBHOOK_NOT_CONFIGURED"])
+        service = make_service(channel)
+
+        async def run():
+            failed = await service.send("fake", "u1", "告警", "CPU 95%")
+            retried = await service.send("fake", "u1", "告警", "CPU 95%")
+            return failed, retried
+
+        failed, retried = asyncio.run(run())
+        assert failed.success is False and retried.success is True
+        assert len(channel.sent) == 2
+
+    def test_digest_consolidates_per_recipient(self, make_service):
+        channel = _FakeChannel()
+        service = make_service(channel, digest_window=60)
+
+        async def run():
+            extra = {"digest_key": "metric:cpu"}
+            queued = await service.send_batch("fake", ["u1", "u2"], "规则A 触发", "CPU 95%", extra)
+            await service.send("fake", "u1", "规则B 触发", "CPU 99%", extra)
+            assert channel.sent == []
+            flushed = await service.dispatcher.flush_digests()
+            return queued, flushed
+
+        queued, flushed = asyncio.run(run())
+        assert all(result.response_data["digested"] for result in queued)
+        assert len(flushed) == 2 and all(result.success for result in flushed)
+
+        sent = {recipient: (subject, content) for recipient, subject, content in channel.sent}
+        assert sent["u1"][0] == "规则A 触发（共 2 条）"
+        assert "[2] 规则B 触发\nCPU 99%" in sent["u1"][1]
+        assert sent["u2"] == ("规则A 触发", "CPU 95%")
+
+    def test_failed_digest_not_deduplicated(self, make_service):
+        channel = _FakeChannel(error_codes=["WEBHOOK_NOT_CONFIGURED"])
+        service = make_service(channel, digest_window=60)
+
+        async def run():
+            extra = {"digest_key": "metric:cpu"}
+            await service.send("fake", "u1", "告警", "CPU 95%", extra)
+            duplicate = await service.send("fake", "u1", "告警", "CPU 95%", extra)
+            failed = await service.dispatcher.flush_digests()
+            retried = await service.send("fake", "u1", "告警", "CPU 95%", extra)
+            flushed = await service.dispatcher.flush_digests()
+            suppressed = await service.send("fake", "u1", "告警", "CPU 95%", extra)
+            return duplicate, failed, retried, flushed, suppressed
+
+        duplicate, failed, retried, flushed, suppressed = asyncio.run(run())
+        assert duplicate.response_data["pending"] == 1
+        assert failed[0].success is False
+        assert retried.response_data["digested"] is True
+        assert flushed[0].success is True
+        assert suppressed.response_data == {"suppressed": True, "reason": "duplicate"}
+        assert [content for _, _, content in channel.sent] == ["CPU 95%", "CPU 95%"]
+
+    def test_close_registered_at_exit(self, make_service):
+        channel = _FakeChannel()
+        service = make_service(channel, digest_window=60)
+
+        with patch("services.shared.notification_service.atexit") as mock_atexit:
+            asyncio.run(service.send("fake", "u1", "a", "1", {"digest_key": "k"}))
+            mock_atexit.register.assert_called_once_with(service.dispatcher.close)
+
+            service.close()
+            mock_atexit.unregister.assert_called_once_with(service.dispatcher.close)
+        assert channel.sent == [("u1", "a", "1")]
+
+    def test_digest_flushed_after_window(self, make_service):
+        channel = _FakeChannel()
+        service = make_service(channel, digest_window=0.05)
+
+        async def run():
+            await service.send("fake", "u1", "a", "1", {"digest_key": "k"})
+            await service.send("fake", "u1", "b", "2", {"digest_key": "k"})
+            for _ in range(100):
+                if channel.sent:
+                    break
+                await asyncio.sleep(0.02)
+
+        asyncio.run(run())
+        assert len(channel.sent) == 1
+        assert channel.sent[0][1] == "a（共 2 条）"
+
+    def test_retryable_errors_retried(self, make_service):
+        channel = _FakeChannel(error_codes=["SEND_FAILED", "503"])
+        service = make_service(channel, max_retries=3)
+        result = asyncio.run(service.send("fake", "u1", "s", "c"))
+        assert result.success is True
+        assert len(channel.sent) == 3
+
+    def test_non_retryable_error_returned_immediately(self, make_service):
+        channel = _FakeChannel(error_codes=["DEPENDENCY_MISSING"])
+        service = make_service(channel, max_retries=3)
+        result = asyncio.run(service.send("fake", "u1", "s", "c"))
+        assert result.error_code == "DEPENDENCY_MISSING"
+        assert len(channel.sent) == 1
+
+    def test_concurrency_bounded_per_channel(self, make_service):
+        channel = _FakeChannel(delay=0.02)
+        service = make_service(channel, max_concurrency=2)
+        recipients = [f"u{i}" for i in range(6)]
+        results = asyncio.run(service.send_batch("fake", recipients, "s", "c"))
+        assert all(result.success for result in results)
+        assert channel.max_active == 2
+
+    def test_multi_channel_runs_concurrently(self, make_service):
+        first, second = _FakeChannel(delay=0.1), _FakeChannel(delay=0.1)
+        service = make_service(first)
+        service.register_channel("fake2", second)
+
+        start = time.monotonic()
+        results = asyncio.run(service.send_multi_channel(["fake", "fake2", "nope"], "u1", "s", "c"))
+        assert time.monotonic() - start < 0.19
+        assert results["fake"].success and results["fake2"].success
+        assert results["nope"].error_code == "UNSUPPORTED_CHANNEL"
+
+
+class TestTokenBucket:
+    """令牌桶限流"""
+
+    def test_burst_then_throttle(self):
+        async def run():
+            bucket = TokenBucket(2, 0.1)
+            start = time.monotonic()
+            for _ in range(4):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) >= 0.09
+
+
+class TestSMTPConnectionPool:
+    """SMTP 连接池"""
+
+    @pytest.fixture
+    def smtp(self):
+        servers = []
+
+        def connect(*args, **kwargs):
+            server = MagicMock(name=f"SMTP{len(servers)}")
+            servers.append(server)
+            return server
+
+        with patch.object(smtplib, "SMTP", side_effect=connect):
+            yield servers
+
+    def test_connection_reused(self, smtp):
+        pool = SMTPConnectionPool("smtp.example.com", 587, "user", "pass")
+        for _ in range(3):
+            pool.sendmail("from@example.com", ["to@example.com"], "msg")
+        assert len(smtp) == 1
+        smtp[0].starttls.assert_called_once()
+        smtp[0].login.assert_called_once_with("user", "pass")
+        assert smtp[0].sendmail.call_count == 3
+
+    def test_reconnect_when_idle_connection_dropped(self, smtp):
+        pool = SMTPConnectionPool("smtp.example.com", 587, "user", "pass")
+        pool.sendmail("from@example.com", ["to@example.com"], "msg")
+        smtp[0].sendmail.side_effect = smtplib.SMTPServerDisconnected()
+
+        pool.sendmail("from@example.com", ["to@example.com"], "msg")
+        assert len(smtp) == 2
+        smtp[1].sendmail.assert_called_once()
+        pool.close()
+        smtp[1].quit.assert_called_once()
+
+    def test_expired_connection_replaced(self, smtp):
+        pool = SMTPConnectionPool("smtp.example.com", 587, "user", "pass", idle_timeout=0)
+        pool.sendmail("from@example.com", ["to@example.com"], "msg")
+        pool.sendmail("from@example.com", ["to@example.com"], "msg")
+        assert len(smtp) == 2
+        smtp[0].quit.assert_called_once()
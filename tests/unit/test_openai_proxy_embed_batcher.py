@@ -0,0 +1,193 @@
+"""
+openai-proxy Embedding 微批处理单元测试
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# 添加 openai-proxy 路径（目录名含连字符，按模块路径导入）
+_openai_proxy_path = str(Path(__file__).parent.parent.parent / "services" / "openai-proxy")
+if _openai_proxy_path not in sys.path:
+    sys.path.insert(0, _openai_proxy_path)
+
+from embed_batcher import EmbeddingBatcher
+
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def model_dump(self):
+        return self._payload
+
+
+class FakeEmbedClient:
+    """记录每次上游调用的假客户端，向量第一维为文本长度"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self.embeddings = MagicMock()
+        self.embeddings.create = self._create
+
+    async def _create(self, model, input):
+        self.calls.append(list(input))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        # 单个 token 数组（List[int]）是一条输入
+        if input and isinstance(input[0], int):
+            input = [input]
+        return _Response({
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), 0.0]}
+                for i, text in enumerate(input)
+            ],
+            "usage": {"prompt_tokens": 10 * len(input), "total_tokens": 10 * len(input)},
+        })
+
+
+class TestEmbeddingBatcher:
+    """EmbeddingBatcher 测试"""
+
+    def test_concurrent_requests_are_merged(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", ["a"]),
+                batcher.embed(client, "m", ["bb", "ccc"]),
+                batcher.embed(client, "m", ["dddd"]),
+            )
+
+        first, second, third = asyncio.run(main())
+        assert client.calls == [["a", "bb", "ccc", "dddd"]]
+        assert [d["embedding"][0] for d in first["data"]] == [1.0]
+        assert [d["embedding"][0] for d in second["data"]] == [2.0, 3.0]
+        assert [d["index"] for d in second["data"]] == [0, 1]
+        assert [d["embedding"][0] for d in third["data"]] == [4.0]
+        assert second["model"] == "m"
+
+    def test_models_are_batched_separately(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m1", ["a"]),
+                batcher.embed(client, "m2", ["b"]),
+            )
+
+        first, second = asyncio.run(main())
+        assert sorted(client.calls) == [["a"], ["b"]]
+        assert first["model"] == "m1"
+        assert second["model"] == "m2"
+
+    def test_max_batch_size_splits_batches(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20, max_batch_size=2)
+
+        async def main():
+            return await asyncio.gather(*[batcher.embed(client, "m", [str(i)]) for i in range(5)])
+
+        results = asyncio.run(main())
+        assert all(len(call) <= 2 for call in client.calls)
+        assert sum(len(call) for call in client.calls) == 5
+        assert [r["data"][0]["embedding"][0] for r in results] == [1.0] * 5
+
+    def test_token_budget_splits_batches(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20, max_batch_tokens=10)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", ["x" * 32]),
+                batcher.embed(client, "m", ["y" * 32]),
+            )
+
+        asyncio.run(main())
+        assert len(client.calls) == 2
+
+    def test_upstream_error_reaches_every_caller(self):
+        client = FakeEmbedClient(fail=True)
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", ["a"]),
+                batcher.embed(client, "m", ["b"]),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        assert len(client.calls) == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_usage_is_split_between_callers(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", ["a" * 40]),
+                batcher.embed(client, "m", ["b" * 40]),
+            )
+
+        first, second = asyncio.run(main())
+        assert first["usage"]["prompt_tokens"] == 10
+        assert second["usage"]["prompt_tokens"] == 10
+
+    def test_metrics_recorded_per_batch(self):
+        client = FakeEmbedClient()
+        metrics = MagicMock()
+        batcher = EmbeddingBatcher(max_wait_ms=5, max_batch_size=4, metrics=metrics)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", ["a"]),
+                batcher.embed(client, "m", ["b"]),
+            )
+
+        asyncio.run(main())
+        metrics.record_batch.assert_called_once()
+        kwargs = metrics.record_batch.call_args.kwargs
+        assert kwargs["fill_ratio"] == 0.5
+        assert len(kwargs["queue_delays"]) == 2
+        assert all(delay >= 0 for delay in kwargs["queue_delays"])
+
+    def test_group_merges_requests_across_clients(self):
+        first_client = FakeEmbedClient()
+        second_client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(first_client, "m", ["a"], group="vllm"),
+                batcher.embed(second_client, "m", ["b"], group="vllm"),
+            )
+
+        asyncio.run(main())
+        assert first_client.calls == [["a", "b"]]
+        assert second_client.calls == []
+
+    def test_token_array_inputs_bypass_batching(self):
+        client = FakeEmbedClient()
+        batcher = EmbeddingBatcher(max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.embed(client, "m", [1, 2, 3]),
+                batcher.embed(client, "m", [[4, 5], [6]]),
+                batcher.embed(client, "m", ["a"]),
+            )
+
+        flat, nested, text = asyncio.run(main())
+        assert sorted(map(str, client.calls)) == sorted(map(str, [[1, 2, 3], [[4, 5], [6]], ["a"]]))
+        assert len(flat["data"]) == 1
+        assert [d["embedding"][0] for d in nested["data"]] == [2.0, 1.0]
+        assert text["data"][0]["index"] == 0
@@ -0,0 +1,116 @@
+"""
+openai-proxy Chat Completions 响应缓存单元测试
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# 添加 openai-proxy 路径（目录名含连字符，按模块路径导入）
+_openai_proxy_path = str(Path(__file__).parent.parent.parent / "services" / "openai-proxy")
+if _openai_proxy_path not in sys.path:
+    sys.path.insert(0, _openai_proxy_path)
+
+from response_cache import ResponseCache, completion_to_sse, is_cacheable, make_cache_key
+
+MESSAGES = [
+    {"role": "system", "content": "你是数据助手"},
+    {"role": "user", "content": "列出表"},
+]
+
+COMPLETION = {
+    "id": "c1",
+    "object": "chat.completion",
+    "created": 1,
+    "model": "m",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+}
+
+
+class TestCacheability:
+    """缓存适用性判断"""
+
+    def test_zero_temperature_is_cacheable(self):
+        assert is_cacheable({}, 0)
+
+    def test_sampling_is_not_cacheable(self):
+        assert not is_cacheable({}, 0.7)
+
+    def test_explicit_flag_overrides(self):
+        assert is_cacheable({"cache": True}, 0.7)
+        assert not is_cacheable({"cache": False}, 0)
+
+
+class TestCacheKey:
+    """缓存键规范化"""
+
+    def test_key_ignores_dict_order_and_unrelated_fields(self):
+        a = make_cache_key("vllm", "m", MESSAGES, {"temperature": 0, "max_tokens": 100, "stream": True})
+        b = make_cache_key("vllm", "m", MESSAGES, {"max_tokens": 100, "temperature": 0, "user": "x"})
+        assert a == b
+
+    def test_key_depends_on_sampling_params_and_backend(self):
+        base = make_cache_key("vllm", "m", MESSAGES, {"temperature": 0, "max_tokens": 100})
+        assert base != make_cache_key("vllm", "m", MESSAGES, {"temperature": 0, "max_tokens": 200})
+        assert base != make_cache_key("openai", "m", MESSAGES, {"temperature": 0, "max_tokens": 100})
+        assert base != make_cache_key("vllm", "m", MESSAGES[1:], {"temperature": 0, "max_tokens": 100})
+
+
+class TestResponseCache:
+    """ResponseCache 测试"""
+
+    def test_completion_roundtrip(self):
+        cache = ResponseCache()
+        cache.set_completion("k", COMPLETION)
+        assert cache.get_completion("k") == COMPLETION
+        assert cache.get_completion("other") is None
+
+    def test_stream_replays_raw_bytes(self):
+        cache = ResponseCache()
+        body = b'data: {"x":1}\n\ndata: [DONE]\n\n'
+        cache.set_stream("k", body)
+        assert list(cache.get_stream("k")) == [body]
+        # 流式条目不能满足非流式请求
+        assert cache.get_completion("k") is None
+
+    def test_stream_synthesized_from_completion(self):
+        cache = ResponseCache()
+        cache.set_completion("k", COMPLETION)
+        events = list(cache.get_stream("k"))
+        assert events[-1] == "data: [DONE]\n\n"
+        chunks = [json.loads(e[len("data: "):]) for e in events[:-1]]
+        assert chunks[0]["object"] == "chat.completion.chunk"
+        assert chunks[0]["choices"][0]["delta"]["content"] == "ok"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(ttl=0)
+        cache.set_completion("k", COMPLETION)
+        time.sleep(0.01)
+        assert cache.get_completion("k") is None
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set_completion("a", COMPLETION)
+        cache.set_completion("b", COMPLETION)
+        cache.get_completion("a")
+        cache.set_completion("c", COMPLETION)
+        assert len(cache) == 2
+        assert cache.get_completion("b") is None
+        assert cache.get_completion("a") is not None
+
+    def test_oversized_stream_not_cached(self):
+        cache = ResponseCache(max_entry_bytes=10)
+        cache.set_stream("k", b"x" * 100)
+        assert cache.get_stream("k") is None
+
+    def test_completion_to_sse_multiple_choices(self):
+        completion = dict(COMPLETION, choices=[
+            {"index": 0, "message": {"role": "assistant", "content": "a"}, "finish_reason": "stop"},
+            {"index": 1, "message": {"role": "assistant", "content": "b"}, "finish_reason": "length"},
+        ])
+        events = list(completion_to_sse(completion))
+        assert len(events) == 5
+        assert json.loads(events[3][len("data: "):])["choices"][0]["finish_reason"] == "length"
@@ -0,0 +1,175 @@
+"""
+openai-proxy 常驻异步运行时单元测试
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# 添加 openai-proxy 路径（目录名含连字符，按模块路径导入）
+_openai_proxy_path = str(Path(__file__).parent.parent.parent / "services" / "openai-proxy")
+if _openai_proxy_path not in sys.path:
+    sys.path.insert(0, _openai_proxy_path)
+
+from async_runtime import AsyncRuntime
+
+
+def _load_proxy_main():
+    """以独立模块名加载 openai-proxy/main.py，避免与其他服务的 main 模块冲突"""
+    import importlib.util
+
+    name = "openai_proxy_main"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, Path(_openai_proxy_path) / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+@pytest.fixture
+def runtime():
+    rt = AsyncRuntime(name="test-runtime")
+    yield rt
+    rt.shutdown()
+
+
+class TestAsyncRuntime:
+    """AsyncRuntime 测试"""
+
+    def test_run_reuses_one_loop(self, runtime):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second
+        assert not first.is_closed()
+
+    def test_run_propagates_exceptions(self, runtime):
+        async def boom():
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError, match="bad"):
+            runtime.run(boom())
+
+    def test_concurrent_callers_share_loop(self, runtime):
+        async def slow():
+            await asyncio.sleep(0.1)
+            return 1
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(runtime.run(slow()))) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [1] * 10
+
+    def test_iterate_yields_in_order(self, runtime):
+        async def gen():
+            for i in range(5):
+                await asyncio.sleep(0)
+                yield i
+
+        assert list(runtime.iterate(gen())) == [0, 1, 2, 3, 4]
+
+    def test_iterate_propagates_producer_error(self, runtime):
+        async def gen():
+            yield "a"
+            raise RuntimeError("upstream failed")
+
+        it = runtime.iterate(gen())
+        assert next(it) == "a"
+        with pytest.raises(RuntimeError, match="upstream failed"):
+            next(it)
+
+    def test_iterate_early_close_stops_producer(self, runtime):
+        closed = threading.Event()
+
+        async def gen():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+                    await asyncio.sleep(0.001)
+            finally:
+                closed.set()
+
+        it = runtime.iterate(gen(), max_buffered=2)
+        assert next(it) == 0
+        it.close()
+        assert closed.wait(2)
+
+
+class TestStreamingRelay:
+    """流式响应透传上游 SSE"""
+
+    def test_stream_relays_upstream_bytes_and_reuses_connection(self, monkeypatch):
+        aiohttp = pytest.importorskip("aiohttp")
+        pytest.importorskip("openai")
+        from aiohttp import web
+        from openai import AsyncOpenAI
+
+        monkeypatch.setenv("AUTH_MODE", "false")
+        main = _load_proxy_main()
+
+        peers = set()
+        sse_body = (
+            'data: {"id":"c1","object":"chat.completion.chunk","choices":[{"index":0,"delta":{"content":"Hi"}}]}\n\n'
+            "data: [DONE]\n\n"
+        )
+
+        async def chat(request):
+            peers.add(request.transport.get_extra_info("peername"))
+            body = await request.json()
+            if body.get("stream"):
+                return web.Response(text=sse_body, content_type="text/event-stream")
+            return web.json_response({
+                "id": "c2", "object": "chat.completion", "created": 1, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+
+        server_loop = asyncio.new_event_loop()
+        threading.Thread(target=server_loop.run_forever, daemon=True).start()
+
+        async def start():
+            app = web.Application()
+            app.router.add_post("/v1/chat/completions", chat)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            return runner, site._server.sockets[0].getsockname()[1]
+
+        runner, port = asyncio.run_coroutine_threadsafe(start(), server_loop).result(5)
+        client = AsyncOpenAI(api_key="dummy", base_url=f"http://127.0.0.1:{port}/v1")
+
+        try:
+            with patch.object(main, "AUTH_MODE", False), \
+                    patch.object(main, "get_chat_client", return_value=(client, "vllm")):
+                test_client = main.app.test_client()
+                payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+                streamed = test_client.post("/v1/chat/completions", json=dict(payload, stream=True))
+                assert streamed.status_code == 200
+                assert streamed.data.decode() == sse_body
+
+                for _ in range(2):
+                    resp = test_client.post("/v1/chat/completions", json=payload)
+                    assert resp.status_code == 200
+                    assert json.loads(resp.data)["choices"][0]["message"]["content"] == "ok"
+
+            # 三次请求复用同一条上游连接
+            assert len(peers) == 1
+        finally:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), server_loop).result(5)
+            server_loop.call_soon_threadsafe(server_loop.stop)
@@ -0,0 +1,122 @@
+"""
+openai-proxy 多副本负载均衡单元测试
+"""
+
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加 openai-proxy 路径（目录名含连字符，按模块路径导入）
+_openai_proxy_path = str(Path(__file__).parent.parent.parent / "services" / "openai-proxy")
+if _openai_proxy_path not in sys.path:
+    sys.path.insert(0, _openai_proxy_path)
+
+from upstream_pool import ReplicaPool, parse_urls
+
+
+def _pool(urls=("http://a:8000", "http://b:8000"), **kwargs):
+    pool = ReplicaPool("test", list(urls), lambda url, http_client: MagicMock(url=url), **kwargs)
+    for replica in pool.replicas:
+        replica.healthy = True
+    return pool
+
+
+class TestReplicaRouting:
+    """路由策略"""
+
+    def test_parse_urls(self):
+        assert parse_urls("http://a:8000, http://b:8000,") == ["http://a:8000", "http://b:8000"]
+        assert parse_urls("") == []
+
+    def test_unprobed_replicas_are_routable(self):
+        pool = ReplicaPool("test", ["http://a:8000"], lambda url, http_client: url)
+        assert pool.available()
+        assert pool.get_client() == "http://a:8000"
+        assert pool.status()[0]["healthy"] is None
+
+    def test_unhealthy_replicas_are_not_routable(self):
+        pool = _pool(urls=("http://a:8000",))
+        pool.replicas[0].healthy = False
+        assert not pool.available()
+        assert pool.get_client() is None
+
+    def test_picks_least_outstanding(self):
+        pool = _pool()
+        a, b = pool.replicas
+        pool._begin(a)
+        pool._begin(a)
+        pool._begin(b)
+        assert pool.pick() is b
+
+    def test_latency_breaks_ties(self):
+        pool = _pool()
+        a, b = pool.replicas
+        a.latency_ewma = 0.5
+        b.latency_ewma = 0.1
+        assert pool.pick() is b
+
+    def test_outstanding_released(self):
+        pool = _pool(urls=("http://a:8000",))
+        replica = pool.replicas[0]
+        started = pool._begin(replica)
+        assert replica.outstanding == 1
+        pool._end(replica, started, ok=True)
+        assert replica.outstanding == 0
+        assert replica.latency_ewma >= 0
+
+    def test_client_is_reused_per_replica(self):
+        pool = _pool(urls=("http://a:8000",))
+        assert pool.get_client() is pool.get_client()
+
+
+class TestEjection:
+    """被动摘除"""
+
+    def test_consecutive_failures_eject_replica(self):
+        pool = _pool(max_failures=2, eject_seconds=60)
+        a, b = pool.replicas
+        for _ in range(2):
+            pool._end(a, pool._begin(a), ok=False)
+        for _ in range(5):
+            assert pool.pick() is b
+
+    def test_success_resets_failure_count(self):
+        pool = _pool(max_failures=2)
+        a = pool.replicas[0]
+        pool._end(a, pool._begin(a), ok=False)
+        pool._end(a, pool._begin(a), ok=True)
+        pool._end(a, pool._begin(a), ok=False)
+        assert a.ejected_until == 0.0
+
+    def test_ejection_expires(self):
+        pool = _pool(urls=("http://a:8000",), max_failures=1, eject_seconds=0.01)
+        a = pool.replicas[0]
+        pool._end(a, pool._begin(a), ok=False)
+        assert not pool.available()
+        time.sleep(0.02)
+        assert pool.available()
+
+
+class TestProbing:
+    """主动探活"""
+
+    def test_probe_updates_health(self):
+        pool = ReplicaPool("test", ["http://a:8000", "http://b:8000"], lambda url, http_client: url)
+
+        def fake_get(url, timeout):
+            if url.startswith("http://a:8000"):
+                return MagicMock(status_code=200)
+            raise ConnectionError("down")
+
+        with patch("upstream_pool.requests.get", side_effect=fake_get):
+            pool.probe_once()
+
+        assert [r.healthy for r in pool.replicas] == [True, False]
+        assert pool.pick().url == "http://a:8000"
+
+    def test_status_reports_replicas(self):
+        pool = _pool()
+        status = pool.status()
+        assert [s["url"] for s in status] == ["http://a:8000", "http://b:8000"]
+        assert all(s["healthy"] for s in status)
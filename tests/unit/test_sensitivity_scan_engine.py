@@ -0,0 +1,344 @@
+"""
+敏感数据扫描引擎单元测试
+
+覆盖：
+- 预编译组合正则与逐条 re.match 的结果一致
+- 按表批量采样
+- 表级并发调度（单库并发上限、取消）
+- 自动扫描服务的检查点续扫
+- AI 批量分类与列指纹缓存
+"""
+
+import importlib.util
+import re
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+_services_dir = Path(__file__).parent.parent.parent / "services" / "data-api" / "services"
+
+
+def _load(name, filename):
+    """直接按文件加载模块，绕过 services 包初始化（依赖数据库配置）"""
+    spec = importlib.util.spec_from_file_location(name, _services_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+engine = _load("sensitivity_scan_engine", "sensitivity_scan_engine.py")
+
+
+def _reference_scan(values):
+    """逐条 re.match 的参考实现（与重构前的 _scan_sample_values 相同）"""
+    str_values = [str(v) for v in values if v is not None and str(v).strip()]
+    if not str_values:
+        return None
+    best_match, best_rate = None, 0
+    sample = str_values[:100]
+    for (stype, sub_type), patterns in engine.CONTENT_PATTERNS.items():
+        if not patterns:
+            continue
+        matched = sum(1 for val in sample if any(re.match(p, val.strip()) for p in patterns))
+        rate = matched / len(sample)
+        if rate > 0.3 and rate > best_rate:
+            best_rate = rate
+            best_match = {
+                "type": stype,
+                "sub_type": sub_type,
+                "confidence": int(min(95, 60 + rate * 30)),
+                "match_rate": round(rate, 3),
+                "matched_by": "content_regex",
+            }
+    return best_match
+
+
+class TestContentMatcher:
+    """预编译内容匹配器"""
+
+    @pytest.mark.parametrize("values", [
+        ["13812345678", "13912345678", " 15012345678 ", "n/a"],
+        ["alice@example.com", "bob@test.cn", None, ""],
+        ["110101199003071234", "11010119900307123X"],
+        ["张三", "李四", "王五六"],
+        ["北京市朝阳区建国路88号", "上海市浦东新区"],
+        ["6222021234567890123", "6228481234567890"],
+        ["sk-" + "a" * 40, "AKIA" + "B" * 16],
+        ["MR1234567", "12-345678"],
+        ["hello", "world", 42, 3.14],
+        [],
+    ])
+    def test_matches_reference_implementation(self, values):
+        assert engine.ContentMatcher().scan(values) == _reference_scan(values)
+
+    def test_detects_phone(self):
+        result = engine.ContentMatcher().scan(["13812345678", "13987654321"])
+        assert (result["type"], result["sub_type"]) == ("pii", "phone")
+        assert result["confidence"] == 90
+
+
+class TestFetchTableSamples:
+    """按表批量采样"""
+
+    def test_one_query_for_all_columns(self, tmp_path):
+        sqlalchemy = pytest.importorskip("sqlalchemy")
+        db = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'scan.db'}")
+        with db.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE users (phone TEXT, email TEXT, note TEXT)")
+            conn.exec_driver_sql(
+                "INSERT INTO users VALUES ('13812345678', 'a@b.com', NULL), "
+                "('13912345678', '', NULL), (NULL, 'c@d.com', NULL)"
+            )
+
+        with db.connect() as conn:
+            samples = engine.fetch_table_samples(conn, "main", "users", ["phone", "email", "note"], 10)
+
+        assert samples == {
+            "phone": ["13812345678", "13912345678"],
+            "email": ["a@b.com", "c@d.com"],
+            "note": [],
+        }
+
+    def test_group_columns_by_table(self):
+        columns = [
+            {"database": "a", "table": "t1", "column": "x"},
+            {"database": "b", "table": "t2", "column": "y"},
+            {"database": "a", "table": "t1", "column": "z"},
+        ]
+        grouped = engine.group_columns_by_table(columns)
+        assert list(grouped) == ["a.t1", "b.t2"]
+        assert [c["column"] for c in grouped["a.t1"]] == ["x", "z"]
+
+
+class TestScanTablesConcurrently:
+    """表级并发调度"""
+
+    def test_per_database_limit(self):
+        lock = threading.Lock()
+        active = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        def scan(key):
+            database = key.split(".")[0]
+            with lock:
+                active[database] += 1
+                peak[database] = max(peak[database], active[database])
+            time.sleep(0.01)
+            with lock:
+                active[database] -= 1
+            return [key]
+
+        keys = [f"a.t{i}" for i in range(6)] + [f"b.t{i}" for i in range(6)]
+        results = dict(engine.scan_tables_concurrently(keys, scan, max_workers=8, max_per_database=2))
+
+        assert set(results) == set(keys)
+        assert peak["a"] <= 2 and peak["b"] <= 2
+        assert peak["a"] + peak["b"] > 2
+
+    def test_failures_are_reported(self):
+        def scan(key):
+            if key == "a.bad":
+                raise RuntimeError("boom")
+            return []
+
+        results = dict(engine.scan_tables_concurrently(["a.ok", "a.bad"], scan, max_workers=2))
+        assert results["a.ok"] == []
+        assert isinstance(results["a.bad"], RuntimeError)
+
+    def test_stops_submitting_when_cancelled(self):
+        running = {"flag": True}
+        scanned = []
+
+        def scan(key):
+            scanned.append(key)
+            running["flag"] = False
+            return []
+
+        keys = [f"a.t{i}" for i in range(20)]
+        list(engine.scan_tables_concurrently(
+            keys, scan, max_workers=1, should_continue=lambda: running["flag"]
+        ))
+        assert len(scanned) == 1
+
+
+class TestBatchClassifier:
+    """AI 批量分类与指纹缓存"""
+
+    def test_fingerprint_depends_on_name_type_and_samples(self):
+        base = engine.column_fingerprint("Phone", "varchar", ["1", "2"])
+        assert base == engine.column_fingerprint("phone", "VARCHAR", ["1", "2"])
+        assert base != engine.column_fingerprint("mobile", "varchar", ["1", "2"])
+        assert base != engine.column_fingerprint("phone", "int", ["1", "2"])
+        assert base != engine.column_fingerprint("phone", "varchar", ["1", "3"])
+
+    def test_batches_split_and_cached(self):
+        calls = []
+
+        def classify_batch(payloads):
+            calls.append(list(payloads))
+            return [f"r-{p}" for p in payloads]
+
+        classifier = engine.BatchClassifier(
+            classify_batch, batch_size=2, max_concurrency=2, cache=engine.ClassificationCache()
+        )
+        items = [(f"fp{i}", i) for i in range(5)]
+        assert classifier.classify(items) == [f"r-{i}" for i in range(5)]
+        assert sorted(len(c) for c in calls) == [1, 2, 2]
+
+        # 第二次全部命中缓存
+        assert classifier.classify(items) == [f"r-{i}" for i in range(5)]
+        assert len(calls) == 3
+        assert classifier.cache_hits == 5
+        assert classifier.requests == 3
+        classifier.shutdown()
+
+    def test_duplicate_fingerprints_sent_once(self):
+        calls = []
+        classifier = engine.BatchClassifier(lambda p: calls.append(p) or ["x"] * len(p))
+        assert classifier.classify([("a", 1), ("a", 1), ("b", 2)]) == ["x", "x", "x"]
+        assert calls == [[1, 2]]
+        classifier.shutdown()
+
+    def test_failures_are_not_cached(self):
+        cache = engine.ClassificationCache()
+        results = iter([RuntimeError("down"), [None], ["ok"]])
+
+        def classify_batch(payloads):
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        classifier = engine.BatchClassifier(classify_batch, cache=cache)
+        assert classifier.classify([("a", 1)]) == [None]
+        assert classifier.classify([("a", 1)]) == [None]
+        assert len(cache) == 0
+        assert classifier.classify([("a", 1)]) == ["ok"]
+        assert cache.get("a") == "ok"
+        classifier.shutdown()
+
+    def test_cache_lru_eviction(self):
+        cache = engine.ClassificationCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+
+class TestAutoScanResume:
+    """检查点续扫"""
+
+    @pytest.fixture
+    def scan_module(self):
+        package = types.ModuleType("services")
+        package.__path__ = []
+        ai_module = types.ModuleType("services.ai_service")
+        ai_module.get_ai_service = MagicMock()
+        ai_module.AIService = object
+        with patch.dict(sys.modules, {
+            "services": package,
+            "services.ai_service": ai_module,
+            "services.sensitivity_scan_engine": engine,
+        }):
+            yield _load("sensitivity_auto_scan_service", "sensitivity_auto_scan_service.py")
+
+    def _columns(self):
+        return [
+            {"database": "shop", "table": f"t{i}", "column": "phone", "column_id": i, "column_type": ""}
+            for i in range(4)
+        ]
+
+    def test_cancelled_scan_resumes_from_checkpoint(self, scan_module):
+        service = scan_module.SensitivityAutoScanService(ai_service=MagicMock())
+        policy = scan_module.AutoScanPolicy(auto_update_metadata=False, auto_generate_masking_rules=False)
+        scanned = []
+
+        def scan_table(table_columns, policy, engine=None, db_session=None):
+            scanned.append(table_columns[0]["table"])
+            if len(scanned) == 2:
+                service._running = False
+            return [{"sensitivity_type": "pii", "column": "phone", "table": table_columns[0]["table"]}]
+
+        with patch.object(service, "_discover_columns", return_value=self._columns()), \
+                patch.object(service, "_scan_table", side_effect=scan_table):
+            service._current_progress = scan_module.AutoScanProgress()
+            service._running = True
+            service._execute_auto_scan(policy)
+            assert service.current_progress.status == scan_module.AutoScanStatus.FAILED
+            assert scanned == ["t0", "t1"]
+
+            service._current_progress = scan_module.AutoScanProgress()
+            service._running = True
+            service._execute_auto_scan(policy, resume=True)
+
+        progress = service.current_progress
+        assert scanned == ["t0", "t1", "t2", "t3"]
+        assert progress.status == scan_module.AutoScanStatus.COMPLETED
+        assert progress.resumed is True
+        assert progress.scanned_columns == 4
+        assert progress.sensitive_found == 4
+        assert service._checkpoint is None
+
+    def test_quick_scan_uses_compiled_patterns(self, scan_module):
+        service = scan_module.SensitivityAutoScanService(ai_service=MagicMock())
+        result = service.quick_scan_column("user_mobile", ["13812345678", "13912345678"])
+        assert result["sensitivity_sub_type"] == "phone"
+        assert result["matched_by"] == "content_regex"
+        assert service._match_column_name("USER_EMAIL")["sub_type"] == "email"
+        assert service._match_column_name("created_at") is None
+
+    def test_table_ai_candidates_batched_and_reused(self, scan_module):
+        ai_service = MagicMock()
+        ai_service.batch_analyze_sensitivity.side_effect = lambda payloads, table_name="": [
+            {"is_sensitive": p["name"] == "remark", "sensitivity_type": "pii", "confidence": 0.9}
+            for p in payloads
+        ]
+        service = scan_module.SensitivityAutoScanService(ai_service=ai_service)
+        service._ai_available = True
+        policy = scan_module.AutoScanPolicy()
+        columns = [
+            {"database": "shop", "table": "orders", "column": name, "column_id": i, "column_type": "varchar"}
+            for i, name in enumerate(["remark", "note", "status"])
+        ]
+        samples = {
+            "remark": ["客户要求周末送货", "放门口"],
+            "note": ["ok", "done"],
+            "status": ["paid", "shipped"],
+        }
+
+        with patch.object(scan_module, "fetch_table_samples", return_value=samples):
+            results = service._scan_table(columns, policy, db_session=MagicMock())
+            assert [r["column"] for r in results] == ["remark"]
+            assert results[0]["matched_by"].startswith("ai_analysis")
+            assert ai_service.batch_analyze_sensitivity.call_count == 1
+            assert len(ai_service.batch_analyze_sensitivity.call_args.args[0]) == 3
+
+            # 未变化的列复用缓存，不再调用 AI
+            again = service._scan_table(columns, policy, db_session=MagicMock())
+        assert again == results
+        assert ai_service.batch_analyze_sensitivity.call_count == 1
+
+    def test_table_sample_failure_falls_back_per_column(self, scan_module):
+        service = scan_module.SensitivityAutoScanService(ai_service=MagicMock())
+        policy = scan_module.AutoScanPolicy()
+        columns = [
+            {"database": "shop", "table": "users", "column": name, "column_id": i, "column_type": "varchar"}
+            for i, name in enumerate(["mobile", "status"])
+        ]
+        per_column = {"mobile": ["13812345678", "13912345678"], "status": ["active"]}
+
+        with patch.object(scan_module, "fetch_table_samples", side_effect=RuntimeError("bad column")), \
+                patch.object(service, "_fetch_sample_data",
+                             side_effect=lambda db, table, column, size, conn: per_column[column]) as fetch:
+            results = service._scan_table(columns, policy, db_session=MagicMock())
+
+        assert [call.args[2] for call in fetch.call_args_list] == ["mobile", "status"]
+        assert [r["column"] for r in results] == ["mobile"]
+        assert results[0]["sensitivity_sub_type"] == "phone"
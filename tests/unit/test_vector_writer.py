@@ -0,0 +1,417 @@
+"""
+VectorStore 批量写入、集合句柄缓存与搜索缓存单元测试
+"""
+
+import importlib.util
+import sys
+import types
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+try:
+    # 先于 patch.dict(sys.modules) 导入，否则退出时被移除后无法再次加载
+    import numpy
+except ImportError:
+    numpy = None
+
+_vector_store_path = (
+    Path(__file__).parent.parent.parent / "services" / "agent-api" / "agent_services" / "vector_store.py"
+)
+
+
+@pytest.fixture
+def milvus():
+    """假的 pymilvus：记录每个集合的 insert / flush / load 调用"""
+    fake = types.ModuleType("pymilvus")
+    existing = set()
+    handles = {}
+
+    def collection(name, schema=None):
+        existing.add(name)
+        if name not in handles:
+            handle = MagicMock(name=f"Collection({name})")
+            handle.search.return_value = [[]]
+            handles[name] = handle
+        return handles[name]
+
+    fake.Collection = MagicMock(side_effect=collection)
+    fake.connections = MagicMock()
+    fake.FieldSchema = MagicMock()
+    fake.CollectionSchema = MagicMock()
+    fake.DataType = MagicMock()
+    fake.utility = MagicMock()
+    fake.utility.has_collection.side_effect = lambda name: name in existing
+    fake.utility.drop_collection.side_effect = lambda name: existing.discard(name)
+    fake.handles = handles
+
+    with patch.dict(sys.modules, {"pymilvus": fake}):
+        spec = importlib.util.spec_from_file_location("vector_store_under_test", _vector_store_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.SEARCH_CACHE_SHARED_VERSIONS = False
+        with patch.object(module.VectorStore, "_connect"), \
+                patch.object(module.VectorStore, "_ensure_connection"):
+            module.VectorStore._collections.clear()
+            module.VectorStore._loaded_collections.clear()
+            yield module, fake
+
+
+def _docs(n, doc_id="d"):
+    return [f"text {i}" for i in range(n)], [[0.1, 0.2]] * n, [{"doc_id": doc_id}] * n
+
+
+class TestCollectionHandleCache:
+    """集合句柄与加载状态缓存"""
+
+    def test_insert_reuses_handle_and_loads_once(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        for _ in range(3):
+            store.insert("kb", *_docs(2))
+
+        handle = fake.handles["kb"]
+        assert handle.insert.call_count == 3
+        handle.flush.assert_not_called()
+        handle.load.assert_called_once()
+        # 首次创建时检查一次，之后命中缓存
+        assert fake.utility.has_collection.call_count == 2
+
+    def test_search_after_insert_skips_has_collection_and_load(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        store.insert("kb", *_docs(1))
+        calls = fake.utility.has_collection.call_count
+
+        store.search("kb", [0.1, 0.2], use_cache=False)
+        store.search("kb", [0.2, 0.1], use_cache=False)
+        assert fake.utility.has_collection.call_count == calls
+        fake.handles["kb"].load.assert_called_once()
+
+    def test_missing_collection_not_cached(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        assert store.search("nope", [0.1])["results"] == []
+        assert "nope" not in module.VectorStore._collections
+
+    def test_drop_collection_clears_cache(self, milvus):
+        module, _ = milvus
+        store = module.VectorStore()
+        store.insert("kb", *_docs(1))
+        store.drop_collection("kb")
+        assert "kb" not in module.VectorStore._collections
+        assert "kb" not in module.VectorStore._loaded_collections
+
+    def test_delete_by_doc_id_does_not_flush(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        store.insert("kb", *_docs(1))
+        assert store.delete_by_doc_id("kb", "d") is True
+        fake.handles["kb"].delete.assert_called_once_with(expr='doc_id == "d"')
+        fake.handles["kb"].flush.assert_not_called()
+
+
+class TestVectorWriter:
+    """VectorWriter 缓冲写入"""
+
+    def test_buffers_across_calls_until_commit(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        with store.writer(max_rows=100, flush_interval=60) as writer:
+            for i in range(10):
+                writer.add("kb", *_docs(3, doc_id=f"doc{i}"))
+            assert "kb" not in fake.handles
+
+        handle = fake.handles["kb"]
+        handle.insert.assert_called_once()
+        ids, doc_ids, embeddings, texts, metadata = handle.insert.call_args.args[0]
+        assert len(ids) == len(set(ids)) == 30
+        assert doc_ids[:3] == ["doc0"] * 3 and doc_ids[-1] == "doc9"
+        assert len(embeddings) == len(texts) == len(metadata) == 30
+        handle.flush.assert_called_once()
+        assert writer.rows_written == 30
+
+    def test_size_threshold_triggers_insert(self, milvus):
+        module, fake = milvus
+        writer = module.VectorStore().writer(max_rows=5, flush_interval=60)
+        writer.add("kb", *_docs(3))
+        assert "kb" not in fake.handles
+        writer.add("kb", *_docs(3))
+        sizes = [len(call.args[0][0]) for call in fake.handles["kb"].insert.call_args_list]
+        assert sizes == [5, 1]
+        fake.handles["kb"].flush.assert_not_called()
+
+    def test_time_threshold_triggers_insert(self, milvus):
+        module, fake = milvus
+        writer = module.VectorStore().writer(max_rows=1000, flush_interval=0)
+        writer.add("kb", *_docs(1))
+        fake.handles["kb"].insert.assert_called_once()
+
+    def test_large_buffer_split_into_max_rows_chunks(self, milvus):
+        module, fake = milvus
+        store = module.VectorStore()
+        assert store.batch_insert("kb", *_docs(25), batch_size=10) == 25
+        sizes = [len(call.args[0][0]) for call in fake.handles["kb"].insert.call_args_list]
+        assert sizes == [10, 10, 5]
+        fake.handles["kb"].flush.assert_called_once()
+
+    def test_multiple_collections_flushed_once_each(self, milvus):
+        module, fake = milvus
+        with module.VectorStore().writer() as writer:
+            writer.add("a", *_docs(1))
+            writer.add("b", *_docs(2))
+            writer.add("a", *_docs(1))
+        assert len(fake.handles["a"].insert.call_args.args[0][0]) == 2
+        fake.handles["a"].flush.assert_called_once()
+        fake.handles["b"].flush.assert_called_once()
+
+    def test_exception_discards_buffer(self, milvus):
+        module, fake = milvus
+        with pytest.raises(RuntimeError):
+            with module.VectorStore().writer() as writer:
+                writer.add("kb", *_docs(2))
+                raise RuntimeError("boom")
+        assert "kb" not in fake.handles
+
+    def test_failed_batch_retried_per_key(self, milvus):
+        module, fake = milvus
+        with module.VectorStore().writer() as writer:
+            writer.add("kb", *_docs(2, doc_id="good"), key="good")
+            writer.add("kb", *_docs(1, doc_id="bad"), key="bad")
+            handle = fake.handles["kb"] = MagicMock(name="Collection(kb)")
+
+            def insert(columns):
+                if len(columns[0]) == 3 or columns[1] == ["bad"]:
+                    raise RuntimeError("insert failed")
+
+            handle.insert.side_effect = insert
+        assert writer.failed == {"bad": "insert failed"}
+        assert writer.rows_written == 2
+        assert [call.args[0][1] for call in handle.insert.call_args_list[1:]] == [["good"] * 2, ["bad"]]
+
+    def test_keyed_segments_not_split_across_chunks(self, milvus):
+        module, fake = milvus
+        with module.VectorStore().writer(max_rows=4, flush_interval=60) as writer:
+            writer.add("kb", *_docs(3, doc_id="a"), key="a")
+            writer.add("kb", *_docs(3, doc_id="b"), key="b")
+        inserted = [call.args[0][1] for call in fake.handles["kb"].insert.call_args_list]
+        assert inserted == [["a"] * 3, ["b"] * 3]
+
+    def test_straddling_key_partial_rows_removed_on_failure(self, milvus):
+        module, fake = milvus
+        handle = fake.handles["kb"] = MagicMock(name="Collection(kb)")
+        calls = []
+
+        def insert(columns):
+            calls.append(list(columns[0]))
+            if len(calls) > 1 and "big" in columns[1]:
+                raise RuntimeError("insert failed")
+
+        handle.insert.side_effect = insert
+        writer = module.VectorStore().writer(max_rows=4, flush_interval=60)
+        writer.add("kb", *_docs(6, doc_id="big"), key="big")
+        writer.add("kb", *_docs(1, doc_id="small"), key="small")
+        with patch.object(module.VectorStore, "_bump_collection_version"):
+            writer.commit()
+
+        # big 被切成 4 + 2 行；第二块失败后重试仍失败，已写入的 4 行被删除
+        assert set(writer.failed) == {"big"}
+        deleted = handle.delete.call_args.kwargs["expr"]
+        assert all(row_id in deleted for row_id in calls[0])
+        assert writer.rows_written == 1
+
+    def test_collection_failure_does_not_drop_other_collections(self, milvus):
+        module, fake = milvus
+        get_collection = module.VectorStore._get_collection
+
+        def failing(self, name, create=False):
+            if name == "a":
+                raise RuntimeError("collection unavailable")
+            return get_collection(self, name, create)
+
+        with patch.object(module.VectorStore, "_get_collection", failing):
+            with module.VectorStore().writer() as writer:
+                writer.add("a", *_docs(1, doc_id="x"), key="x")
+                writer.add("b", *_docs(2, doc_id="y"), key="y")
+        assert writer.failed == {"x": "collection unavailable"}
+        assert fake.handles["b"].insert.call_args.args[0][1] == ["y", "y"]
+
+    def test_unkeyed_failure_keeps_rows_buffered(self, milvus):
+        module, fake = milvus
+        handle = fake.handles["a"] = MagicMock(name="Collection(a)")
+        handle.insert.side_effect = [RuntimeError("insert failed"), None]
+        writer = module.VectorStore().writer(max_rows=100, flush_interval=60)
+        writer.add("a", *_docs(2))
+        writer.add("b", *_docs(1))
+
+        with pytest.raises(RuntimeError):
+            writer.flush()
+        assert fake.handles["b"].insert.call_count == 1
+        assert writer.flush() == 2
+        assert len(handle.insert.call_args.args[0][0]) == 2
+
+    def test_failed_batch_without_keys_raises(self, milvus):
+        module, fake = milvus
+        writer = module.VectorStore().writer()
+        writer.add("kb", *_docs(2))
+        fake.handles["kb"] = MagicMock(name="Collection(kb)")
+        fake.handles["kb"].insert.side_effect = RuntimeError("insert failed")
+        with pytest.raises(RuntimeError):
+            writer.commit()
+
+    def test_row_count_mismatch_rejected_before_buffering(self, milvus):
+        module, fake = milvus
+        with module.VectorStore().writer() as writer:
+            with pytest.raises(ValueError):
+                writer.add("kb", ["a", "b"], [[0.1, 0.2]])
+            writer.add("kb", *_docs(1))
+        assert len(fake.handles["kb"].insert.call_args.args[0][0]) == 1
+
+
+class TestSearchCache:
+    """搜索缓存：精确键、集合版本、语义命中"""
+
+    @pytest.fixture
+    def store(self, milvus):
+        module, fake = milvus
+        module.VectorStore._search_cache.clear()
+        module.VectorStore._collection_versions.clear()
+        store = module.VectorStore()
+        store.insert("kb", *_docs(1))
+        yield module, fake, store
+        module.VectorStore._search_cache.clear()
+
+    def test_key_uses_full_vector(self, store):
+        _, _, store = store
+        base = [0.1] * 20
+        changed = base[:15] + [0.9] + base[16:]
+        assert store._get_cache_key("kb", base, 5) != store._get_cache_key("kb", changed, 5)
+        assert store._get_cache_key("kb", base, 5) == store._get_cache_key("kb", list(base), 5)
+
+    def test_repeat_query_hits_cache(self, store):
+        _, fake, store = store
+        store.search("kb", [0.1, 0.2])
+        result = store.search("kb", [0.1, 0.2])
+        assert result["cached"] is True and result["cache_match"] == "exact"
+        assert fake.handles["kb"].search.call_count == 1
+
+    def test_output_fields_are_part_of_key(self, store):
+        _, fake, store = store
+        store.search("kb", [0.1, 0.2])
+        assert store.search("kb", [0.1, 0.2], output_fields=["text"])["cached"] is False
+        assert fake.handles["kb"].search.call_count == 2
+
+    def test_insert_and_delete_invalidate_collection(self, store):
+        _, fake, store = store
+        store.search("kb", [0.1, 0.2])
+        store.insert("kb", *_docs(1))
+        assert store.search("kb", [0.1, 0.2])["cached"] is False
+        store.delete_by_doc_id("kb", "d")
+        assert store.search("kb", [0.1, 0.2])["cached"] is False
+        assert fake.handles["kb"].search.call_count == 3
+
+    def test_writer_commit_invalidates_collection(self, store):
+        _, _, store = store
+        store.search("kb", [0.1, 0.2])
+        with store.writer() as writer:
+            writer.add("kb", *_docs(2))
+        assert store.search("kb", [0.1, 0.2])["cached"] is False
+
+    def test_other_collection_not_invalidated(self, store):
+        _, _, store = store
+        store.insert("other", *_docs(1))
+        store.search("kb", [0.1, 0.2])
+        store.insert("other", *_docs(1))
+        assert store.search("kb", [0.1, 0.2])["cached"] is True
+
+    def test_versions_shared_through_redis(self, store):
+        module, fake, store = store
+        versions = {}
+        client = MagicMock()
+        client.incr.side_effect = lambda key: versions.__setitem__(key, versions.get(key, 0) + 1)
+        client.get.side_effect = versions.get
+
+        with patch.object(module, "SEARCH_CACHE_SHARED_VERSIONS", True), \
+                patch.object(module, "REDIS_AVAILABLE", True), \
+                patch.object(module.VectorStore, "_version_redis", client):
+            store.search("kb", [0.1, 0.2])
+            assert store.search("kb", [0.1, 0.2])["cached"] is True
+
+            # 其他进程（如 Celery 导入）写入同一集合，只递增 Redis 中的版本
+            client.incr(module.COLLECTION_VERSION_KEY_PREFIX + "kb")
+            assert store.search("kb", [0.1, 0.2])["cached"] is False
+
+            store.insert("kb", *_docs(1))
+            assert versions[module.COLLECTION_VERSION_KEY_PREFIX + "kb"] == 2
+        assert fake.handles["kb"].search.call_count == 2
+
+    def test_search_reads_collection_version_once(self, store):
+        module, _, store = store
+        client = MagicMock()
+        client.get.return_value = b"3"
+
+        with patch.object(module, "SEARCH_CACHE_SHARED_VERSIONS", True), \
+                patch.object(module, "REDIS_AVAILABLE", True), \
+                patch.object(module.VectorStore, "_version_redis", client):
+            store.search("kb", [0.1, 0.2])
+            assert client.get.call_count == 1
+            assert store.search("kb", [0.1, 0.2])["cached"] is True
+            assert client.get.call_count == 2
+
+    def test_redis_failure_falls_back_to_local_versions(self, store):
+        module, _, store = store
+        client = MagicMock()
+        client.get.side_effect = ConnectionError("down")
+
+        with patch.object(module, "SEARCH_CACHE_SHARED_VERSIONS", True), \
+                patch.object(module, "REDIS_AVAILABLE", True), \
+                patch.object(module.VectorStore, "_version_redis", client), \
+                patch.object(module.VectorStore, "_version_redis_retry_at", 0.0):
+            assert store._get_collection_version("kb") == "local1"
+            assert module.VectorStore._version_redis is None
+            assert module.VectorStore._version_redis_retry_at > 0
+
+    def test_lru_evicts_least_recently_used(self, store):
+        module, _, store = store
+        with patch.object(module, "SEARCH_CACHE_SIZE", 2):
+            store._set_cache("a", [1])
+            store._set_cache("b", [2])
+            assert store._get_from_cache("a") == [1]
+            store._set_cache("c", [3])
+        assert store._get_from_cache("b") is None
+        assert store._get_from_cache("a") == [1]
+        assert len(module.VectorStore._search_cache) == 2
+
+    @pytest.mark.skipif(numpy is None, reason="numpy not installed")
+    def test_semantic_hit_within_threshold(self, store):
+        module, fake, store = store
+        with patch.object(module.VectorStore, "_semantic_index", module.SemanticQueryIndex(0.99)):
+            store.search("kb", [1.0, 0.0, 0.0])
+            near = store.search("kb", [1.0, 0.01, 0.0])
+            far = store.search("kb", [0.0, 1.0, 0.0])
+            assert near["cached"] is True and near["cache_match"] == "semantic"
+            assert far["cached"] is False
+
+            # 集合变更后语义索引同样失效
+            store.insert("kb", *_docs(1))
+            assert store.search("kb", [1.0, 0.01, 0.0])["cached"] is False
+        assert fake.handles["kb"].search.call_count == 3
+
+
+class TestSemanticQueryIndex:
+    """最近查询向量索引"""
+
+    @pytest.mark.skipif(numpy is None, reason="numpy not installed")
+    def test_ring_buffer_keeps_recent_queries(self, milvus):
+        module, _ = milvus
+        index = module.SemanticQueryIndex(0.95, capacity=2)
+        scope = "kb:v0:5:"
+        index.add(scope, [1.0, 0.0], "k1")
+        index.add(scope, [0.0, 1.0], "k2")
+        assert index.lookup(scope, [0.0, 2.0]) == "k2"
+        index.add(scope, [0.7, 0.7], "k3")  # 覆盖最旧的 k1
+        assert index.lookup(scope, [1.0, 0.0]) is None
+        assert index.lookup("other:v0:5:", [0.0, 1.0]) is None
+        index.drop_collection("kb")
+        assert index.lookup(scope, [0.0, 1.0]) is None
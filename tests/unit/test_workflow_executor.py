@@ -278,6 +278,144 @@ class TestWorkflowExecutor:
             WorkflowExecutor.parse_definition("invalid json")
 
 
+class TestWavefrontExecution:
+    """波前并行调度测试"""
+
+    @staticmethod
+    def _register_sleep_node(state):
+        """注册一个记录并发度的延时节点类型"""
+        from engine.nodes import register_node_type, BaseNode
+
+        class SleepNode(BaseNode):
+            def __init__(self, node_id, config=None):
+                super().__init__(node_id, "sleep", config)
+
+            async def execute(self, context):
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                state["order"].append(self.node_id)
+                try:
+                    await asyncio.sleep(self.config.get("delay", 0.05))
+                    if self.config.get("fail"):
+                        raise Exception(f"{self.node_id} failed")
+                    return {self.node_id: {"value": self.node_id}, "shared": self.node_id}
+                finally:
+                    state["active"] -= 1
+
+        register_node_type("sleep", SleepNode)
+
+    @staticmethod
+    def _fan_out_definition(width, **branch_config):
+        nodes = [{"id": "input", "type": "input"}]
+        edges = []
+        for i in range(width):
+            nodes.append({"id": f"b{i}", "type": "sleep", "config": dict(branch_config)})
+            edges.append({"source": "input", "target": f"b{i}"})
+            edges.append({"source": f"b{i}", "target": "join"})
+        nodes.append({"id": "join", "type": "sleep", "config": {"delay": 0}})
+        return {"version": "1.0", "nodes": nodes, "edges": edges}
+
+    @pytest.mark.asyncio
+    async def test_independent_branches_run_concurrently(self):
+        """测试无依赖的分支并行执行"""
+        from engine.executor import WorkflowExecutor
+
+        state = {"active": 0, "peak": 0, "order": []}
+        self._register_sleep_node(state)
+
+        executor = WorkflowExecutor("wf-001", self._fan_out_definition(4, delay=0.1))
+        start = asyncio.get_event_loop().time()
+        result = await executor.execute({})
+        elapsed = asyncio.get_event_loop().time() - start
+
+        assert result["status"] == "completed"
+        assert state["peak"] == 4
+        assert elapsed < 0.3
+        # 汇合节点在所有分支完成后才启动
+        assert state["order"][-1] == "join"
+
+    @pytest.mark.asyncio
+    async def test_max_concurrency_limit(self):
+        """测试并发数上限"""
+        from engine.executor import WorkflowExecutor
+
+        state = {"active": 0, "peak": 0, "order": []}
+        self._register_sleep_node(state)
+
+        executor = WorkflowExecutor("wf-001", self._fan_out_definition(5, delay=0.02), max_concurrency=2)
+        result = await executor.execute({})
+
+        assert result["status"] == "completed"
+        assert state["peak"] == 2
+        # 就绪节点按拓扑顺序启动
+        assert state["order"][:5] == ["b0", "b1", "b2", "b3", "b4"]
+
+    @pytest.mark.asyncio
+    async def test_merge_is_deterministic(self):
+        """测试同名键按拓扑顺序合并，与完成先后无关"""
+        from engine.executor import WorkflowExecutor
+
+        state = {"active": 0, "peak": 0, "order": []}
+        self._register_sleep_node(state)
+
+        definition = self._fan_out_definition(2)
+        # b0 比 b1 晚完成，但 b0 拓扑序在前，最终 shared 应由 b1 写入
+        definition["nodes"][1]["config"] = {"delay": 0.08}
+        definition["nodes"][2]["config"] = {"delay": 0.01}
+
+        executor = WorkflowExecutor("wf-001", definition)
+        result = await executor.execute({})
+
+        assert result["status"] == "completed"
+        assert executor.context["b0"] == {"value": "b0"}
+        assert executor.context["shared"] == "join"
+        # 汇合前的上下文按拓扑顺序合并
+        join_input = executor._merge_outputs(
+            {}, {n: executor.node_results[n]["result"] for n in ("b0", "b1")}, ["b0", "b1"]
+        )
+        assert join_input["shared"] == "b1"
+
+    @pytest.mark.asyncio
+    async def test_fail_fast_cancels_running_nodes(self):
+        """测试未配置 continue_on_error 时立即失败并取消其余节点"""
+        from engine.executor import WorkflowExecutor
+
+        state = {"active": 0, "peak": 0, "order": []}
+        self._register_sleep_node(state)
+
+        definition = self._fan_out_definition(2)
+        definition["nodes"][1]["config"] = {"delay": 0.01, "fail": True}
+        definition["nodes"][2]["config"] = {"delay": 5}
+
+        executor = WorkflowExecutor("wf-001", definition)
+        result = await asyncio.wait_for(executor.execute({}), timeout=2)
+
+        assert result["status"] == "failed"
+        assert result["node_results"]["b0"]["status"] == "error"
+        assert result["node_results"]["b1"]["status"] == "cancelled"
+        assert "join" not in result["node_results"]
+        assert state["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_continue_on_error_runs_successors(self):
+        """测试 continue_on_error 节点失败后继续执行后继节点"""
+        from engine.executor import WorkflowExecutor
+
+        state = {"active": 0, "peak": 0, "order": []}
+        self._register_sleep_node(state)
+
+        definition = self._fan_out_definition(2)
+        definition["nodes"][1]["config"] = {"delay": 0.01, "fail": True, "continue_on_error": True}
+
+        executor = WorkflowExecutor("wf-001", definition)
+        result = await executor.execute({})
+
+        assert result["status"] == "completed"
+        assert result["node_results"]["b0"]["status"] == "error"
+        assert result["node_results"]["join"]["status"] == "success"
+        assert len(executor.errors) == 1
+
+
 class TestExecutionManagement:
     """执行管理函数测试"""
 
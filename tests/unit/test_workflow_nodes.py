@@ -208,9 +208,10 @@ class TestLLMNode:
         assert node.temperature == 0.5
 
     @pytest.mark.asyncio
-    @patch('engine.nodes.requests.post')
-    async def test_execute_success(self, mock_post):
+    @patch('engine.nodes.get_llm_client')
+    async def test_execute_success(self, mock_get_client):
         """测试成功执行"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.nodes import LLMNode
 
         mock_response = Mock()
@@ -230,9 +231,10 @@ class TestLLMNode:
         assert result["llm-1"]["tokens"] == 100
 
     @pytest.mark.asyncio
-    @patch('engine.nodes.requests.post')
-    async def test_execute_with_documents(self, mock_post):
+    @patch('engine.nodes.get_llm_client')
+    async def test_execute_with_documents(self, mock_get_client):
         """测试使用文档上下文执行"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.nodes import LLMNode
 
         mock_response = Mock()
@@ -261,9 +263,10 @@ class TestLLMNode:
         assert "Context 1" in str(call_args)
 
     @pytest.mark.asyncio
-    @patch('engine.nodes.requests.post')
-    async def test_execute_api_error(self, mock_post):
+    @patch('engine.nodes.get_llm_client')
+    async def test_execute_api_error(self, mock_get_client):
         """测试 API 错误"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.nodes import LLMNode
 
         mock_response = Mock()
@@ -295,9 +298,10 @@ class TestThinkNode:
         assert node.model == "gpt-4"
 
     @pytest.mark.asyncio
-    @patch('engine.nodes.requests.post')
-    async def test_execute(self, mock_post):
+    @patch('engine.nodes.get_llm_client')
+    async def test_execute(self, mock_get_client):
         """测试执行"""
+        mock_post = mock_get_client.return_value.chat_completion = AsyncMock()
         from engine.nodes import ThinkNode
 
         mock_response = Mock()